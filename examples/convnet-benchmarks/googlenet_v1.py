@@ -39,6 +39,8 @@ parser = NeonArgparser(__doc__)
 args = parser.parse_args()
 
 NervanaObject.be.enable_winograd = 4
+# run the independent inception branches concurrently on the CPU backend
+NervanaObject.be.set_branch_workers(4)
 
 # setup data provider
 X_train = np.random.uniform(-1, 1, (128, 3 * 224 * 224))
@@ -77,14 +77,16 @@ class ObjectLocalization(DataLoaderTransformer):
         #
         # The above are computed during fprop by the ProposalLayer,
         # so here we create the buffers to pass that to layer.
+        # The rois of the images of the minibatch follow each other.
+        num_rois = self.frcn_rois_per_img * self.be.bsz
         self.dev_y_frcn_labels = self.be.zeros(
-            (self.num_classes, self.frcn_rois_per_img), dtype=np.int32)
+            (self.num_classes, num_rois), dtype=np.int32)
         self.dev_y_frcn_labels_mask = self.be.zeros(
-            (self.num_classes, self.frcn_rois_per_img), dtype=np.int32)
+            (self.num_classes, num_rois), dtype=np.int32)
         self.dev_y_frcn_bbtargets = self.be.zeros(
-            (self.num_classes * 4, self.frcn_rois_per_img), dtype=np.float32)
+            (self.num_classes * 4, num_rois), dtype=np.float32)
         self.dev_y_frcn_bbmask = self.be.zeros(
-            (self.num_classes * 4, self.frcn_rois_per_img), dtype=np.float32)
+            (self.num_classes * 4, num_rois), dtype=np.float32)
 
     def get_target_buffers(self):
 
@@ -116,7 +116,8 @@ class ProposalLayer(Layer):
 
     def configure(self, in_obj):
         super(ProposalLayer, self).configure(in_obj)
-        # set out_shape as the ROI shape
+        # set out_shape as the ROI shape, the ROIs of the images of the
+        # minibatch follow each other
         if(self.inference):
             self.out_shape = ((5, self.post_nms_N))
         else:
@@ -144,25 +145,35 @@ class ProposalLayer(Layer):
         self.dets = self.be.zeros((self.pre_nms_N, 5))
 
         # buffer to store proposals after they have sorted
-        # and filtered with NMS.
+        # and filtered with NMS, post_nms_N rows for each image.
         # Note: The buffer has shape (num_ROIs, 5), where each column
-        # is (0, x_min, y_min, x_max, y_max)
+        # is (image_idx, x_min, y_min, x_max, y_max)
         # This format is designed to be compatible with the
         # roi-pooling layer fprop code from Fast-RCNN.
-        self.dev_proposals = self.be.zeros((self.post_nms_N, 5))
+        self.dev_proposals = self.be.zeros((self.post_nms_N * self.be.bsz, 5))
 
-        # buffer to store proposals after they have been sampled.
-        # this is passed forward during training.
-        self.dev_proposals_filtered = self.be.zeros((self.num_rois, 5))
+        # buffer to store proposals after they have been sampled, num_rois
+        # rows for each image. this is passed forward during training.
+        self.dev_proposals_filtered = self.be.zeros((self.num_rois * self.be.bsz, 5))
 
         # class member as a view to get scores from RPN outputs
         self.rpn_scores_v = None
         self.bbox_deltas_v = None
 
+        # scores and bbox deltas of the images, one row for each image
+        self._all_scores = self.be.zeros((self.be.bsz, self._num_anchors))
+        self._all_deltas = self.be.zeros((self.be.bsz, 4 * self._num_anchors))
+
         # create a local buffer for the rpn scores, otherwise, any in-place
         # memory change will affect the final cost and training
         self._scores = self.be.zeros((self._num_anchors, 1))
 
+        # feature map row and column of each anchor, to mask the padded area
+        anchor_inds = np.arange(self._num_anchors)
+        self._anchor_rows = self.be.array(
+            (anchor_inds // self._conv_width) % self._conv_height, dtype=np.float32)
+        self._anchor_cols = self.be.array(anchor_inds % self._conv_width, dtype=np.float32)
+
     def fprop(self, inputs, inference=False):
         """
         fprop function that does no proposal filtering
@@ -174,69 +185,46 @@ class ProposalLayer(Layer):
         (self.im_shape, self.im_scale, self.gt_boxes,
             self.gt_classes, self.num_gt_boxes, _) = self.dataloader.get_metadata_buffers()
 
-        # real H and W need to get in fprop, as every image is different
-        real_H = int(np.round(self.im_shape.get()[1] * self._scale))
-        real_W = int(np.round(self.im_shape.get()[0] * self._scale))
-
         if self.rpn_scores_v is None:
             # get output from the RPN network
             # transform the scores and slice the score for the label=1 class
-            # shape: (KWH, 1)
-            self.rpn_scores_v = self.rpn_obj[0].outputs.reshape((2, -1))[1].T
+            # shape: (KWH, N)
+            self.rpn_scores_v = self.rpn_obj[0].outputs.reshape((2, -1))[1].reshape(
+                (self._num_anchors, -1))
 
         if self.bbox_deltas_v is None:
-            # transform the bbox deltas, reshape to (4, KHW) then transpose to
-            # (KHW, 4) to match the shape of anchors.
-            self.bbox_deltas_v = self.rpn_bbox[0].outputs.reshape((4, -1)).T
+            # transform the bbox deltas, reshape to (4KHW, N)
+            self.bbox_deltas_v = self.rpn_bbox[0].outputs.reshape((4 * self._num_anchors, -1))
 
-        # 1. Convert anchors into proposals via bbox transformations
-        # store output in proposals buffer
-        self._bbox_transform_inv(self._dev_anchors, self.bbox_deltas_v, output=self._proposals)
-
-        # 2. clip predicted boxes to image
-        self._clip_boxes(self._proposals, self.im_shape)
-
-        # 3. remove predicted boxes with either height or width < threshold
-        # (NOTE: convert min_size to input image scale stored in im_scale)
-        keep = self._filter_boxes(self._proposals,
-                                  self.min_bbox_size * float(self.im_scale.get()))
+        # one row of scores and deltas for each image
+        self.be.copy_transpose(self.rpn_scores_v, self._all_scores)
+        self.be.copy_transpose(self.bbox_deltas_v, self._all_deltas)
 
-        # we set the score of those we discard to -1
-        self._scores[:] = (self.rpn_scores_v * keep) - (1 - keep)
+        im_shape = self.im_shape.get().reshape((2, -1))
+        im_scale = self.im_scale.get().reshape(-1)
 
-        # 4. set the scores to be -1 for the padded area
-        # set the scores of all the proposals from the padded area to be -1
-        # in order to ignore them after sorting
-        scores_np = self._scores.get()
-        scores_np.reshape(-1, self._conv_height, self._conv_width)[:, real_H:] = -1
-        scores_np.reshape(-1, self._conv_height, self._conv_width)[:, :, real_W:] = -1
-        self._scores[:] = self.be.array(scores_np)
-
-        # 5. sort the scores from highest to lowest and take top pre_nms_topN
-        top_N_ind = self.get_top_N_index(self._scores, self.pre_nms_N)
-
-        # take top pre_nms_topN (e.g. 12000)
-        # (make scores & proposals attributes of layer for unit testing)
-        self.dets.fill(0)
-        self.dets[:len(top_N_ind), :4] = self._proposals[top_N_ind]
-        self.dets[:len(top_N_ind), 4] = self._scores[top_N_ind]
+        proposals, scores = [], []
+        self.proposal_counts = []
+        self.dev_proposals.fill(0)
+        for i in range(self.be.bsz):
+            proposals_i, scores_i, keep = self._image_proposals(i, im_shape[:, i], im_scale[i],
+                                                                inference)
+            proposals.append(proposals_i)
+            scores.append(scores_i)
+            self.proposal_counts.append(len(keep))
 
-        # 6. apply nms (e.g. threshold = 0.7)
-        keep = self.be.nms(self.dets, self.nms_thresh)
+            # 8. provide ROIs in the format of [image_idx, x1, y1, x2, y2]
+            start = i * self.post_nms_N
+            self.dev_proposals[start:start + self.post_nms_N, 0] = i
+            self.dev_proposals[start:start + len(keep), 1:] = self.dets[keep, :4]
 
-        # 7. take post_nms_N (e.g. 2000)
-        keep = keep[:self.post_nms_N]
-        self.num_proposals = len(keep)
+        self.num_proposals = sum(self.proposal_counts)
 
         # for training or debugging, we need to copy these detections to host.
         if self.debug or not inference:
             # make scores & proposals attributes of layer for unit testing
-            self.proposals = self.dets[keep, :4].get()
-            self.scores = self.dets[keep, -1].get()
-
-        # 8. provide ROIs in the format of [0, x1, y1, x2, y2]
-        self.dev_proposals.fill(0)
-        self.dev_proposals[:self.num_proposals, 1:] = self.dets[keep, :4]
+            self.proposals = np.vstack(proposals)
+            self.scores = np.concatenate(scores)
 
         # If training, sample the proposals and only propagate those forward
         if not inference:
@@ -245,56 +233,41 @@ class ProposalLayer(Layer):
             ((frcn_labels, frcn_labels_mask),
              (frcn_bbtargets, frcn_bbmask)) = self.dataloader.get_target_buffers()
 
-            non_zero_gt_boxes = self.gt_boxes.get()
-            num_gt_boxes = self.num_gt_boxes.get()[0][0]
-            non_zero_gt_boxes = non_zero_gt_boxes[:num_gt_boxes]
-
-            # Include ground-truth boxes in the set of candidate rois
-            all_rois = np.vstack((self.proposals, non_zero_gt_boxes))
-
-            # 1. Compute the overlap of each proposal roi with each ground truth roi
-            overlaps = calculate_bb_overlap(all_rois, non_zero_gt_boxes)
-
-            # 2. Use overlaps to compute the gt box each proposal is 'closest' to
-            gt_assignment = overlaps.argmax(axis=1)
-            max_overlaps = overlaps.max(axis=1)
-            labels = self.gt_classes.get()[:num_gt_boxes]
-            labels = labels[gt_assignment]
-
-            # Sample num_rois fg and bg indicies based on overlaps with gt bocxes
-            keep_inds, fg_rois_this_img = self._sample_fg_bg(max_overlaps)
-            # Select sampled values from various arrays:
-            labels = labels[keep_inds]
-            # Clamp labels for the background RoIs to 0
-            labels[fg_rois_this_img:] = 0
-
-            rois = all_rois[keep_inds]
-            targets = compute_targets(non_zero_gt_boxes[gt_assignment[keep_inds]], rois)
+            num_rois = self.num_rois * self.be.bsz
+            rois = np.zeros((num_rois, 5), dtype=np.float32)
+            labels = np.zeros(num_rois, dtype=np.int32)
+            labels_mask = np.zeros(num_rois)
+            targets = np.zeros((num_rois, 4))
+
+            gt_boxes = self.gt_boxes.get().reshape((-1, 4, self.be.bsz))
+            gt_classes = self.gt_classes.get().reshape((-1, self.be.bsz))
+            num_gt_boxes = self.num_gt_boxes.get().reshape(-1).astype(int)
+
+            for i in range(self.be.bsz):
+                start = i * self.num_rois
+                rois[start:start + self.num_rois, 0] = i
+                non_zero_gt_boxes = gt_boxes[:num_gt_boxes[i], :, i]
+                n = self._sample_rois(proposals[i], non_zero_gt_boxes,
+                                      gt_classes[:num_gt_boxes[i], i],
+                                      rois[start:, 1:], labels[start:], targets[start:])
+                labels_mask[start:start + n] = 1.0
 
             targets = (targets - np.array(BBOX_NORMALIZE_MEANS)) / np.array(BBOX_NORMALIZE_STDS)
-
-            num_proposals = rois.shape[0]
             bbox_targets, bbox_inside_weights = \
                 self._get_bbox_regression_labels(targets, labels)
 
             # Load fast-rcnn training labels and bbox targets back to global buffers
-            labels_full = self._onehot_labels(labels.ravel())
-            frcn_labels[:] = labels_full
-            labels_mask = np.zeros((self.num_rois, self.num_classes))
-            labels_mask[:num_proposals, :] = 1.0
-            frcn_labels_mask[:] = np.ascontiguousarray(labels_mask.T)
+            frcn_labels[:] = self._onehot_labels(labels)
+            frcn_labels_mask[:] = np.ascontiguousarray(
+                np.broadcast_to(labels_mask, (self.num_classes, num_rois)))
 
             # fcrn_*.shape = (num_classes*4 , 256), so transpose first
             frcn_bbtargets[:] = np.ascontiguousarray(bbox_targets.T)
             frcn_bbmask[:] = np.ascontiguousarray(bbox_inside_weights.T)
 
             # load the sampled proposals back to device
-            rois = np.hstack([np.zeros((num_proposals, 1)), rois])
-            rois = np.ascontiguousarray(rois, dtype=np.float32)
-
-            self.dev_proposals_filtered.fill(0)
-            self.dev_proposals_filtered[:num_proposals, :] = rois
-            self.num_proposals = num_proposals
+            self.dev_proposals_filtered[:] = rois
+            self.num_proposals = int(labels_mask.sum())
 
             # During training, only propagate sampled proposals
             return (inputs, self.dev_proposals_filtered.T)
@@ -303,18 +276,119 @@ class ProposalLayer(Layer):
         else:
             return (inputs, self.dev_proposals.T)
 
+    def _image_proposals(self, i, im_shape, im_scale, inference):
+        """
+        Generate the proposals of image i of the minibatch into dets.
+
+        Arguments:
+            i (int): index of the image in the minibatch
+            im_shape (numpy.ndarray): width and height of the image
+            im_scale (float): scale of the image
+            inference (bool): whether the proposals are kept on device only
+
+        Returns:
+            tuple: host proposals (num_kept, 4) and scores (num_kept,), None for inference
+                   without debug, and the indices of the kept rows of dets
+        """
+        # real H and W need to get in fprop, as every image is different
+        real_H = int(np.round(im_shape[1] * self._scale))
+        real_W = int(np.round(im_shape[0] * self._scale))
+
+        # 1. Convert anchors into proposals via bbox transformations
+        # store output in proposals buffer
+        bbox_deltas = self._all_deltas[i].reshape((4, -1)).T
+        self._bbox_transform_inv(self._dev_anchors, bbox_deltas, output=self._proposals)
+
+        # 2. clip predicted boxes to image
+        self._clip_boxes(self._proposals, im_shape)
+
+        # 3. remove predicted boxes with either height or width < threshold
+        # (NOTE: convert min_size to input image scale stored in im_scale)
+        keep = self._filter_boxes(self._proposals, self.min_bbox_size * float(im_scale))
+
+        # 4. set the scores to be -1 for the padded area
+        # and for the boxes we discard, in order to ignore them after sorting
+        keep = keep * (self._anchor_rows < real_H) * (self._anchor_cols < real_W)
+        self._scores[:] = (self._all_scores[i].T * keep) - (1 - keep)
+
+        # 5. sort the scores from highest to lowest and take top pre_nms_topN
+        top_N_ind = self.get_top_N_index(self._scores, self.pre_nms_N)
+
+        # take top pre_nms_topN (e.g. 12000)
+        self.dets.fill(0)
+        self.dets[:len(top_N_ind), :4] = self._proposals[top_N_ind]
+        self.dets[:len(top_N_ind), 4] = self._scores[top_N_ind]
+
+        # 6. apply nms (e.g. threshold = 0.7)
+        keep = self.be.nms(self.dets, self.nms_thresh)
+
+        # 7. take post_nms_N (e.g. 2000)
+        keep = keep[:self.post_nms_N]
+
+        if self.debug or not inference:
+            return self.dets[keep, :4].get(), self.dets[keep, -1].get(), keep
+        return None, None, keep
+
+    def _sample_rois(self, proposals, gt_boxes, gt_classes, rois, labels, targets):
+        """
+        Sample the training rois of an image among its proposals and GT boxes, and compute
+        their labels and bbox regression targets.
+
+        Arguments:
+            proposals (numpy.ndarray): (num_proposals, 4) proposals of the image
+            gt_boxes (numpy.ndarray): (num_gt_boxes, 4) GT boxes of the image
+            gt_classes (numpy.ndarray): (num_gt_boxes,) classes of the GT boxes
+            rois (numpy.ndarray): output rois, at least num_rois rows of 4 coordinates
+            labels (numpy.ndarray): output labels of the rois
+            targets (numpy.ndarray): output bbox regression targets of the rois
+
+        Returns:
+            int: number of sampled rois
+        """
+        # Include ground-truth boxes in the set of candidate rois
+        all_rois = np.vstack((proposals, gt_boxes))
+
+        # 1. Compute the overlap of each proposal roi with each ground truth roi
+        overlaps = calculate_bb_overlap(all_rois, gt_boxes)
+
+        # 2. Use overlaps to compute the gt box each proposal is 'closest' to
+        gt_assignment = overlaps.argmax(axis=1)
+        max_overlaps = overlaps.max(axis=1)
+
+        # Sample num_rois fg and bg indicies based on overlaps with gt bocxes
+        keep_inds, fg_rois_this_img = self._sample_fg_bg(max_overlaps)
+        n = len(keep_inds)
+
+        # Select sampled values from various arrays:
+        labels[:n] = gt_classes.ravel()[gt_assignment[keep_inds]]
+        # Clamp labels for the background RoIs to 0
+        labels[fg_rois_this_img:n] = 0
+
+        rois[:n] = all_rois[keep_inds]
+        targets[:n] = compute_targets(gt_boxes[gt_assignment[keep_inds]], rois[:n])
+        return n
+
     def get_proposals(self):
+        """
+        Returns the proposals, post_nms_N rows for each image of the minibatch of which
+        proposal_counts are used, and the total number of proposals.
+        """
         return (self.dev_proposals, self.num_proposals)
 
     def get_top_N_index(self, scores, N):
         # this function handles scores still being device tensors
-        count = len(np.where(scores.get() > -1)[0])
-        order = scores.get().ravel().argsort()[::-1].tolist()
-        order = order[:count]
+        scores = scores.get().ravel()
+        count = np.count_nonzero(scores > -1)
         if N > 0:
-            order = order[:N]
+            count = min(count, N)
+        if count == 0:
+            return []
+
+        # partial sort: the count highest scores, then their order
+        order = np.argpartition(-scores, count - 1)[:count]
+        order = order[np.argsort(-scores[order])]
 
-        return order
+        return order.tolist()
 
     def bprop(self, errors, alpha=1.0, beta=0.0):
         """This layer propagate gradients from ROIs back to lower VGG layers"""
@@ -366,12 +440,11 @@ class ProposalLayer(Layer):
         return keep
 
     def _onehot_labels(self, labels):
-        """Converts the roi labels from compressed (1, num_rois) shape
+        """Converts the roi labels from compressed (num_rois,) shape
         to the one-hot format required for the global buffers of shape
         (num_classes, num_rois)"""
-        labels_full = np.zeros((self.num_classes, self.num_rois))
-        for idx, l in enumerate(labels):
-            labels_full[int(l), idx] = 1
+        labels_full = np.zeros((self.num_classes, len(labels)))
+        labels_full[labels.astype(int), np.arange(len(labels))] = 1
         return labels_full
 
     def _get_bbox_regression_labels(self, bbox_target_data, labels):
@@ -383,16 +456,13 @@ class ProposalLayer(Layer):
             bbox_targets (ndarray): N x 4K blob of regression targets
             bbox_inside_weights (ndarray): N x 4K blob of loss weights
         """
-        bbox_targets = np.zeros((self.num_rois, 4 * self.num_classes), dtype=np.float32)
+        bbox_targets = np.zeros((len(labels), self.num_classes, 4), dtype=np.float32)
         bbox_inside_weights = np.zeros(bbox_targets.shape, dtype=np.float32)
         inds = np.where(labels > 0)[0]
-        for ind in inds:
-            l = labels[ind]
-            start = int(4 * l)
-            end = int(start + 4)
-            bbox_targets[ind, start:end] = bbox_target_data[ind]
-            bbox_inside_weights[ind, start:end] = 1.0
-        return bbox_targets, bbox_inside_weights
+        bbox_targets[inds, labels[inds].astype(int)] = bbox_target_data[inds]
+        bbox_inside_weights[inds, labels[inds].astype(int)] = 1.0
+        return (bbox_targets.reshape((len(labels), -1)),
+                bbox_inside_weights.reshape((len(labels), -1)))
 
     def _sample_fg_bg(self, max_overlaps):
         """Return sample of at most fg_fraction * num_rois foreground indicies, padding
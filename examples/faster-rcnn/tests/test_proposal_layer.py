@@ -230,6 +230,80 @@ def test_proposal_layer(backend_default, fargs):
     assert (np.alltrue(frcn_bbmask_reference == frcn_bbmask.get()))   # target bbox mask
 
 
+def make_proposal_layer(be, conv_size, im_shape, gt_boxes, num_gt_boxes, rpn_obj_scores,
+                        rpn_bbox_deltas):
+    bsz = be.bsz
+    frcn_labels = be.zeros((21, 128 * bsz), dtype=np.int32)
+    frcn_labels_mask = be.zeros(frcn_labels.shape, dtype=np.int32)
+    frcn_bbtargets = be.zeros((21 * 4, 128 * bsz), dtype=np.float32)
+    frcn_bbmask = be.zeros(frcn_bbtargets.shape, dtype=np.float32)
+
+    gt_classes = be.zeros((64, bsz), dtype=np.int32).fill(9)
+    mock_loader = mock_dataloader(conv_size, be.ones((1, 1)).fill(1.0 / 16.0),
+                                  be.array(im_shape), be.ones((1, bsz)).fill(1.6),
+                                  be.array(gt_boxes), gt_classes, be.array(num_gt_boxes),
+                                  frcn_labels, frcn_labels_mask, frcn_bbtargets, frcn_bbmask)
+
+    prop_layer = ProposalLayer([[mock_layer(be.array(rpn_obj_scores))],
+                                [mock_layer(be.array(rpn_bbox_deltas))]], mock_loader,
+                               pre_nms_N=6000, post_nms_N=300, num_rois=128,
+                               deterministic=True, inference=False, debug=True)
+    prop_layer.configure(mock_layer([]))
+    prop_layer.allocate()
+    _, rois = prop_layer.fprop([], inference=False)
+    targets = [t.get() for t in (frcn_labels, frcn_labels_mask, frcn_bbtargets, frcn_bbmask)]
+    return prop_layer, rois.get(), targets
+
+
+def test_proposal_layer_batch(backend_default):
+    """
+    The proposals, rois and targets of a minibatch of images are those of each image
+    """
+    np.random.seed(seed=0)
+    be = backend_default
+    bsz = be.bsz = 3
+    conv_size = 40
+    num_anchors = 9 * conv_size * conv_size
+
+    im_shape = np.array([[640, 600, 400], [640, 480, 560]], dtype=np.float32)
+    num_gt_boxes = np.array([[3, 1, 2]], dtype=np.int32)
+    gt_boxes = np.zeros((64, 4, bsz), dtype=np.float32)
+    gt_boxes[:3, :, 0] = [[262, 210, 323, 338], [164, 263, 252, 371], [240, 193, 294, 298]]
+    gt_boxes[:1, :, 1] = [[100, 120, 300, 400]]
+    gt_boxes[:2, :, 2] = [[20, 30, 200, 220], [150, 100, 380, 500]]
+
+    rpn_obj_scores = np.random.permutation(2 * num_anchors * bsz).reshape(
+        (2 * num_anchors, bsz)) / float(2 * num_anchors * bsz)
+    rpn_bbox_deltas = np.random.uniform(-0.5, 0.5, (4 * num_anchors, bsz))
+
+    layer, rois, targets = make_proposal_layer(be, conv_size, im_shape, gt_boxes.reshape(-1, bsz),
+                                               num_gt_boxes, rpn_obj_scores, rpn_bbox_deltas)
+    assert all(layer.proposal_counts)
+    assert layer.proposals.shape[0] == sum(layer.proposal_counts)
+    assert np.all(rois[0] == np.repeat(np.arange(bsz), 128))
+
+    start = 0
+    try:
+        for i in range(bsz):
+            be.bsz = 1
+            ref, ref_rois, ref_targets = make_proposal_layer(
+                be, conv_size, im_shape[:, i:i + 1], gt_boxes[:, :, i], num_gt_boxes[:, i:i + 1],
+                rpn_obj_scores[:, i:i + 1], rpn_bbox_deltas[:, i:i + 1])
+
+            count = layer.proposal_counts[i]
+            assert count == ref.proposal_counts[0]
+            assert np.allclose(layer.proposals[start:start + count], ref.proposals)
+            assert np.allclose(layer.scores[start:start + count], ref.scores)
+            start += count
+
+            cols = slice(i * 128, (i + 1) * 128)
+            assert np.allclose(rois[1:, cols], ref_rois[1:])
+            for target, ref_target in zip(targets, ref_targets):
+                assert np.allclose(target[:, cols], ref_target)
+    finally:
+        be.bsz = bsz
+
+
 if __name__ == "__main__":
     be = gen_backend(backend='gpu', batch_size=1)
     _conv_size = 62
@@ -54,7 +54,6 @@ parser.add_argument('--subset_pct', type=float, default=100,
 args = parser.parse_args(gen_be=False)
 
 # hyperparameters
-assert args.batch_size is 1, "Faster-RCNN only supports batch size 1"
 assert 'train' in args.manifest
 
 rpn_rois_per_img = 256  # number of rois to sample to train rpn
@@ -73,6 +72,7 @@ config = PASCALVOC(args.manifest['train'], args.manifest_root,
                    width=args.width, height=args.height,
                    rois_per_img=rpn_rois_per_img, inference=False)
 config['subset_fraction'] = float(args.subset_pct / 100.0)
+config['batch_size'] = args.batch_size
 
 train_set = faster_rcnn.build_dataloader(config, frcn_rois_per_img)
 
@@ -14,20 +14,18 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 # ******************************************************************************
-from builtins import str, zip
+from builtins import str
 from configargparse import ArgParser
-from itertools import repeat
 from neon import logger as neon_logger
+from neon.data.ingest import ingest_shards, write_manifest
 from neon.util.persist import ensure_dirs_exist
 from PIL import Image
 import logging
-import multiprocessing
 import numpy as np
 import os
 import re
 import shutil
 import tarfile
-import tqdm
 import zlib
 
 
@@ -63,9 +61,10 @@ def process_files_in_tar(target_size, label, tar_handle, file_list, outpath):
         except OSError:
             pass
     for fobj in file_list:
+        # shards missing from the ingest journal are processed again from scratch, as their
+        # files may have been interrupted
         fname = os.path.join(outpath, fobj.name)
-        if not os.path.exists(fname):
-            transform_and_save(target_size, tar_handle, fobj, fname)
+        transform_and_save(target_size, tar_handle, fobj, fname)
         pair_list.append((fname, label))
     return pair_list
 
@@ -116,8 +115,10 @@ class IngestI1K(object):
         self.overwrite = overwrite
 
         self.manifests, self.tars = dict(), dict()
+        self.journals = dict()
         for setn in ('train', 'val'):
             self.manifests[setn] = os.path.join(self.out_dir, '{}-index.csv'.format(setn))
+            self.journals[setn] = os.path.join(self.out_dir, '{}-journal.jsonl'.format(setn))
             self.tars[setn] = os.path.join(self.input_dir, 'ILSVRC2012_img_{}.tar'.format(setn))
 
         self.target_size = target_size
@@ -180,19 +181,13 @@ class IngestI1K(object):
 
         label_dict = self.extract_labels(setn)
         subpaths = root_tf.getmembers()
-        arg_iterator = zip(repeat(self.target_size), repeat(root_tf_path), repeat(img_dir),
-                           repeat(setn), repeat(label_dict), subpaths)
-        pool = multiprocessing.Pool()
-
-        pairs = []
-        for pair_list in tqdm.tqdm(pool.imap_unordered(process_i1k_tar_subpath, arg_iterator),
-                                   total=len(subpaths)):
-            pairs.extend(pair_list)
-        pool.close()
-        pool.join()
         root_tf.close()
+        shards = [(subpath.name, (self.target_size, root_tf_path, img_dir, setn, label_dict,
+                                  subpath))
+                  for subpath in subpaths]
 
-        return pairs
+        # shards completed by an interrupted run are skipped
+        return ingest_shards(shards, process_i1k_tar_subpath, self.journals[setn])
 
     def run(self):
         """
@@ -214,11 +209,11 @@ class IngestI1K(object):
             return
 
         for setn, manifest in self.manifests.items():
+            if self.overwrite and os.path.exists(self.journals[setn]):
+                os.remove(self.journals[setn])
             pairs = self.train_or_val_pairs(setn)
-            records = [(os.path.relpath(fname, self.out_dir), int(tgt))
-                       for fname, tgt in pairs]
-            records.insert(0, ('@FILE', 'STRING'))
-            np.savetxt(manifest, records, fmt='%s\t%s')
+            records = [(fname, int(tgt)) for fname, tgt in pairs]
+            write_manifest(manifest, records, root_dir=self.out_dir)
 
 
 if __name__ == "__main__":
@@ -147,8 +147,10 @@ for i in range(3):
 inputs = valid_set.X[:, :valid_set.nbatches, :]
 source_sentences = bleu_format(inputs, tgt_dict, valid_set.nbatches, args.batch_size)
 
-generated = bleu_format(prediction, tgt_dict, valid_set.nbatches, args.batch_size)
-references = bleu_format(valid_set.y, tgt_dict, valid_set.nbatches, args.batch_size)
-references = [[r] for r in references]
+# score the token ids directly, dropping the end of sentence padding (eos=0) and never
+# matching n-grams with unknown words (unk=1), in the vocab order of data.py
+generated = prediction.transpose(1, 0, 2).reshape(-1, time_steps)
+references = valid_set.y[:, :valid_set.nbatches].transpose(1, 0, 2).reshape(-1, time_steps)
 bleu_score = BLEUScore()
-bleu4 = bleu_score(generated, references, N=4, brevity_penalty=False, lower_case=True)
+bleu4 = bleu_score.score_ids(generated, references, N=4, brevity_penalty=False, pad_id=0,
+                             unk_id=1)
@@ -21,9 +21,9 @@ import json
 import numpy as np
 from PIL import Image
 import math
-from tqdm import tqdm
 from collections import OrderedDict
 import ingest_utils as util
+from neon.data.ingest import ingest_shards
 from neon.util.persist import get_data_cache_or_nothing
 
 
@@ -196,6 +196,31 @@ def convert_annot_to_json(path, im_path, out_path, difficult, img_reshape=None):
         json.dump(annot, f, indent=4)
 
 
+def convert_tag(args):
+    """
+    Converts the image and the annotations of a tag.
+
+    Arguments:
+        args (tuple): image, annotation, target image and target annotation folders, and tag
+
+    Returns:
+        list: (target image, target annotation) manifest record
+    """
+    img_folder, annot_folder, target_img_folder, target_annot_folder, tag = args
+    image = os.path.join(img_folder, tag + '.png')
+    annot = os.path.join(annot_folder, tag + '.txt')
+    assert os.path.exists(image), "{} not found.".format(image)
+    assert os.path.exists(annot), "{} not found.".format(annot)
+
+    target_image = os.path.join(target_img_folder, tag + '.png')
+    target_annot = os.path.join(target_annot_folder, tag + '.json')
+
+    convert_annot_to_json(annot, image, target_annot, difficult=True, img_reshape=None)
+    util.resize_image(image, target_image, img_reshape=None)
+
+    return [(target_image, target_annot)]
+
+
 def ingest_kitti(input_dir, out_dir, img_reshape=(300, 994),
                  train_percent=90, overwrite=False, skip_unzip=False):
     """
@@ -249,22 +274,15 @@ def ingest_kitti(input_dir, out_dir, img_reshape=(300, 994),
     util.make_dir(target_img_folder)
     util.make_dir(target_annot_folder)
 
-    manifest = []
-
-    for tag in tqdm(tags):
-
-        image = os.path.join(img_folder, tag + '.png')
-        annot = os.path.join(annot_folder, tag + '.txt')
-        assert os.path.exists(image), "{} not found.".format(image)
-        assert os.path.exists(annot), "{} not found.".format(annot)
-
-        target_image = os.path.join(target_img_folder, tag + '.png')
-        target_annot = os.path.join(target_annot_folder, tag + '.json')
-
-        convert_annot_to_json(annot, image, target_annot, difficult=True, img_reshape=None)
-        util.resize_image(image, target_image, img_reshape=None)
-
-        manifest.append((target_image, target_annot))
+    # the images are converted by a pool of processes, and an interrupted ingest resumes
+    # with the images missing from the journal
+    journal = os.path.join(root_dir, 'ingest_{}.jsonl'.format(hw))
+    if overwrite and os.path.exists(journal):
+        os.remove(journal)
+    shards = [(tag, (img_folder, annot_folder, target_img_folder, target_annot_folder, tag))
+              for tag in sorted(tags)]
+    manifest = ingest_shards(shards, convert_tag, journal, file_columns=(0, 1))
+    manifest = [tuple(entry) for entry in manifest]
 
     # shuffle files and split into training and validation set.
     np.random.seed(0)
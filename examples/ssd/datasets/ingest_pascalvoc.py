@@ -21,7 +21,7 @@ import os
 import tarfile
 import ingest_utils as util
 from collections import OrderedDict
-from tqdm import tqdm
+from neon.data.ingest import ingest_shards
 from neon.util.persist import get_data_cache_or_nothing
 
 
@@ -157,6 +157,33 @@ def get_tag_list(index_file):
     return tag_list
 
 
+def convert_tag(args):
+    """
+    Converts the image and the annotations of a tag, e.g. '000032' for the image
+    000032.jpg and the annotation XML file 000032.xml.
+
+    Arguments:
+        args (tuple): image, annotation, target image and target annotation folders, and tag
+
+    Returns:
+        list: (target image, target annotation) manifest record
+    """
+    img_folder, annot_folder, target_img_folder, target_annot_folder, tag = args
+    image = os.path.join(img_folder, tag + '.jpg')
+    annot = os.path.join(annot_folder, tag + '.xml')
+    assert os.path.exists(image)
+    assert os.path.exists(annot)
+
+    target_image = os.path.join(target_img_folder, tag + '.jpg')
+    target_annot = os.path.join(target_annot_folder, tag + '.json')
+
+    # convert the annotations to json, including difficult objects
+    convert_xml_to_json(annot, target_annot, difficult=True, img_reshape=None)
+    util.resize_image(image, target_image, img_reshape=None)
+
+    return [(target_image, target_annot)]
+
+
 def ingest_pascal(data_dir, out_dir, img_reshape=(300, 300), overwrite=False, skip_untar=False):
 
     assert img_reshape is not None, "Target image reshape required."
@@ -179,6 +206,10 @@ def ingest_pascal(data_dir, out_dir, img_reshape=(300, 300), overwrite=False, sk
         print("Use --overwrite flag to force re-ingest.")
         return
 
+    journal = os.path.join(root_dir, 'ingest_{}.jsonl'.format(hw))
+    if overwrite and os.path.exists(journal):
+        os.remove(journal)
+
     for year in datasets:
         tags = {'trainval': [], 'test': []}
 
@@ -209,26 +240,14 @@ def ingest_pascal(data_dir, out_dir, img_reshape=(300, 300), overwrite=False, sk
         util.make_dir(target_img_folder)
         util.make_dir(target_annot_folder)
 
-        all_tags = tags['trainval'] + tags['test']  # process all the tags in our index files.
-
-        for tag in tqdm(all_tags):
-
-            image = os.path.join(img_folder, tag + '.jpg')
-            annot = os.path.join(annot_folder, tag + '.xml')
-            assert os.path.exists(image)
-            assert os.path.exists(annot)
-
-            target_image = os.path.join(target_img_folder, tag + '.jpg')
-            target_annot = os.path.join(target_annot_folder, tag + '.json')
-
-            # convert the annotations to json, including difficult objects
-            convert_xml_to_json(annot, target_annot, difficult=True, img_reshape=None)
-            util.resize_image(image, target_image, img_reshape=None)
-
-            if tag in tags['trainval']:
-                manifest['trainval'].append((target_image, target_annot))
-            elif tag in tags['test']:
-                manifest['test'].append((target_image, target_annot))
+        # process all the tags in our index files, in a pool of processes.  An interrupted
+        # ingest resumes with the tags missing from the journal.
+        for sets in ('trainval', 'test'):
+            shards = [('{}/{}'.format(year, tag),
+                       (img_folder, annot_folder, target_img_folder, target_annot_folder, tag))
+                      for tag in tags[sets]]
+            records = ingest_shards(shards, convert_tag, journal, file_columns=(0, 1))
+            manifest[sets].extend(tuple(record) for record in records)
 
     np.random.seed(0)
     np.random.shuffle(manifest['trainval'])
@@ -23,9 +23,9 @@ from PIL import Image, ImageDraw
 from collections import OrderedDict
 import ingest_utils as util
 import numpy as np
-from tqdm import tqdm
 import warnings
 from configargparse import ArgumentParser
+from neon.data.ingest import ingest_shards
 from neon.util.persist import get_data_cache_or_nothing
 
 
@@ -232,6 +232,31 @@ def convert_image_annot(image_path, annot_path, target_image, target_annot,
     return annot
 
 
+def convert_image(args):
+    """
+    Converts an image and its annotations, keeping it if it is eligible.
+
+    Arguments:
+        args (tuple): image, annotation, target image, target annotation, debug image
+                      folder and maximum fraction of blank pixels
+
+    Returns:
+        list: (target image, target annotation) manifest record, empty if the image is not
+              eligible
+    """
+    image, annot, target_image, target_annot, debug_dir, percent_blank = args
+    annotation = convert_image_annot(image_path=image, annot_path=annot,
+                                     target_image=target_image,
+                                     target_annot=target_annot,
+                                     width=512, height=512, box_shrink=0.8,
+                                     debug_dir=debug_dir)
+
+    # filter on percent_blank, as well as presence of any objects
+    if is_eligible_example(annotation, percent_blank):
+        return [(target_image, target_annot)]
+    return []
+
+
 def make_dir(directory):
     if not os.path.exists(directory):
         os.mkdir(directory)
@@ -258,6 +283,10 @@ def ingest_spacenet(data_dir, cities, width, height, overwrite=False,
         print("Use --overwrite flag to force re-ingest.")
         return
 
+    journal = os.path.join(data_dir, 'ingest_{}.jsonl'.format(hw))
+    if overwrite and os.path.exists(journal):
+        os.remove(journal)
+
     for city in cities:
 
         if city == 'AOI_1_Rio':  # Rio has different dataset structure
@@ -273,7 +302,7 @@ def ingest_spacenet(data_dir, cities, width, height, overwrite=False,
 
             # helper function for converting image files to their corresponding annotation file
             # e.g. 3band_013022223133_Public_img3593.tif -> 013022223133_Public_img3593_Geo.geojson
-            def img_to_annot(x): x.replace('3band_', '').replace('.tif', '_Geo.geojson')
+            def img_to_annot(x): return x.replace('3band_', '').replace('.tif', '_Geo.geojson')
 
         else:
             prefix = 'RGB-PanSharpen'
@@ -287,7 +316,7 @@ def ingest_spacenet(data_dir, cities, width, height, overwrite=False,
 
             # helper function for converting image files to their corresponding annotation file
             # e.g. RGB-PanSharpen_AOI_2_Vegas_img9.tif -> buildings_AOI_2_Vegas_img9.geojson
-            def img_to_annot(x): x.replace(prefix, 'buildings').replace('.tif', '.geojson')
+            def img_to_annot(x): return x.replace(prefix, 'buildings').replace('.tif', '.geojson')
 
         print('Processing {}'.format(city))
 
@@ -298,11 +327,14 @@ def ingest_spacenet(data_dir, cities, width, height, overwrite=False,
         images = glob.glob(os.path.join(img_folder, "*.tif"))
         assert len(images) > 0, 'No Images found in {}'.format(img_folder)
 
-        data[city] = {'manifest': [], 'annotation': [],
+        data[city] = {'manifest': [],
                       'img_folder': img_folder,
                       'annot_folder': annot_folder}
 
-        for image in tqdm(images):
+        # the images are converted by a pool of processes, and an interrupted ingest resumes
+        # with the images missing from the journal
+        shards = []
+        for image in sorted(images):
 
             img_file = os.path.basename(image)
             annot_file = img_to_annot(img_file)
@@ -313,24 +345,11 @@ def ingest_spacenet(data_dir, cities, width, height, overwrite=False,
             target_image = os.path.join(target_img_folder, os.path.splitext(img_file)[0] + ext)
             target_annot = os.path.join(target_annot_folder,
                                         os.path.splitext(annot_file)[0] + '.json')
+            shards.append((image, (image, annot, target_image, target_annot, test_img_folder,
+                                   percent_blank)))
 
-            if not os.path.exists(target_image) or not os.path.exists(target_annot) or overwrite:
-
-                annotation = convert_image_annot(image_path=image, annot_path=annot,
-                                                 target_image=target_image,
-                                                 target_annot=target_annot,
-                                                 width=512, height=512, box_shrink=0.8,
-                                                 debug_dir=test_img_folder)
-            else:
-                warnings.warn(
-                    'File for {} already exists, skipping processing.Use --overwrite to force.'.
-                    format(city), Warning)
-                annotation = json.load(open(target_annot))
-
-            # filter on percent_blank, as well as presence of any objects
-            if is_eligible_example(annotation, percent_blank):
-                data[city]['annotation'].append(annotation)
-                data[city]['manifest'].append((target_image, target_annot))
+        records = ingest_shards(shards, convert_image, journal, file_columns=(0, 1))
+        data[city]['manifest'].extend(tuple(record) for record in records)
 
     # write manifest files
 
@@ -1,10 +1,10 @@
 from __future__ import print_function
 import os
 import json
-import numpy as np
 from zipfile import ZipFile
 from scipy.ndimage import imread
 from scipy.misc import imsave, imresize
+from neon.data.ingest import write_manifest
 
 
 def get_image_scale(im_shape, im_reshape):
@@ -61,17 +61,16 @@ def write_ssd_config(ssd_config, ssd_config_path, overwrite=False):
 
 
 def create_manifest(manifest_path, manifest, root_dir):
-    records = [('@FILE', 'FILE')]
-
     for entry in manifest:
 
-        (annot, image) = entry
+        (image, annot) = entry
         assert os.path.exists(image), 'Path {} not found'.format(image)
         assert os.path.exists(annot), 'Path {} not found'.format(annot)
 
-        records.append((os.path.relpath(image, root_dir),
-                        os.path.relpath(annot, root_dir)))
-    np.savetxt(manifest_path, records, fmt='%s\t%s')
+    # annotations first, in the etl order of the SSD configs, written atomically so
+    # an interrupted ingest leaves no partial manifest
+    write_manifest(manifest_path, [(annot, image) for image, annot in manifest],
+                   header=('@FILE', 'FILE'), root_dir=root_dir, file_columns=(0, 1))
     print("Writing manifest file ({} records) to: {}".format(len(manifest), manifest_path))
 
 
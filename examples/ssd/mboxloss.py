@@ -54,17 +54,45 @@ class MBoxLoss(NervanaObject):
         self.loc_classes = 1 if share_location else self.num_classes
 
         self.clip = clip
+        self.variances = np.array([0.1, 0.1, 0.2, 0.2])
         self.loc_deltas_dev = None
         self.conf_deltas_dev = None
 
-        self.loss = None
+        self.prob_dev = None
         self.y_conf_dev = None
         self.softmax_dev = Softmax(axis=1)
+        self.num_priors = None
 
     def initialize(self, *args, **kwargs):
         # just needed to interface with neon.models.model properly
         pass
 
+    def allocate(self, num_priors, max_gt):
+        """
+        Allocate the buffers of the matching and of the deltas, kept between minibatches.
+        """
+        bsz = self.be.bsz
+        self.num_priors = num_priors
+        self.max_gt = max_gt
+
+        self.prob_dev = self.be.empty((bsz * num_priors, self.num_classes))
+        self.y_conf_dev = self.be.empty(self.prob_dev.shape).reshape((bsz, -1, self.num_classes))
+
+        # prior box to GT box overlaps of the batch, padded GT boxes overlap by -1
+        self.overlaps = np.empty(bsz * num_priors * max_gt)
+        # GT box index matched by each prior box, -1 if none
+        self.matches = np.empty((bsz, num_priors), dtype=np.int64)
+        self.match_overlaps = np.empty((bsz, num_priors))
+        self.labels = np.empty((bsz, num_priors), dtype=np.int64)
+        self.conf_loss = np.empty((bsz, num_priors))
+        self.neg_loss = np.empty((bsz, num_priors))
+        self.neg_mask = np.empty((bsz, num_priors), dtype=bool)
+
+        self.loc_deltas = np.zeros((bsz, num_priors, 4))
+        self.conf_deltas = np.zeros((bsz, num_priors, self.num_classes))
+        self.loc_deltas_dev = self.be.zeros((num_priors * 4, bsz))
+        self.conf_deltas_dev = self.be.zeros((num_priors * self.num_classes, bsz))
+
     def get_cost(self, y, t):
         y_loc = y[0]  # (batch, num_preds/class, 4)
         y_conf = y[1]  # (batch, num_preds/class, num_classes)
@@ -73,84 +101,50 @@ class MBoxLoss(NervanaObject):
         t_conf = t[1]  # (max_boxes, batch)
         n_gt = t[2]  # (1, barch)
 
-        self.num_priors = priors.shape[0]
+        if self.num_priors != priors.shape[0] or self.max_gt != t_conf.shape[0]:
+            self.allocate(priors.shape[0], t_conf.shape[0])
 
         # for now, transpose the input to the shape expected by this layer
         y_loc = y_loc.get().reshape(-1, 4, self.be.bsz).transpose((2, 0, 1))
         y_conf = y_conf.reshape(-1, self.num_classes, self.be.bsz)
 
-        # allocate buffers needed to store intermediate results
-        if self.loss is None:
-            self.loss = self.be.empty((self.be.bsz * self.num_priors, self.num_classes))
-
-        if self.y_conf_dev is None:
-            self.y_conf_dev = self.be.empty(self.loss.shape).reshape((self.be.bsz, -1,
-                                                                      self.num_classes))
-
         # transpose the results to y_conf_dev (needed for softmax)
         self.be.copy_transpose(y_conf, self.y_conf_dev, axes=(2, 0, 1))
 
-        y_conf = self.y_conf_dev.get()
-
-        assert y_conf.shape[0] == self.be.bsz
-        assert y_conf.shape[1] == priors.shape[0]
-        assert y_conf.shape[2] == self.num_classes
-
         assert y_loc.shape[0] == self.be.bsz
         assert y_loc.shape[1] == priors.shape[0]
 
-        # layer shape is the output shape of the convolution
-        # layer generating the input to the priorbox layer
-
-        # get the GT boxes
-        gt_boxes = self.gen_gt_boxes(t_loc, t_conf, n_gt)
-
-        # get the model box predictions
-        loc_data = self.gen_locs(y_loc, priors.shape[0])
+        # get the GT boxes, padded to the max number of boxes
+        gt_boxes, gt_classes, gt_valid = self.gen_gt_boxes(t_loc, t_conf, n_gt)
 
         # find GT prior boxes matches
-        matches = self.find_matches(priors, gt_boxes)
+        self.find_matches(priors, gt_boxes, gt_valid)
+        pos = self.matches > -1
+        num_matches = np.count_nonzero(pos)
 
-        # the conf loss is added to matches
-        # sparse take of loss from matching ground truth
-        self.get_conf_loss(self.y_conf_dev, matches, gt_boxes)
+        # label of each prior box and its conf loss
+        self.get_conf_loss(gt_classes)
 
         # negative sampling
-        # maybe here we need to move to host?
-        (all_neg_inds, num_matches) = self.mine_examples(matches)
-
+        self.mine_examples(pos)
         self.num_matches = num_matches
+        self.pos = pos
+
         if num_matches > 0:
-            (loc_gt_data, loc_pred_data) = self.encodeLocPrediction(num_matches, matches, loc_data,
-                                                                    gt_boxes, priors)
+            batch, inds = np.nonzero(pos)
+            loc_gt_data = self.encodeBBox(priors[inds], gt_boxes[batch, self.matches[pos]])
             # get a smooth L1 loss for these two vectors
-            # may also need to stor values to bprop
-            self.loc_diff_data = (loc_pred_data - loc_gt_data)
+            self.loc_diff_data = y_loc[pos] - loc_gt_data
             loc_loss = np.sum(self.smoothL1loss(self.loc_diff_data))
         else:
-            self.loc_diff_data = 0.0
+            self.loc_diff_data = None
             loc_loss = 0.0
 
-        self.all_neg_inds = all_neg_inds
-        num_conf = num_matches + sum([len(all_neg_inds[bt]) for bt in all_neg_inds])
-        if num_conf >= 1:
-            # conf_gt is num_conf x 1
-            # conf_pred is num_conf x num_classes
-            (conf_gt, conf_pred) = self.EncodeConfPrediction(num_conf, y_conf, matches,
-                                                             all_neg_inds, gt_boxes)
-            # conf_gt has the GT labels
-            # conf_pred has the probs
-            # softmax loss
-            self.probs = self.softmax(conf_pred, axis=1)
-            self.labels = conf_gt
-
-            conf_loss = np.sum(-1 * np.log(np.maximum(EPS, self.probs[range(self.probs.shape[0]),
-                                                      self.labels])))
-        else:
-            conf_loss = 0.0
+        # softmax loss of the positive and mined negative prior boxes
+        self.conf_mask = pos | self.neg_mask
+        conf_loss = np.sum(self.conf_loss[self.conf_mask])
 
-        self.matches = matches
-        self.norm_ = self.be.bsz*self.num_priors if num_matches == -1 else num_matches
+        self.norm_ = max(num_matches, 1)
         loss = (self.loc_weight*loc_loss + conf_loss) / self.norm_
 
         self.cost = loss
@@ -158,311 +152,157 @@ class MBoxLoss(NervanaObject):
 
     def get_errors(self, x, t):
         # back propogate the loc and conf losses
-        if getattr(self, 'loc_deltas', None) is None:
-            self.loc_deltas = np.zeros((self.be.bsz, self.num_priors, 4))
-        else:
-            self.loc_deltas[:] = 0.0
-
-        if getattr(self, 'conf_deltas', None) is None:
-            self.conf_deltas = np.zeros((self.be.bsz, self.num_priors, self.num_classes))
-        else:
-            self.conf_deltas[:] = 0.0
-
-        loc_deltas = self.loc_deltas
-        conf_deltas = self.conf_deltas
-
-        num_matches = self.num_matches
-        matches = self.matches
-
-        if num_matches > 0:
+        self.loc_deltas.fill(0.0)
+        if self.num_matches > 0:
             # backprop the smooth L1 loss first
-            loc_diff = self.loc_diff_data  # this is the errors calculated above
-            loc_diff[self.inds_more] = np.sign(loc_diff[self.inds_more])
-
-            # backprop the loc loss
-            # sclae the loc_predictions by num_matches
-            loc_diff /= float(num_matches)
-
-            count = 0
-            for batch, match in enumerate(matches):
-                match_inds = match['inds']
-                # load up the errors to the proper prior box location
-                # in the loc network outputs matches the diffs up with
-                # the correct location in loc_deltas which is the full
-                # length of all the location predictions concated together
-                inds_ = np.where(match_inds > -1)[0]
-                loc_deltas[batch, inds_, :] = loc_diff[range(count, count+len(inds_)), :]
-                count += len(inds_)
-        else:
-            loc_deltas[:] = 0.0
-
-        # first bprop the softmax
-        conf_diff = self.probs.copy()  # may not need copy, could do in place?
-        for ind in range(len(self.labels)):
-            conf_diff[ind, self.labels[ind]] -= 1.0
-
-        conf_diff /= float(self.num_matches)
+            loc_diff = self.loc_diff_data
+            np.clip(loc_diff, -1.0, 1.0, out=loc_diff)
+            # scale the loc_predictions by num_matches
+            self.loc_deltas[self.pos] = loc_diff / float(self.norm_)
 
-        count = 0
-        for batch, match in enumerate(matches):
-            match_inds = match['inds']
-            inds_ = np.where(match_inds > -1)[0]
-            self.conf_deltas[batch, :, :] = 0.0
-            self.conf_deltas[batch, inds_, :] = conf_diff[range(count, count+len(inds_)), :]
-            count += len(inds_)
-
-            inds_ = self.all_neg_inds[batch]
-            assert np.all(inds_ < self.num_priors)
-            self.conf_deltas[batch, inds_, :] = conf_diff[range(count, count+len(inds_)), :]
-            count += len(inds_)
+        # bprop the softmax, prob - 1 at the label of the selected prior boxes
+        conf_deltas = self.conf_deltas
+        conf_deltas[:] = self.prob
+        batch, inds = np.nonzero(self.conf_mask)
+        conf_deltas[batch, inds, self.labels[batch, inds]] -= 1.0
+        conf_deltas[~self.conf_mask] = 0.0
+        conf_deltas /= float(self.norm_)
 
         # for now, to match rest of the network, transpose from (N, K, 4) to (K4, N)
         # and load onto device
-        loc_deltas = np.ascontiguousarray(
-                      self.loc_deltas.reshape((self.be.bsz, -1)).transpose((1, 0)))
-        conf_deltas = np.ascontiguousarray(
-                      self.conf_deltas.reshape((self.be.bsz, -1)).transpose((1, 0)))
-        if self.conf_deltas_dev is None:
-            self.conf_deltas_dev = self.be.array(conf_deltas)
-        else:
-            self.conf_deltas_dev.set(conf_deltas)
-
-        if self.loc_deltas_dev is None:
-            self.loc_deltas_dev = self.be.array(loc_deltas)
-        else:
-            self.loc_deltas_dev.set(loc_deltas)
+        self.loc_deltas_dev.set(np.ascontiguousarray(
+            self.loc_deltas.reshape((self.be.bsz, -1)).T))
+        self.conf_deltas_dev.set(np.ascontiguousarray(
+            conf_deltas.reshape((self.be.bsz, -1)).T))
 
         return (self.loc_deltas_dev, self.conf_deltas_dev)
 
-    def EncodeConfPrediction(self, num_conf, y_conf, all_matches, all_neg_inds, all_gt_boxes):
-
-        conf_gt = np.zeros((num_conf, ), dtype=np.int) + self.background_label_id
-        conf_pred = np.zeros((num_conf, self.num_classes))
-
-        num_priors = y_conf.shape[1]
-
-        count = 0
-        for batch in range(self.be.bsz):
-            gt_boxes = all_gt_boxes[batch]
-            if len(gt_boxes) == 0:
-                # no GT labels for this image
-                continue
-
-            matches = all_matches[batch]
-            match_inds = matches['inds']
-            assert len(match_inds) == num_priors
-
-            positive_inds = np.where(match_inds > -1)[0]
-            negative_inds = all_neg_inds[batch]
-
-            n_pos = len(positive_inds)
-            n_neg = len(negative_inds)
-
-            # store positive matches
-            conf_pred[count:(count+n_pos), :] = y_conf[batch, positive_inds, :]
-            conf_gt[count:(count+n_pos)] = gt_boxes[match_inds[positive_inds], 4]
-            count += n_pos
-
-            # pad with negative matches
-            conf_pred[count:(count+n_neg), :] = y_conf[batch, negative_inds, :]
-            conf_gt[count:(count+n_neg)] = self.background_label_id
-            count += n_neg
-
-        return (conf_gt, conf_pred)
-
     def encodeBBox(self, prior, bbox):
-        self.variances = [0.1, 0.1, 0.2, 0.2]
-
-        xmin = 0.5*(bbox[2] + bbox[0] - prior[2] - prior[0]) / (
-               prior[2] - prior[0]) / self.variances[0]
-        ymin = 0.5*(bbox[3] + bbox[1] - prior[3] - prior[1]) / (
-               prior[3] - prior[1]) / self.variances[1]
-        xmax = np.log((bbox[2] - bbox[0]) / (prior[2] - prior[0])) / self.variances[2]
-        ymax = np.log((bbox[3] - bbox[1]) / (prior[3] - prior[1])) / self.variances[3]
-        return [xmin, ymin, xmax,  ymax]
-
-    # find matching gt_boxes and prior boxes and compute the regression target
-    def encodeLocPrediction(self, num_matches, matches, loc_data, gt_boxes, priors):
-        # output regression gt data
-        loc_gt_data = np.zeros((num_matches, 4))
-        loc_pred_data = np.zeros((num_matches, 4))
-        cnt = 0
-
-        for batch in range(self.be.bsz):
-            match_inds = matches[batch]['inds']
-
-            inds = np.where(match_inds > -1)[0]
-            for ind in inds:
-
-                gt_ind = match_inds[ind]
-                gt_box = gt_boxes[batch][gt_ind, :]
-
-                loc_gt_data[cnt, :] = self.encodeBBox(priors[ind], gt_box)
-                loc_pred_data[cnt, :] = loc_data[batch][ind, :]
-                cnt += 1
-
-        return (loc_gt_data, loc_pred_data)
-
-    def count_matches(self, matches):
-        num_matches = 0
-        for batch in range(self.be.bsz):
-            inds = matches[batch]['inds']
-            num_matches += len(np.where(inds > -1)[0])
-
-        return num_matches
-
-    def mine_examples(self, matches):
-        num_matches = self.count_matches(matches)
-
-        # go through each image in the batch
-        all_neg_inds = {}
-        for batch in range(self.be.bsz):
-            # loss  = conf_loss + loc_loss but loc_loss for max_negative is 0
-
-            # loop over the matches
-            # we have only implemented share_location = True so the matches
-            # are not done by location, BBs are shared across all classes
-            match_inds = matches[batch]['inds']
-            match_ovlp = matches[batch]['overlap']
-            sel_inds = set()
-            num_sel = 0
-            loss_inds = []
-            loss = matches[batch]['conf_loss']
-            num_pos = np.count_nonzero(match_inds > -1)
-
-            linds = np.where((match_inds == -1) & (match_ovlp < self.neg_overlap))[0]
-            loss_inds = np.vstack([loss[linds], linds]).T
-            num_sel = min([int(num_pos*self.neg_pos_ratio), linds.shape[0]])
-
-            # sort the losses
-            sort_inds = np.argsort(loss_inds[:, 0])
-
-            sel_inds = np.unique(loss_inds[sort_inds[-num_sel:], 1].astype(np.int))
-            cnt = num_sel + 1
-            # the loop below should seldom run i think
-            while (len(sel_inds) < num_sel):
-                if cnt > sort_inds.shape[0]:
-                    break
-                sel_inds = np.union1d(sel_inds, [np.int(loss_inds[sort_inds[-cnt], 1])])
-                cnt += 1
-
-            assert np.all(match_inds[sel_inds] == -1)
-            all_neg_inds[batch] = sel_inds
-        return (all_neg_inds, num_matches)
-
-    def isEligibleMining(self, mind, movlp):
-        return mind == -1 and movlp < self.neg_overlap
-
-    def softmax(self, x, axis=0):
-        exp = np.exp(x - np.max(x, axis=axis, keepdims=True))
-        return exp / np.sum(exp, axis=axis, keepdims=True)
+        """
+        Regression targets of the boxes bbox (N, 4) relative to the prior boxes prior (N, 4).
+        """
+        prior_w = prior[:, 2] - prior[:, 0]
+        prior_h = prior[:, 3] - prior[:, 1]
+
+        encoded = np.empty((prior.shape[0], 4))
+        encoded[:, 0] = 0.5*(bbox[:, 2] + bbox[:, 0] - prior[:, 2] - prior[:, 0]) / prior_w
+        encoded[:, 1] = 0.5*(bbox[:, 3] + bbox[:, 1] - prior[:, 3] - prior[:, 1]) / prior_h
+        encoded[:, 2] = np.log((bbox[:, 2] - bbox[:, 0]) / prior_w)
+        encoded[:, 3] = np.log((bbox[:, 3] - bbox[:, 1]) / prior_h)
+        encoded /= self.variances
+        return encoded
+
+    def mine_examples(self, pos):
+        """
+        Select the hard negatives of each image into neg_mask: the unmatched prior boxes
+        overlapping less than neg_overlap with the largest conf losses, neg_pos_ratio
+        times as many as the matched ones.
+        """
+        # loss  = conf_loss + loc_loss but loc_loss for max_negative is 0
+        eligible = ~pos & (self.match_overlaps < self.neg_overlap)
+        neg_loss = self.neg_loss
+        neg_loss.fill(-np.inf)
+        neg_loss[eligible] = self.conf_loss[eligible]
+
+        num_pos = np.count_nonzero(pos, axis=1)
+        num_neg = np.minimum((num_pos * self.neg_pos_ratio).astype(np.int64),
+                             np.count_nonzero(eligible, axis=1))
+
+        self.neg_mask.fill(False)
+        k = num_neg.max()
+        if k == 0:
+            return
+
+        # the k largest losses of each image, then the num_neg largest of those
+        rows = np.arange(self.be.bsz)[:, None]
+        top = np.argpartition(-neg_loss, k - 1, axis=1)[:, :k]
+        top = top[rows, np.argsort(-neg_loss[rows, top], axis=1)]
+        keep = np.arange(k) < num_neg[:, None]
+        self.neg_mask[np.broadcast_to(rows, top.shape)[keep], top[keep]] = True
 
     def smoothL1loss(self, x):
-
         loc_loss_vec = np.abs(x)
-        self.inds_less = np.where(loc_loss_vec < 1.0)
-        self.inds_more = np.where(loc_loss_vec >= 1.0)
-        loc_loss_vec[self.inds_less] = 0.5*loc_loss_vec[self.inds_less]**2
-        loc_loss_vec[self.inds_more] -= 0.5
-
-        return loc_loss_vec
-
-    def get_conf_loss(self, y_conf, matches, gt_boxes):
-        # y_conf (batch, num_preds/class, num_classes)
-        # match the caffe version where things are (HWC, N)
-        # y_conf should be (batch_size, num_preds_per_class, num_classes)
-
-        # for each of the confidences we need to the GT label
-        # which comes from the matches
-
-        # calculate the softmax loss
-        prob = self.softmax_dev(y_conf.reshape(-1, self.num_classes))
-        self.loss[:] = -1 * self.be.log(prob)
-
-        loss = self.loss.reshape(y_conf.shape).get()
-
-        for batch in range(self.be.bsz):
-            match_inds = matches[batch]['inds']
-            gt_boxes_ = gt_boxes[batch]
-            if len(gt_boxes_) == 0:
-                continue
-
-            label = match_inds.copy().astype(np.int)
-            label[match_inds == -1] = self.background_label_id
-            inds = np.where(match_inds > -1)[0]
-            label[inds] = gt_boxes_[match_inds[inds], 4]
-
-            matches[batch]['conf_loss'] = loss[batch, range(loss.shape[1]), label]
-
-    def find_matches(self, priors, gt):
+        return np.where(loc_loss_vec < 1.0, 0.5*loc_loss_vec**2, loc_loss_vec - 0.5)
+
+    def get_conf_loss(self, gt_classes):
+        # softmax loss of every prior box for its label, the class of
+        # the matched GT box or the background
+        prob = self.softmax_dev(self.y_conf_dev.reshape(-1, self.num_classes))
+        self.prob_dev[:] = prob
+        self.prob = self.prob_dev.get().reshape(self.y_conf_dev.shape)
+
+        labels = self.labels
+        labels.fill(self.background_label_id)
+        pos = self.matches > -1
+        batch, inds = np.nonzero(pos)
+        labels[pos] = gt_classes[batch, self.matches[pos]]
+
+        rows = np.arange(self.be.bsz)[:, None]
+        cols = np.arange(self.num_priors)[None, :]
+        np.log(np.maximum(EPS, self.prob[rows, cols, labels]), out=self.conf_loss)
+        np.negative(self.conf_loss, out=self.conf_loss)
+
+    def find_matches(self, priors, gt_boxes, gt_valid):
+        """
+        Match the prior boxes to the GT boxes of all the images: each GT box to the prior
+        box overlapping it most, then every other prior box overlapping a GT box by more
+        than overlap_threshold to the GT box overlapping it most.
+        """
         assert self.use_prior_for_matching
         assert self.share_location
 
-        matches = len(gt) * [None]
-
-        for batch, gt_boxes in enumerate(gt):
-
-            # check to see if there are any GT boxes for this image
-            if len(gt_boxes) == 0:
-                # if not then all the predictions are negative samples
-                # may need to return all -1 for inds and 0 for overlap with same shape as locs?
-                print('WARNING - found image with no ground truth box')
-                continue
-
-            # 1. Compute the overlap of each prior box with each ground truth box
-            overlaps = util.calculate_bb_overlap(priors, gt_boxes[:, :4])
-            # overlaps[overlaps <= 1.0e-6] = 0.0
-
-            # 2. Use overlaps to compute the gt box each prior box is 'closest' to
-            gt_assignment = overlaps.argmax(axis=1)  # max_inds
-            match_overlaps = overlaps.max(axis=1)  # match_overlaps
-
-            # 3. Set up the match_inds
-            match_inds = np.empty((overlaps.shape[0], ), dtype=np.int)
-            match_inds.fill(-1)
-
-            # 4. loop through each gt box, assigning the best match
-            for inds in range(len(gt_boxes)):
-                max_ind = np.argmax(overlaps)
-                (ind_priorbox, ind_gt) = np.unravel_index(max_ind, overlaps.shape)
-
-                match_inds[ind_priorbox] = ind_gt
-                match_overlaps[ind_priorbox] = overlaps[ind_priorbox, ind_gt]
-
-                # remove that match
-                overlaps[:, ind_gt] = -1.0
-                overlaps[ind_priorbox, :] = -1.0
-
-            # 5. any prior box above the overlap threshold with any gt box
-            inds_ = np.where((match_inds == -1) & (match_overlaps > self.overlap_threshold))[0]
-            match_inds[inds_] = gt_assignment[inds_]
-
-            # match_inds maps from prior box ind to GT box
-            matches[batch] = {'inds': match_inds,
-                              'overlap': match_overlaps}
-        return matches
-
-    def gen_locs(self, y_loc, num_preds_per_class):
-        # y_loc should be (batch_size, num_preds_per_class, 4)
-        assert self.share_location, 'non share location is not supported yet'
-        assert y_loc.shape[1] == num_preds_per_class
-        bboxes = {}
-        for batch in range(self.be.bsz):
-            bboxes[batch] = y_loc[batch, :, :].copy()
-        return bboxes
-
-    # convert gt_boxes to boxes per batch, removing
-    # zero-padded entries
+        overlaps = self.overlaps[:gt_valid.size * self.num_priors].reshape(
+            (self.be.bsz, self.num_priors, -1))
+        # 1. Compute the overlap of each prior box with each ground truth box
+        overlaps[:] = util.calculate_bb_overlap(priors, gt_boxes)
+        overlaps[np.broadcast_to(~gt_valid[:, None, :], overlaps.shape)] = -1.0
+
+        # 2. Use overlaps to compute the gt box each prior box is 'closest' to
+        gt_assignment = overlaps.argmax(axis=2)
+        np.max(overlaps, axis=2, out=self.match_overlaps)
+        # images without GT boxes only have negative samples
+        self.match_overlaps[self.match_overlaps < 0] = 0.0
+
+        # 3. Set up the match_inds
+        match_inds = self.matches
+        match_inds.fill(-1)
+
+        # 4. assign each gt box its best prior box, best overlaps first
+        bsz, num_priors, max_gt = overlaps.shape
+        batch = np.arange(bsz)
+        for _ in range(gt_valid.sum(axis=1).max()):
+            best = overlaps.reshape(bsz, -1).argmax(axis=1)
+            ind_priorbox, ind_gt = np.unravel_index(best, (num_priors, max_gt))
+            matched = overlaps[batch, ind_priorbox, ind_gt] >= 0
+            b, p, g = batch[matched], ind_priorbox[matched], ind_gt[matched]
+
+            match_inds[b, p] = g
+            self.match_overlaps[b, p] = overlaps[b, p, g]
+
+            # remove that match
+            overlaps[b, :, g] = -1.0
+            overlaps[b, p, :] = -1.0
+
+        # 5. any prior box above the overlap threshold with any gt box
+        thresh = (match_inds == -1) & (self.match_overlaps > self.overlap_threshold)
+        match_inds[thresh] = gt_assignment[thresh]
+
     def gen_gt_boxes(self, gt_boxes, gt_classes, num_gt):
-        # gt_boxes is (max_gt_boxes, batch_size)
-        # gt_classes is (max_gt_boxes, batch_size)
-        # num_gt is (1, batch_size)  number of GT box counts
-        bboxes = [np.zeros((ngt, 5)) for ngt in num_gt[0]]
-
-        gt_boxes = gt_boxes.reshape((-1, 4, self.be.bsz))
-        for batch in range(self.be.bsz):
-            ngt = num_gt[0][batch]
-            bboxes[batch][:, :4] = gt_boxes[:ngt, :, batch]
-            bboxes[batch][:, 4] = gt_classes[:ngt, batch]
-
-        return bboxes
+        """
+        Batch the GT boxes, zero padded to the largest number of boxes of the images.
+
+        Arguments:
+            gt_boxes (numpy.ndarray): (max_gt_boxes * 4, batch_size)
+            gt_classes (numpy.ndarray): (max_gt_boxes, batch_size)
+            num_gt (numpy.ndarray): (1, batch_size) number of GT box counts
+
+        Returns:
+            tuple: boxes (batch_size, num_boxes, 4), classes (batch_size, num_boxes) and
+                   mask of the boxes present (batch_size, num_boxes)
+        """
+        num_gt = num_gt.reshape((-1, 1)).astype(np.int64)
+        num_boxes = max(num_gt.max(), 1)
+        boxes = gt_boxes.reshape((-1, 4, self.be.bsz))[:num_boxes].transpose((2, 0, 1))
+        classes = gt_classes[:num_boxes].T.astype(np.int64)
+        valid = np.arange(num_boxes)[None, :] < num_gt
+        return boxes, classes, valid
@@ -111,16 +111,23 @@ def JaccardOverlap(box1, box2):
 
 
 def calculate_bb_overlap(rp, gt):
+    """
+    Jaccard overlaps of boxes rp (R, 4) with the ground truth boxes gt (G, 4), or with
+    a batch of them (N, G, 4).  Overlaps below 1e-6 are set to 0.
 
-    R = rp.shape[0]
-    G = gt.shape[0]
-
-    overlaps = np.zeros((R, G))
+    Returns:
+        numpy.ndarray: overlaps (R, G), or (N, R, G) for a batch
+    """
+    rp = rp[:, None, :]
+    gt = gt[..., None, :, :]
 
-    for ind, gt_box in enumerate(gt):
-        overlap = JaccardOverlap(rp, gt_box)
-        overlap[overlap <= 1.0e-6] = 0.0
+    dx = np.minimum(rp[..., 2], gt[..., 2]) - np.maximum(rp[..., 0], gt[..., 0])
+    dy = np.minimum(rp[..., 3], gt[..., 3]) - np.maximum(rp[..., 1], gt[..., 1])
+    inter_area = np.maximum(dx, 0) * np.maximum(dy, 0)
 
-        overlaps[:, ind] = overlap
+    joint_area = (rp[..., 2] - rp[..., 0]) * (rp[..., 3] - rp[..., 1]) + \
+        (gt[..., 2] - gt[..., 0]) * (gt[..., 3] - gt[..., 1])
 
+    overlaps = inter_area / (joint_area - inter_area)
+    overlaps[overlaps <= 1.0e-6] = 0.0
     return overlaps
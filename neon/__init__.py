@@ -30,8 +30,6 @@ from copy import deepcopy
 import inspect
 import logging
 
-from neon.util.persist import load_class
-
 
 DISPLAY_LEVEL_NUM = 41
 logging.addLevelName(DISPLAY_LEVEL_NUM, "DISPLAY")
@@ -99,6 +97,8 @@ class NervanaObject(object):
                 # assume empty params if 'config' key missing
                 # needed to keep yaml deserialization short
                 pdict[key]['config'] = {}
+            # imported here to keep the pickle and h5py machinery out of `import neon`
+            from neon.util.persist import load_class
             ccls = load_class(pdict[key]['type'])
             pdict[key] = ccls.gen_class(pdict[key]['config'])
 
@@ -25,31 +25,16 @@ from neon.backends.autodiff import Autodiff
 from neon.backends.util.check_gpu import get_device_count
 from neon.backends.util.check_mkl import get_mkl_lib
 
-# These are imported to register the backends with the factory
-# importing with `from` ensures links will be generated in sphinx documentation
+# The CPU backend is imported to register it with the factory, importing with `from`
+# ensures links will be generated in sphinx documentation.  The other backends pull in
+# PyCUDA or the MKL engine and are imported by gen_backend when requested.
 from neon.backends import nervanacpu
 
-try:
-    from neon.backends import nervanagpu
-except ImportError:
-    pass
 
-try:
-    from neon.backends import nervanamkl
-except ImportError:
-    pass
-
-try:
-    # Register if it exists
-    from mgpu import nervanamgpu
-except ImportError:
-    pass
-
-
-def gen_backend(backend='mkl' if get_mkl_lib() else 'cpu',
+def gen_backend(backend=None,
                 rng_seed=None, datatype=np.float32,
                 batch_size=0, stochastic_round=False, device_id=0,
-                max_devices=get_device_count(), compat_mode=None,
+                max_devices=None, compat_mode=None,
                 deterministic_update=None, deterministic=None):
     """
     Construct and return a backend instance of the appropriate type based on
@@ -57,13 +42,18 @@ def gen_backend(backend='mkl' if get_mkl_lib() else 'cpu',
     backend is returned.
 
     Arguments:
-        backend (string, optional): 'cpu', 'mkl' or 'gpu'.
+        backend (string, optional): 'cpu', 'mkl' or 'gpu'.  Defaults to 'mkl' if the MKL
+                                    engine is installed, 'cpu' otherwise.
         rng_seed (numeric, optional): Set this to a numeric value which can be used to seed the
                                       random number generator of the instantiated backend.
                                       Defaults to None, which doesn't explicitly seed (so each run
                                       will be different)
         datatype (dtype): Default tensor data type. CPU backend supports np.float64, np.float32,
                           and np.float16; GPU backend supports np.float32 and np.float16.
+                          With np.float16 the CPU backend stores parameters and
+                          activations in half precision, accumulates dot products
+                          and convolutions in float32 and the optimizers keep float32
+                          master weights.
         batch_size (int): Set the size the data batches.
         stochastic_round (int/bool, optional): Set this to True or an integer to implent
                                                stochastic rounding. If this is False rounding will
@@ -75,7 +65,7 @@ def gen_backend(backend='mkl' if get_mkl_lib() else 'cpu',
                                        device on which to run the process
         max_devices (int, optional): For use with multi-GPU backend only.
                                       Controls the maximum number of GPUs to run
-                                      on.
+                                      on.  Defaults to all devices found.
         compat_mode (str, optional): if this is set to 'caffe' then the conv and pooling
                                      layer output sizes will match that of caffe as will
                                      the dropout layer implementation
@@ -90,6 +80,11 @@ def gen_backend(backend='mkl' if get_mkl_lib() else 'cpu',
     """
     logger = logging.getLogger(__name__)
 
+    if backend is None:
+        backend = 'mkl' if get_mkl_lib() else 'cpu'
+    if max_devices is None and backend == 'mgpu':
+        max_devices = get_device_count()
+
     if NervanaObject.be is not None:
         # backend was already generated clean it up first
         cleanup_backend()
@@ -0,0 +1,133 @@
+# ******************************************************************************
+# Copyright 2017-2018 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ******************************************************************************
+"""
+Selection of the conv algorithms of the CPU backend by timing them.
+"""
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class ConvAutotuner(object):
+    """
+    Picks the fastest algorithm (direct, im2col GEMM, Winograd or FFT) of the fprop,
+    bprop and update of each conv and deconv layer geometry, by timing all the algorithms
+    able to compute it on its first call.  The choices are kept in a JSON file, so later
+    runs with the same layer geometries skip the timing.
+
+    Arguments:
+        cache_file (str, optional): file of the choices, defaults to conv_algos.json in
+                                    the neon cache directory.  An empty string keeps them
+                                    in memory only.
+        repeat (int, optional): number of timed runs of each algorithm, the best is kept
+    """
+
+    def __init__(self, cache_file=None, repeat=1):
+        if cache_file is None:
+            from neon.util.persist import get_cache_dir
+            cache_file = os.path.join(get_cache_dir(), 'conv_algos.json')
+        self.cache_file = cache_file
+        self.repeat = repeat
+        self.choices = self.load()
+        # seconds taken by each algorithm, by key, for the geometries timed in this run
+        self.timings = {}
+
+    def load(self):
+        """
+        Read the choices file.
+
+        Returns:
+            dict: algorithm name by key, empty if there is no readable file
+        """
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return {}
+        try:
+            with open(self.cache_file) as f:
+                return json.load(f)
+        except (IOError, ValueError) as e:
+            logger.warning("Ignoring unreadable conv algorithm cache %s: %s",
+                           self.cache_file, e)
+            return {}
+
+    def save(self):
+        """
+        Merge the choices into the choices file.
+        """
+        if not self.cache_file:
+            return
+        choices = self.load()
+        choices.update(self.choices)
+        # concurrent jobs write whole files and rename them into place
+        tmp_file = '%s.%d.tmp' % (self.cache_file, os.getpid())
+        with open(tmp_file, 'w') as f:
+            json.dump(choices, f, indent=1, sort_keys=True)
+        os.rename(tmp_file, self.cache_file)
+
+    def choose(self, key, candidates):
+        """
+        Time the candidate algorithms of a computation and remember the fastest.
+
+        Arguments:
+            key (str): name of the computation
+            candidates (dict): a function of no arguments by algorithm name
+
+        Returns:
+            str: name of the fastest algorithm
+        """
+        if len(candidates) == 1:
+            return list(candidates)[0]
+
+        times = {}
+        for name, func in sorted(candidates.items()):
+            best = float('inf')
+            for _ in range(self.repeat):
+                start = time.time()
+                func()
+                best = min(best, time.time() - start)
+            times[name] = best
+        algo = min(times, key=times.get)
+        logger.info("Conv algorithm of %s: %s (%s)", key, algo,
+                    ', '.join('%s %.2fms' % (n, t * 1000) for n, t in sorted(times.items())))
+
+        self.timings[key] = times
+        self.choices[key] = algo
+        self.save()
+        return algo
+
+    def select(self, layer, op, A, B):
+        """
+        Set the algorithm of an op of a conv or deconv layer, on its first call.
+
+        Arguments:
+            layer (ConvLayer): conv or deconv parameter object
+            op (str): 'fprop', 'bprop' or 'update'
+            A (Tensor): first operand of the op, inputs or errors
+            B (Tensor): second operand of the op, filters or errors
+
+        Returns:
+            str: name of the algorithm of the op
+        """
+        algo = layer.algos.get(op)
+        if algo is None:
+            key = layer.tune_key(op, A.dtype)
+            algo = self.choices.get(key)
+            if algo not in layer.algorithms(op):
+                algo = self.choose(key, layer.candidates(op, A, B))
+            layer.algos[op] = algo
+        return algo
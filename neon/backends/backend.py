@@ -18,6 +18,8 @@ Defines Tensor and Backend class.
 """
 from __future__ import division
 from builtins import hex, map, object, range, str, zip
+from collections import OrderedDict
+import importlib
 import logging
 from math import ceil
 import numpy as np
@@ -456,26 +458,64 @@ class Backend(AbstractBackend):
                                        usage and slow down.  Only relevant for GPU
                                        backends.
     """
+    # modules defining the backends, imported when a backend is first requested since
+    # they pull in PyCUDA or the MKL engine
+    backend_modules = OrderedDict([('cpu', 'neon.backends.nervanacpu'),
+                                   ('mkl', 'neon.backends.nervanamkl'),
+                                   ('gpu', 'neon.backends.nervanagpu'),
+                                   ('mgpu', 'mgpu.nervanamgpu')])
+
+    @staticmethod
+    def load_backend(name):
+        """
+        Import the module of a named backend to register it, if it is not registered
+        yet.
+
+        Returns:
+            bool: whether the backend is available
+        """
+        if name not in Backend.backends and name in Backend.backend_modules:
+            try:
+                importlib.import_module(Backend.backend_modules[name])
+            except ImportError:
+                pass
+        return name in Backend.backends
+
     @staticmethod
     def backend_choices():
         """Return the list of available backends."""
-        names = sorted(Backend.backends.keys())
+        names = [name for name in Backend.backend_modules if Backend.load_backend(name)]
+        names = sorted(set(names) | set(Backend.backends.keys()))
         return names
 
     @staticmethod
     def allocate_backend(name, **kargs):
         """Allocate a named backend."""
-        try:
-            return Backend.backends[name](**kargs)
-        except KeyError:
+        if not Backend.load_backend(name):
             names = ', '.join(["'%s'" % (_,) for _ in Backend.backend_choices()])
             raise ValueError("backend must be one of (%s)" % (names,))
+        return Backend.backends[name](**kargs)
 
     def __init__(self, rng_seed=None, default_dtype=np.float32,
                  compat_mode=None, deterministic=None):
         # dtype
         self.default_dtype = default_dtype
 
+        # dtype that products of default_dtype tensors are accumulated in, parameters
+        # stored in a narrower type get master copies of this type in the optimizers
+        self.compute_dtype = default_dtype
+
+        # dtype of dropout keep masks, None for default_dtype
+        self.mask_dtype = None
+
+        # whether the layer kernels accept column slices of the iobuf buffers, which
+        # lets layers skip the unused columns of a partial minibatch
+        self.partial_batch = False
+
+        # number of threads the independent branches of MergeBroadcast, MergeSum and
+        # Tree containers are run on, 0 runs them one after the other
+        self.branch_workers = 0
+
         # use RandomState instead of seed
         self.rng_seed = rng_seed
         self.rng = self.gen_rng(rng_seed)
@@ -501,6 +541,33 @@ class Backend(AbstractBackend):
         """Release any resources that have been acquired by this backend."""
         pass
 
+    def set_branch_workers(self, num_workers):
+        """
+        Run the independent branches of MergeBroadcast, MergeSum and Tree containers
+        concurrently on num_workers threads.  Has to be called before the model is
+        initialized, since concurrent branches are given delta (and MergeSum output)
+        buffers of their own.
+
+        Backends that can not run branches concurrently keep running them in order.
+
+        Arguments:
+            num_workers (int): number of threads, 0 or 1 to run branches in order
+        """
+        if num_workers > 1:
+            logger.info("%s runs container branches in order", self.__class__.__name__)
+
+    def run_branches(self, funcs):
+        """
+        Call each of funcs, concurrently if branch workers are enabled.
+
+        Arguments:
+            funcs (list of callables): independent branch computations
+
+        Returns:
+            list: the return values of funcs, in order
+        """
+        return [f() for f in funcs]
+
     def output_dim(self, X, S, padding, strides, pooling=False, dilation=1):
         """
         Compute along 1 dimension, with these sizes, what will be the output dimension.
@@ -543,6 +610,30 @@ class Backend(AbstractBackend):
         """
         return self.compat_mode == 'caffe'
 
+    def rng_uniform(self, ary, low=0.0, high=1.0):
+        """
+        Fill ary with values drawn uniformly from [low, high) by the seeded
+        backend RNG.  Used by the parameter initializers.
+
+        Arguments:
+            ary (Tensor): Tensor to fill with random values
+            low (float, optional): lower bound.  Defaults to 0.
+            high (float, optional): upper bound.  Defaults to 1.
+        """
+        ary[:] = self.rng.uniform(low, high, ary.shape)
+
+    def rng_normal(self, ary, loc=0.0, scale=1.0):
+        """
+        Fill ary with normally distributed values drawn by the seeded backend
+        RNG.  Used by the parameter initializers.
+
+        Arguments:
+            ary (Tensor): Tensor to fill with random values
+            loc (float, optional): mean.  Defaults to 0.
+            scale (float, optional): standard deviation.  Defaults to 1.
+        """
+        ary[:] = self.rng.normal(loc, scale, ary.shape)
+
     def iobuf(self, dim0, x=None, dtype=None, name=None, persist_values=True,
               shared=None, parallelism=None):
         """
@@ -1648,34 +1739,35 @@ class Backend(AbstractBackend):
                                           h_ff_buffer, W_recur_f, h_prev, h_ff_f, h_f, b_f,
                                           W_recur_b, h_next, h_ff_b, h_b, b_b, nout, nsteps,
                                           used_nsteps, activation):
-        self.compound_rnn_unroll_fprop(W_recur_f, h_prev,
-                                       h_ff_f, h_f, b_f,
-                                       nout, nsteps,
-                                       used_nsteps,
-                                       activation, False)
-
-        self.compound_rnn_unroll_fprop(W_recur_b, h_next,
-                                       h_ff_b, h_b, b_b,
-                                       nout, nsteps,
-                                       used_nsteps,
-                                       activation, True)
+        # the two directions are independent, run_branches overlaps them if it can
+        self.run_branches([
+            lambda: self.compound_rnn_unroll_fprop(W_recur_f, h_prev,
+                                                   h_ff_f, h_f, b_f,
+                                                   nout, nsteps,
+                                                   used_nsteps,
+                                                   activation, False),
+            lambda: self.compound_rnn_unroll_fprop(W_recur_b, h_next,
+                                                   h_ff_b, h_b, b_b,
+                                                   nout, nsteps,
+                                                   used_nsteps,
+                                                   activation, True)])
 
     def compound_rnn_unroll_bprop_bibnrnn(self, ngLayer, error, in_deltas_f, prev_in_deltas,
                                           in_deltas_b, next_in_deltas, W_recur_f,
                                           W_recur_b, h_f, h_b, nout, nsteps, used_nsteps,
                                           activation, h_buffer_all):
 
-        self.compound_rnn_unroll_bprop(W_recur_f.T, prev_in_deltas,
-                                       in_deltas_f, h_f,
-                                       nout, nsteps,
-                                       used_nsteps,
-                                       activation, True)
-
-        self.compound_rnn_unroll_bprop(W_recur_b.T, next_in_deltas,
-                                       in_deltas_b, h_b,
-                                       nout, nsteps,
-                                       used_nsteps,
-                                       activation, False)
+        self.run_branches([
+            lambda: self.compound_rnn_unroll_bprop(W_recur_f.T, prev_in_deltas,
+                                                   in_deltas_f, h_f,
+                                                   nout, nsteps,
+                                                   used_nsteps,
+                                                   activation, True),
+            lambda: self.compound_rnn_unroll_bprop(W_recur_b.T, next_in_deltas,
+                                                   in_deltas_b, h_b,
+                                                   nout, nsteps,
+                                                   used_nsteps,
+                                                   activation, False)])
 
 
 # For constructing an op tree used in lazy evaluation
@@ -0,0 +1,165 @@
+# ******************************************************************************
+# Copyright 2017-2018 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ******************************************************************************
+"""
+Counter-based random number generation for the CPU backends.
+
+Every fill is cut into fixed size chunks and each chunk is drawn from its own
+Philox stream, keyed on the seed and indexed by a running chunk counter.  The
+values produced only depend on the seed and the number of chunks drawn so far,
+so large tensors can be filled by several threads at once and the whole state
+of the generator is the (key, counter) pair.
+"""
+from __future__ import division
+from builtins import object, range
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+import threading
+
+import numpy as np
+
+try:
+    from numpy.random import Generator, Philox, SeedSequence
+except ImportError:
+    # numpy < 1.17 has no bit generator API
+    Generator = Philox = SeedSequence = None
+
+
+class CounterRNG(object):
+    """
+    Philox based generator that fills numpy arrays in parallel chunks.
+
+    Arguments:
+        seed (int, optional): seed for the Philox key.  If None, a key is drawn
+                              from OS entropy.
+        chunk_size (int, optional): number of values drawn from each Philox stream.
+                                    Changing it changes the generated values.
+        num_threads (int, optional): worker threads used to fill arrays spanning
+                                     more than one chunk.  Defaults to the number
+                                     of cores.
+    """
+    available = Philox is not None
+
+    def __init__(self, seed=None, chunk_size=1 << 16, num_threads=None):
+        if not self.available:
+            raise NotImplementedError("CounterRNG requires numpy >= 1.17")
+        self.key = SeedSequence(seed).generate_state(2, np.uint64)
+        self.counter = 0
+        self.chunk_size = chunk_size
+        self.num_threads = num_threads or multiprocessing.cpu_count()
+        self._pool = None
+        # streams are reserved under a lock, tensors may be filled from several
+        # threads when container branches run concurrently
+        self._lock = threading.Lock()
+
+    def get_state(self):
+        """
+        Return the generator state.
+
+        Returns:
+            dict: Philox key and the index of the next stream to draw from
+        """
+        return {'key': self.key.copy(), 'counter': self.counter}
+
+    def set_state(self, state):
+        """
+        Restore a state returned by get_state.
+
+        Arguments:
+            state (dict): Philox key and stream counter
+        """
+        self.key = np.array(state['key'], dtype=np.uint64)
+        self.counter = int(state['counter'])
+
+    def fill_uniform(self, out, low=0.0, high=1.0):
+        """
+        Fill out with values drawn uniformly from [low, high).
+
+        Arguments:
+            out (np.ndarray): array to fill in place
+            low (float, optional): lower bound.  Defaults to 0.
+            high (float, optional): upper bound.  Defaults to 1.
+        """
+        def fill(gen, chunk):
+            if chunk.dtype in (np.float32, np.float64):
+                gen.random(out=chunk, dtype=chunk.dtype)
+            else:
+                chunk[:] = gen.random(chunk.size, dtype=np.float32)
+            chunk *= high - low
+            chunk += low
+
+        self._fill(out, fill)
+
+    def fill_normal(self, out, loc=0.0, scale=1.0):
+        """
+        Fill out with normally distributed values.
+
+        Arguments:
+            out (np.ndarray): array to fill in place
+            loc (float, optional): mean.  Defaults to 0.
+            scale (float, optional): standard deviation.  Defaults to 1.
+        """
+        def fill(gen, chunk):
+            if chunk.dtype in (np.float32, np.float64):
+                gen.standard_normal(out=chunk, dtype=chunk.dtype)
+            else:
+                chunk[:] = gen.standard_normal(chunk.size, dtype=np.float32)
+            chunk *= scale
+            chunk += loc
+
+        self._fill(out, fill)
+
+    def fill_mask(self, out, keepthresh=0.5):
+        """
+        Fill out with a binary keep mask where each element is one with
+        probability keepthresh.  out can be of any numeric type, a uint8 mask
+        is the cheapest to generate and to apply.
+
+        Arguments:
+            out (np.ndarray): array to fill in place
+            keepthresh (float, optional): fraction of ones.  Defaults to 0.5.
+        """
+        def fill(gen, chunk):
+            np.less(gen.random(chunk.size, dtype=np.float32), keepthresh, out=chunk)
+
+        self._fill(out, fill)
+
+    def _fill(self, out, fill_chunk):
+        """
+        Call fill_chunk(generator, view) on consecutive chunk_size pieces of the
+        flattened out array, each piece with the next Philox stream.
+        """
+        contiguous = out.flags.c_contiguous
+        flat = out.reshape(-1) if contiguous else np.empty(out.size, dtype=out.dtype)
+        nchunks = max(1, -(-flat.size // self.chunk_size))
+        with self._lock:
+            first = self.counter
+            self.counter += nchunks
+
+        def work(idx):
+            gen = Generator(Philox(key=self.key, counter=[0, 0, first + idx, 0]))
+            fill_chunk(gen, flat[idx * self.chunk_size:(idx + 1) * self.chunk_size])
+
+        if nchunks == 1 or self.num_threads < 2:
+            for idx in range(nchunks):
+                work(idx)
+        else:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadPool(self.num_threads)
+            self._pool.map(work, range(nchunks))
+
+        if not contiguous:
+            out[...] = flat.reshape(out.shape)
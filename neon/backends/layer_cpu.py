@@ -17,12 +17,21 @@
 CPU backend layers
 """
 from __future__ import division
-from builtins import object
+from builtins import object, zip
+import itertools as itt
 import math
 from operator import mul
 import numpy as np
 from functools import reduce
 
+from neon.backends.winograd import F_2x2_3x3, I_2x2_3x3, O_2x2_3x3
+
+# largest im2col buffer, in bytes, the GEMM conv algorithm may allocate
+GEMM_WORKSPACE = 1 << 28
+
+# smallest (dilated) filter extent the FFT conv algorithm is tried for
+FFT_MIN_KERNEL = 5
+
 
 def ceil_div(x, y):
     """
@@ -31,6 +40,107 @@ def ceil_div(x, y):
     return -(-x // y)
 
 
+def batch_dims(dims, tensor):
+    """
+    Return dims with the trailing minibatch dimension taken from tensor, so the
+    kernels can run on a column slice holding fewer images than the layer was
+    configured for.
+    """
+    N = tensor.size // reduce(mul, dims[:-1], 1)
+    assert 0 < N <= dims[-1] and N * reduce(mul, dims[:-1], 1) == tensor.size
+    return dims[:-1] + (N,)
+
+
+def blas_array(ary, dtype=np.float32):
+    """
+    Return ary converted to dtype if numpy has no BLAS routines for its type
+    (float16 and integers), so products of such arrays accumulate in dtype.
+    """
+    return ary if ary.dtype in (np.float32, np.float64) else ary.astype(dtype)
+
+
+def pad_spatial(ary, padding, extra=(0, 0, 0)):
+    """
+    Zero pad the depth, height and width of a (C, D, H, W, N) array by padding on
+    both sides, and by extra more at the end.
+    """
+    if not any(padding) and not any(extra):
+        return ary
+    pads = [(0, 0)] + [(p, p + e) for p, e in zip(padding, extra)] + [(0, 0)]
+    return np.pad(ary, pads, 'constant')
+
+
+def freq_matmul(A, B):
+    """
+    Product of the (X, Y) matrices of A by the (Y, Z) matrices of B at each frequency,
+    for A of shape (X, f1, f2, f3, Y) and B of shape (Y, f1, f2, f3, Z).
+    """
+    X, Y, Z = A.shape[0], A.shape[-1], B.shape[-1]
+    out = np.matmul(A.reshape((X, -1, Y)).transpose(1, 0, 2),
+                    B.reshape((Y, -1, Z)).transpose(1, 0, 2))
+    return out.transpose(1, 0, 2).reshape((X,) + A.shape[1:-1] + (Z,))
+
+
+def transform_tiles(mat, X, axis):
+    """
+    Apply the small matrix mat of a Winograd transform to an axis of the stacked tiles
+    X, as a sum of scaled slices of X.
+    """
+    X = np.moveaxis(X, axis, 0)
+    out = np.empty(mat.shape[:1] + X.shape[1:], dtype=X.dtype)
+    for row, o in zip(mat, out):
+        terms = [(a, w) for a, w in enumerate(row) if w]
+        np.multiply(X[terms[0][0]], terms[0][1], out=o)
+        for a, w in terms[1:]:
+            if w == 1:
+                o += X[a]
+            elif w == -1:
+                o -= X[a]
+            else:
+                o += w * X[a]
+    return np.moveaxis(out, 0, axis)
+
+
+def winograd_2x2_3x3(I, F, padding):
+    """
+    Stride 1 convolution of I (C, H, W, N) with the 3x3 filters F (C, 3, 3, K) with the
+    Winograd F(2x2, 3x3) minimal filtering algorithm: the 4x4 input tiles (overlapping by
+    2) and the filters are transformed, multiplied by 16 GEMMs reducing over the
+    channels and transformed back into 2x2 output tiles.
+
+    Arguments:
+        I (ndarray): input, (C, H, W, N)
+        F (ndarray): filters, (C, 3, 3, K)
+        padding (tuple): zero padding of the height and width
+
+    Returns:
+        ndarray: output, (K, P, Q, N)
+    """
+    C, H, W, N = I.shape
+    K = F.shape[-1]
+    P, Q = H + 2 * padding[0] - 2, W + 2 * padding[1] - 2
+    Yw, Xw = ceil_div(P, 2), ceil_div(Q, 2)
+
+    # the bottom and right edges are padded to whole tiles
+    Ip = np.pad(I, ((0, 0), (padding[0], padding[0] + 2 * Yw - P),
+                    (padding[1], padding[1] + 2 * Xw - Q), (0, 0)), 'constant')
+    tiles = np.empty((4, 4, C, Yw, Xw, N), dtype=F.dtype)
+    for a, b in itt.product(range(4), range(4)):
+        tiles[a, b] = Ip[:, a:a + 2 * Yw:2, b:b + 2 * Xw:2]
+    V = transform_tiles(I_2x2_3x3, transform_tiles(I_2x2_3x3, tiles, 0), 1)
+
+    G = F_2x2_3x3.astype(F.dtype)
+    U = np.einsum('ir,js,crsk->ijkc', G, G, F)
+    Mw = np.matmul(U.reshape((16, K, C)), V.reshape((16, C, -1)))
+    Y = transform_tiles(O_2x2_3x3, transform_tiles(O_2x2_3x3, Mw.reshape((4, 4, K, Yw, Xw, N)),
+                                                   0), 1)
+
+    out = np.empty((K, Yw, 2, Xw, 2, N), dtype=F.dtype)
+    for u, v in itt.product(range(2), range(2)):
+        out[:, :, u, :, v] = Y[u, v]
+    return out.reshape((K, 2 * Yw, 2 * Xw, N))[:, :P, :Q]
+
+
 class ConvLayer(object):
 
     """
@@ -108,6 +218,9 @@ class ConvLayer(object):
             self.wSlice = [self.bprop_slice(w, S, Q, pad_w, str_w, dil_w) for w in range(W)]
         self.is_mklop = False
 
+        # algorithm of each op picked by the conv autotuner, shared with the copies
+        self.algos = {}
+
     def get_is_mklop(self):
         return self.is_mklop
 
@@ -178,14 +291,15 @@ class ConvLayer(object):
             X = O
 
         if backward:
-            I = I._tensor.reshape(self.dimO)
-            O = O._tensor.reshape(self.dimI)
-            X = X._tensor.reshape(self.dimI)
+            I = I._tensor.reshape(batch_dims(self.dimO, I))
+            O = O._tensor.reshape(batch_dims(self.dimI, O))
+            X = X._tensor.reshape(batch_dims(self.dimI, X))
         else:
-            I = I._tensor.reshape(self.dimI)
-            O = O._tensor.reshape(self.dimO)
-            X = X._tensor.reshape(self.dimO)
-        F = F._tensor.reshape(self.dimF)
+            I = I._tensor.reshape(batch_dims(self.dimI, I))
+            O = O._tensor.reshape(batch_dims(self.dimO, O))
+            X = X._tensor.reshape(batch_dims(self.dimO, X))
+        # float32 filters make every np.dot below a float32 BLAS call
+        F = blas_array(F._tensor.reshape(self.dimF))
         if bias is not None:
             bias = bias._tensor.reshape((O.shape[0], 1))
         if bsum is not None:
@@ -211,6 +325,18 @@ class ConvLayer(object):
                 self.compound_ops(O, X, bias, bsum, relu, brelu, slope)
             return
 
+        algo = self.algos.get('bprop' if backward else 'fprop', 'direct')
+        if algo == 'direct':
+            self.xprop_direct(I, F, O, X, alpha, beta, backward)
+        elif beta:
+            O[:] = alpha * self.xprop_algos[algo](self, I, F, backward) + beta * X
+        else:
+            O[:] = self.xprop_algos[algo](self, I, F, backward)
+
+        if not beta:
+            self.compound_ops(O, X, bias, bsum, relu, brelu, slope)
+
+    def xprop_direct(self, I, F, O, X, alpha, beta, backward):
         if backward:
             # C <=> K and mirror T, R, S  (0, 1, 2, 3, 4) => (4, 1, 2, 3, 0)
             F = np.transpose(F[:, ::-1, ::-1, ::-1], (4, 1, 2, 3, 0)).copy()
@@ -236,9 +362,6 @@ class ConvLayer(object):
                     else:
                         O[:, m, p, q] = np.dot(slicedF.T, slicedI)
 
-        if not beta:
-            self.compound_ops(O, X, bias, bsum, relu, brelu, slope)
-
     # grad_bias is added for convolution layer with bias
     def update_conv(self, I, E, U, alpha=1.0, beta=0.0, grad_bias=None, layer_op=None):
 
@@ -246,7 +369,7 @@ class ConvLayer(object):
         K, M, P, Q, N = self.dimO
 
         I = I._tensor.reshape(self.dimI)
-        E = E._tensor.reshape(self.dimO)
+        E = blas_array(E._tensor.reshape(self.dimO))
         U = U._tensor.reshape(self.dimF)
 
         if grad_bias is not None:
@@ -264,6 +387,18 @@ class ConvLayer(object):
                 U[:] = alpha * np.dot(I, E).reshape(U.shape)
             return
 
+        algo = self.algos.get('update', 'direct')
+        if algo == 'direct':
+            self.update_direct(I, E, U, alpha, beta)
+        elif beta:
+            U[:] = alpha * self.update_algos[algo](self, I, E) + beta * U
+        else:
+            U[:] = alpha * self.update_algos[algo](self, I, E)
+
+    def update_direct(self, I, E, U, alpha, beta):
+        C = self.C
+        K, M, P, Q, N = self.dimO
+
         if beta:
             U *= beta
         else:
@@ -284,6 +419,196 @@ class ConvLayer(object):
                     else:
                         U[:, sliceT, sliceR, sliceS] += alpha * update
 
+    def algorithms(self, op):
+        """
+        Names of the algorithms able to compute an op of the layer, the direct sliced
+        loop first.  1x1 convolutions are always a single GEMM.
+
+        Arguments:
+            op (str): 'fprop', 'bprop' or 'update'
+
+        Returns:
+            list: algorithm names
+        """
+        if self.dot:
+            return ['direct']
+        algos = ['direct']
+        if self.sizeF // self.K * reduce(mul, self.dimO[1:], 1) * 4 <= GEMM_WORKSPACE:
+            algos.append('gemm')
+        # Winograd F(2x2, 3x3) is for 2D stride 1 3x3 filters, the flipped convolution
+        # of bprop pads by 2 - pad
+        if op != 'update' and self.TRS == (1, 3, 3) and self.DHW[0] == 1 and \
+                self.padding[0] == 0 and self.strides == (1, 1, 1) and \
+                self.dilation == (1, 1, 1) and (op == 'fprop' or max(self.padding) <= 2):
+            algos.append('winograd')
+        # strided FFT convolutions compute all the outputs of the stride 1 convolution
+        if self.strides == (1, 1, 1) and \
+                max(d * (t - 1) + 1 for t, d in zip(self.TRS, self.dilation)) >= FFT_MIN_KERNEL:
+            algos.append('fft')
+        return algos
+
+    def tune_key(self, op, dtype):
+        """
+        Key of an op of the layer in the conv autotuner choices, the same for all the
+        layers of the same geometry.
+        """
+        geometry = (op, np.dtype(dtype).name, self.dimI, self.dimF, self.padding, self.strides,
+                    self.dilation)
+        return '%s %s I%s F%s pad%s str%s dil%s' % geometry
+
+    def candidates(self, op, A, B):
+        """
+        Computations of an op of the layer by each of its algorithms, for the
+        autotuner to time.  They write to scratch buffers only.
+
+        Arguments:
+            op (str): 'fprop', 'bprop' or 'update'
+            A (CPUTensor): inputs (fprop, update) or errors (bprop)
+            B (CPUTensor): filters (fprop, bprop) or errors (update)
+
+        Returns:
+            dict: a function of no arguments by algorithm name
+        """
+        if op == 'update':
+            I = A._tensor.reshape(self.dimI)
+            E = blas_array(B._tensor.reshape(self.dimO))
+            U = np.empty(self.dimF, dtype=E.dtype)
+            funcs = {'direct': lambda: self.update_direct(I, E, U, 1.0, 0.0)}
+            funcs.update((name, lambda f=f: f(self, I, E))
+                         for name, f in self.update_algos.items())
+        else:
+            backward = op == 'bprop'
+            dimA, dimO = (self.dimO, self.dimI) if backward else (self.dimI, self.dimO)
+            I = A._tensor.reshape(batch_dims(dimA, A))
+            F = blas_array(B._tensor.reshape(self.dimF))
+            O = np.empty(dimO[:-1] + I.shape[-1:], dtype=F.dtype)
+            funcs = {'direct': lambda: self.xprop_direct(I, F, O, O, 1.0, 0.0, backward)}
+            funcs.update((name, lambda f=f: f(self, I, F, backward))
+                         for name, f in self.xprop_algos.items())
+        return {name: funcs[name] for name in self.algorithms(op)}
+
+    def col_slices(self):
+        """
+        For each filter tap (t, r, s), the strided slice of the padded input it
+        multiplies over all the output positions.
+        """
+        (T, R, S), (M, P, Q) = self.TRS, self.MPQ
+        for t, r, s in itt.product(range(T), range(R), range(S)):
+            yield (t, r, s), (Ellipsis,) + tuple(
+                slice(f * d, f * d + (o - 1) * st + 1, st)
+                for f, o, st, d in zip((t, r, s), (M, P, Q), self.strides, self.dilation)
+            ) + (slice(None),)
+
+    def im2col(self, I, dtype):
+        """
+        Receptive fields of the outputs, (C, T, R, S, M, P, Q, N), of the input I.
+        """
+        Ip = pad_spatial(I, self.padding)
+        cols = np.empty(self.dimF[:-1] + self.MPQ + I.shape[-1:], dtype=dtype)
+        for trs, sl in self.col_slices():
+            cols[(slice(None),) + trs] = Ip[sl]
+        return cols
+
+    def col2im(self, cols):
+        """
+        Sum the receptive field columns back into an input of the layer, the adjoint of
+        im2col.
+        """
+        N = cols.shape[-1]
+        Ip = np.zeros((self.C,) + tuple(x + 2 * p for x, p in zip(self.DHW, self.padding)) +
+                      (N,), dtype=cols.dtype)
+        for trs, sl in self.col_slices():
+            Ip[sl] += cols[(slice(None),) + trs]
+        return Ip[(slice(None),) + tuple(slice(p, p + x)
+                                         for x, p in zip(self.DHW, self.padding))]
+
+    def xprop_gemm(self, I, F, backward):
+        """
+        im2col convolution: the receptive fields of all the outputs are gathered into one
+        matrix multiplied with the filters in a single GEMM.  bprop scatters the product
+        of the filters and the errors back into the input positions.
+        """
+        Fm = F.reshape((-1, self.K))
+        if backward:
+            cols = np.dot(Fm, blas_array(I).reshape((self.K, -1)))
+            return self.col2im(cols.reshape(self.dimF[:-1] + self.MPQ + I.shape[-1:]))
+        cols = self.im2col(I, F.dtype)
+        return np.dot(Fm.T, cols.reshape((Fm.shape[0], -1))).reshape(
+            (self.K,) + self.MPQ + I.shape[-1:])
+
+    def update_gemm(self, I, E):
+        cols = self.im2col(I, E.dtype)
+        return np.dot(cols.reshape((self.sizeF // self.K, -1)),
+                      E.reshape((self.K, -1)).T).reshape(self.dimF)
+
+    def xprop_winograd(self, I, F, backward):
+        """
+        Winograd F(2x2, 3x3) convolution of the 2D layers with 3x3 stride 1 filters.
+        bprop is the convolution of the errors with the mirrored filters, C and K
+        swapped, padded by 2 - pad.
+        """
+        if backward:
+            F = np.transpose(F[:, :, ::-1, ::-1], (4, 1, 2, 3, 0))
+            padding = [2 - p for p in self.padding[1:]]
+        else:
+            padding = self.padding[1:]
+        return winograd_2x2_3x3(I[:, 0], F[:, 0], padding)[:, np.newaxis]
+
+    def dilated_filter(self, F):
+        """
+        F with zeros in the holes of the dilated filter.
+        """
+        if self.dilation == (1, 1, 1):
+            return F
+        Fd = np.zeros(F.shape[:1] + tuple(d * (t - 1) + 1 for t, d in
+                                          zip(self.TRS, self.dilation)) + F.shape[-1:],
+                      dtype=F.dtype)
+        Fd[(Ellipsis,) + tuple(slice(None, None, d) for d in self.dilation) +
+           (slice(None),)] = F
+        return Fd
+
+    def fft_shape(self):
+        # the padded input, long enough for the circular correlations not to wrap around
+        return tuple(x + 2 * p for x, p in zip(self.DHW, self.padding))
+
+    def strided_outputs(self):
+        # the correlation outputs kept by the strides
+        return (Ellipsis,) + tuple(slice(0, o * s, s) for o, s in
+                                   zip(self.MPQ, self.strides)) + (slice(None),)
+
+    def xprop_fft(self, I, F, backward):
+        """
+        FFT convolution over the padded input extent, for large filters.  fprop
+        correlates the input with the filters, bprop convolves the errors, spread out by
+        the strides, with them.
+        """
+        L, axes = self.fft_shape(), (1, 2, 3)
+        Fs = np.fft.rfftn(self.dilated_filter(F), s=L, axes=axes)
+        if backward:
+            Eu = np.zeros((self.K,) + L + I.shape[-1:], dtype=F.dtype)
+            Eu[self.strided_outputs()] = I
+            out = np.fft.irfftn(freq_matmul(Fs, np.fft.rfftn(Eu, axes=axes)), s=L, axes=axes)
+            return out[(slice(None),) + tuple(slice(p, p + x)
+                                              for x, p in zip(self.DHW, self.padding))]
+        Is = np.fft.rfftn(pad_spatial(I, self.padding), axes=axes)
+        out = np.fft.irfftn(freq_matmul(Fs.conj().transpose(4, 1, 2, 3, 0), Is),
+                            s=L, axes=axes)
+        return out[self.strided_outputs()]
+
+    def update_fft(self, I, E):
+        L, axes = self.fft_shape(), (1, 2, 3)
+        Eu = np.zeros((self.K,) + L + E.shape[-1:], dtype=E.dtype)
+        Eu[self.strided_outputs()] = E
+        Is = np.fft.rfftn(pad_spatial(I, self.padding), axes=axes)
+        Es = np.fft.rfftn(Eu, axes=axes)
+        out = np.fft.irfftn(freq_matmul(Is, Es.conj().transpose(4, 1, 2, 3, 0)),
+                            s=L, axes=axes)
+        return out[(Ellipsis,) + tuple(slice(0, d * (t - 1) + 1, d) for t, d in
+                                       zip(self.TRS, self.dilation)) + (slice(None),)]
+
+    xprop_algos = {'gemm': xprop_gemm, 'winograd': xprop_winograd, 'fft': xprop_fft}
+    update_algos = {'gemm': update_gemm, 'fft': update_fft}
+
 
 class DeconvLayer(ConvLayer):
 
@@ -372,6 +697,8 @@ class DeconvLayer(ConvLayer):
             self.pSlice = [self.fprop_slice(p, R, H, pad_h, str_h, dil_h) for p in range(P)]
             self.qSlice = [self.fprop_slice(q, S, W, pad_w, str_w, dil_w) for q in range(Q)]
 
+        self.algos = {}
+
 
 class PoolLayer(object):
 
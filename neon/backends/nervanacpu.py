@@ -22,10 +22,15 @@ from builtins import object, round, str, zip
 import numpy as np
 import sys
 import logging
+import threading
 import time
 import functools
+from copy import copy
+from multiprocessing.pool import ThreadPool
+from neon.backends.autotune import ConvAutotuner
 from neon.backends.backend import Tensor, Backend, OpTreeNode, OpCollection
-from neon.backends.layer_cpu import ConvLayer, DeconvLayer, PoolLayer
+from neon.backends.counter_rng import CounterRNG
+from neon.backends.layer_cpu import ConvLayer, DeconvLayer, PoolLayer, batch_dims, blas_array
 from neon.util.compat import xrange
 
 _none_slice = slice(None, None, None)
@@ -36,6 +41,33 @@ logger = logging.getLogger(__name__)
 # np.seterr(all='raise')
 
 
+def exponent_hist(ary, nbins, offset):
+    """
+    Histogram of rint(log2(abs(x))) over the values of an array, computed from the bits
+    of the float32 values instead of taking the logarithm.  The exponent is rounded up
+    when the mantissa is above sqrt(2), so values within the rounding error of a float32
+    log2 from a bin edge land in the mathematically correct bin.
+
+    The first bin extends to -Inf and counts zeros, the last bin also counts the values
+    rounding to 2 ** (offset + nbins).  Larger values, Inf and NaN are not counted.
+
+    Arguments:
+        ary (numpy.ndarray): values to histogram, of any numeric dtype
+        nbins (int): number of bins
+        offset (int): largest rounded log2 counted in the first bin
+
+    Returns:
+        numpy.ndarray: count of values in each bin
+    """
+    bits = np.ascontiguousarray(ary, dtype=np.float32).reshape(-1).view(np.uint32) & 0x7fffffff
+    # adding 2 - sqrt(2) in mantissa units carries into the exponent above sqrt(2)
+    counts = np.bincount((bits + 0x4afb0c) >> 23, minlength=256)[:255]
+    below = np.concatenate(([0], np.cumsum(counts)))
+    first = 127 + offset
+    edges = np.concatenate(([0], np.arange(first + 1, first + nbins), [first + nbins + 1]))
+    return np.diff(below[np.clip(edges, 0, 255)])
+
+
 class CPUTensor(Tensor):
 
     """
@@ -434,13 +466,7 @@ class CPUTensor(Tensor):
             Tensor containing the histogram data.
 
         """
-        nbins = self.backend.hist_bins
-        offset = self.backend.hist_offset
-        bins = np.arange(nbins + 1) + float(offset)
-        bins[0] = -float('Inf')
-        np_inp_log_abs = np.rint(
-            np.log2(np.abs(self._tensor.astype(np.float32))))
-        np_hist, edges = np.histogram(np_inp_log_abs, density=False, bins=bins)
+        np_hist = exponent_hist(self._tensor, self.backend.hist_bins, self.backend.hist_offset)
         nc_hist = self.backend._hist_tensor(tag)._assign(np_hist)
         return nc_hist
 
@@ -477,6 +503,19 @@ def _assign_right_to_left(left, right):
     left[:] = right
 
 
+def _lrn_window_sum(src, dst, pad):
+    """
+    Sum src over a window of 2 * pad + 1 entries along the leading (channel) axis,
+    centered on each channel, and write the result to dst.  Channels that fall
+    outside the array are treated as zero.  src and dst must not overlap.
+    """
+    C = src.shape[0]
+    dst[:] = src
+    for offset in range(1, min(pad, C - 1) + 1):
+        dst[offset:] += src[:-offset]
+        dst[:-offset] += src[offset:]
+
+
 numpy_call_dict_cpu = {
     # assign
     "assign": _assign_right_to_left,
@@ -580,6 +619,116 @@ class NervanaCPU(Backend):
 
         self.use_pinned_mem = False
 
+        # dropout masks are only multiplied in, one byte per element is enough
+        self.mask_dtype = np.uint8
+
+        # conv, pool and lrn kernels take the minibatch size from their arguments
+        self.partial_batch = True
+
+        # numpy has no half precision or integer BLAS, so float16 storage (and int8
+        # quantized weights) are multiplied and accumulated in float32
+        self.compute_dtype = np.float32 if default_dtype == np.float16 else default_dtype
+
+        # numpy releases the GIL in BLAS calls and most elementwise kernels, so
+        # independent container branches can overlap on a thread pool
+        self._branch_pool = None
+        self._branch_local = threading.local()
+
+        # conv, deconv and pool parameter objects with their slice tables, keyed on the
+        # layer geometry (see neon.util.graph_cache to persist them across runs)
+        self.layer_geometry = {}
+
+        # picks the conv algorithm of each layer geometry, see autotune_conv
+        self.conv_tuner = None
+
+    def autotune_conv(self, enable=True, cache_file=None):
+        """
+        Time the conv algorithms (the direct sliced loop, im2col GEMM, Winograd F(2x2, 3x3)
+        for 3x3 stride 1 filters and FFT for large filters) on the first fprop, bprop and
+        update of each conv and deconv layer geometry, and run the fastest from then on.
+        The choices are kept in a file of the neon cache directory and reused by later
+        runs.  Without autotuning the direct loop is used.
+
+        Arguments:
+            enable (bool, optional): False to stop tuning the geometries not seen yet,
+                                     the layers already tuned keep their algorithms
+            cache_file (str, optional): file of the choices, an empty string to keep them
+                                        in memory only (see ConvAutotuner)
+        """
+        self.conv_tuner = ConvAutotuner(cache_file) if enable else None
+
+    def cleanup_backend(self):
+        """
+        Stop the branch worker threads.
+        """
+        self.set_branch_workers(0)
+        super(NervanaCPU, self).cleanup_backend()
+
+    def set_branch_workers(self, num_workers):
+        """
+        Run the independent branches of MergeBroadcast, MergeSum and Tree containers, and
+        the two directions of bidirectional recurrent layers, concurrently on num_workers
+        threads.  Has to be called before the model is
+        initialized, since concurrent branches are given delta (and MergeSum output)
+        buffers of their own.  The branch results are always reduced in the order the
+        branches are run sequentially, so the outputs and gradients do not depend on
+        the thread scheduling.  Dropout masks drawn inside concurrent branches do.
+
+        Arguments:
+            num_workers (int): number of threads, 0 or 1 to run branches in order
+        """
+        if self._branch_pool is not None:
+            self._branch_pool.close()
+            self._branch_pool.join()
+            self._branch_pool = None
+        self.branch_workers = num_workers if num_workers > 1 else 0
+        if self.branch_workers:
+            self._branch_pool = ThreadPool(self.branch_workers)
+
+    def run_branches(self, funcs):
+        """
+        Call each of funcs, concurrently if branch workers are enabled.  Branches
+        nested in a branch that already runs on a worker thread are run in order.
+
+        Arguments:
+            funcs (list of callables): independent branch computations
+
+        Returns:
+            list: the return values of funcs, in order
+        """
+        local = self._branch_local
+        if self._branch_pool is None or len(funcs) < 2 or getattr(local, 'worker', False):
+            return [f() for f in funcs]
+
+        def call(f):
+            local.worker = True
+            try:
+                return f()
+            finally:
+                local.worker = False
+
+        return self._branch_pool.map(call, funcs, chunksize=1)
+
+    def cached_layer(self, layer_cls, dtype, *args):
+        """
+        Create a conv, deconv or pool parameter object, reusing the geometry and slice
+        tables of any earlier layer created with the same arguments.
+
+        Arguments:
+            layer_cls (class): ConvLayer, DeconvLayer or PoolLayer
+            dtype (data-type): layer data type
+            args: the remaining positional arguments of layer_cls
+
+        Returns:
+            object: a new layer_cls object
+        """
+        key = (layer_cls.__name__, np.dtype(dtype).str) + args
+        layer = self.layer_geometry.get(key)
+        if layer is None:
+            layer = self.layer_geometry[key] = layer_cls(self, dtype, *args)
+        # the slice tables are read only, only the per layer flags need a copy
+        return copy(layer)
+
     def consume(self, buf_index, hostlist, devlist):
         assert 0 <= buf_index < 2, 'Can only double buffer'
 
@@ -610,6 +759,9 @@ class NervanaCPU(Backend):
             seeded numpy RNG
         """
         self.rng = np.random.RandomState(seed)
+        # counter-based RNG used to fill tensors (dropout masks, initializers)
+        # in parallel, if this numpy has one
+        self.crng = CounterRNG(seed) if CounterRNG.available else None
         self.init_rng_state = self.rng_get_state()
         return self.rng
 
@@ -618,8 +770,14 @@ class NervanaCPU(Backend):
         Set the RNG state for host RNG.
 
         Arguments:
-            state (np.array): numpy random number state vector
-        """
+            state (np.array or dict): numpy random number state vector, or a dict
+                                      with the numpy state under 'host' and the
+                                      counter-based RNG state under 'counter'
+        """
+        if isinstance(state, dict):
+            if self.crng is not None:
+                self.crng.set_state(state['counter'])
+            state = state['host']
         self.rng.set_state(state)
 
     def rng_get_state(self):
@@ -627,9 +785,12 @@ class NervanaCPU(Backend):
         Return the current state of the on-host RNG.
 
         Returns:
-            np.array: the on-host RNG state vectors
+            np.array or dict: the on-host RNG state vectors, along with the
+                              counter-based RNG state if that is in use
         """
-        return self.rng.get_state()
+        if self.crng is None:
+            return self.rng.get_state()
+        return {'host': self.rng.get_state(), 'counter': self.crng.get_state()}
 
     def rng_reset(self):
         """
@@ -647,7 +808,35 @@ class NervanaCPU(Backend):
             mean (float): Mean value. Default 0
             stdv (float): standard deviation value.  Default 1
         """
-        ary[:] = np.random.standard_normal(ary.shape) * stdv + mean
+        self.rng_normal(ary, mean, stdv)
+
+    def rng_uniform(self, ary, low=0.0, high=1.0):
+        """
+        Fill ary with values drawn uniformly from [low, high).
+
+        Arguments:
+            ary (Tensor): Tensor to fill with random values
+            low (float, optional): lower bound.  Defaults to 0.
+            high (float, optional): upper bound.  Defaults to 1.
+        """
+        if self.crng is None:
+            super(NervanaCPU, self).rng_uniform(ary, low, high)
+        else:
+            self.crng.fill_uniform(ary._tensor, low, high)
+
+    def rng_normal(self, ary, loc=0.0, scale=1.0):
+        """
+        Fill ary with normally distributed values.
+
+        Arguments:
+            ary (Tensor): Tensor to fill with random values
+            loc (float, optional): mean.  Defaults to 0.
+            scale (float, optional): standard deviation.  Defaults to 1.
+        """
+        if self.crng is None:
+            super(NervanaCPU, self).rng_normal(ary, loc, scale)
+        else:
+            self.crng.fill_normal(ary._tensor, loc, scale)
 
     def execute(self, optree, numpy_call_dict=numpy_call_dict_cpu):
         """
@@ -678,7 +867,7 @@ class NervanaCPU(Backend):
             numpy_ind[numpy_axis] = numpy_ind0
             numpy_ind[1 - numpy_axis] = numpy_ind1
             array_output[:] = 0
-            array_output[numpy_ind.tolist()] = 1
+            array_output[tuple(numpy_ind)] = 1
 
             return array_output
 
@@ -924,12 +1113,13 @@ class NervanaCPU(Backend):
         """
 
         # checking type and shape
-        assert A.dtype == B.dtype == C.dtype
-
         assert A.shape[0] == C.shape[0]
         assert B.shape[1] == C.shape[1]
         assert A.shape[1] == B.shape[0]
 
+        if not A.dtype == B.dtype == C.dtype or C.dtype not in (np.float32, np.float64):
+            return self._compound_dot_mixed(A, B, C, alpha, beta, relu, bsum)
+
         # cleaner implementation, shall be equivalent to the one below
         # if relu:
         #     C[:] = self.log(1. + self.exp(alpha * self.dot(A, B))) + beta * C
@@ -959,6 +1149,26 @@ class NervanaCPU(Backend):
 
         return C
 
+    def _compound_dot_mixed(self, A, B, C, alpha, beta, relu, bsum):
+        """
+        compound_dot for float16 or int8 operands.  Operands that are not already
+        in a BLAS type are converted to compute_dtype, the product is accumulated
+        there and rounded to the dtype of C once.
+        """
+        tmp = np.dot(blas_array(A._tensor, self.compute_dtype),
+                     blas_array(B._tensor, self.compute_dtype))
+        if alpha != 1.0:
+            tmp *= alpha
+        if relu:
+            self.Relu(tmp, tmp)
+        if beta != 0:
+            tmp += beta * C._tensor
+        C._tensor[:] = tmp
+        if bsum is not None:
+            bsum[:] = np.sum(tmp, axis=1, keepdims=True)
+
+        return C
+
     def batched_dot(self, A, B, C, alpha=1.0, beta=0.0, relu=False):
         """
         Doing following operations:
@@ -1058,9 +1268,12 @@ class NervanaCPU(Backend):
             out (CPUTensor): Output tensor
             keepthresh (float): fraction of ones
         """
-        out._tensor[:] = np.array(
-            self.rng.uniform(size=out._tensor.shape) < keepthresh,
-            dtype=out._tensor.dtype)
+        if self.crng is None:
+            out._tensor[:] = np.array(
+                self.rng.uniform(size=out._tensor.shape) < keepthresh,
+                dtype=out._tensor.dtype)
+        else:
+            self.crng.fill_mask(out._tensor, keepthresh)
 
     def conv_layer(self, dtype,
                    N, C, K,
@@ -1095,9 +1308,9 @@ class NervanaCPU(Backend):
               outputs an fp32 tensor of size Kx1
 
         """
-        return ConvLayer(self, dtype, N, C, K, D, H, W, T, R, S,
-                         pad_d, pad_h, pad_w, str_d, str_h, str_w,
-                         dil_d, dil_h, dil_w)
+        return self.cached_layer(ConvLayer, dtype, N, C, K, D, H, W, T, R, S,
+                                 pad_d, pad_h, pad_w, str_d, str_h, str_w,
+                                 dil_d, dil_h, dil_w)
 
     def fprop_conv(self, layer, I, F, O,
                    X=None, bias=None, bsum=None,
@@ -1132,6 +1345,8 @@ class NervanaCPU(Backend):
                 O *= (X > 0) + beta*(X < 0)
                 can be combined with bsum tensor to output bprop_bias
         """
+        if self.conv_tuner is not None:
+            self.conv_tuner.select(layer, 'fprop', I, F)
         layer.xprop_conv(I, F, O, X, bias, bsum, alpha,
                          beta, relu, brelu, slope, layer_op=layer)
 
@@ -1167,6 +1382,8 @@ class NervanaCPU(Backend):
                 grad_I *= (X > 0) + slope*(X < 0)
                 can be combined with bsum tensor to output bprop_bias
         """
+        if self.conv_tuner is not None:
+            self.conv_tuner.select(layer, 'bprop', E, F)
         layer.xprop_conv(E, F, grad_I, X, bias, bsum, alpha, beta, relu, brelu, slope,
                          backward=True, layer_op=layer)
 
@@ -1185,6 +1402,8 @@ class NervanaCPU(Backend):
         assert layer.sizeI == I.size
         assert layer.sizeO == E.size
         assert layer.sizeF == U.size
+        if self.conv_tuner is not None:
+            self.conv_tuner.select(layer, 'update', I, E)
         layer.update_conv(I, E, U, alpha, beta, grad_bias=grad_bias, layer_op=layer_op)
 
     def deconv_layer(self, dtype,
@@ -1221,9 +1440,9 @@ class NervanaCPU(Backend):
 
         dtype: need to know dtype to setup proper kernels and params.
         """
-        return DeconvLayer(self, dtype, N, C, K, M, P, Q, T, R, S,
-                           pad_d, pad_h, pad_w, str_d, str_h, str_w,
-                           dil_d, dil_h, dil_w)
+        return self.cached_layer(DeconvLayer, dtype, N, C, K, M, P, Q, T, R, S,
+                                 pad_d, pad_h, pad_w, str_d, str_h, str_w,
+                                 dil_d, dil_h, dil_w)
 
     def lrn_layer(self, dtype, N, C, D=1, H=1, W=1, J=1):
         """
@@ -1268,33 +1487,28 @@ class NervanaCPU(Backend):
             bpower (float): exponential parameter (beta) to raise denominator by (0.75 in AK)
         """
 
-        assert layer.sizeI == I.size
-        assert layer.sizeO == O.size
+        # I, O and denom may be column slices holding fewer than layer.N images
+        dimI = batch_dims(layer.dimI, I)
+        dimO = batch_dims(layer.dimO, O)
+        assert dimI[-1] == dimO[-1]
 
-        J, T, R, S = layer.JTRS
-        C, D, H, W, N = layer.dimI
-        K, M, P, Q, N = layer.dimO
-        pad_c, pad_d, pad_h, pad_w = layer.padding
-        str_c, str_d, str_h, str_w = layer.strides
+        J = layer.JTRS[0]
+        pad_c = layer.padding[0]
 
-        array_I = I._tensor.reshape(layer.dimI)
-        array_O = O._tensor.reshape(layer.dimO)  # _tensor to write to
+        array_I = I._tensor.reshape(dimI)
+        array_O = O._tensor.reshape(dimO)  # _tensor to write to
         # although we can calculate directly into O, keeping denom around is useful for bprop
-        array_d = denom._tensor.reshape(layer.dimO)  # _tensor to write to
+        array_d = denom._tensor.reshape(dimO)  # _tensor to write to
 
-        for k in range(K):
-            sliceC, _ = layer.kSlice[k]
-            _ascale = ascale / J
-            for m in range(M):
-                sliceD, _ = layer.mSlice[m]
-                for p in range(P):
-                    sliceH, _ = layer.pSlice[p]
-                    for q in range(Q):
-                        sliceW, _ = layer.qSlice[q]
-                        sliceI = array_I[sliceC, sliceD, sliceH, sliceW, :].reshape(-1, N)
-                        array_d[k, m, p, q, :] = 1 + _ascale * np.sum(np.square(sliceI), axis=0)
+        # the window only spans the channel axis, so the pooled sum of squares is computed
+        # for the whole tensor at once; O serves as scratch for the squares until the end
+        np.square(array_I, out=array_O)
+        _lrn_window_sum(array_O, array_d, pad_c)
+        array_d *= ascale / J
+        array_d += 1
 
-        array_O[:] = array_I * np.power(array_d, -bpower)  # elementwise divide by denominator
+        np.power(array_d, -bpower, out=array_O)
+        array_O *= array_I  # elementwise divide by denominator
 
     def bprop_lrn(self, layer, I, O, E, delta, denom, alpha=None, beta=None, ascale=1, bpower=1):
         """
@@ -1315,11 +1529,8 @@ class NervanaCPU(Backend):
         assert layer.sizeO == E.size
         assert layer.sizeI == delta.size
 
-        J, T, R, S = layer.JTRS
-        C, D, H, W, N = layer.dimI
-        K, M, P, Q, N = layer.dimO
-        pad_c, pad_d, pad_h, pad_w = layer.padding
-        str_c, str_d, str_h, str_w = layer.strides
+        J = layer.JTRS[0]
+        pad_c = layer.padding[0]
 
         array_I = I._tensor.reshape(layer.dimI)
         array_E = E._tensor.reshape(layer.dimO)
@@ -1327,23 +1538,16 @@ class NervanaCPU(Backend):
         array_delta = delta._tensor.reshape(layer.dimI)  # write to
         array_denom = denom._tensor.reshape(layer.dimO)
 
-        for k in range(K):
-            sliceC, _ = layer.kSlice[k]
-            for m in range(M):
-                sliceD, _ = layer.mSlice[m]
-                for p in range(P):
-                    sliceH, _ = layer.pSlice[p]
-                    for q in range(Q):
-                        sliceW, _ = layer.qSlice[q]
-
-                        _O = array_O[sliceC, sliceD, sliceH, sliceW, :].reshape(-1, N)
-                        _E = array_E[sliceC, sliceD, sliceH, sliceW, :].reshape(-1, N)
-                        _den = array_denom[sliceC, sliceD, sliceH, sliceW, :].reshape(-1, N)
-                        # temporarily store part of the derivative in here
-                        array_delta[k, m, p, q, :] = np.sum(_O * _E / _den, axis=0)
+        # pooled sum of O * E / denom over the same channel window as fprop
+        scratch = array_O * array_E
+        scratch /= array_denom
+        _lrn_window_sum(scratch, array_delta, pad_c)
+        array_delta *= array_I
+        array_delta *= -2 * bpower * (ascale / float(J))
 
-        array_delta[:] = -2 * bpower * (ascale / float(J)) * array_delta * array_I + (
-            array_E * np.power(array_denom, -bpower))
+        np.power(array_denom, -bpower, out=scratch)
+        scratch *= array_E
+        array_delta += scratch
 
     def pool_layer(self, dtype,
                    op, N, C,
@@ -1383,8 +1587,8 @@ class NervanaCPU(Backend):
         if str_w is None:
             str_w = S
 
-        return PoolLayer(self, dtype, op, N, C, D, H, W, J, T, R, S,
-                         pad_c, pad_d, pad_h, pad_w, str_c, str_d, str_h, str_w)
+        return self.cached_layer(PoolLayer, dtype, op, N, C, D, H, W, J, T, R, S,
+                                 pad_c, pad_d, pad_h, pad_w, str_c, str_d, str_h, str_w)
 
     def fprop_pool(self, layer, I, O, argmax=None, beta=0.0):
         """
@@ -1398,22 +1602,24 @@ class NervanaCPU(Backend):
             argmax (Tensor): tensor to store location of the maximum
         """
 
-        assert layer.sizeI == I.size
-        assert layer.sizeO == O.size
+        # I, O and argmax may be column slices holding fewer than layer.N images
+        dimI = batch_dims(layer.dimI, I)
+        dimO = batch_dims(layer.dimO, O)
+        assert dimI[-1] == dimO[-1]
         if layer.op == "max":
-            assert layer.sizeO == argmax.size
+            assert argmax.size == O.size
         op = layer.op
 
         J, T, R, S = layer.JTRS
-        C, D, H, W, N = layer.dimI
-        K, M, P, Q, N = layer.dimO
+        C, D, H, W, N = dimI
+        K, M, P, Q, N = dimO
         pad_c, pad_d, pad_h, pad_w = layer.padding
         str_c, str_d, str_h, str_w = layer.strides
 
-        array_I = I._tensor.reshape(layer.dimI)
-        array_O = O._tensor.reshape(layer.dimO)
+        array_I = I._tensor.reshape(dimI)
+        array_O = O._tensor.reshape(dimO)
         if op == "max":
-            array_argmax = argmax._tensor.reshape(layer.dimO)
+            array_argmax = argmax._tensor.reshape(dimO)
 
         for k in range(K):
             sliceC, _ = layer.kSlice[k]
@@ -1950,8 +2156,8 @@ class NervanaCPU(Backend):
         return None
 
     def fprop_mergebroadcast(self, ngLayer, inputs, inference, outputs, layers, out_shape):
-        for l in layers:
-            l.fprop(inputs, inference)
+        # the branches only share their input and write disjoint views of outputs
+        self.run_branches([functools.partial(l.fprop, inputs, inference) for l in layers])
 
     def bprop_mergebroadcast(self, ngLayer, layers, error_views, error,
                              delta, out_shape, alpha, beta, alphas, betas):
@@ -977,6 +977,8 @@ class NervanaGPU(Backend):
         """
         # This is probably a CPU-trained model, but loaded on the GPU for
         # predictions
+        if isinstance(rng_states, dict):
+            rng_states = rng_states['host']
         if len(rng_states) != 2:
             self.rng_reset()
             self.rng.set_state(rng_states)
@@ -28,7 +28,7 @@ from cffi import FFI
 from ctypes import c_longlong, c_float, c_double, c_int
 import numpy as np
 from neon.backends import math_cpu
-from neon.backends.backend import OpTreeNode
+from neon.backends.backend import Backend, OpTreeNode
 import os
 import sys
 
@@ -181,6 +181,8 @@ class NervanaMKL(NervanaCPU):
         super(NervanaMKL, self).__init__(rng_seed, default_dtype,
                                          hist_bins, hist_offset, compat_mode=compat_mode)
         self.tensor_cls = MKLTensor
+        # MKL primitives are created for the full minibatch
+        self.partial_batch = False
         logger.info("Initialized NervanaMKL")
         assert get_mkl_lib(), "MKL is not installed correctly"
 
@@ -695,6 +697,13 @@ class NervanaMKL(NervanaCPU):
                         ngLayer.tensors, deltas, ngLayer.shape5D)
         deltas.shape5D = ngLayer.shape5D
 
+    def set_branch_workers(self, num_workers):
+        """
+        MKL merge kernels gather the branch buffers themselves and the MKL primitives
+        are threaded already, so container branches are run in order.
+        """
+        Backend.set_branch_workers(self, num_workers)
+
     def mergebroadcast_layer(self, layer_num):
         return layer_mkl.MergeBroadcastLayerMKL(layer_num)
 
@@ -18,6 +18,10 @@
 from builtins import str
 from neon import logger as neon_logger
 
+# results of the PyCUDA probes by function and device, which do not change while the
+# process runs and cost a driver initialization each
+_probes = {}
+
 
 def get_compute_capability(device_id=None, verbose=False):
     """
@@ -35,6 +39,13 @@ def get_compute_capability(device_id=None, verbose=False):
     Returns:
         float: Zero if no GPU is found, otherwise highest compute capability.
     """
+    key = ('compute_capability', tuple(device_id) if isinstance(device_id, list) else device_id)
+    if key not in _probes:
+        _probes[key] = _probe_compute_capability(device_id, verbose)
+    return _probes[key]
+
+
+def _probe_compute_capability(device_id, verbose):
     try:
         import pycuda
         import pycuda.driver as drv
@@ -84,6 +95,12 @@ def get_device_count(verbose=False):
     Returns:
         int: Number of GPUs available.
     """
+    if 'device_count' not in _probes:
+        _probes['device_count'] = _probe_device_count(verbose)
+    return _probes['device_count']
+
+
+def _probe_device_count(verbose):
     try:
         import pycuda
         import pycuda.driver as drv
@@ -19,7 +19,18 @@ import os
 import sys
 
 
+# result of the library probe, which does not change while the process runs
+_mkl_lib = None
+
+
 def get_mkl_lib(device_id=None, verbose=False):
+    global _mkl_lib
+    if _mkl_lib is None:
+        _mkl_lib = _probe_mkl_lib()
+    return _mkl_lib
+
+
+def _probe_mkl_lib():
     if sys.platform == 'win32':
         # find *.dll
         current_path = os.path.dirname(os.path.realpath(__file__))
@@ -148,8 +148,8 @@ O_2x2_3x3 = np.array([
     [ 1.0, 1.0,  1.0,  0.0 ],
     [ 0.0, 1.0, -1.0, -1.0 ]]) #, dtype=np.float32
 
-half    = np.float(0.5)
-quarter = np.float(0.25)
+half    = 0.5
+quarter = 0.25
 
 def trans_I_2x2_3x3(Iw, I, minimal=False):
     if minimal:
@@ -539,73 +539,75 @@ def updat_winograd(I, E, U, padding, minimal=False, inner=False):
 
 ### Test Code ###
 
-np.set_printoptions(threshold=8192 * 4, linewidth=600, formatter={'float':lambda x: "%6.3f" % x})
+if __name__ == "__main__":
 
-minimal = 1
-ones = 0
-N    = 32
-C, K = 32, 32
-Y, X = 4, 4
-R, S = 3, 3     # Fixed winograd dim
-strides = 1, 1  # Fixed winograd dim
-padding = 1, 1  # 0-2
+    np.set_printoptions(threshold=8192 * 4, linewidth=600, formatter={'float':lambda x: "%6.3f" % x})
 
-P = out_dim(R, Y, padding[0], strides[0])
-Q = out_dim(S, X, padding[1], strides[1])
+    minimal = 1
+    ones = 0
+    N    = 32
+    C, K = 32, 32
+    Y, X = 4, 4
+    R, S = 3, 3     # Fixed winograd dim
+    strides = 1, 1  # Fixed winograd dim
+    padding = 1, 1  # 0-2
 
-dimI = (C,Y,X,N)
-dimF = (C,R,S,K)
-dimO = (K,P,Q,N)
+    P = out_dim(R, Y, padding[0], strides[0])
+    Q = out_dim(S, X, padding[1], strides[1])
 
-if ones:
-    I  = np.ones(dimI)
-    F  = np.ones(dimF)
-    E  = np.ones(dimO)
+    dimI = (C,Y,X,N)
+    dimF = (C,R,S,K)
+    dimO = (K,P,Q,N)
 
-    # for c in range(C):
-    #     for n in range(N):
-    #         I[c,:,:,n] = c+1 #np.arange(1+c,37+c).reshape((6,6))
+    if ones:
+        I  = np.ones(dimI)
+        F  = np.ones(dimF)
+        E  = np.ones(dimO)
 
-    # for k in range(K):
-    #     for n in range(N):
-    #         E[k,:,:,n] = k+1 #np.arange(1+k,17+k).reshape((4,4))
+        # for c in range(C):
+        #     for n in range(N):
+        #         I[c,:,:,n] = c+1 #np.arange(1+c,37+c).reshape((6,6))
 
-else:
-    I  = np.maximum(np.random.uniform(-1.0, 1.0, dimI), 0)
-    F  = np.random.normal(0.0, 0.1, dimF)
-    #F  = np.random.uniform(-1.0, 1.0, dimF)
-    E  = np.random.uniform(-1.0, 1.0, dimO)
+        # for k in range(K):
+        #     for n in range(N):
+        #         E[k,:,:,n] = k+1 #np.arange(1+k,17+k).reshape((4,4))
 
-Od = np.empty(dimO)
-Ow = np.empty(dimO) #, dtype=np.float32
+    else:
+        I  = np.maximum(np.random.uniform(-1.0, 1.0, dimI), 0)
+        F  = np.random.normal(0.0, 0.1, dimF)
+        #F  = np.random.uniform(-1.0, 1.0, dimF)
+        E  = np.random.uniform(-1.0, 1.0, dimO)
+
+    Od = np.empty(dimO)
+    Ow = np.empty(dimO) #, dtype=np.float32
 
-Bd = np.empty(dimI)
-Bw = np.empty(dimI) #, dtype=np.float32
+    Bd = np.empty(dimI)
+    Bw = np.empty(dimI) #, dtype=np.float32
 
-Ud = np.empty(dimF)
-Uw = np.empty(dimF)
+    Ud = np.empty(dimF)
+    Uw = np.empty(dimF)
 
 
-xprop_direct(I, F, Od, padding, strides)
-xprop_winograd(I, F, Ow, padding, minimal=minimal)
+    xprop_direct(I, F, Od, padding, strides)
+    xprop_winograd(I, F, Ow, padding, minimal=minimal)
 
-xprop_direct(E, F, Bd, padding, strides, backward=True)
-xprop_winograd(E, F, Bw, padding, minimal=minimal, backward=True)
+    xprop_direct(E, F, Bd, padding, strides, backward=True)
+    xprop_winograd(E, F, Bw, padding, minimal=minimal, backward=True)
 
-updat_direct(I, E, Ud, padding, strides)
-updat_winograd(I, E, Uw, padding, minimal=minimal, inner=True)
+    updat_direct(I, E, Ud, padding, strides)
+    updat_winograd(I, E, Uw, padding, minimal=minimal, inner=True)
 
-difO = Od - Ow
-difB = Bd - Bw
-difU = Ud - Uw
+    difO = Od - Ow
+    difB = Bd - Bw
+    difU = Ud - Uw
 
-neon_logger.display(abs(difO).max() / Od.max())
-neon_logger.display(abs(difB).max() / Bd.max())
-neon_logger.display(abs(difU).max() / Ud.max())
+    neon_logger.display(abs(difO).max() / Od.max())
+    neon_logger.display(abs(difB).max() / Bd.max())
+    neon_logger.display(abs(difU).max() / Ud.max())
 
-# print Bd[0,:,:,0]
-# print Bw[0,:,:,0]
+    # print Bd[0,:,:,0]
+    # print Bw[0,:,:,0]
 
-# print Ud[0,:,:,0]
-# print Uw[0,:,:,0]
-# print difU[0,:,:,0]
+    # print Ud[0,:,:,0]
+    # print Uw[0,:,:,0]
+    # print difU[0,:,:,0]
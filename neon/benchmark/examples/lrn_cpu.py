@@ -0,0 +1,115 @@
+# ******************************************************************************
+# Copyright 2017-2018 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ******************************************************************************
+"""
+CPU LRN Benchmark
+
+Times the CPU backend fprop_lrn/bprop_lrn against the original per output position
+loop implementation at the two LRN shapes of examples/imagenet/alexnet_lrn.py.
+Only the CPU backend is supported.
+
+./lrn_cpu.py -z 32
+"""
+from __future__ import division
+import time
+
+import numpy as np
+
+from neon import NervanaObject
+from neon import logger as neon_logger
+from neon.util.argparser import NeonArgparser
+
+
+def fprop_lrn_loop(layer, I, O, denom, ascale, bpower):
+    J = layer.JTRS[0]
+    K, M, P, Q, N = layer.dimO
+    array_I = I._tensor.reshape(layer.dimI)
+    array_O = O._tensor.reshape(layer.dimO)
+    array_d = denom._tensor.reshape(layer.dimO)
+
+    for k in range(K):
+        sliceC, _ = layer.kSlice[k]
+        for m in range(M):
+            sliceD, _ = layer.mSlice[m]
+            for p in range(P):
+                sliceH, _ = layer.pSlice[p]
+                for q in range(Q):
+                    sliceW, _ = layer.qSlice[q]
+                    sliceI = array_I[sliceC, sliceD, sliceH, sliceW, :].reshape(-1, N)
+                    array_d[k, m, p, q, :] = 1 + ascale / J * np.sum(np.square(sliceI), axis=0)
+
+    array_O[:] = array_I * np.power(array_d, -bpower)
+
+
+def bprop_lrn_loop(layer, I, O, E, delta, denom, ascale, bpower):
+    J = layer.JTRS[0]
+    K, M, P, Q, N = layer.dimO
+    array_I = I._tensor.reshape(layer.dimI)
+    array_E = E._tensor.reshape(layer.dimO)
+    array_O = O._tensor.reshape(layer.dimO)
+    array_delta = delta._tensor.reshape(layer.dimI)
+    array_denom = denom._tensor.reshape(layer.dimO)
+
+    for k in range(K):
+        sliceC, _ = layer.kSlice[k]
+        for m in range(M):
+            sliceD, _ = layer.mSlice[m]
+            for p in range(P):
+                sliceH, _ = layer.pSlice[p]
+                for q in range(Q):
+                    sliceW, _ = layer.qSlice[q]
+                    _O = array_O[sliceC, sliceD, sliceH, sliceW, :].reshape(-1, N)
+                    _E = array_E[sliceC, sliceD, sliceH, sliceW, :].reshape(-1, N)
+                    _den = array_denom[sliceC, sliceD, sliceH, sliceW, :].reshape(-1, N)
+                    array_delta[k, m, p, q, :] = np.sum(_O * _E / _den, axis=0)
+
+    array_delta[:] = -2 * bpower * (ascale / float(J)) * array_delta * array_I + (
+        array_E * np.power(array_denom, -bpower))
+
+
+def time_call(func, *args):
+    start = time.time()
+    func(*args)
+    return time.time() - start
+
+
+parser = NeonArgparser(__doc__)
+args = parser.parse_args()
+be = NervanaObject.be
+
+ascale, bpower = 0.0001, 0.75
+# (C, H, W) at the inputs of the two LRN layers in alexnet_lrn.py
+for C, H, W in [(96, 27, 27), (256, 13, 13)]:
+    layer = be.lrn_layer(be.default_dtype, N=be.bsz, C=C, H=H, W=W, J=5)
+    shape = (C * H * W, be.bsz)
+    I = be.array(np.random.uniform(-1, 1, shape))
+    E = be.array(np.random.uniform(-1, 1, shape))
+    O, denom, delta = be.empty(shape), be.empty(shape), be.empty(shape)
+    O_ref, denom_ref, delta_ref = be.empty(shape), be.empty(shape), be.empty(shape)
+
+    t_loop = (time_call(fprop_lrn_loop, layer, I, O_ref, denom_ref, ascale, bpower),
+              time_call(bprop_lrn_loop, layer, I, O_ref, E, delta_ref, denom_ref,
+                        ascale, bpower))
+    t_vec = (time_call(be.fprop_lrn, layer, I, O, denom, None, None, ascale, bpower),
+             time_call(be.bprop_lrn, layer, I, O, E, delta, denom, None, None,
+                       ascale, bpower))
+
+    assert np.allclose(O.get(), O_ref.get(), rtol=1e-4, atol=1e-6)
+    assert np.allclose(delta.get(), delta_ref.get(), rtol=1e-4, atol=1e-6)
+
+    neon_logger.display("C=%d H=%d W=%d N=%d" % (C, H, W, be.bsz))
+    for name, loop, vec in zip(('fprop', 'bprop'), t_loop, t_vec):
+        neon_logger.display("  %s: loop %.4fs  vectorized %.4fs  speedup %.1fx" %
+                            (name, loop, vec, loop / vec))
@@ -0,0 +1,530 @@
+# ******************************************************************************
+# Copyright 2017-2018 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ******************************************************************************
+"""
+Regression benchmark suite, small enough to run on the CPU backend in CI.
+
+The cases time primitives (layer fprop and bprop, optimizers, op-tree execution), the
+training iterations of small models and the epochs of data iterators, all on synthetic
+data.  The results are stored as JSON along with the environment they were measured in,
+and compared against the results of a baseline to flag regressions:
+
+    python -m neon.benchmark.suite -b cpu -z 32 --results results.json \\
+        --baseline baseline.json --tolerance 0.25
+
+The command exits with status 1 if a case is slower than its baseline by more than
+the tolerance.  --cases selects cases by name patterns, e.g. 'layers/*'.
+"""
+from __future__ import division
+from builtins import range
+from collections import OrderedDict
+from fnmatch import fnmatch
+import json
+import os
+import platform
+import sys
+
+import numpy as np
+
+from neon import NervanaObject
+from neon import __version__ as neon_version
+from neon import logger as neon_logger
+
+CASES = OrderedDict()
+
+
+def case(name):
+    """
+    Register a benchmark case.  The decorated function sets up the case on the current
+    backend and returns a function running an iteration of it, and the number of
+    records processed by an iteration.
+
+    Arguments:
+        name (str): name of the case, prefixed by its group
+    """
+    def register(setup):
+        CASES[name] = setup
+        return setup
+    return register
+
+
+def uniform(shape, low=-1., high=1., dtype=None):
+    """
+    Returns a device tensor of uniform random values.
+    """
+    be = NervanaObject.be
+    return be.array(be.rng.uniform(low, high, shape), dtype=dtype)
+
+
+def build_layer(layer, in_shape):
+    """
+    Configure and allocate a layer on its own, with deltas for its inputs.
+
+    Arguments:
+        layer (Layer): layer to build
+        in_shape (int, tuple): shape of the inputs of the layer
+
+    Returns:
+        tuple: random inputs and output errors of the layer
+    """
+    from neon.layers.container import DeltasTree
+    be = NervanaObject.be
+    layer.configure(in_shape)
+    layer.prev_layer = True  # the deltas of the inputs are computed
+    layer.allocate()
+    deltas = DeltasTree()
+    layer.allocate_deltas(deltas)
+    deltas.allocate_buffers()
+    layer.set_deltas(deltas)
+    inputs = be.iobuf(layer.in_shape)
+    inputs[:] = uniform(inputs.shape)
+    errors = be.iobuf(layer.out_shape)
+    errors[:] = uniform(errors.shape)
+    return inputs, errors
+
+
+def layer_case(layer, in_shape, fprop=True, bprop=True):
+    """
+    Setup of the cases timing the fprop and/or bprop of a layer.
+    """
+    inputs, errors = build_layer(layer, in_shape)
+    layer.fprop(inputs)
+
+    def step():
+        if fprop:
+            layer.fprop(inputs)
+        if bprop:
+            layer.bprop(errors)
+    return step, NervanaObject.be.bsz
+
+
+def model_case(layers, in_shape, inputs, targets, optimizer, cost=None):
+    """
+    Setup of the cases timing the training iterations of a model.
+
+    Arguments:
+        layers (list, LayerContainer): layers of the model
+        in_shape (int, tuple): shape of the inputs
+        inputs (Tensor, tuple): inputs of a minibatch
+        targets (Tensor): onehot targets of a minibatch
+        optimizer (Optimizer): optimizer of the model
+        cost (GeneralizedCost, optional): defaults to the cross entropy
+    """
+    from neon.layers import GeneralizedCost
+    from neon.models import Model
+    from neon.transforms import CrossEntropyMulti
+    cost = cost or GeneralizedCost(costfunc=CrossEntropyMulti())
+    model = Model(layers)
+    model.initialize(in_shape, cost)
+
+    def step():
+        x = model.fprop(inputs)
+        cost.get_cost(x, targets)
+        model.bprop(cost.get_errors(x, targets))
+        optimizer.optimize(model.layers_to_optimize, epoch=0)
+    return step, NervanaObject.be.bsz
+
+
+def iterator_case(dataset):
+    """
+    Setup of the cases timing the epochs of a data iterator.
+    """
+    def step():
+        for _ in dataset:
+            pass
+    return step, dataset.ndata
+
+
+def onehot(nclass, nsteps=1):
+    be = NervanaObject.be
+    labels = be.rng.randint(0, nclass, nsteps * be.bsz)
+    out = np.zeros((nclass, nsteps * be.bsz))
+    out[labels, np.arange(out.shape[1])] = 1
+    return be.array(out)
+
+
+@case('layers/conv_fprop')
+def conv_fprop():
+    from neon.initializers import Gaussian
+    from neon.layers import Convolution
+    return layer_case(Convolution((3, 3, 32), init=Gaussian(), padding=1), (16, 32, 32),
+                      bprop=False)
+
+
+@case('layers/conv_bprop')
+def conv_bprop():
+    from neon.initializers import Gaussian
+    from neon.layers import Convolution
+    return layer_case(Convolution((3, 3, 32), init=Gaussian(), padding=1), (16, 32, 32),
+                      fprop=False)
+
+
+@case('layers/pool')
+def pool():
+    from neon.layers import Pooling
+    return layer_case(Pooling(3, strides=2), (32, 32, 32))
+
+
+@case('layers/lrn')
+def lrn():
+    from neon.layers import LRN
+    return layer_case(LRN(5, ascale=0.0001, bpower=0.75), (32, 16, 16))
+
+
+@case('layers/batchnorm')
+def batchnorm():
+    from neon.layers import BatchNorm
+    return layer_case(BatchNorm(), (32, 16, 16))
+
+
+@case('layers/lstm_step')
+def lstm_step():
+    from neon.initializers import GlorotUniform
+    from neon.layers import LSTM
+    from neon.transforms import Logistic, Tanh
+    layer = LSTM(256, GlorotUniform(), activation=Tanh(), gate_activation=Logistic())
+    return layer_case(layer, (128, 1))
+
+
+@case('layers/lookuptable')
+def lookuptable():
+    from neon.initializers import Uniform
+    from neon.layers import LookupTable
+    be = NervanaObject.be
+    layer = LookupTable(vocab_size=10000, embedding_dim=128, init=Uniform(-0.1, 0.1))
+    _, errors = build_layer(layer, (32, 1))
+    inputs = be.array(be.rng.randint(0, 10000, (32, be.bsz)), dtype=np.int32)
+    layer.fprop(inputs)
+
+    def step():
+        layer.fprop(inputs)
+        layer.bprop(errors)
+    return step, be.bsz
+
+
+def optimizer_case(optimizer):
+    """
+    Setup of the cases timing an optimizer update of the parameters of 4 linear layers.
+    """
+    from neon.initializers import Gaussian
+    from neon.layers import Linear
+    layers = []
+    for _ in range(4):
+        layer = Linear(1024, Gaussian())
+        build_layer(layer, 1024)
+        layer.dW[:] = uniform(layer.dW.shape)
+        layers.append(layer)
+    optimizer.optimize(layers, epoch=0)
+    return lambda: optimizer.optimize(layers, epoch=0), NervanaObject.be.bsz
+
+
+@case('optimizers/gradient_descent_momentum')
+def gradient_descent_momentum():
+    from neon.optimizers import GradientDescentMomentum
+    return optimizer_case(GradientDescentMomentum(0.01, momentum_coef=0.9, wdecay=0.0005))
+
+
+@case('optimizers/rmsprop')
+def rmsprop():
+    from neon.optimizers import RMSProp
+    return optimizer_case(RMSProp(gradient_clip_value=5))
+
+
+@case('optimizers/adam')
+def adam():
+    from neon.optimizers import Adam
+    return optimizer_case(Adam())
+
+
+@case('optree/elementwise')
+def optree_elementwise():
+    be = NervanaObject.be
+    a, b = uniform((4096, be.bsz)), uniform((4096, be.bsz))
+    c, out = uniform((4096, 1)), be.iobuf(4096)
+
+    def step():
+        out[:] = be.sqrt(be.square(a) + 1.) * b - be.exp(-be.absolute(a)) * c
+    return step, be.bsz
+
+
+@case('optree/reduction')
+def optree_reduction():
+    be = NervanaObject.be
+    a, b = uniform((4096, be.bsz)), uniform((4096, be.bsz))
+    rows, cols = be.empty((4096, 1)), be.iobuf(1)
+
+    def step():
+        rows[:] = be.sum(a * b, axis=1)
+        cols[:] = be.max(be.absolute(a - b), axis=0)
+    return step, be.bsz
+
+
+@case('models/mlp')
+def mlp():
+    from neon.initializers import Gaussian
+    from neon.layers import Affine
+    from neon.optimizers import GradientDescentMomentum
+    from neon.transforms import Rectlin, Softmax
+    layers = [Affine(512, Gaussian(scale=0.01), bias=Gaussian(), activation=Rectlin()),
+              Affine(512, Gaussian(scale=0.01), bias=Gaussian(), activation=Rectlin()),
+              Affine(10, Gaussian(scale=0.01), bias=Gaussian(), activation=Softmax())]
+    return model_case(layers, 784, uniform((784, NervanaObject.be.bsz)), onehot(10),
+                      GradientDescentMomentum(0.01, momentum_coef=0.9))
+
+
+@case('models/cifar_convnet')
+def cifar_convnet():
+    from neon.initializers import Gaussian
+    from neon.layers import Affine, Conv, Pooling
+    from neon.optimizers import GradientDescentMomentum
+    from neon.transforms import Rectlin, Softmax
+    init = Gaussian(scale=0.01)
+    layers = [Conv((5, 5, 16), init=init, bias=Gaussian(), activation=Rectlin()),
+              Pooling(2),
+              Conv((5, 5, 32), init=init, bias=Gaussian(), activation=Rectlin()),
+              Pooling(2),
+              Affine(500, init=init, bias=Gaussian(), activation=Rectlin()),
+              Affine(10, init=init, bias=Gaussian(), activation=Softmax())]
+    return model_case(layers, (3, 32, 32), uniform((3 * 32 * 32, NervanaObject.be.bsz)),
+                      onehot(10), GradientDescentMomentum(0.01, momentum_coef=0.9))
+
+
+@case('models/char_lstm')
+def char_lstm():
+    from neon.initializers import GlorotUniform
+    from neon.layers import Affine, LSTM
+    from neon.optimizers import RMSProp
+    from neon.transforms import Logistic, Softmax, Tanh
+    vocab, steps = 64, 32
+    layers = [LSTM(128, GlorotUniform(), activation=Tanh(), gate_activation=Logistic()),
+              Affine(vocab, GlorotUniform(), bias=GlorotUniform(), activation=Softmax())]
+    return model_case(layers, (vocab, steps), onehot(vocab, steps), onehot(vocab, steps),
+                      RMSProp(gradient_clip_value=5))
+
+
+@case('models/seq2seq')
+def seq2seq():
+    from neon.initializers import GlorotUniform
+    from neon.layers import Affine, LSTM, Seq2Seq
+    from neon.optimizers import RMSProp
+    from neon.transforms import Logistic, Softmax, Tanh
+    vocab, steps, init = 64, 16, GlorotUniform()
+    encoder = [LSTM(128, init, activation=Tanh(), gate_activation=Logistic(),
+                    reset_cells=True)]
+    decoder = [LSTM(128, init, activation=Tanh(), gate_activation=Logistic(),
+                    reset_cells=True),
+               Affine(vocab, init, bias=init, activation=Softmax())]
+    layers = Seq2Seq([encoder, decoder], decoder_connections=[0])
+    inputs = (onehot(vocab, steps), onehot(vocab, steps))
+    return model_case(layers, (vocab, steps, vocab, steps), inputs, onehot(vocab, steps),
+                      RMSProp(gradient_clip_value=5))
+
+
+def array_data(nbatches=16, nfeatures=3072):
+    be = NervanaObject.be
+    X = be.rng.randint(0, 256, (nbatches * be.bsz, nfeatures)).astype(np.uint8)
+    return X, be.rng.randint(0, 10, nbatches * be.bsz)
+
+
+@case('iterators/array_iterator')
+def array_iterator():
+    from neon.data import ArrayIterator
+    X, y = array_data()
+    return iterator_case(ArrayIterator(X.astype(np.float32), y, nclass=10))
+
+
+@case('iterators/normalized_array_iterator')
+def normalized_array_iterator():
+    from neon.data import NormalizedArrayIterator
+    X, y = array_data()
+    return iterator_case(NormalizedArrayIterator(X, y, nclass=10, scale=1. / 255,
+                                                 shift=-0.5, lshape=(3, 32, 32)))
+
+
+@case('iterators/streaming_array_iterator')
+def streaming_array_iterator():
+    from neon.data import ArrayIterator
+    X, y = array_data()
+    return iterator_case(ArrayIterator(X.astype(np.float32), y, nclass=10, memory_budget=0))
+
+
+@case('iterators/text')
+def text():
+    from neon.data import Text
+    be = NervanaObject.be
+    vocab, steps = 1000, 32
+    token_ids = be.rng.randint(0, vocab, 64 * steps * be.bsz)
+    return iterator_case(Text(steps, None, vocab=list(range(vocab)), onehot_input=False,
+                              token_ids=token_ids))
+
+
+def time_step(step, repeat=10, warmup=2):
+    """
+    Time the iterations of a case, synchronizing the device after each one.
+
+    Arguments:
+        step (function): runs an iteration
+        repeat (int, optional): number of timed iterations
+        warmup (int, optional): number of iterations run first
+
+    Returns:
+        list: seconds of the timed iterations
+    """
+    be = NervanaObject.be
+    start, end = be.init_mark(), be.init_mark()
+    for _ in range(warmup):
+        step()
+    times = []
+    for _ in range(repeat):
+        be.record_mark(start)
+        step()
+        be.record_mark(end)
+        be.synchronize_mark(end)
+        times.append(be.get_time(start, end) / 1000.)
+    return times
+
+
+def environment():
+    """
+    Returns the environment of the results of the current backend.
+    """
+    be = NervanaObject.be
+    return OrderedDict([('neon', neon_version),
+                        ('backend', be.backend_name),
+                        ('batch_size', be.bsz),
+                        ('datatype', np.dtype(be.default_dtype).name),
+                        ('python', platform.python_version()),
+                        ('numpy', np.__version__),
+                        ('platform', platform.platform()),
+                        ('processor', platform.processor())])
+
+
+def select_cases(patterns=None):
+    """
+    Names of the cases matching any of patterns, all of them if None.
+    """
+    if not patterns:
+        return list(CASES)
+    return [name for name in CASES if any(fnmatch(name, p) for p in patterns)]
+
+
+def run_suite(patterns=None, repeat=10, warmup=2):
+    """
+    Run the benchmark cases on the current backend.
+
+    Arguments:
+        patterns (list, optional): fnmatch patterns of the names of the cases to run
+        repeat (int, optional): number of timed iterations of each case
+        warmup (int, optional): number of iterations run before timing
+
+    Returns:
+        dict: 'environment' of the run, and 'results' by case name, with the median and
+              minimum seconds per iteration, the seconds of each iteration and the records
+              per second
+    """
+    results = OrderedDict()
+    for name in select_cases(patterns):
+        step, records = CASES[name]()
+        times = time_step(step, repeat, warmup)
+        median = float(np.median(times))
+        results[name] = OrderedDict([('median', median),
+                                     ('min', float(np.min(times))),
+                                     ('times', times),
+                                     ('records_per_second', records / median)])
+        neon_logger.display('%-45s %10.3f ms %12.1f records/s' %
+                            (name, median * 1000., records / median))
+    return OrderedDict([('environment', environment()), ('results', results)])
+
+
+def save_results(results, path):
+    """
+    Write results to a JSON file atomically.
+    """
+    tmp_path = '%s.%d.tmp' % (path, os.getpid())
+    with open(tmp_path, 'w') as f:
+        json.dump(results, f, indent=2)
+    os.rename(tmp_path, path)
+
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f, object_pairs_hook=OrderedDict)
+
+
+def compare(results, baseline, tolerance=0.25):
+    """
+    Compare results to the ones of a baseline.
+
+    Arguments:
+        results (dict): results of run_suite
+        baseline (dict): baseline results of run_suite
+        tolerance (float, optional): relative slowdown of the median time of a case
+                                     flagged as a regression
+
+    Returns:
+        list: (name, baseline median, median, ratio) of the regressions
+    """
+    env, base_env = results['environment'], baseline['environment']
+    for key in ('backend', 'batch_size', 'datatype'):
+        if env.get(key) != base_env.get(key):
+            neon_logger.display('Warning: %s %s differs from the %s of the baseline' %
+                                (key, env.get(key), base_env.get(key)))
+
+    regressions = []
+    for name, result in results['results'].items():
+        if name not in baseline['results']:
+            neon_logger.display('%-45s not in the baseline' % name)
+            continue
+        base_median = baseline['results'][name]['median']
+        ratio = result['median'] / base_median
+        if ratio > 1. + tolerance:
+            regressions.append((name, base_median, result['median'], ratio))
+            status = 'REGRESSION'
+        elif ratio < 1. / (1. + tolerance):
+            status = 'faster'
+        else:
+            status = 'ok'
+        neon_logger.display('%-45s %10.3f ms %10.3f ms %6.2fx  %s' %
+                            (name, base_median * 1000., result['median'] * 1000., ratio,
+                             status))
+    return regressions
+
+
+if __name__ == '__main__':
+    from neon.util.argparser import NeonArgparser
+    parser = NeonArgparser(__doc__)
+    parser.add_argument('--results', default='benchmark_results.json',
+                        help='JSON file of the results')
+    parser.add_argument('--baseline', help='JSON file of the baseline results')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='relative slowdown flagged as a regression')
+    parser.add_argument('--cases', nargs='+', help='patterns of the names of the cases')
+    parser.add_argument('--repeat', type=int, default=10, help='timed iterations per case')
+    parser.add_argument('--warmup', type=int, default=2, help='iterations run before timing')
+    parser.add_argument('--list', action='store_true', help='list the cases and exit')
+    args = parser.parse_args()
+
+    if args.list:
+        for name in CASES:
+            neon_logger.display(name)
+        sys.exit(0)
+
+    results = run_suite(args.cases, args.repeat, args.warmup)
+    save_results(results, args.results)
+    if args.baseline:
+        regressions = compare(results, load_results(args.baseline), args.tolerance)
+        if regressions:
+            neon_logger.display('%d regressions' % len(regressions))
+            sys.exit(1)
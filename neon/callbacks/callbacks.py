@@ -17,23 +17,27 @@ from __future__ import division
 from builtins import map, str, zip
 from future.utils import native
 from collections import deque
-import h5py
+from future.moves.queue import Full, Queue
 import inspect
 import logging
 import numpy as np
 import os
 import signal
 import sys
+import threading
 import time
 import math
 from timeit import default_timer
 import weakref
 
 from neon import NervanaObject, logger as neon_logger
+from neon.backends.backend import Tensor
+from neon.backends.nervanacpu import exponent_hist
 from neon.data import NervanaDataIterator, Ticker
 from neon.util.compat import PY3
 from neon.util.persist import load_obj, save_obj, load_class
 from neon.layers import Convolution, BatchNorm, Multicost
+from neon.layers.container import LayerContainer
 from neon.transforms.cost import Metric
 
 logger = logging.getLogger(__name__)
@@ -87,6 +91,7 @@ class Callbacks(NervanaObject):
                            "accepts train_set as a parameter.  This argument will "
                            "be removed soon update your code.")
 
+        import h5py
         super(Callbacks, self).__init__(name=None)
         self.callbacks = list()
         self.epoch_marker = 0
@@ -230,6 +235,15 @@ class Callbacks(NervanaObject):
         """
         self.callbacks.append(HistCallback(plot_per_mini=plot_per_mini, filter_key=filter_key))
 
+    def add_telemetry_callback(self, filter_key=['W', 'dW', 'outputs'], sample_size=4096,
+                               minibatch_freq=1, plot_per_mini=False):
+        """
+        Convenience function to create and add a sampled telemetry callback.
+        """
+        self.add_callback(TelemetryCallback(filter_key=filter_key, sample_size=sample_size,
+                                            minibatch_freq=minibatch_freq,
+                                            plot_per_mini=plot_per_mini))
+
     def add_callback(self, callback, insert_pos=None):
         """
         Add a user supplied callback. Since callbacks are run serially and share data,
@@ -806,13 +820,14 @@ class LossCallback(Callback):
         for x, t in self.eval_set:
             x = model.fprop(x, inference=True)
             bsz = min(self.eval_set.ndata - nprocessed, self.be.bsz)
-            model.cost.get_cost(x, t)
+            # per record costs stay on the device until the end of the pass
+            costbuf = model.cost.fprop_cost(x, t)
             nsteps = x.shape[1] // self.be.bsz if not isinstance(x, list) else \
                 x[0].shape[1] // self.be.bsz
-            costbuf = model.cost.outputs[:, :bsz * nsteps]
+            costbuf = costbuf[:, :bsz * nsteps]
             nprocessed += bsz
             self.loss[:] = self.loss + self.be.sum(costbuf, axis=1) / nsteps
-            mean_cost = float(self.loss.get() / nprocessed)
+        mean_cost = float(self.loss.get() / nprocessed)
         callback_data["time/loss"][epoch // self.epoch_freq] = (default_timer() - start_loss)
         callback_data["cost/loss"][epoch // self.epoch_freq] = mean_cost
 
@@ -913,18 +928,14 @@ class MultiLabelStatsCallback(Callback):
         if (epoch + 1) % self.epoch_freq == 0:
             self.eval_set.reset()
 
-            running_stats = np.zeros_like(self.metric.outputs.get(), dtype=np.float32)
-
-            # Calculate the metric values
-            nbatch = 0
+            # Calculate the metric values over the whole set
+            self.metric.reset_accumulators()
             for x, t in self.eval_set:
                 x = model.fprop(x, inference=True)
+                self.metric.accumulate(x, t)
 
-                self.metric(x, t)
-                running_stats += self.metric.outputs.get()
-                nbatch += 1
-
-            running_stats /= nbatch
+            self.metric.accumulated()
+            running_stats = self.metric.outputs.get()
 
             # Print the statistics for all the labels
             for i, label in enumerate(self.labels):
@@ -1012,6 +1023,180 @@ class HistCallback(Callback):
             hist_dset[:, timestamp] = hdata[hmap[hname]].reshape((64,))
 
 
+class TelemetryCallback(Callback):
+    """
+    Collect log2 histograms of weights, gradients and activations with an overhead low
+    enough to leave on in production.  Every minibatch_freq minibatches a random sample
+    of each selected tensor is gathered on the device and copied to the host, and a
+    background thread computes the histograms from the exponent bits and accumulates
+    them.  The histograms of an epoch are written to the hdf5 output file at its end,
+    in the layout of HistCallback that the nvis tool reads.
+
+    Arguments:
+        filter_key (list, optional): layer attributes to collect, defaults to the
+                                     weights, their gradients and the activations
+        sample_size (int, optional): number of values sampled from each tensor, None
+                                     for all values.  Defaults to 4096.
+        minibatch_freq (int, optional): minibatches between samples.  Defaults to 1.
+        plot_per_mini (bool, optional): keep a histogram per minibatch rather than
+                                        summing them over each epoch
+        max_pending (int, optional): samples waiting for the background thread beyond
+                                     which new ones are dropped instead of stalling
+                                     training.  Defaults to 1024.
+    """
+    def __init__(self, filter_key=['W', 'dW', 'outputs'], sample_size=4096, minibatch_freq=1,
+                 plot_per_mini=False, max_pending=1024):
+        super(TelemetryCallback, self).__init__(epoch_freq=1, minibatch_freq=minibatch_freq)
+        self.filter_key = filter_key
+        self.sample_size = sample_size
+        self.plot_per_mini = plot_per_mini
+        self.max_pending = max_pending
+        self.rng = np.random.RandomState(0)
+        self.hists = dict()
+        self.dropped = 0
+        self.queue = None
+        self.thread = None
+
+    def on_train_begin(self, callback_data, model, epochs):
+        """
+        Called when training is about to begin
+
+        Arguments:
+            callback_data (HDF5 dataset): shared data between callbacks
+            model (Model): model object
+            epochs (int): Total epochs
+        """
+        minibatches = callback_data['config'].attrs['total_minibatches']
+        self.time_steps = int(minibatches) if self.plot_per_mini else epochs
+
+        hist_grp = callback_data.require_group("hist")
+        hist_grp.attrs['bins'] = self.be.hist_bins
+        hist_grp.attrs['offset'] = self.be.hist_offset
+        hist_grp.attrs['time_markers'] = 'minibatch' if self.plot_per_mini else 'epoch'
+        hist_grp.attrs['time_steps'] = self.time_steps
+
+        # in place layers share their outputs with the layer before, name them after the
+        # last layer writing to them
+        self.tensors = []
+        owner = None
+        for l in model.layers.layers_fprop():
+            if isinstance(l, LayerContainer):
+                continue
+            for key in self.filter_key:
+                name = "%s_%s" % (l.name, key)
+                if key == 'outputs' and not l.owns_output:
+                    if owner is not None:
+                        self.tensors[owner] = (name,) + self.tensors[owner][1:]
+                    continue
+                tensor = getattr(l, key, None)
+                if isinstance(tensor, Tensor) and tensor.size > 0:
+                    if key == 'outputs':
+                        owner = len(self.tensors)
+                    self.tensors.append((name, l, key))
+        self.next_step, self.last_step = 0, -1
+
+        self.queue = Queue(maxsize=self.max_pending)
+        self.thread = threading.Thread(target=self._aggregate)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def on_minibatch_end(self, callback_data, model, epoch, minibatch):
+        """
+        Called when minibatch is about to end
+
+        Arguments:
+            callback_data (HDF5 dataset): shared data between callbacks
+            model (Model): model object
+            epoch (int): index of current epoch
+            minibatch (int): index of minibatch that is ending
+        """
+        if self.plot_per_mini:
+            prev_epochs_minibatches = 0
+            if epoch > 0:
+                prev_epochs_minibatches = callback_data['time_markers/minibatch'][epoch - 1]
+            timestamp = int(prev_epochs_minibatches) + minibatch
+        else:
+            timestamp = epoch
+        self.last_step = timestamp
+
+        for name, layer, key in self.tensors:
+            # layers may replace their tensors, e.g. on set_batch_size
+            values = self.sample(getattr(layer, key))
+            try:
+                self.queue.put_nowait((name, timestamp, values))
+            except Full:
+                self.dropped += 1
+
+    def on_epoch_end(self, callback_data, model, epoch):
+        """
+        Called when an epoch is about to end
+
+        Arguments:
+            callback_data (HDF5 dataset): shared data between callbacks
+            model (Model): model object
+            epoch (int): index of epoch that is ending
+        """
+        self.queue.join()
+        steps = slice(self.next_step, self.last_step + 1)
+        self.next_step = self.last_step + 1
+
+        hist_grp = callback_data['hist']
+        for name, hist in self.hists.items():
+            hist_dset = hist_grp.require_dataset(name, shape=hist.shape, dtype=hist.dtype)
+            hist_dset[:, steps] = hist[:, steps]
+
+        if self.dropped:
+            logger.warning("%s dropped %d tensor samples that the background thread could not "
+                           "keep up with", self.__class__.__name__, self.dropped)
+            self.dropped = 0
+
+    def on_train_end(self, callback_data, model):
+        """
+        Called when training is about to end
+
+        Arguments:
+            callback_data (HDF5 dataset): shared data between callbacks
+            model (Model): model object
+        """
+        self.queue.put(None)
+        self.thread.join()
+        self.queue = None
+        self.thread = None
+
+    def sample(self, tensor):
+        """
+        Copy a random sample of the values of a tensor to the host.
+
+        Arguments:
+            tensor (Tensor): tensor to sample
+
+        Returns:
+            numpy.ndarray: sampled values
+        """
+        if self.sample_size is None or tensor.size <= self.sample_size:
+            return tensor.get()
+        idx = self.rng.randint(0, tensor.size, self.sample_size)
+        return tensor.reshape((1, tensor.size)).take(idx, axis=1).get()
+
+    def _aggregate(self):
+        """
+        Background thread computing and accumulating the histograms of the samples.
+        """
+        while True:
+            item = self.queue.get()
+            try:
+                if item is None:
+                    return
+                name, timestamp, values = item
+                if name not in self.hists:
+                    self.hists[name] = np.zeros((self.be.hist_bins, self.time_steps),
+                                                dtype=np.int64)
+                self.hists[name][:, timestamp] += exponent_hist(values, self.be.hist_bins,
+                                                                self.be.hist_offset)
+            finally:
+                self.queue.task_done()
+
+
 def get_progress_string(tag, epoch, minibatch, nbatches, cost, time,
                         blockchar=u'\u2588'):
     """
@@ -14,7 +14,7 @@
 # limitations under the License.
 # ******************************************************************************
 
-from neon.data.dataiterator import NervanaDataIterator, ArrayIterator
+from neon.data.dataiterator import NervanaDataIterator, ArrayIterator, NormalizedArrayIterator
 from neon.data.hdf5iterator import HDF5Iterator, HDF5IteratorOneHot, HDF5IteratorAutoencoder
 from neon.data.datasets import Dataset
 from neon.data.text import Text, Shakespeare, PTB, HutterPrize, IMDB, SICK
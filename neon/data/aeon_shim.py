@@ -17,19 +17,33 @@
 import sys
 from neon import logger as neon_logger
 from neon.data.dataloaderadapter import DataLoaderAdapter
+from neon.data.manifestloader import ManifestLoader
 
 
 try:
     from aeon import DataLoader as AeonLoader
 except ImportError:
-    neon_logger.error('Unable to load Aeon data loading module.')
-    neon_logger.error('Please follow installation instructions at:')
-    neon_logger.error('https://github.com/NervanaSystems/aeon')
-    sys.exit(1)
+    AeonLoader = None
 
 
 def AeonDataLoader(config, adapter=True):
+    if AeonLoader is not None:
+        loader = AeonLoader(config)
+    else:
+        # image and label manifests can be loaded without aeon
+        try:
+            loader = ManifestLoader(config)
+        except NotImplementedError:
+            neon_logger.error('Unable to load Aeon data loading module.')
+            neon_logger.error('Please follow installation instructions at:')
+            neon_logger.error('https://github.com/NervanaSystems/aeon')
+            sys.exit(1)
+        neon_logger.display('Aeon is not installed, loading {} with ManifestLoader'.format(
+            config['manifest_filename']))
+        if config.get('augmentation'):
+            neon_logger.display('ManifestLoader ignores the augmentation settings')
+
     if adapter:
-        return DataLoaderAdapter(AeonLoader(config))
+        return DataLoaderAdapter(loader)
     else:
-        return AeonLoader(config)
+        return loader
@@ -17,10 +17,16 @@
 Defines basic input datatset types.
 """
 from builtins import zip
+import threading
 import numpy as np
 
 from neon import NervanaObject
 
+try:
+    from queue import Queue
+except ImportError:
+    from Queue import Queue
+
 
 class NervanaDataIterator(NervanaObject):
     """
@@ -80,10 +86,20 @@ class ArrayIterator(NervanaDataIterator):
         y = 2*X + 1
         train = ArrayIterator(X=X, y=y, make_onehot=False)
 
+    Data sets too large for the device memory can be streamed from host memory: when their
+    device copy would take more than `memory_budget` bytes, the data is kept on the host
+    (e.g. a memory mapped array) and a worker thread gathers and transposes the next
+    minibatches into a double buffer while the model computes, each minibatch being copied
+    to the device as it is loaded.  For example::
+
+        X = np.load('features.npy', mmap_mode='r')
+        train = ArrayIterator(X=X, y=y, nclass=10, memory_budget=2 * 1024**3)
+
     For more information, see the Loading data section of the documentation.
     """
 
-    def __init__(self, X, y=None, nclass=None, lshape=None, make_onehot=True, name=None):
+    def __init__(self, X, y=None, nclass=None, lshape=None, make_onehot=True, name=None,
+                 memory_budget=None, pinned=False):
         """
         During initialization, the input data will be converted to backend tensor objects
         (e.g. CPUTensor or GPUTensor). If the backend uses the GPU, the data is copied over to the
@@ -101,6 +117,11 @@ class ArrayIterator(NervanaDataIterator):
                 (e.g. # channels, height, width)
             make_onehot (bool, optional): True if y is a categorical label that has to be converted
                 to a one hot representation.
+            memory_budget (int, optional): device memory in bytes the data set may take, above
+                which it is streamed from host memory.  None, the default, always copies the
+                data set to the device, 0 always streams it.
+            pinned (bool, optional): stream through page-locked host buffers, so the copies to
+                a GPU are asynchronous.
 
         """
         # Treat singletons like list so that iteration follows same syntax
@@ -141,6 +162,17 @@ class ArrayIterator(NervanaDataIterator):
             self.shape = self.shape[0]
             self.lshape = lshape
 
+        # stream the data set from host memory if its device copy exceeds the budget
+        nbytes = sum(x.shape[0] * x.shape[1] * np.dtype(self._input_dtype(x)).itemsize
+                     for x in X)
+        if y is not None:
+            nbytes += y.size * np.dtype(np.int32 if make_onehot else
+                                        self.be.default_dtype).itemsize
+        self.streaming = memory_budget is not None and nbytes > memory_budget
+        if self.streaming:
+            self._init_streaming(X, y, make_onehot, pinned)
+            return
+
         # Helpers to make dataset, minibatch, unpacking function for transpose and onehot
         def transpose_gen(z):
             return (self.be.array(z), self.be.iobuf(z.shape[1]),
@@ -150,7 +182,7 @@ class ArrayIterator(NervanaDataIterator):
             return (self.be.array(z.reshape((-1, 1)), dtype=np.int32), self.be.iobuf(nclass),
                     lambda _in, _out: self.be.onehot(_in, axis=0, out=_out))
 
-        self.Xdev, self.Xbuf, self.unpack_func = list(zip(*[transpose_gen(x) for x in X]))
+        self.Xdev, self.Xbuf, self.unpack_func = list(zip(*[self._input_buffers(x) for x in X]))
 
         # Shallow copies for appending, iterating
         self.dbuf, self.hbuf = list(self.Xdev), list(self.Xbuf)
@@ -162,6 +194,127 @@ class ArrayIterator(NervanaDataIterator):
             self.hbuf.append(self.ybuf)
             self.unpack_func.append(yfunc)
 
+    def _input_dtype(self, x):
+        """
+        Returns the dtype of the minibatches of an input array, the backend dtype.
+        """
+        return self.be.default_dtype
+
+    def _input_buffers(self, x):
+        """
+        Returns the device copy of an input array, its minibatch buffer and the function
+        unpacking a minibatch of the copy into the buffer.
+        """
+        dtype = self._input_dtype(x)
+        return (self.be.array(x, dtype=dtype), self.be.iobuf(x.shape[1], dtype=dtype),
+                lambda _in, _out: self.be.copy_transpose(_in, _out))
+
+    def _init_streaming(self, X, y, make_onehot, pinned):
+        """
+        Allocate the minibatch buffers of a data set streamed from host memory, and the
+        double buffer of host minibatches.
+        """
+        self.Xbuf = [self.be.iobuf(x.shape[1], dtype=self._input_dtype(x)) for x in X]
+        self.host_arrays = list(X)
+        # the device buffers set from the host minibatches
+        self.hbuf = list(self.Xbuf)
+        if y is not None:
+            self.host_arrays.append(y.reshape((-1, 1)) if make_onehot else y)
+            if make_onehot:
+                self.ylabels = self.be.iobuf(1, dtype=np.int32)
+                self.ybuf = self.be.iobuf(self.nclass)
+                self.hbuf.append(self.ylabels)
+            else:
+                self.ybuf = self.be.iobuf(y.shape[1])
+                self.hbuf.append(self.ybuf)
+        self.make_onehot = make_onehot
+
+        self.pinned = pinned and self.be.device_type == 1
+        if self.pinned:
+            import pycuda.driver as drv
+            empty = drv.pagelocked_empty
+        else:
+            empty = np.empty
+        self.host_buffers = [[empty(buf.shape, dtype=buf.dtype) for buf in self.hbuf]
+                             for _ in range(2)]
+
+    def _fill_host_buffers(self, start, free, ready):
+        """
+        Gather and transpose the minibatches of an epoch into the host buffers, in a worker
+        thread.
+
+        Arguments:
+            start (int): index of the first example of the epoch
+            free (Queue): (index, copy event) of the host buffers free to be filled, None to
+                          stop
+            ready (Queue): indices of the filled host buffers, None at the end of the epoch,
+                           or an exception
+        """
+        bsz = self.be.bsz
+        try:
+            for i1 in range(start, self.ndata, bsz):
+                slot = free.get()
+                if slot is None:
+                    return
+                index, event = slot
+                if event is not None:
+                    # wait for the copy to the device of the previous minibatch of the buffer
+                    event.synchronize()
+                if i1 + bsz <= self.ndata:
+                    rows = slice(i1, i1 + bsz)
+                else:
+                    # the last minibatch wraps around to the first examples
+                    rows = np.arange(i1, i1 + bsz) % self.ndata
+                for host, array in zip(self.host_buffers[index], self.host_arrays):
+                    host[:] = array[rows].T
+                ready.put(index)
+            ready.put(None)
+        except Exception as e:
+            ready.put(e)
+
+    def _stream(self):
+        """
+        Load the minibatches of an epoch from host memory, the next ones being prepared by
+        a worker thread.
+
+        Yields:
+            tuple: The next minibatch which includes both features and labels.
+        """
+        free, ready = Queue(), Queue()
+        for index in range(len(self.host_buffers)):
+            free.put((index, None))
+        worker = threading.Thread(target=self._fill_host_buffers,
+                                  args=(self.start, free, ready))
+        worker.daemon = True
+        worker.start()
+
+        try:
+            for i1 in range(self.start, self.ndata, self.be.bsz):
+                index = ready.get()
+                if isinstance(index, Exception):
+                    raise index
+                if i1 + self.be.bsz > self.ndata:
+                    self.start = i1 + self.be.bsz - self.ndata
+
+                for buf, host in zip(self.hbuf, self.host_buffers[index]):
+                    buf.set(host)
+                event = None
+                if self.pinned:
+                    import pycuda.driver as drv
+                    event = drv.Event()
+                    event.record(self.be.stream)
+                # copies from pageable memory are done when set returns
+                free.put((index, event))
+
+                if self.ybuf is not None and self.make_onehot:
+                    self.be.onehot(self.ylabels, axis=0, out=self.ybuf)
+                inputs = self.Xbuf[0] if len(self.Xbuf) == 1 else self.Xbuf
+                targets = self.ybuf if self.ybuf else inputs
+                yield (inputs, targets)
+        finally:
+            free.put(None)
+            worker.join()
+
     @property
     def nbatches(self):
         """
@@ -184,6 +337,11 @@ class ArrayIterator(NervanaDataIterator):
         Yields:
             tuple: The next minibatch which includes both features and labels.
         """
+        if self.streaming:
+            for minibatch in self._stream():
+                yield minibatch
+            return
+
         for i1 in range(self.start, self.ndata, self.be.bsz):
             bsz = min(self.be.bsz, self.ndata - i1)
             islice1, oslice1 = slice(0, bsz), slice(i1, i1 + bsz)
@@ -200,3 +358,81 @@ class ArrayIterator(NervanaDataIterator):
             inputs = self.Xbuf[0] if len(self.Xbuf) == 1 else self.Xbuf
             targets = self.ybuf if self.ybuf else inputs
             yield (inputs, targets)
+
+
+class NormalizedArrayIterator(ArrayIterator):
+    """
+    ArrayIterator over inputs stored compactly, such as the uint8 pixels of a data set
+    cache (see Dataset.load_cache).  The inputs keep their dtype on the device and each
+    minibatch is normalized into a buffer of the backend dtype as it is loaded, by, in
+    order, global contrast normalization, scaling and shifting, and ZCA whitening.
+
+    Arguments:
+        X (ndarray): input features of shape (# examples, feature size), e.g. uint8
+        y (ndarray, optional): labels, see ArrayIterator
+        nclass (int, optional): number of classes of the labels
+        lshape (tuple, optional): local shape of the input features
+        make_onehot (bool, optional): convert the labels to a one hot representation
+        name (str, optional): name of the iterator
+        scale (float, optional): factor of the inputs
+        shift (float, optional): offset added to the scaled inputs
+        contrast_normalize (float, optional): scale of the global contrast normalization of
+                                              each example, none by default
+        whiten (tuple, optional): (mean, W) ZCA whitening transform, applied to the
+                                  examples x as (x - mean) W
+    """
+
+    def __init__(self, X, y=None, nclass=None, lshape=None, make_onehot=True, name=None,
+                 scale=1., shift=0., contrast_normalize=None, whiten=None, memory_budget=None,
+                 pinned=False):
+        assert not isinstance(X, list), "NormalizedArrayIterator takes a single input array"
+        super(NormalizedArrayIterator, self).__init__(X, y, nclass=nclass, lshape=lshape,
+                                                      make_onehot=make_onehot, name=name,
+                                                      memory_budget=memory_budget,
+                                                      pinned=pinned)
+        self.scale = scale
+        self.shift = shift
+        self.contrast_normalize = contrast_normalize
+        self.inputs = self.be.iobuf(X.shape[1])
+        self.norms = self.be.iobuf(1)
+        self.whiten = whiten is not None
+        if self.whiten:
+            mean, W = whiten
+            self.whiten_mean = self.be.array(np.reshape(mean, (-1, 1)))
+            self.whiten_W = self.be.array(np.transpose(W))
+            self.centered = self.be.iobuf(X.shape[1])
+
+    def _input_dtype(self, x):
+        # minibatches of the inputs are unpacked in the dtype of x, then normalized
+        return x.dtype
+
+    def normalize(self):
+        """
+        Normalize the minibatch of inputs into the inputs buffer.
+        """
+        x = self.inputs
+        x[:] = self.Xbuf[0]
+        if self.contrast_normalize:
+            self.norms[:] = self.be.mean(x, axis=0)
+            x[:] = x - self.norms
+            self.norms[:] = self.be.sqrt(self.be.sum(self.be.square(x), axis=0))
+            self.norms[:] = self.norms / self.contrast_normalize
+            # examples of constant value are only centered
+            self.norms[:] = self.norms + self.be.less(self.norms, 1e-8) * (1. - self.norms)
+            x[:] = x / self.norms
+        if self.scale != 1. or self.shift != 0.:
+            x[:] = x * self.scale + self.shift
+        if self.whiten:
+            self.centered[:] = x - self.whiten_mean
+            self.be.compound_dot(self.whiten_W, self.centered, x)
+
+    def __iter__(self):
+        """
+        Returns a new minibatch of normalized data with each call.
+
+        Yields:
+            tuple: The next minibatch which includes both features and labels.
+        """
+        for _ in super(NormalizedArrayIterator, self).__iter__():
+            self.normalize()
+            yield (self.inputs, self.ybuf if self.ybuf else self.inputs)
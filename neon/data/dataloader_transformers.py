@@ -15,7 +15,7 @@ class DataLoaderTransformer(NervanaObject):
         self.dataloader = dataloader
         self.index = index
 
-        if self.index is not None:
+        if self.index is not None and hasattr(self.dataloader, 'shapes'):
             # input shape is contiguous
             data_size = np.prod(self.dataloader.shapes()[index])
             self._shape = (data_size, self.be.bsz)
@@ -164,6 +164,76 @@ class ValueNormalize(DataLoaderTransformer):
         return t
 
 
+class ImageAugmentation(DataLoaderTransformer):
+    """
+    Random crops with zero padding, horizontal flips and brightness and contrast jitter
+    of the images at `index`, (C*H*W, N) minibatches laid out as CxHxWxN.  The whole
+    minibatch is transformed at once, by gathering each output pixel from its source
+    pixel with per image offsets, and the random draws come from the backend RNG, so runs
+    with the same rng_seed augment the same way.  Meant for the training set only.
+
+    Arguments:
+        dataloader (iterable): data loader or ArrayIterator
+        index (int): index of the images in the tuples of dataloader
+        lshape (tuple): (C, H, W) shape of the images
+        crop_padding (int, optional): zero padding of the random crops, the images are
+                                      shifted by up to crop_padding pixels in each
+                                      direction.  0 disables the crops.
+        flip (bool, optional): flip half of the images horizontally
+        brightness (float, optional): max shift of the pixel values of an image
+        contrast (float, optional): max relative change of the deviations of the pixel
+                                    values of an image from their mean
+    """
+    def __init__(self, dataloader, index, lshape, crop_padding=0, flip=False, brightness=0.,
+                 contrast=0., *args, **kwargs):
+        super(ImageAugmentation, self).__init__(dataloader, index, *args, **kwargs)
+        self.lshape = tuple(lshape)
+        self.crop_padding = crop_padding
+        self.flip = flip
+        self.brightness = brightness
+        self.contrast = contrast
+
+        C, H, W = self.lshape
+        self.output = self.be.iobuf(C * H * W, parallelism='Data')
+        self.rows = np.arange(H)[:, np.newaxis]
+        self.cols = np.arange(W)[:, np.newaxis]
+        self.images = np.arange(self.be.bsz)
+
+    def transform(self, t):
+        C, H, W = self.lshape
+        N = self.be.bsz
+        rng = self.be.rng
+        x = t.get().reshape((C, H, W, N))
+
+        if self.crop_padding or self.flip:
+            # source row (H, N) and column (W, N) of each output pixel of each image
+            rows, cols = self.rows, self.cols
+            if self.flip:
+                cols = np.where(rng.uniform(size=N) < 0.5, W - 1 - cols, cols)
+            if self.crop_padding:
+                pad = self.crop_padding
+                rows = rows + rng.randint(-pad, pad + 1, N)
+                cols = cols + rng.randint(-pad, pad + 1, N)
+            rows = np.broadcast_to(rows, (H, N))
+            cols = np.broadcast_to(cols, (W, N))
+            x = x[:, np.clip(rows, 0, H - 1)[:, np.newaxis], np.clip(cols, 0, W - 1)[np.newaxis],
+                  self.images]
+            if self.crop_padding:
+                # the pixels from the padding are 0
+                x *= (((rows >= 0) & (rows < H))[:, np.newaxis] &
+                      ((cols >= 0) & (cols < W))[np.newaxis])
+
+        x = x.reshape((-1, N))
+        if self.contrast:
+            mean = x.mean(axis=0)
+            x = (x - mean) * rng.uniform(1 - self.contrast, 1 + self.contrast, N) + mean
+        if self.brightness:
+            x = x + rng.uniform(-self.brightness, self.brightness, N)
+
+        self.output.set(np.ascontiguousarray(x, dtype=self.output.dtype))
+        return self.output
+
+
 class DumpImage(DataLoaderTransformer):
     def __init__(self, dataloader, index, image_index, outshape,
                  output_directory=None, *args, **kwargs):
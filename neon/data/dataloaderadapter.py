@@ -20,6 +20,18 @@ class DataLoaderAdapter(DataLoaderTransformer):
             self.nbatches += 1
         self.outputs = OrderedDict()  # Create output buffers
 
+        # Output buffers in neon's layout, (C*H*W, N), allocated on the first minibatch,
+        # which gives their dtype, and filled in place afterwards.  The characters of
+        # char_map are packed in a single row.
+        self.buffers = {}
+        self.buffer_shapes = {}
+        for (name, _), shape in zip(self.dataloader.axes_info, self.shapes()):
+            size = int(np.prod(shape))
+            self.buffer_shapes[name] = ((1, size * self.be.bsz) if name == 'char_map'
+                                        else (size, self.be.bsz))
+        # contiguous host copies of the buffers, for backends copying them to the device
+        self.host_buffers = {} if self.be.device_type != 0 else None
+
         def max_dur(val, freq):
             uval = float(val.split(" ")[0])
             ucat = val.split(" ")[1]
@@ -49,32 +61,50 @@ class DataLoaderAdapter(DataLoaderTransformer):
         for key, value in t:
             assert value.shape[0] == self.be.bsz
 
-            reshape_rows = self.be.bsz
-
             # Convert audio length from absolute to percentage
             if key == 'audio_length':
-                for x in np.nditer(value, op_flags=['readwrite']):
-                    x[...] = x/self.max_duration*100
-                value = value.astype(np.uint8, copy=False)
+                value = (value / self.max_duration * 100).astype(np.uint8)
 
             if key == 'char_map':
-                x = value
-                x = x[x != 0]
-                x = np.reshape(x, (1, -1))
-                x = np.ascontiguousarray(x)  # Contigious array needed for GPU backend
+                x = value[value != 0].reshape((1, -1))
             else:
-                # Adjust Aeon data layout to Neon layout, e.g. shape (N,C,H,W) -> (N,C*H*W)
-                x = np.reshape(value, (reshape_rows, -1))
-                x = np.ascontiguousarray(x.T)  # Contigious array needed for GPU backend
-
-            # Patch that forces the numpy array into C order to fix the strides for NumPy > 1.11.1
-            x = np.array(x, order='C')
+                # Adjust Aeon data layout to Neon layout, e.g. shape (N,C,H,W) -> (C*H*W,N)
+                x = value.reshape((self.be.bsz, -1)).T
 
-            # Create tensor
-            self.outputs[key] = self.be.array(x, dtype=value.dtype)
+            self.outputs[key] = self.fill(key, x)
 
         return tuple(self.outputs.values())
 
+    def fill(self, key, x):
+        """
+        Copy x into the output buffer of key with a single transposing copy.  The CPU
+        backend copies into the tensor directly, other backends go through a contiguous
+        host buffer.
+
+        Arguments:
+            key (str): name of the aeon buffer
+            x (numpy.ndarray): data in neon's layout
+
+        Returns:
+            Tensor: the output buffer, or a view of its first columns for char_map
+        """
+        buf = self.buffers.get(key)
+        if buf is None or buf.dtype != x.dtype:
+            buf = self.be.empty(self.buffer_shapes[key], dtype=x.dtype)
+            self.buffers[key] = buf
+            if self.host_buffers is not None:
+                self.host_buffers[key] = np.empty(buf.shape, dtype=x.dtype)
+        assert x.shape[0] == buf.shape[0] and x.shape[1] <= buf.shape[1]
+
+        if x.shape[1] < buf.shape[1]:
+            buf = buf[:, :x.shape[1]]
+        if self.host_buffers is None:
+            return buf.set(x)
+
+        host = self.host_buffers[key][:, :x.shape[1]]
+        np.copyto(host, x)
+        return buf.set(host)
+
     def shapes(self):
         # Get tuple of shape values only
         shapes = []
@@ -19,15 +19,17 @@ Functions used to load commonly available datasets.
 from __future__ import division
 from future import standard_library
 standard_library.install_aliases()  # triggers E402, hence noqa below
-from future.moves.urllib.request import Request, urlopen  # noqa
 
 import logging  # noqa
 import os  # noqa
 import sys  # noqa
 import zipfile  # noqa
 
+import numpy as np  # noqa
+
 from neon import NervanaObject, logger as neon_logger  # noqa
 from neon.util.compat import PY3  # noqa
+from neon.util.persist import get_data_cache_dir  # noqa
 
 logger = logging.getLogger(__name__)
 
@@ -85,6 +87,41 @@ class Dataset(NervanaObject):
             filepath = filepath.split('.zip')[0]
         return filepath
 
+    def load_cache(self, name, keys, build):
+        """
+        Load decoded arrays of the data set from .npy files of the data cache directory
+        (see neon.util.persist.get_data_cache_dir), memory mapped.  On the first call, the
+        arrays are decoded by build and written to the cache, so later runs skip the
+        decoding.  Arrays should be stored compactly, e.g. images as uint8 pixels, and
+        normalized when loading the minibatches (see NormalizedArrayIterator).
+
+        Arguments:
+            name (str): name of the cache entry, prefix of its files
+            keys (list): names of the arrays of the entry
+            build (function): returns the dict of numpy arrays of the entry, by key
+
+        Returns:
+            dict: read-only numpy arrays by key
+        """
+        cache_dir = get_data_cache_dir(self.path, 'decoded')
+        files = dict((key, os.path.join(cache_dir, '%s_%s.npy' % (name, key))) for key in keys)
+        if all(os.path.exists(f) for f in files.values()):
+            return dict((key, np.load(f, mmap_mode='r')) for key, f in files.items())
+
+        logger.info("Decoding %s into the data cache %s", name, cache_dir)
+        arrays = build()
+        try:
+            for key, f in files.items():
+                # concurrent jobs write whole files and rename them into place
+                tmp_file = '%s.%d.tmp' % (f, os.getpid())
+                with open(tmp_file, 'wb') as fp:
+                    np.save(fp, arrays[key])
+                os.rename(tmp_file, f)
+        except (IOError, OSError) as e:
+            logger.warning("Could not write the data cache %s: %s", cache_dir, e)
+            return arrays
+        return dict((key, np.load(f, mmap_mode='r')) for key, f in files.items())
+
     @staticmethod
     def _valid_path_append(path, *args):
         """
@@ -130,6 +167,7 @@ class Dataset(NervanaObject):
             destfile (str): Path to the destination.
             totalsz (int): Size of the file to be downloaded.
         """
+        from future.moves.urllib.request import Request, urlopen
         req = Request(os.path.join(url, sourcefile), headers={'User-Agent': 'neon'})
         # backport https limitation and workaround per http://python-future.org/imports.html
         cloudfile = urlopen(req)
@@ -17,7 +17,6 @@
 Defines basic input datatset types.
 """
 import os
-import h5py
 import logging
 import numpy as np
 
@@ -73,6 +72,7 @@ class HDF5Iterator(ArrayIterator):
 
         if not os.path.isfile(hdf_filename):
             raise IOError('File not found %s' % hdf_filename)
+        import h5py
         self.hdf_file = h5py.File(hdf_filename, mode='r', driver=None)
 
         # input data array
@@ -30,7 +30,7 @@ import tarfile  # noqa
 from neon.util.compat import pickle  # noqa
 from neon.util.compat import pickle_load  # noqa
 from neon.data.datasets import Dataset  # noqa
-from neon.data.dataiterator import ArrayIterator  # noqa
+from neon.data.dataiterator import ArrayIterator, NormalizedArrayIterator  # noqa
 
 logger = logging.getLogger(__name__)
 
@@ -55,6 +55,76 @@ class MNIST(Dataset):
         self.shuffle = shuffle
         self.subset_pct = subset_pct
 
+    def load_decoded(self):
+        """
+        Load the uint8 images and the labels of MNIST from the data cache, fetching and
+        decoding the dataset on the first call.
+
+        Returns:
+            tuple: training and test sets, with images of shape (N, 28, 28)
+        """
+        def decode():
+            filepath = self._valid_path_append(self.path, self.filename)
+            if not os.path.exists(filepath):
+                self.fetch_dataset(self.url, self.filename, filepath, self.size)
+
+            with gzip.open(filepath, 'rb') as mnist:
+                (X_train, y_train), (X_test, y_test) = pickle_load(mnist)
+            return {'X_train': np.asarray(X_train, dtype=np.uint8),
+                    'y_train': np.asarray(y_train, dtype=np.int32),
+                    'X_test': np.asarray(X_test, dtype=np.uint8),
+                    'y_test': np.asarray(y_test, dtype=np.int32)}
+
+        d = self.load_cache('mnist', ['X_train', 'y_train', 'X_test', 'y_test'], decode)
+        X_train, y_train, X_test, y_test = d['X_train'], d['y_train'], d['X_test'], d['y_test']
+
+        if self.subset_pct < 100:
+            X_train = X_train[:int(X_train.shape[0] * self.subset_pct / 100.)]
+            y_train = y_train[:int(y_train.shape[0] * self.subset_pct / 100.)]
+            X_test = X_test[:int(X_test.shape[0] * self.subset_pct / 100.)]
+            y_test = y_test[:int(y_test.shape[0] * self.subset_pct / 100.)]
+            logger.debug("subset %d%% of data", self.subset_pct*100)
+
+        return (X_train, y_train), (X_test, y_test)
+
+    def load_uint8(self):
+        """
+        Load the MNIST dataset, padded or cropped to size, with uint8 pixels.
+
+        Returns:
+            tuple: training and test sets, with images flattened to size*size
+        """
+        (X_train, y_train), (X_test, y_test) = self.load_decoded()
+
+        if self.size > 28:
+            n_train, n_test = X_train.shape[0], X_test.shape[0]
+            X_train_ = np.zeros(shape=(n_train, self.size, self.size), dtype=np.uint8)
+            X_test_ = np.zeros(shape=(n_test, self.size, self.size), dtype=np.uint8)
+            X_train_[:, :28, :28] = X_train
+            X_test_[:, :28, :28] = X_test
+        else:
+            X_train_ = X_train[:, :self.size, :self.size]
+            X_test_ = X_test[:, :self.size, :self.size]
+        X_train = X_train_.reshape(-1, self.size*self.size)
+        X_test = X_test_.reshape(-1, self.size*self.size)
+
+        if self.shuffle:
+            np.random.seed(0)
+            X_train = X_train[np.random.permutation(X_train.shape[0])]
+
+        return (X_train, y_train), (X_test, y_test)
+
+    def normalization(self):
+        """
+        Returns:
+            tuple: scale and shift of the pixels
+        """
+        if not self.normalize:
+            return 1., 0.
+        if self.sym_range:
+            return 2. / 255., -1.
+        return 1. / 255., 0.
+
     def load_data(self):
         """
         Fetch the MNIST dataset and load it into memory.
@@ -68,57 +138,31 @@ class MNIST(Dataset):
         Returns:
             tuple: Both training and test sets are returned.
         """
-        filepath = self._valid_path_append(self.path, self.filename)
-        if not os.path.exists(filepath):
-            self.fetch_dataset(self.url, self.filename, filepath, self.size)
-
-        with gzip.open(filepath, 'rb') as mnist:
-            (X_train, y_train), (X_test, y_test) = pickle_load(mnist)
-
-            if self.subset_pct < 100:
-                X_train = X_train[:int(X_train.shape[0] * self.subset_pct / 100.)]
-                y_train = y_train[:int(y_train.shape[0] * self.subset_pct / 100.)]
-                X_test = X_test[:int(X_test.shape[0] * self.subset_pct / 100.)]
-                y_test = y_test[:int(y_test.shape[0] * self.subset_pct / 100.)]
-                logger.debug("subset %d%% of data", self.subset_pct*100)
-
-            if self.size > 28:
-                n_train, n_test = X_train.shape[0], X_test.shape[0]
-                X_train_ = np.zeros(shape=(n_train, self.size, self.size))
-                X_test_ = np.zeros(shape=(n_test, self.size, self.size))
-                X_train_[:, :28, :28] = X_train
-                X_test_[:, :28, :28] = X_test
-            else:
-                X_train_ = X_train[:, :self.size, :self.size]
-                X_test_ = X_test[:, :self.size, :self.size]
-            X_train = X_train_.reshape(-1, self.size*self.size)
-            X_test = X_test_.reshape(-1, self.size*self.size)
-
-            if self.normalize:
-                X_train = X_train / 255.
-                X_test = X_test / 255.
-                if self.sym_range:
-                    X_train = X_train * 2. - 1.
-                    X_test = X_test * 2. - 1.
-
-            if self.shuffle:
-                np.random.seed(0)
-                np.random.shuffle(X_train)
-
+        (X_train, y_train), (X_test, y_test) = self.load_uint8()
+        if self.normalize:
+            scale, shift = self.normalization()
+            X_train = X_train * scale + shift
+            X_test = X_test * scale + shift
         return (X_train, y_train), (X_test, y_test), 10
 
     def gen_iterators(self):
-        (X_train, y_train), (X_test, y_test), nclass = self.load_data()
-        train = ArrayIterator(X_train,
-                              y_train,
-                              nclass=nclass,
-                              lshape=(1, self.size, self.size),
-                              name='train')
-        val = ArrayIterator(X_test,
-                            y_test,
-                            nclass=nclass,
-                            lshape=(1, self.size, self.size),
-                            name='valid')
+        # the pixels are normalized in each minibatch
+        (X_train, y_train), (X_test, y_test) = self.load_uint8()
+        scale, shift = self.normalization()
+        train = NormalizedArrayIterator(X_train,
+                                        y_train,
+                                        nclass=10,
+                                        lshape=(1, self.size, self.size),
+                                        name='train',
+                                        scale=scale,
+                                        shift=shift)
+        val = NormalizedArrayIterator(X_test,
+                                      y_test,
+                                      nclass=10,
+                                      lshape=(1, self.size, self.size),
+                                      name='valid',
+                                      scale=scale,
+                                      shift=shift)
         self._data_dict = {'train': train,
                            'valid': val}
         return self._data_dict
@@ -171,77 +215,108 @@ class CIFAR10(Dataset):
         self.whiten = whiten
         self.pad_classes = pad_classes
 
-    def load_data(self):
+    def load_decoded(self):
         """
-        Fetch the CIFAR-10 dataset and load it into memory.
-
-        Arguments:
-            path (str, optional): Local directory in which to cache the raw
-                                  dataset.  Defaults to current directory.
-            normalize (bool, optional): Whether to scale values between 0 and 1.
-                                        Defaults to True.
+        Load the uint8 images and the labels of CIFAR-10 from the data cache, fetching and
+        decoding the dataset on the first call.
 
         Returns:
-            tuple: Both training and test sets are returned.
+            tuple: training and test sets, with images of shape (N, 3*32*32)
         """
         workdir, filepath = self._valid_path_append(self.path, '', self.filename)
         batchdir = os.path.join(workdir, 'cifar-10-batches-py')
-        if not os.path.exists(os.path.join(batchdir, 'data_batch_1')):
-            if not os.path.exists(filepath):
-                self.fetch_dataset(self.url, self.filename, filepath, self.size)
-            with tarfile.open(filepath, 'r:gz') as f:
-                f.extractall(workdir)
 
-        train_batches = [os.path.join(batchdir, 'data_batch_' + str(i)) for i in range(1, 6)]
-        Xlist, ylist = [], []
-        for batch in train_batches:
-            with open(batch, 'rb') as f:
+        def decode():
+            if not os.path.exists(os.path.join(batchdir, 'data_batch_1')):
+                if not os.path.exists(filepath):
+                    self.fetch_dataset(self.url, self.filename, filepath, self.size)
+                with tarfile.open(filepath, 'r:gz') as f:
+                    f.extractall(workdir)
+
+            train_batches = [os.path.join(batchdir, 'data_batch_' + str(i))
+                             for i in range(1, 6)]
+            Xlist, ylist = [], []
+            for batch in train_batches:
+                with open(batch, 'rb') as f:
+                    d = pickle_load(f)
+                    Xlist.append(d['data'])
+                    ylist.append(d['labels'])
+
+            with open(os.path.join(batchdir, 'test_batch'), 'rb') as f:
                 d = pickle_load(f)
-                Xlist.append(d['data'])
-                ylist.append(d['labels'])
+                X_test, y_test = d['data'], d['labels']
 
-        X_train = np.vstack(Xlist)
-        y_train = np.vstack(ylist)
+            return {'X_train': np.vstack(Xlist).astype(np.uint8),
+                    'y_train': np.array(ylist, dtype=np.int32).reshape(-1, 1),
+                    'X_test': np.asarray(X_test, dtype=np.uint8),
+                    'y_test': np.array(y_test, dtype=np.int32).reshape(-1, 1)}
 
-        with open(os.path.join(batchdir, 'test_batch'), 'rb') as f:
-            d = pickle_load(f)
-            X_test, y_test = d['data'], d['labels']
+        d = self.load_cache('cifar10', ['X_train', 'y_train', 'X_test', 'y_test'], decode)
+        return (d['X_train'], d['y_train']), (d['X_test'], d['y_test'])
+
+    def preprocess(self, X):
+        """
+        Apply the contrast normalization and scaling options to images.
 
-        y_train = y_train.reshape(-1, 1)
-        y_test = np.array(y_test).reshape(-1, 1)
+        Arguments:
+            X (ndarray): uint8 images, of shape (N, 3*32*32)
 
+        Returns:
+            ndarray: preprocessed images
+        """
         if self.contrast_normalize:
             norm_scale = 55.0  # Goodfellow
-            X_train = self.global_contrast_normalize(X_train, scale=norm_scale)
-            X_test = self.global_contrast_normalize(X_test, scale=norm_scale)
+            X = self.global_contrast_normalize(X, scale=norm_scale)
 
         if self.normalize:
-            X_train = X_train / 255.
-            X_test = X_test / 255.
+            X = X / 255.
+        return X
+
+    def load_data(self):
+        """
+        Fetch the CIFAR-10 dataset and load it into memory.
+
+        Arguments:
+            path (str, optional): Local directory in which to cache the raw
+                                  dataset.  Defaults to current directory.
+            normalize (bool, optional): Whether to scale values between 0 and 1.
+                                        Defaults to True.
+
+        Returns:
+            tuple: Both training and test sets are returned.
+        """
+        (X_train, y_train), (X_test, y_test) = self.load_decoded()
+        X_train = self.preprocess(X_train)
+        X_test = self.preprocess(X_test)
 
         if self.whiten:
-            zca_cache = os.path.join(workdir, 'cifar-10-zca-cache.pkl')
-            X_train, X_test = self.zca_whiten(X_train, X_test, cache=zca_cache)
+            X_train, X_test = self.zca_whiten(X_train, X_test, cache=self.zca_cache())
 
         return (X_train, y_train), (X_test, y_test), 10
 
+    def zca_cache(self):
+        """
+        Returns:
+            str: file of the cached ZCA transform
+        """
+        return self._valid_path_append(self.path, 'cifar-10-zca-cache.pkl')
+
     def gen_iterators(self):
-        datasets = self.load_data()
-
-        (X_train, y_train), (X_test, y_test), nclass = datasets
-        if self.pad_classes:
-            nclass = 16
-
-        train = ArrayIterator(X_train,
-                              y_train,
-                              nclass=nclass,
-                              lshape=(3, 32, 32),
-                              name='train')
-        test = ArrayIterator(X_test,
-                             y_test,
-                             nclass=nclass,
-                             lshape=(3, 32, 32),
-                             name='valid')
+        # the images are kept as uint8 and preprocessed in each minibatch
+        (X_train, y_train), (X_test, y_test) = self.load_decoded()
+        nclass = 16 if self.pad_classes else 10
+
+        whiten = None
+        if self.whiten:
+            whiten = self.zca_transform(X_train, cache=self.zca_cache(),
+                                        preprocess=self.preprocess)
+        options = dict(nclass=nclass,
+                       lshape=(3, 32, 32),
+                       scale=1. / 255. if self.normalize else 1.,
+                       contrast_normalize=55.0 if self.contrast_normalize else None,
+                       whiten=whiten)
+        train = NormalizedArrayIterator(X_train, y_train, name='train', **options)
+        test = NormalizedArrayIterator(X_test, y_test, name='valid', **options)
         self._data_dict = {'train': train,
                            'valid': test}
         return self._data_dict
@@ -266,21 +341,41 @@ class CIFAR10(Dataset):
         W = np.dot(E, np.dot(np.diag(D), E.T))
         return meanX, W
 
+    @staticmethod
+    def zca_transform(train, cache=None, preprocess=None):
+        """
+        Load the ZCA whitening transform of the train set from the cache file, or compute
+        it.
+
+        Arguments:
+            train (ndarray): train set
+            cache (str, optional): file of the cached transform
+            preprocess (function, optional): applied to the train set before computing the
+                                             transform
+
+        Returns:
+            tuple: mean and transform matrix W, applied as (x - mean) W
+        """
+        if cache and os.path.isfile(cache):
+            with open(cache, 'rb') as f:
+                return pickle_load(f)
+
+        if preprocess is not None:
+            train = preprocess(train)
+        meanX, W = CIFAR10._compute_zca_transform(train)
+        if cache:
+            logger.info("Caching ZCA transform matrix")
+            with open(cache, 'wb') as f:
+                pickle.dump((meanX, W), f, 2)
+        return meanX, W
+
     @staticmethod
     def zca_whiten(train, test, cache=None):
         """
         Use train set statistics to apply the ZCA whitening transform to
         both train and test sets.
         """
-        if cache and os.path.isfile(cache):
-            with open(cache, 'rb') as f:
-                (meanX, W) = pickle_load(f)
-        else:
-            meanX, W = CIFAR10._compute_zca_transform(train)
-            if cache:
-                logger.info("Caching ZCA transform matrix")
-                with open(cache, 'wb') as f:
-                    pickle.dump((meanX, W), f, 2)
+        meanX, W = CIFAR10.zca_transform(train, cache=cache)
 
         logger.info("Applying ZCA whitening transform")
         train_w = np.dot(train - meanX, W)
@@ -0,0 +1,219 @@
+# ******************************************************************************
+# Copyright 2017-2018 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ******************************************************************************
+"""
+Parallel and resumable ingest of data sets.
+
+The work of an ingest is split into shards (e.g. the class tars of ImageNet, or the images
+of a detection data set), processed by a pool of processes.  Each processed shard is
+appended to a journal with its manifest records and the sizes and hashes of its output
+files, so a rerun of an interrupted ingest only processes the shards missing from the
+journal or whose outputs no longer match their hashes.
+"""
+from __future__ import division
+from builtins import str
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+
+from neon.util.persist import ensure_dirs_exist
+
+logger = logging.getLogger(__name__)
+
+
+def file_hash(path, algorithm='sha1', chunk_size=1 << 20):
+    """
+    Hash the content of a file.
+
+    Arguments:
+        path (str): file to hash
+        algorithm (str, optional): hashlib algorithm
+        chunk_size (int, optional): bytes read at a time
+
+    Returns:
+        str: hex digest of the file
+    """
+    h = hashlib.new(algorithm)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class IngestJournal(object):
+    """
+    Append-only journal of the shards completed by an ingest, a JSON line per shard with
+    its key, its manifest records and the size and hash of each of its output files.
+
+    Arguments:
+        journal_file (str): file of the journal, created if needed
+    """
+
+    def __init__(self, journal_file):
+        self.journal_file = ensure_dirs_exist(journal_file)
+        self.entries = {}
+        if os.path.exists(journal_file):
+            with open(journal_file) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # the last line of an interrupted ingest may be truncated
+                        logger.warning("Ignoring a corrupt line of ingest journal %s",
+                                       journal_file)
+                        continue
+                    self.entries[entry['key']] = entry
+
+    def completed(self, key, verify=True):
+        """
+        Look up a completed shard, checking that its output files are unchanged.
+
+        Arguments:
+            key (str): key of the shard
+            verify (bool, optional): check the hashes of the output files, otherwise only
+                                     their sizes
+
+        Returns:
+            list: manifest records of the shard, None if it has to be processed
+        """
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        for path, (size, digest) in entry['files'].items():
+            if not os.path.exists(path) or os.path.getsize(path) != size or \
+                    (verify and file_hash(path) != digest):
+                logger.warning("Output %s of shard %s changed, processing it again", path, key)
+                return None
+        return entry['records']
+
+    def record(self, key, records, files):
+        """
+        Append a completed shard to the journal.
+
+        Arguments:
+            key (str): key of the shard
+            records (list): manifest records of the shard
+            files (dict): [size, hash] of the output files of the shard, by path
+        """
+        entry = {'key': key, 'records': records, 'files': files}
+        self.entries[key] = entry
+        with open(self.journal_file, 'a') as f:
+            f.write(json.dumps(entry) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def process_shard(args):
+    """
+    Process a shard in a worker, and hash its output files.
+
+    Arguments:
+        args (tuple): process function, key and argument of the shard, and columns of the
+                      records holding output files
+
+    Returns:
+        tuple: key, manifest records and output files of the shard
+    """
+    process, key, shard, file_columns = args
+    records = [list(record) for record in process(shard)]
+    files = {}
+    for record in records:
+        for column in file_columns:
+            path = record[column]
+            files[path] = [os.path.getsize(path), file_hash(path)]
+    return key, records, files
+
+
+def ingest_shards(shards, process, journal_file, num_workers=None, file_columns=(0,),
+                  verify=True):
+    """
+    Process the shards of an ingest in a pool of processes, skipping the shards completed
+    by a previous run according to the journal.
+
+    Arguments:
+        shards (list): (key, argument) of each shard, the keys being unique strings
+        process (function): function of a shard argument returning the manifest records
+                            (tuples) of the shard.  It has to be picklable, i.e. defined
+                            at the top level of a module.
+        journal_file (str): file of the journal of the completed shards
+        num_workers (int, optional): number of processes, defaults to the number of CPUs.
+                                     0 processes the shards in the calling process.
+        file_columns (tuple, optional): columns of the records holding output files,
+                                        which are hashed
+        verify (bool, optional): check the hashes of the outputs of the completed shards
+
+    Returns:
+        list: manifest records of all the shards, in the order of the shards
+    """
+    journal = IngestJournal(journal_file)
+    records = {}
+    pending = []
+    for key, shard in shards:
+        done = journal.completed(key, verify)
+        if done is None:
+            pending.append((process, key, shard, file_columns))
+        else:
+            records[key] = done
+    if records:
+        logger.info("Skipping %d shards completed by a previous ingest", len(records))
+
+    if pending:
+        from tqdm import tqdm
+        if num_workers == 0:
+            results = (process_shard(args) for args in pending)
+            pool = None
+        else:
+            pool = multiprocessing.Pool(num_workers)
+            results = pool.imap_unordered(process_shard, pending)
+        try:
+            for key, shard_records, files in tqdm(results, total=len(pending)):
+                journal.record(key, shard_records, files)
+                records[key] = shard_records
+        finally:
+            if pool is not None:
+                pool.terminate()
+                pool.join()
+
+    return [record for key, _ in shards for record in records[key]]
+
+
+def write_manifest(manifest_file, records, header=('@FILE', 'STRING'), root_dir=None,
+                   file_columns=(0,)):
+    """
+    Write an aeon manifest atomically, so an interrupted ingest never leaves a partial
+    manifest.
+
+    Arguments:
+        manifest_file (str): file of the manifest
+        records (list): records of the manifest
+        header (tuple, optional): '@' header line of the manifest, none if None
+        root_dir (str, optional): directory the file columns of the records are written
+                                  relative to
+        file_columns (tuple, optional): columns of the records holding files
+    """
+    lines = [] if header is None else ['\t'.join(header)]
+    for record in records:
+        fields = [str(field) for field in record]
+        if root_dir is not None:
+            for column in file_columns:
+                fields[column] = os.path.relpath(fields[column], root_dir)
+        lines.append('\t'.join(fields))
+
+    tmp_file = '%s.%d.tmp' % (manifest_file, os.getpid())
+    with open(tmp_file, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+    os.rename(tmp_file, manifest_file)
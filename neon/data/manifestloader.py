@@ -0,0 +1,367 @@
+# ******************************************************************************
+# Copyright 2017-2018 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ******************************************************************************
+"""
+Python loader of image manifests, decoding the images in a pool of processes.
+"""
+from __future__ import division
+from builtins import range
+import logging
+import multiprocessing
+import os
+import traceback
+from collections import deque
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+try:
+    from queue import Empty
+except ImportError:
+    from Queue import Empty
+
+
+def decode_image(path, height, width, channels=3):
+    """
+    Decode an image file and resize it.
+
+    Arguments:
+        path (str): image file
+        height (int): output height
+        width (int): output width
+        channels (int, optional): 3 for BGR images, 1 for grayscale
+
+    Returns:
+        numpy.ndarray: uint8 image of shape (channels, height, width)
+    """
+    from PIL import Image
+    img = Image.open(path)
+    mode = 'RGB' if channels == 3 else 'L'
+    # JPEG images are decoded at the smallest scale larger than the output
+    img.draft(mode, (width, height))
+    img = img.convert(mode)
+    if img.size != (width, height):
+        img = img.resize((width, height), Image.BILINEAR)
+    img = np.asarray(img, dtype=np.uint8)
+    if channels == 1:
+        return img[np.newaxis]
+    # RGB to BGR, HWC to CHW
+    return img[:, :, ::-1].transpose((2, 0, 1))
+
+
+def read_manifest(manifest_file, manifest_root=None):
+    """
+    Read a manifest of image files and labels, in the format of aeon v1.0+ (tab separated
+    with an '@' header, see neon.data.convert_manifest) or of the previous versions
+    (comma separated, the label in a file).
+
+    Arguments:
+        manifest_file (str): manifest to read
+        manifest_root (str, optional): directory of the relative paths of the manifest,
+                                       defaults to the directory of the manifest
+
+    Returns:
+        tuple: list of image paths and int32 array of labels
+    """
+    if manifest_root is None:
+        manifest_root = os.path.dirname(os.path.abspath(manifest_file))
+
+    def path(p):
+        return os.path.join(manifest_root, p)
+
+    label_types = None
+    paths, labels = [], []
+    with open(manifest_file) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            sep = '\t' if '\t' in line else ','
+            fields = [field.strip() for field in line.split(sep)]
+            if fields[0].startswith('@'):
+                label_types = [t.upper() for t in fields[1:]]
+                continue
+            paths.append(path(fields[0]))
+            if len(fields) < 2:
+                labels.append(0)
+            elif label_types is not None and label_types[0] == 'STRING':
+                labels.append(int(fields[1]))
+            else:
+                with open(path(fields[1])) as label_file:
+                    labels.append(int(label_file.read().strip()))
+
+    return paths, np.array(labels, dtype=np.int32)
+
+
+def decode_worker(tasks, done, image_buffers, shape):
+    """
+    Decode the minibatches of tasks into the shared image buffers, until a None task.
+
+    Arguments:
+        tasks (Queue): (slot, batch index, image paths) tasks
+        done (Queue): (slot, batch index, error message or None) results
+        image_buffers (RawArray): shared buffers of the minibatches
+        shape (tuple): (slots, batch size, channels, height, width) of image_buffers
+    """
+    images = np.frombuffer(image_buffers, dtype=np.uint8).reshape(shape)
+    channels, height, width = shape[2:]
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        slot, batch, paths = task
+        try:
+            for row, path in enumerate(paths):
+                images[slot, row] = decode_image(path, height, width, channels)
+            done.put((slot, batch, None))
+        except Exception:
+            done.put((slot, batch, traceback.format_exc()))
+
+
+class ManifestLoader(object):
+    """
+    Loads the minibatches of images and labels of a manifest, with the images decoded and
+    resized by a pool of worker processes into a ring of minibatch buffers in shared
+    memory.  It takes the configuration dict of the aeon DataLoader, of which it supports
+    image (height, width and channels) and label etl, and the manifest_filename,
+    manifest_root, batch_size, subset_fraction, shuffle_manifest and random_seed
+    settings.  Like aeon, the last minibatch of an epoch is completed with the first
+    images, so it can be wrapped with DataLoaderAdapter.
+
+    Each minibatch is a list of ('image', (N, C*H*W) uint8 array) and ('label', (N, 1)
+    int32 array), the BGR images laid out as CHW.  The arrays are valid until the next
+    minibatch is requested.
+
+    Arguments:
+        config (dict): aeon style configuration
+        num_workers (int, optional): number of decoding processes, defaults to the number
+                                     of CPUs.  0 decodes in the calling process.
+        slots (int, optional): number of minibatch buffers, defaults to twice the number of
+                               workers
+    """
+
+    def __init__(self, config, num_workers=None, slots=None):
+        self.config = config
+        image_config = [c for c in config['etl'] if c['type'] == 'image']
+        unsupported = [c['type'] for c in config['etl'] if c['type'] not in ('image', 'label')]
+        if len(image_config) != 1 or unsupported:
+            raise NotImplementedError('ManifestLoader only supports image and label etl')
+        image_config = image_config[0]
+        self.image_shape = (image_config.get('channels', 3), image_config['height'],
+                            image_config['width'])
+        self.batch_size = config['batch_size']
+
+        self.paths, self.labels = read_manifest(config['manifest_filename'],
+                                                config.get('manifest_root'))
+        self.ndata = len(self.paths)
+        if 'subset_fraction' in config:
+            self.ndata = max(int(self.ndata * config['subset_fraction']), 1)
+        self.nbatches = -(-self.ndata // self.batch_size)
+        self.shuffle = config.get('shuffle_manifest', False) or config.get('shuffle_enable',
+                                                                           False)
+        self.rng = np.random.RandomState(config.get('random_seed', 0))
+
+        self.axes_info = [('image', tuple(zip(('channels', 'height', 'width'),
+                                              self.image_shape))),
+                          ('label', (('dim0', 1),))]
+
+        self.num_workers = multiprocessing.cpu_count() if num_workers is None else num_workers
+        self.slots = slots or max(2 * self.num_workers, 1)
+        self.workers = []
+        self.buffer_shape = (self.slots, self.batch_size) + self.image_shape
+        self.image_buffers = multiprocessing.RawArray('B', int(np.prod(self.buffer_shape)))
+        self.images = np.frombuffer(self.image_buffers, dtype=np.uint8).reshape(
+            self.buffer_shape)
+        self.batch_labels = np.zeros((self.slots, self.batch_size, 1), dtype=np.int32)
+
+    def start(self):
+        """
+        Start the worker processes.
+        """
+        if self.workers or self.num_workers == 0:
+            return
+        self.tasks = multiprocessing.Queue()
+        self.done = multiprocessing.Queue()
+        for _ in range(self.num_workers):
+            worker = multiprocessing.Process(target=decode_worker,
+                                             args=(self.tasks, self.done, self.image_buffers,
+                                                   self.buffer_shape))
+            worker.daemon = True
+            worker.start()
+            self.workers.append(worker)
+
+    def close(self):
+        """
+        Stop the worker processes.
+        """
+        for _ in self.workers:
+            self.tasks.put(None)
+        for worker in self.workers:
+            worker.join()
+        self.workers = []
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+    def epoch_order(self):
+        """
+        Indices of the images of the minibatches of an epoch.
+
+        Returns:
+            numpy.ndarray: (nbatches, batch_size) image indices
+        """
+        order = np.arange(self.ndata)
+        if self.shuffle:
+            self.rng.shuffle(order)
+        order = np.resize(order, self.nbatches * self.batch_size)
+        return order.reshape((self.nbatches, self.batch_size))
+
+    def wait(self):
+        """
+        Wait for a minibatch decoded by the workers, of the pending ones.
+
+        Returns:
+            tuple: slot and index of the minibatch
+        """
+        while True:
+            try:
+                slot, batch, error = self.done.get(timeout=1.0)
+            except Empty:
+                if not all(worker.is_alive() for worker in self.workers):
+                    self.workers = [w for w in self.workers if w.is_alive()]
+                    raise RuntimeError('ManifestLoader worker process died')
+                continue
+            self.pending -= 1
+            if error is not None:
+                raise RuntimeError('ManifestLoader worker failed:\n' + error)
+            return slot, batch
+
+    def __iter__(self):
+        self.start()
+        order = self.epoch_order()
+
+        if self.num_workers == 0:
+            for inds in order:
+                for row, ind in enumerate(inds):
+                    self.images[0, row] = decode_image(self.paths[ind], *self.image_shape[1:])
+                yield self.minibatch(0, inds)
+            return
+
+        free = deque(range(self.slots))
+        submitted, ready = 0, {}
+        self.pending = 0
+        try:
+            for batch, inds in enumerate(order):
+                # keep the workers busy with the next minibatches
+                while free and submitted < self.nbatches:
+                    self.tasks.put((free.popleft(), submitted,
+                                    [self.paths[i] for i in order[submitted]]))
+                    submitted += 1
+                    self.pending += 1
+                while batch not in ready:
+                    slot, done_batch = self.wait()
+                    ready[done_batch] = slot
+
+                slot = ready.pop(batch)
+                yield self.minibatch(slot, inds)
+                free.append(slot)
+        finally:
+            # let the workers finish the minibatches of an interrupted epoch
+            while self.pending > 0 and self.workers:
+                try:
+                    self.wait()
+                except RuntimeError:
+                    pass
+
+    def minibatch(self, slot, inds):
+        """
+        Returns the buffers of a minibatch.
+        """
+        self.batch_labels[slot, :, 0] = self.labels[inds]
+        return [('image', self.images[slot].reshape((self.batch_size, -1))),
+                ('label', self.batch_labels[slot])]
+
+
+def benchmark(num_images=512, height=224, width=224, batch_size=64, workers=(1, 2, 4),
+              directory=None):
+    """
+    Time the loading of a synthetic set of JPEG images, for several numbers of workers.
+
+    Arguments:
+        num_images (int, optional): number of images of the set
+        height (int, optional): height of the images and of the output
+        width (int, optional): width of the images and of the output
+        batch_size (int, optional): minibatch size
+        workers (tuple, optional): numbers of workers to time
+        directory (str, optional): directory of the set, a temporary one by default
+
+    Returns:
+        dict: images per second by number of workers
+    """
+    import shutil
+    import tempfile
+    import time
+    from PIL import Image
+
+    tmp_dir = directory or tempfile.mkdtemp()
+    try:
+        manifest = os.path.join(tmp_dir, 'manifest.tsv')
+        rng = np.random.RandomState(0)
+        with open(manifest, 'w') as f:
+            f.write('@FILE\tSTRING\n')
+            for i in range(num_images):
+                # smooth random images, compressing like photographs
+                img = rng.randint(0, 256, (height // 8, width // 8, 3)).astype(np.uint8)
+                img = Image.fromarray(img).resize((width * 2, height * 2), Image.BILINEAR)
+                img.save(os.path.join(tmp_dir, '%d.jpg' % i), quality=90)
+                f.write('%d.jpg\t%d\n' % (i, i % 10))
+
+        config = {'manifest_filename': manifest, 'batch_size': batch_size,
+                  'etl': [{'type': 'image', 'height': height, 'width': width},
+                          {'type': 'label', 'binary': False}]}
+        rates = {}
+        for num_workers in workers:
+            loader = ManifestLoader(config, num_workers=num_workers)
+            # the first epoch starts the workers and warms the file cache
+            for _ in loader:
+                pass
+            start = time.time()
+            for _ in loader:
+                pass
+            rates[num_workers] = loader.nbatches * batch_size / (time.time() - start)
+            loader.close()
+            logger.info('%d workers: %.1f images/s', num_workers, rates[num_workers])
+        return rates
+    finally:
+        if directory is None:
+            shutil.rmtree(tmp_dir)
+
+
+if __name__ == '__main__':
+    from configargparse import ArgumentParser
+    parser = ArgumentParser()
+    parser.add_argument('--num_images', type=int, default=512)
+    parser.add_argument('--size', type=int, default=224, help='height and width of the images')
+    parser.add_argument('--batch_size', type=int, default=64)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    args = parser.parse_args()
+
+    rates = benchmark(args.num_images, args.size, args.size, args.batch_size, args.workers)
+    for num_workers in sorted(rates):
+        print('{} workers: {:.1f} images/s'.format(num_workers, rates[num_workers]))
@@ -20,7 +20,6 @@ Defines text datatset handling.
 import logging
 import numpy as np
 import os
-import h5py
 
 from neon.data.dataiterator import NervanaDataIterator, ArrayIterator
 from neon.data.datasets import Dataset
@@ -35,7 +34,8 @@ class Text(NervanaDataIterator):
     """
 
     def __init__(self, time_steps, path, vocab=None, tokenizer=None,
-                 onehot_input=True, reverse_target=False, get_prev_target=False):
+                 onehot_input=True, reverse_target=False, get_prev_target=False,
+                 token_ids=None, onehot_target=True):
         """
         Construct a text dataset object.
 
@@ -54,16 +54,28 @@ class Text(NervanaDataIterator):
                                        input. If condition, shape will be a tuple
                                        of shapes, corresponding to encoder and
                                        decoder inputs.
+            token_ids (numpy.ndarray, optional): indices in vocab of the tokens of the
+                                                 text, used instead of reading path, e.g.
+                                                 from a data set cache.  vocab is then the
+                                                 list of tokens of the indices.
+            onehot_target (boolean): One-hot representation of target, otherwise
+                                     (1, time_steps * batch size) int32 indices, e.g.
+                                     for SampledSoftmax and ClassFactoredSoftmax
+                                     outputs over large vocabularies
         """
         super(Text, self).__init__(name=None)
 
         self.seq_length = time_steps
         self.onehot_input = onehot_input
+        self.onehot_target = onehot_target
         self.batch_index = 0
         self.reverse_target = reverse_target
         self.get_prev_target = get_prev_target
 
-        X, y = self._get_data(path, tokenizer, vocab)
+        if token_ids is None:
+            X, y = self._get_data(path, tokenizer, vocab)
+        else:
+            X, y = self._index_data(token_ids, vocab)
 
         # reshape to preserve sentence continuity across batches
         self.X = X.reshape(self.be.bsz, self.nbatches, time_steps)
@@ -83,9 +95,18 @@ class Text(NervanaDataIterator):
                 self.dev_Z = self.be.iobuf(time_steps, dtype=np.int32)
         self.decoder_shape = self.shape
 
-        self.dev_y = self.be.iobuf((self.nout, time_steps))
+        # the onehot targets are also the previous targets of onehot decoder inputs
+        if self.onehot_target or (self.get_prev_target and self.onehot_input):
+            self.dev_y = self.be.iobuf((self.nout, time_steps))
+        else:
+            self.dev_y = None
         self.dev_lbl = self.be.iobuf(time_steps, dtype=np.int32)
         self.dev_lblflat = self.dev_lbl.reshape((1, -1))
+        if self.onehot_target:
+            self.target = self.dev_y
+        else:
+            self.dev_ylbl = self.be.iobuf(time_steps, dtype=np.int32)
+            self.target = self.dev_ylbl.reshape((1, -1))
 
     def _get_data(self, path, tokenizer, vocab):
 
@@ -115,6 +136,36 @@ class Text(NervanaDataIterator):
 
         return X, y
 
+    def _index_data(self, token_ids, vocab):
+        """
+        Inputs and targets from the indices of the tokens of a text.
+
+        Arguments:
+            token_ids (numpy.ndarray): indices in vocab of the tokens
+            vocab (list): tokens of the indices
+
+        Returns:
+            tuple: input and target indices
+        """
+        extra_tokens = len(token_ids) % (self.be.bsz * self.seq_length)
+        if extra_tokens:
+            token_ids = token_ids[:-extra_tokens]
+        self.nbatches = len(token_ids) // (self.be.bsz * self.seq_length)
+        self.ndata = self.nbatches * self.be.bsz  # no leftovers
+
+        self.vocab = list(vocab)
+        self.nclass = len(self.vocab)
+        self.token_to_index = dict((t, i) for i, t in enumerate(self.vocab))
+        self.index_to_token = dict((i, t) for i, t in enumerate(self.vocab))
+
+        X = np.asarray(token_ids, dtype=np.uint32)
+        if self.reverse_target:
+            y = X.copy()
+        else:
+            y = np.concatenate((X[1:], X[:1]))
+
+        return X, y
+
     @staticmethod
     def create_valid_file(path, valid_split=0.1):
         """
@@ -242,8 +293,11 @@ class Text(NervanaDataIterator):
                 # reverse target sequence
                 y_batch = self.y[:, self.batch_index, ::-1].T.astype(np.float32, order='C')
 
-            self.dev_lbl.set(y_batch)
-            self.dev_y[:] = self.be.onehot(self.dev_lblflat, axis=0)
+            if self.dev_y is not None:
+                self.dev_lbl.set(y_batch)
+                self.dev_y[:] = self.be.onehot(self.dev_lblflat, axis=0)
+            if not self.onehot_target:
+                self.dev_ylbl.set(y_batch)
 
             if self.onehot_input:
                 self.dev_lbl.set(X_batch)
@@ -261,9 +315,9 @@ class Text(NervanaDataIterator):
             self.batch_index += 1
 
             if self.get_prev_target:
-                yield (self.dev_X, self.dev_Z), self.dev_y
+                yield (self.dev_X, self.dev_Z), self.target
             else:
-                yield self.dev_X, self.dev_y
+                yield self.dev_X, self.target
 
 
 class TextNMT(Text):
@@ -286,10 +340,12 @@ class TextNMT(Text):
         dataset (str): 'un2000' for the United Nations dataset or 'eurparl7'
                        for the European Parliament datset.
         subset_pct (float): Percentage of the dataset to use (100 is the full dataset)
+        onehot_target (boolean): One-hot representation of target, otherwise int32
+                                 indices
     """
     def __init__(self, time_steps, path, tokenizer=None,
                  onehot_input=False, get_prev_target=False, split=None,
-                 dataset='un2000', subset_pct=100):
+                 dataset='un2000', subset_pct=100, onehot_target=True):
         """
         Load French and English sentence data from file.
         """
@@ -300,7 +356,7 @@ class TextNMT(Text):
 
         super(TextNMT, self).__init__(time_steps, processed_file, vocab=None, tokenizer=tokenizer,
                                       onehot_input=onehot_input, get_prev_target=get_prev_target,
-                                      reverse_target=True)
+                                      reverse_target=True, onehot_target=onehot_target)
 
     def _get_data(self, path, tokenizer, vocab):
         """
@@ -313,6 +369,7 @@ class TextNMT(Text):
 
         # get saved processed data
         logger.debug("Loading parsed data from %s", path)
+        import h5py
         with h5py.File(path, 'r') as f:
             self.s_vocab = f['s_vocab'][:].tolist()
             self.t_vocab = f['t_vocab'][:].tolist()
@@ -441,23 +498,46 @@ class PTB(Dataset):
             self.file_paths[phase] = self.load_zip(fn, size)
         return self.file_paths
 
-    def gen_iterators(self):
+    def decode(self):
+        """
+        Tokenize the train, test and valid texts.
+
+        Returns:
+            dict: int32 indices of the tokens of each phase in the vocab of the train text,
+                  and the vocab
+        """
         self.load_data()
+        tokens = {}
+        for phase in self.filemap:
+            with open(self.file_paths[phase]) as f:
+                tokens[phase] = Text.get_tokens(f.read(), self.tokenizer_func)
+        vocab = sorted(Text.get_vocab(tokens['train']))
+        token_to_index = dict((t, i) for i, t in enumerate(vocab))
+
+        arrays = {'vocab': np.array(vocab)}
+        for phase in self.filemap:
+            Text.get_vocab(tokens[phase], vocab)
+            arrays[phase] = np.array([token_to_index[t] for t in tokens[phase]],
+                                     dtype=np.int32)
+        return arrays
+
+    def gen_iterators(self):
+        # the texts are tokenized once, into the data set cache
+        cache_name = 'ptb_%s' % (self.tokenizer or 'chars')
+        keys = list(self.filemap.keys()) + ['vocab']
+        data = self.load_cache(cache_name, keys, self.decode)
+        self.vocab = data['vocab'].tolist()
 
         self._data_dict = {}
-        self.vocab = None
         for phase in ['train', 'test', 'valid']:
-            file_path = self.file_paths[phase]
-            get_prev_target = self.get_prev_target if phase is 'train' else False
+            get_prev_target = self.get_prev_target if phase == 'train' else False
             self._data_dict[phase] = Text(self.timesteps,
-                                          file_path,
-                                          tokenizer=self.tokenizer_func,
+                                          None,
                                           onehot_input=self.onehot_input,
                                           vocab=self.vocab,
                                           reverse_target=self.reverse_target,
-                                          get_prev_target=get_prev_target)
-            if self.vocab is None:
-                self.vocab = self._data_dict['train'].vocab
+                                          get_prev_target=get_prev_target,
+                                          token_ids=data[phase])
         return self._data_dict
 
 
@@ -107,7 +107,7 @@ class Uniform(Initializer):
         Args:
             params (tensor): Tensor to fill
         """
-        param[:] = self.be.rng.uniform(self.low, self.high, param.shape)
+        self.be.rng_uniform(param, self.low, self.high)
 
 
 class Gaussian(Initializer):
@@ -135,7 +135,7 @@ class Gaussian(Initializer):
         Args:
             params (tensor): Tensor to fill
         """
-        param[:] = self.be.rng.normal(self.loc, self.scale, param.shape)
+        self.be.rng_normal(param, self.loc, self.scale)
 
 
 class GlorotUniform(Initializer):
@@ -167,7 +167,7 @@ class GlorotUniform(Initializer):
             params (tensor): Tensor to fill
         """
         k = np.sqrt(6.0 / (param.shape[0] + param.shape[1]))
-        param[:] = self.be.rng.uniform(-k, k, param.shape)
+        self.be.rng_uniform(param, -k, k)
 
 
 class Xavier(Initializer):
@@ -201,7 +201,7 @@ class Xavier(Initializer):
         """
         fan_in = param.shape[0 if self.local else 1]
         scale = np.sqrt(3. / fan_in)
-        param[:] = self.be.rng.uniform(-scale, scale, param.shape)
+        self.be.rng_uniform(param, -scale, scale)
 
 
 class Kaiming(Initializer):
@@ -235,7 +235,7 @@ class Kaiming(Initializer):
         """
         fan_in = param.shape[0 if self.local else 1]
         scale = np.sqrt(2. / fan_in)
-        param[:] = self.be.rng.normal(0, scale, param.shape)
+        self.be.rng_normal(param, 0, scale)
 
 
 class IdentityInit(Initializer):
@@ -17,17 +17,21 @@
 from __future__ import division
 from builtins import str, zip, range
 import numpy as np
+import functools
 import itertools as itt
+import logging
 from operator import add
 import inspect
 
 from neon import NervanaObject
 from neon.layers.layer import Layer, BranchNode, Dropout, DataTransform, LookupTable, Affine
-from neon.layers.recurrent import Recurrent, get_steps
+from neon.layers.recurrent import Recurrent, BiRNN, get_steps
 from neon.transforms import Softmax
 from neon.util.persist import load_class
 from functools import reduce
 
+logger = logging.getLogger(__name__)
+
 
 # modified from https://docs.python.org/3/library/itertools.html
 def pairwise(iterable):
@@ -46,6 +50,17 @@ def flatten(item):
         yield item
 
 
+def has_recurrent(layer):
+    """
+    Whether layer is or contains a recurrent layer, whose outputs carry the hidden state
+    from one minibatch to the next.  Bidirectional layers count too, their outputs are
+    padded beyond out_shape.
+    """
+    if isinstance(layer, (Recurrent, BiRNN)):
+        return True
+    return any(has_recurrent(l) for l in getattr(layer, 'layers', []))
+
+
 class DeltasTree(NervanaObject):
     """
     Data structure for maintaining nested global delta buffers
@@ -85,6 +100,36 @@ class DeltasTree(NervanaObject):
                                                       parallelism="Data")
 
 
+class CheckpointBuffers(NervanaObject):
+    """
+    Pool of activation buffers shared by the segments of a checkpointed Sequential
+    container.  The k-th recomputed output of every segment is a view into the k-th
+    buffer, sized for the largest of them like the DeltasTree buffers.
+    """
+    def __init__(self):
+        self.buffers = []
+        self.max_shapes = []
+
+    def proc_layer(self, layer, slot):
+        size = layer.be.shared_iobuf_size(layer.out_shape, layer.parallelism)
+        while len(self.max_shapes) <= slot:
+            self.max_shapes.append(0)
+        self.max_shapes[slot] = max(self.max_shapes[slot], size)
+
+    def allocate_buffers(self):
+        self.buffers = [self.be.iobuf(size, persist_values=False, parallelism="Data")
+                        for size in self.max_shapes]
+
+
+class ActivationArenas(CheckpointBuffers):
+    """
+    Arenas shared by the outputs of the layers of a Sequential container initialized for
+    inference.  Outputs whose lifetimes do not overlap are views into the same arena,
+    which is sized for the largest of them.
+    """
+    pass
+
+
 class LayerContainer(Layer):
     """
     Layer containers are a generic class that are used to encapsulate groups of layers and
@@ -287,11 +332,31 @@ class Sequential(LayerContainer):
     """
     Layer container that encapsulates a simple linear pathway of layers.
 
+    Activation checkpointing trades compute for memory in training.  The layers are
+    split into segments and only the outputs at the end of each segment are kept from
+    fprop to bprop.  The outputs inside a segment share a pool of buffers with the
+    other segments and are recomputed from the previous segment end right before
+    the segment is backpropagated.  Layer containers, recurrent layers and layers
+    feeding a branch node always end a segment.
+
     Arguments:
         layers (list): List of objects which can be either a list of layers
                        (including layer containers).
+        name (str, optional): Container name
+        checkpoint_segments (int, optional): number of segments to split the layers
+                                             into for activation checkpointing
+        checkpoint_memory (int, optional): activation memory budget in bytes.  The
+                                           layers are split into as many segments
+                                           (recomputing as little) as the budget
+                                           allows.  Ignored if checkpoint_segments
+                                           is given.
+
+    Attributes:
+        inference_arenas (bool): if True, allocate shares the output buffers of layers
+                                 whose outputs are not live at the same time.  Set by
+                                 Model.initialize for inference only models.
     """
-    def __init__(self, layers, name=None):
+    def __init__(self, layers, name=None, checkpoint_segments=None, checkpoint_memory=None):
         super(Sequential, self).__init__(name)
 
         assert layers, "Provide layers"
@@ -300,6 +365,12 @@ class Sequential(LayerContainer):
         root = self._layers[0]
         assert (root.owns_output or
                 type(root) in [Dropout, DataTransform]), "Sequential root must own outputs"
+        self.checkpoint_segments = checkpoint_segments
+        self.checkpoint_memory = checkpoint_memory
+        self.segments = None
+        self.checkpoint_buffers = None
+        self.inference_arenas = False
+        self.output_arenas = None
 
     def configure(self, in_obj):
         """
@@ -349,11 +420,217 @@ class Sequential(LayerContainer):
             alloc_layers[-1].allocate(shared_outputs, accumulate_updates=accumulate_updates)
         else:
             alloc_layers[-1].allocate(shared_outputs)
+
+        pooled = {}
+        if self.inference_arenas:
+            pooled = self.allocate_arenas()
+        elif self.checkpoint_segments or self.checkpoint_memory:
+            pooled = self.allocate_checkpoints()
+
         for l in self.layers:
+            args = (pooled[id(l)],) if id(l) in pooled else ()
             if 'accumulate_updates' in inspect.getargspec(l.allocate).args:
-                l.allocate(accumulate_updates=accumulate_updates)
+                l.allocate(*args, accumulate_updates=accumulate_updates)
+            else:
+                l.allocate(*args)
+
+    def _output_groups(self):
+        """
+        Group each layer that owns its outputs with the in place layers following it.
+
+        Returns:
+            list: (layers, size, pinned) for each group, where size is the number of
+                  output features and pinned groups can not be recomputed
+        """
+        groups = []
+        for l in self.layers:
+            if l.owns_output or not groups:
+                groups.append([l])
+            else:
+                groups[-1].append(l)
+
+        result = []
+        for group in groups:
+            size = group[0].be.shared_iobuf_size(group[0].out_shape, group[0].parallelism) \
+                if group[0].owns_output else 0
+            pinned = any(isinstance(l, (LayerContainer, Recurrent, BiRNN, BranchNode))
+                         for l in group)
+            result.append((group, size, pinned))
+        # the container outputs are needed after fprop
+        result[-1] = result[-1][:2] + (True,)
+        return result
+
+    def _plan_segments(self, groups, nsegments):
+        """
+        Split groups into about nsegments segments of equal output size, ending a
+        segment at every pinned group.
+
+        Returns:
+            list: (recomputed groups, kept group) for each segment
+        """
+        total = float(sum(size for _, size, _ in groups))
+        ends = set(i for i, (_, _, pinned) in enumerate(groups) if pinned)
+        cumsum = 0
+        cut = 1
+        for i, (_, size, _) in enumerate(groups):
+            cumsum += size
+            if cut < nsegments and cumsum >= cut * total / nsegments:
+                ends.add(i)
+                while cut < nsegments and cumsum >= cut * total / nsegments:
+                    cut += 1
+
+        segments = []
+        start = 0
+        for end in sorted(ends):
+            segments.append(([g[0] for g in groups[start:end]], groups[end][0]))
+            start = end + 1
+        return segments
+
+    def _segment_sizes(self, groups, segments):
+        """
+        Returns:
+            tuple: number of features kept for the segment ends and the sizes of the
+                   pool buffers shared by the recomputed outputs
+        """
+        sizes = dict((id(g[0]), size) for g, size, _ in groups)
+        kept = sum(sizes[id(end[0])] for _, end in segments)
+        pool = []
+        for recomputed, _ in segments:
+            for slot, group in enumerate(recomputed):
+                if slot == len(pool):
+                    pool.append(0)
+                pool[slot] = max(pool[slot], sizes[id(group[0])])
+        return kept, pool
+
+    def allocate_checkpoints(self):
+        """
+        Choose the checkpoint segments and allocate the buffer pool shared by the
+        outputs recomputed in bprop.
+
+        Returns:
+            dict: pool buffer to allocate the outputs of a layer from, by layer id
+        """
+        groups = self._output_groups()
+        itemsize = np.dtype(self.be.default_dtype).itemsize * self.be.bsz
+
+        def plan(n):
+            segments = self._plan_segments(groups, n)
+            kept, pool = self._segment_sizes(groups, segments)
+            return segments, (kept + sum(pool)) * itemsize
+
+        if self.checkpoint_segments:
+            self.segments, nbytes = plan(self.checkpoint_segments)
+        else:
+            # more segments recompute fewer layers, use as many as fit the budget
+            plans = [plan(n) for n in range(1, len(groups) + 1)]
+            fitting = [p for p in plans if p[1] <= self.checkpoint_memory]
+            if not fitting:
+                fitting = [min(plans, key=lambda p: p[1])]
+                logger.warning("Activation memory budget of %d bytes can not be met, using "
+                               "%d bytes", self.checkpoint_memory, fitting[0][1])
+            self.segments, nbytes = fitting[-1]
+
+        self.checkpoint_buffers = CheckpointBuffers()
+        pooled = []
+        for recomputed, _ in self.segments:
+            for slot, group in enumerate(recomputed):
+                self.checkpoint_buffers.proc_layer(group[0], slot)
+                pooled.append((group[0], slot))
+        self.checkpoint_buffers.allocate_buffers()
+
+        # bprop recomputes a segment from the output kept for the previous one when it
+        # reaches the last layer kept for the segment.  The outputs of the last segment
+        # are still in the pool from fprop.
+        self.recompute_at = {}
+        prev_end = None
+        for recomputed, end in self.segments[:-1]:
+            last = [l for l in end if type(l) is not BranchNode]
+            if recomputed and last:
+                self.recompute_at[id(last[-1])] = (recomputed, prev_end)
+            prev_end = end[-1]
+
+        full = sum(size for _, size, _ in groups) * itemsize
+        self.checkpoint_stats = {'segments': len(self.segments),
+                                 'full_bytes': full,
+                                 'checkpointed_bytes': nbytes,
+                                 'saved_bytes': full - nbytes}
+        logger.info("%s: %d checkpoint segments, activations use %d of %d bytes",
+                    self.name, len(self.segments), nbytes, full)
+        return dict((id(l), self.checkpoint_buffers.buffers[slot]) for l, slot in pooled)
+
+    def allocate_arenas(self):
+        """
+        Assign the outputs of the layers to a minimal set of shared arenas for inference.
+        The output of a group of layers is live from the layer computing it until the
+        next group has read it, and groups whose lifetimes overlap get different arenas.
+        Outputs needed across minibatches (recurrent state), by other branches (branch
+        nodes) or after fprop (the container outputs) keep buffers of their own.
+
+        Returns:
+            dict: arena to allocate the outputs of a layer from, by layer id
+        """
+        groups = self._output_groups()
+        itemsize = np.dtype(self.be.default_dtype).itemsize * self.be.bsz
+
+        self.output_arenas = ActivationArenas()
+        pooled = []
+        pooled_size = 0
+        ends = []   # last step reading the output held by each arena
+        for step, (group, size, _) in enumerate(groups[:-1]):
+            if size == 0 or any(type(l) is BranchNode or has_recurrent(l) for l in group):
+                continue
+            slot = next((s for s, end in enumerate(ends) if end < step), len(ends))
+            if slot == len(ends):
+                ends.append(step + 1)
             else:
-                l.allocate()
+                ends[slot] = step + 1
+            self.output_arenas.proc_layer(group[0], slot)
+            pooled.append((group[0], slot))
+            pooled_size += size
+        self.output_arenas.allocate_buffers()
+
+        full = sum(size for _, size, _ in groups) * itemsize
+        planned = full - (pooled_size - sum(self.output_arenas.max_shapes)) * itemsize
+        self.arena_stats = {'arenas': len(ends),
+                            'full_bytes': full,
+                            'planned_bytes': planned,
+                            'saved_bytes': full - planned}
+        logger.info("%s: outputs of %d layers share %d arenas, using %d of %d bytes",
+                    self.name, len(pooled), len(ends), planned, full)
+        return dict((id(l), self.output_arenas.buffers[slot]) for l, slot in pooled)
+
+    def checkpoint_report(self):
+        """
+        Activation memory of the checkpointed layers, including the per step buffers
+        saved by layers checkpointing across time.
+
+        Returns:
+            dict: number of segments, and the bytes of activations stored without and
+                  with checkpointing and the difference
+        """
+        report = dict(self.checkpoint_stats) if self.segments else \
+            {'segments': 0, 'full_bytes': 0, 'checkpointed_bytes': 0, 'saved_bytes': 0}
+        for l in self.layers:
+            if hasattr(l, 'checkpoint_report') and l.checkpoint_report() is not None:
+                sub = l.checkpoint_report()
+                for key in ('full_bytes', 'checkpointed_bytes', 'saved_bytes'):
+                    report[key] += sub[key]
+        return report
+
+    def recompute(self, groups, prev_end=None):
+        """
+        Recompute the training fprop outputs of a segment from the output kept for
+        the previous segment.
+
+        Arguments:
+            groups (list): groups of layers to recompute
+            prev_end (Layer, optional): last layer of the previous segment, None for
+                                        the first segment
+        """
+        x = self.inputs if prev_end is None else prev_end.outputs
+        for l in itt.chain.from_iterable(groups):
+            l.be.convert_data(x, l.get_is_mklop())
+            x = l.fprop_recompute(x)
 
     def allocate_deltas(self, global_deltas=None):
         if global_deltas is None:
@@ -382,6 +659,8 @@ class Sequential(LayerContainer):
 
         """
         x = inputs
+        if self.segments:
+            self.inputs = inputs
 
         for l in self.layers:
             altered_tensor = l.be.distribute_data(x, l.parallelism)
@@ -415,6 +694,9 @@ class Sequential(LayerContainer):
             Tensor: deltas to propagate to the adjacent lower layer
         """
         for l in reversed(self._layers):
+            if self.segments and id(l) in self.recompute_at:
+                self.recompute(*self.recompute_at[id(l)])
+
             altered_tensor = l.be.distribute_data(error, l.parallelism)
 
             # try to convert to mkl
@@ -517,6 +799,7 @@ class Tree(LayerContainer):
             next_root = root
             self.betas.append(beta)
         self.betas.reverse()
+        self.branch_deltas = None
 
     def nested_str(self, level=0):
         """
@@ -567,6 +850,33 @@ class Tree(LayerContainer):
         for l in reversed(self.layers):
             l.allocate_deltas(global_deltas)
 
+        # Without a shared pool every branch has delta buffers of its own, only the
+        # deltas at the branch nodes are shared.  For concurrent bprop the auxiliary
+        # branches write those to private buffers that are summed in afterwards.
+        self.branch_deltas = None
+        if self.be.branch_workers and global_deltas is None and len(self.layers) > 2:
+            firsts = [l._layers[0] for l in self.layers[1:]]
+            if all(type(f.prev_layer) is BranchNode and f.deltas is not None for f in firsts):
+                self.branch_targets = [f.deltas for f in firsts]
+                self.branch_deltas = []
+                for f in firsts:
+                    f.deltas = self.be.iobuf(f.in_shape, parallelism=f.parallelism)
+                    self.branch_deltas.append(f.deltas)
+
+    def fprop_branches(self, inference=False):
+        """
+        Apply the forward pass of the auxiliary branches, which only depend on the
+        outputs of the main trunk at the branch nodes.
+
+        Arguments:
+            inference (bool): is inference only
+
+        Returns:
+            list: outputs of the auxiliary branches
+        """
+        return self.be.run_branches([functools.partial(l.fprop, None, inference=inference)
+                                     for l in self.layers[1:]])
+
     def fprop(self, inputs, inference=False):
         """
         Apply the forward pass transformation to the input data.
@@ -578,7 +888,7 @@ class Tree(LayerContainer):
             Tensor: output data
         """
         x = self.layers[0].fprop(inputs, inference)
-        out = [x] + [l.fprop(None, inference=inference) for l in self.layers[1:]]
+        out = [x] + self.fprop_branches(inference)
         return out
 
     def bprop(self, error, alpha=1.0, beta=0.0):
@@ -591,8 +901,21 @@ class Tree(LayerContainer):
         Returns:
             Tensor: deltas to propagate to the adjacent lower layer
         """
-        for l, e, a, b in reversed(list(zip(self.layers, error, self.alphas, self.betas))):
-            l.bprop(e, alpha=a, beta=b)
+        if self.branch_deltas is None:
+            for l, e, a, b in reversed(list(zip(self.layers, error, self.alphas, self.betas))):
+                l.bprop(e, alpha=a, beta=b)
+            return
+
+        self.be.run_branches([functools.partial(l.bprop, e, alpha=a)
+                              for l, e, a in zip(self.layers[1:], error[1:], self.alphas[1:])])
+        # accumulate at the branch nodes in the order the branches are run sequentially
+        for d, target, b in reversed(list(zip(self.branch_deltas, self.branch_targets,
+                                              self.betas[1:]))):
+            if b == 0:
+                target[:] = d
+            else:
+                target[:] = target * b + d
+        self.layers[0].bprop(error[0], alpha=self.alphas[0], beta=self.betas[0])
 
     def get_terminal(self):
         """
@@ -621,7 +944,7 @@ class SingleOutputTree(Tree):
         if inference:
             return x
         else:
-            out = [x] + [l.fprop(None) for l in self.layers[1:]]
+            out = [x] + self.fprop_branches()
             return out
 
 
@@ -647,6 +970,8 @@ class Broadcast(LayerContainer):
                 ValueError("Incompatible element for " + self.__class__.__name__ + " Layer")
         self.owns_output = True
         self.outputs = None
+        self.branch_trees = None
+        self.branch_deltas = None
 
     @property
     def nest_deltas(self):
@@ -679,10 +1004,20 @@ class Broadcast(LayerContainer):
 
     def allocate_deltas(self, global_deltas):
         nested_deltas = global_deltas.decend()
-        for layer in self.layers:
+
+        # branches that are run concurrently each need their own nested buffers
+        self.branch_trees = None
+        if self.be.branch_workers and len(self.layers) > 1:
+            self.branch_trees = [DeltasTree() for _ in self.layers]
+
+        for layer, nested in zip(self.layers, self.branch_trees or itt.repeat(nested_deltas)):
             layer.layers[0].allocate_deltas(global_deltas)
             for sublayer in layer.layers[1:]:
-                sublayer.allocate_deltas(nested_deltas)
+                sublayer.allocate_deltas(nested)
+
+        if self.branch_trees is not None:
+            for tree in self.branch_trees:
+                tree.allocate_buffers()
 
     def set_deltas(self, delta_buffers):
         """
@@ -698,7 +1033,7 @@ class Broadcast(LayerContainer):
 
         nested_deltas = delta_buffers.decend()
         assert nested_deltas is not None
-        for l in self.layers:
+        for l, nested in zip(self.layers, self.branch_trees or itt.repeat(nested_deltas)):
             l.layers[0].set_deltas(delta_buffers)
 
             # mkl need allocate new deltas
@@ -707,7 +1042,7 @@ class Broadcast(LayerContainer):
 
             delta_buffers.buffers.reverse()  # undo that last reverse
             for sublayer in l.layers[1:]:
-                sublayer.set_deltas(nested_deltas)
+                sublayer.set_deltas(nested)
 
         # Special case if originating from a branch node
         if type(self.prev_layer) is BranchNode:
@@ -718,6 +1053,36 @@ class Broadcast(LayerContainer):
                                         parallelism=self.parallelism)
             delta_buffers.buffers.reverse()
 
+        # concurrent branches write their deltas to private buffers that are summed
+        # into self.deltas once all of them are done
+        self.branch_deltas = None
+        firsts = [l.layers[0] for l in self.layers]
+        if self.branch_trees is not None and all(f.deltas is not None for f in firsts):
+            self.branch_deltas = []
+            for f in firsts:
+                f.deltas = self.be.iobuf(f.in_shape, parallelism=f.parallelism)
+                self.branch_deltas.append(f.deltas)
+
+    def bprop_branches(self, errors, alphas, beta):
+        """
+        Backpropagate through the branches concurrently and sum their deltas in the
+        order the branches are run sequentially, last branch first.
+
+        Arguments:
+            errors (list of Tensors): error for each branch
+            alphas (list of floats): scale to apply to the deltas of each branch
+            beta (float): scale to apply to the existing deltas
+        """
+        self.be.run_branches([functools.partial(l.bprop, e, alpha=a)
+                              for l, e, a in zip(self.layers, errors, alphas)])
+        for i, d in enumerate(reversed(self.branch_deltas)):
+            if i > 0:
+                self.deltas[:] = self.deltas + d
+            elif beta == 0:
+                self.deltas[:] = d
+            else:
+                self.deltas[:] = self.deltas * beta + d
+
     def get_terminal(self):
         """
         Used for recursively getting final nodes from layer containers.
@@ -732,6 +1097,7 @@ class MergeSum(Broadcast):
     def __init__(self, layers, name=None):
         super(MergeSum, self).__init__(layers, name)
         self.ngLayer = self.be.mergesum_layer(len(layers))
+        self.branch_outputs = None
 
     def allocate(self, shared_outputs=None):
         """
@@ -744,6 +1110,18 @@ class MergeSum(Broadcast):
         if self.outputs is None:
             self.outputs = self.be.iobuf(self.out_shape, shared=shared_outputs,
                                          parallelism=self.parallelism)
+
+        # concurrent branches can not accumulate into the same buffer, all but the
+        # first get their own outputs which are summed in after fprop
+        self.branch_outputs = None
+        if self.be.branch_workers and len(self.layers) > 1:
+            self.branch_outputs = [self.outputs] + [
+                self.be.iobuf(self.out_shape, parallelism=self.parallelism)
+                for _ in self.layers[1:]]
+            for l, outputs in zip(self.layers, self.branch_outputs):
+                l.allocate(shared_outputs=outputs)
+            return
+
         for l in self.layers:
             self.be.allocate_new_outputs(l, self.outputs)
 
@@ -764,6 +1142,13 @@ class MergeSum(Broadcast):
         Returns:
             Tensor: output data
         """
+        if self.branch_outputs is not None:
+            self.be.run_branches([functools.partial(l.fprop, inputs, inference)
+                                  for l in self.layers])
+            for outputs in self.branch_outputs[1:]:
+                self.outputs[:] = self.outputs + outputs
+            return self.outputs
+
         self.be.fprop_mergesum(self.ngLayer, inputs, inference,
                                self.layers, self.outputs, self.out_shape)
         return self.outputs
@@ -782,6 +1167,10 @@ class MergeSum(Broadcast):
         Returns:
             Tensor: deltas to propagate to the adjacent lower layer
         """
+        if self.branch_deltas is not None:
+            self.bprop_branches([error] * len(self.layers), [alpha] * len(self.layers), beta)
+            return self.deltas
+
         self.be.bprop_mergesum(self.ngLayer, alpha, beta,
                                self.layers, error, self.deltas)
         return self.deltas
@@ -916,6 +1305,9 @@ class MergeBroadcast(Broadcast):
         """
         if self.error_views is None:
             self.error_views = self.get_partitions(error, self.slices)
+        if self.branch_deltas is not None:
+            self.bprop_branches(self.error_views, [a * alpha for a in self.alphas], beta)
+            return self.deltas
         self.be.bprop_mergebroadcast(
             self.ngLayer, self.layers, self.error_views, error,
             self.deltas, self.out_shape, alpha, beta, self.alphas, self.betas)
@@ -977,8 +1369,9 @@ class MergeMultistream(MergeBroadcast):
         Returns:
             Tensor: output data
         """
-        for l, inp in zip(self.layers, inputs):
-            l.fprop(inp, inference)
+        # each stream has its own input and delta buffers
+        self.be.run_branches([functools.partial(l.fprop, inp, inference)
+                              for l, inp in zip(self.layers, inputs)])
         return self.outputs
 
     def bprop(self, error, alpha=1.0, beta=0.0):
@@ -997,8 +1390,8 @@ class MergeMultistream(MergeBroadcast):
         """
         if self.error_views is None:
             self.error_views = self.get_partitions(error, self.slices)
-        for l, e in zip(self.layers, self.error_views):
-            l.bprop(e)
+        self.be.run_branches([functools.partial(l.bprop, e)
+                              for l, e in zip(self.layers, self.error_views)])
 
 
 class Encoder(Sequential):
@@ -1407,6 +1800,7 @@ class Multicost(NervanaObject):
         self.weights = [1.0 for c in costs] if weights is None else weights
         self.deltas = None
         self.inputs = None
+        self.record_costs = None
         self.costfunc = costs[0].costfunc  # For displaying during callbacks
 
     def initialize(self, in_obj):
@@ -1483,6 +1877,35 @@ class Multicost(NervanaObject):
 
             return reduce(add, costs)
 
+    def fprop_cost(self, inputs, targets):
+        """
+        Compute the weighted sum of the costs of every record over a list of inputs and
+        targets, without copying anything to the host.
+
+        Arguments:
+            inputs (list(Tensor)): list of Tensors containing input values to be compared to
+                                   targets
+            targets (Tensor, list(Tensor)): either a list of Tensors containing target values, or
+                                            a single target Tensor that will be mapped to each
+                                            input
+
+        Returns:
+            Tensor containing the cost per record
+        """
+        if not isinstance(inputs, list):
+            return self.costs[0].fprop_cost(inputs, targets)
+
+        if type(targets) not in (tuple, list):
+            targets = [targets] * len(self.costs)
+        if self.record_costs is None:
+            self.record_costs = self.be.empty_like(self.costs[0].outputs)
+
+        self.record_costs[:] = 0
+        for w, c, i, t in zip(self.weights, self.costs, inputs, targets):
+            if t is not None:
+                self.record_costs[:] = self.record_costs + w * c.fprop_cost(i, t)
+        return self.record_costs
+
     def get_errors(self, inputs, targets):
         """
         Get a list of errors for backpropagating to a Tree container that has multiple output
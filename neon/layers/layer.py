@@ -210,6 +210,21 @@ class Layer(NervanaObject):
         """
         raise NotImplementedError
 
+    def fprop_recompute(self, inputs):
+        """
+        Recompute the outputs of the training forward pass for a checkpointed
+        Sequential container that dropped them between fprop and bprop.  Layers whose
+        training fprop has side effects beyond their outputs override this to leave
+        them unchanged.
+
+        Arguments:
+            inputs (Tensor): input data, as given to the last fprop
+
+        Returns:
+            Tensor: output data
+        """
+        return self.fprop(inputs)
+
     def bprop(self, error):
         """
         Apply the backward pass transformation to the input data.
@@ -269,6 +284,35 @@ class Layer(NervanaObject):
         """
         self.actual_bsz = N
 
+    @property
+    def partial_bsz(self):
+        """
+        Number of examples in a partial minibatch this layer can compute on
+        alone, None when the minibatch is full or the backend does not support
+        column sliced buffers.
+        """
+        if (self.actual_bsz is None or self.actual_bsz >= self.be.bsz or
+                not self.be.partial_batch):
+            return None
+        return self.actual_bsz
+
+    def batch_view(self, tensor):
+        """
+        Return a view on the columns of tensor holding the actual minibatch, so
+        fprop on a partial minibatch skips the padding columns.  Buffers with
+        more than one step are returned whole since their examples are not
+        contiguous.
+
+        Arguments:
+            tensor (Tensor): buffer with be.bsz columns
+
+        Returns:
+            Tensor: the first actual_bsz columns of tensor, or tensor itself
+        """
+        if self.partial_bsz is None or tensor.shape[1] != self.be.bsz:
+            return tensor
+        return tensor[:, :self.partial_bsz]
+
     def set_seq_len(self, S):
         """
         Set sequence length.
@@ -607,7 +651,9 @@ class Pooling(Layer):
             Tensor: output data
         """
         self.inputs = inputs
-        self.be.fprop_pool(self.nglayer, inputs, self.outputs, self.argmax, beta=beta)
+        argmax = None if self.argmax is None else self.batch_view(self.argmax)
+        self.be.fprop_pool(self.nglayer, self.batch_view(inputs), self.batch_view(self.outputs),
+                           argmax, beta=beta)
         return self.outputs
 
     def bprop(self, error, alpha=1.0, beta=0.0):
@@ -649,6 +695,7 @@ class ParameterLayer(Layer):
         self.init = init
         self.W = None
         self.dW = None
+        self.W_scale = None  # per row scales of int8 quantized weights
         self.weight_shape = None
         self.batch_sum = None
         self.batch_sum_shape = None
@@ -697,12 +744,44 @@ class ParameterLayer(Layer):
             self.acc_dW = self.be.empty_like(self.dW)
             self.acc_params = [(self.acc_dW, self.dW)]
 
+    def fprop_recompute(self, inputs):
+        """
+        Recompute the outputs without the batch sum, which the following batch norm
+        layer has already scaled to the batch mean it needs in bprop.
+
+        Arguments:
+            inputs (Tensor): input data
+
+        Returns:
+            Tensor: output data
+        """
+        batch_sum, self.batch_sum = self.batch_sum, None
+        try:
+            return self.fprop(inputs)
+        finally:
+            self.batch_sum = batch_sum
+
     def get_params(self):
         """
         Get layer parameters, gradients, and states for optimization.
         """
         return ((self.W, self.dW), self.states)
 
+    def _quantize_rows(self):
+        """
+        Replace W with symmetric int8 values and W_scale with a float32 scale per
+        row of W.  Only supported on the CPU backend, whose compound_dot
+        multiplies int8 operands in float32.
+        """
+        if self.be.backend_name != 'cpu':
+            raise NotImplementedError("int8 weights are only supported on the CPU backend")
+        W = self.W.get().astype(np.float32)
+        scale = np.abs(W).max(axis=1, keepdims=True) / 127.
+        scale[scale == 0] = 1.
+        self.W = self.be.array(np.rint(W / scale), dtype=np.int8, **self.get_param_attrs())
+        self.W_scale = self.be.array(scale, dtype=np.float32, **self.get_param_attrs())
+        self.dW = self.be.empty_like(self.W)
+
     def get_params_serialize(self, keep_states=True):
         return self.get_description(get_weights=True, keep_states=keep_states)
 
@@ -720,6 +799,8 @@ class ParameterLayer(Layer):
         serial_dict = super(ParameterLayer, self).get_description()
         if get_weights:
             serial_dict['params'] = {'W': self.W.get()}
+            if self.W_scale is not None:
+                serial_dict['params']['W_scale'] = self.W_scale.get()
             if keep_states:
                 serial_dict['states'] = [s.get() for s in self.states]
         return serial_dict
@@ -744,7 +825,10 @@ class ParameterLayer(Layer):
                 # get set the values
                 attr.set(pdict['params'][key])
             elif type(pdict['params'][key]) is np.ndarray:
-                setattr(self, key, self.be.array(pdict['params'][key], **self.get_param_attrs()))
+                value = pdict['params'][key]
+                # keep quantized integer weights in their own type
+                dtype = value.dtype if value.dtype.kind in 'iu' else None
+                setattr(self, key, self.be.array(value, dtype=dtype, **self.get_param_attrs()))
             else:
                 setattr(self, key, pdict['params'][key])
 
@@ -883,7 +967,8 @@ class Convolution(ParameterLayer):
             Tensor: output data
         """
         self.inputs = inputs
-        self.be.fprop_conv(self.nglayer, inputs, self.W, self.outputs, beta=beta,
+        self.be.fprop_conv(self.nglayer, self.batch_view(inputs), self.W,
+                           self.batch_view(self.outputs), beta=beta,
                            bsum=self.batch_sum, layer_op=self)
         return self.outputs
 
@@ -1058,7 +1143,8 @@ class Convolution_bias(Convolution):
             Tensor: output data
         """
         self.inputs = inputs
-        self.be.fprop_conv(self.nglayer, inputs, self.W, self.outputs, beta=beta,
+        self.be.fprop_conv(self.nglayer, self.batch_view(inputs), self.W,
+                           self.batch_view(self.outputs), beta=beta,
                            bias=self.weight_bias, bsum=self.batch_sum, layer_op=self)
         return self.outputs
 
@@ -1285,19 +1371,36 @@ class Linear(ParameterLayer):
         """
         self.inputs = inputs
         if self.actual_bsz is None and self.actual_seq_len is None:
-            self.be.compound_dot(A=self.W, B=self.inputs, C=self.outputs, beta=beta,
-                                 bsum=self.batch_sum)
+            inputs, outputs = self.inputs, self.outputs
         else:
             bsz = self.be.bsz if self.actual_bsz is None else self.actual_bsz
             steps = self.nsteps if self.actual_seq_len is None else self.actual_seq_len
-            self.be.compound_dot(A=self.W,
-                                 B=self.inputs[:, :bsz * steps],
-                                 C=self.outputs[:, :bsz * steps],
-                                 beta=beta,
+            if steps > 1:
+                # columns are ordered by step, so only whole steps can be skipped
+                bsz = self.be.bsz
+            inputs = self.inputs[:, :bsz * steps]
+            outputs = self.outputs[:, :bsz * steps]
+
+        if self.W_scale is None:
+            self.be.compound_dot(A=self.W, B=inputs, C=outputs, beta=beta,
                                  bsum=self.batch_sum)
+        else:
+            assert beta == 0, "int8 weights do not support accumulating into the outputs"
+            self.be.compound_dot(A=self.W, B=inputs, C=outputs)
+            outputs[:] = outputs * self.W_scale
+            if self.batch_sum is not None:
+                self.batch_sum[:] = self.be.sum(outputs, axis=1)
 
         return self.outputs
 
+    def quantize_weights(self):
+        """
+        Store the weights as int8 with a float32 scale per output unit, for
+        inference with a quarter of the weight memory and checkpoint size.  The
+        layer can not be trained afterwards.  CPU backend only.
+        """
+        self._quantize_rows()
+
     @Layer.accumulates
     def bprop(self, error, alpha=1.0, beta=0.0):
         """
@@ -1357,6 +1460,9 @@ class BinaryLinear(Linear):
         else:
             bsz = self.be.bsz if self.actual_bsz is None else self.actual_bsz
             steps = self.nsteps if self.actual_seq_len is None else self.actual_seq_len
+            if steps > 1:
+                # columns are ordered by step, so only whole steps can be skipped
+                bsz = self.be.bsz
 
             gemm(A=self.Wb,
                  B=self.inputs[:, :bsz * steps],
@@ -1432,7 +1538,9 @@ class Bias(ParameterLayer):
         self.outputs = self.inputs = inputs
         if self.y is None or self.y.base is not self.outputs:
             self.y = self.outputs.reshape((self.bias_size, -1))
-        self.y[:] = self.y + self.W
+        # the columns of a partial minibatch only line up when bias is added per row
+        y = self.batch_view(self.y) if self.y.shape == self.outputs.shape else self.y
+        y[:] = y + self.W
         return self.outputs
 
     @Layer.accumulates
@@ -1511,8 +1619,9 @@ class Activation(Layer):
             Tensor: output data
         """
         self.outputs = self.inputs = inputs
-        self.be.fprop_transform(self.nglayer, self.transform, self.inputs,
-                                self.outputs, type(self.transform) == Rectlin)
+        x = self.batch_view(inputs)
+        self.be.fprop_transform(self.nglayer, self.transform, x, x,
+                                type(self.transform) == Rectlin)
         return self.outputs
 
     def bprop(self, error):
@@ -1945,8 +2054,8 @@ class LRN(Layer):
             Tensor: output data
         """
         self.inputs = inputs
-        self.be.fprop_lrn(self.nglayer,
-                          inputs, self.outputs, self.denom,
+        self.be.fprop_lrn(self.nglayer, self.batch_view(inputs),
+                          self.batch_view(self.outputs), self.batch_view(self.denom),
                           self.alpha, self.beta, self.ascale, self.bpower)
         return self.outputs
 
@@ -2024,7 +2133,8 @@ class Dropout(Layer):
                                                computed into
         """
         super(Dropout, self).allocate(shared_outputs)
-        self.keep_mask = self.be.iobuf(self.out_shape, parallelism=self.parallelism)
+        self.keep_mask = self.be.iobuf(self.out_shape, dtype=self.be.mask_dtype,
+                                       parallelism=self.parallelism)
 
     def fprop(self, inputs, inference=False):
         """
@@ -2046,6 +2156,20 @@ class Dropout(Layer):
 
         return self.outputs
 
+    def fprop_recompute(self, inputs):
+        """
+        Reapply the keep mask drawn in the last fprop.
+
+        Arguments:
+            inputs (Tensor): input data
+
+        Returns:
+            Tensor: output data
+        """
+        self.outputs = self.inputs = inputs
+        self.outputs[:] = self.keep_mask * inputs * self._train_scaling
+        return self.outputs
+
     def _fprop_inference(self, inputs):
         """
         Apply the forward pass transformation to the input data.
@@ -2163,10 +2287,22 @@ class LookupTable(ParameterLayer):
             Tensor: output data
         """
         self.inputs[:] = inputs.reshape(self.inputs.shape)
-        self.outputs_t[:] = self.W.take(self.inputs, axis=0)
+        if self.W_scale is None:
+            self.outputs_t[:] = self.W.take(self.inputs, axis=0)
+        else:
+            self.outputs_t[:] = (self.W.take(self.inputs, axis=0) *
+                                 self.W_scale.take(self.inputs, axis=0))
         self.outputs[:] = self.outputs_t.T
         return self.outputs
 
+    def quantize_weights(self):
+        """
+        Store the embeddings as int8 with a float32 scale per word, for inference
+        with a quarter of the table memory and checkpoint size.  The layer can
+        not be trained afterwards.  CPU backend only.
+        """
+        self._quantize_rows()
+
     def bprop(self, error, alpha=1.0, beta=0):
         """
         Apply the backward pass transformation to the input data.
@@ -2188,6 +2324,408 @@ class LookupTable(ParameterLayer):
         return self.deltas
 
 
+class SoftmaxOutput(ParameterLayer):
+
+    """
+    Intermediate class of the softmax output layers over large numbers of classes, which
+    compute their cross entropy in training with SoftmaxLayerCost, without the
+    probabilities of all the classes.  In inference they output the exact softmax
+    probabilities of all the classes.
+
+    Not intended to be used directly.
+
+    weight shape - (nout + extra_rows, nin + 1), the last column holding the biases
+
+    Arguments:
+        nout (int): number of classes
+        init (Initializer): Initializer object to use for initializing layer
+            weights, the biases start at 0
+        name (str, optional): Layer name
+    """
+
+    extra_rows = 0
+
+    def __init__(self, nout, init, name=None):
+        super(SoftmaxOutput, self).__init__(init, name)
+        self.nout = nout
+        self.inference = False
+        self.dlogits = None
+
+    def __str__(self):
+        return "%s Layer '%s': %d inputs, %d outputs" % (
+               self.classnm, self.name, self.nin, self.nout)
+
+    def configure(self, in_obj):
+        """
+        Sets shape based parameters of this layer given an input tuple or int
+        or input layer.
+
+        Arguments:
+            in_obj (int, tuple, Layer or Tensor): object that provides shape
+                                                  information for layer
+
+        Returns:
+            (tuple): shape of output data
+        """
+        super(SoftmaxOutput, self).configure(in_obj)
+        (self.nin, self.nsteps) = interpret_in_shape(self.in_shape)
+        self.out_shape = (self.nout, self.nsteps)
+        if self.weight_shape is None:
+            self.weight_shape = (self.nout + self.extra_rows, self.nin + 1)
+        return self
+
+    def init_params(self, shape):
+        super(SoftmaxOutput, self).init_params(shape)
+        self.W[:, self.nin:] = 0
+
+    def allocate(self, shared_outputs=None, accumulate_updates=False):
+        super(SoftmaxOutput, self).allocate(shared_outputs, accumulate_updates)
+        self.ncols = self.nsteps * self.be.bsz
+        # inputs with a row of ones multiplying the biases
+        self.hidden = self.be.iobuf((self.nin + 1, self.nsteps))
+        self.hidden[self.nin:] = 1.
+        self.labels = self.be.iobuf((1, self.nsteps), dtype=np.int32)
+        self.columns = self.be.array(np.arange(self.ncols).reshape((1, -1)), dtype=np.int32)
+        self.flat_index = self.be.iobuf((1, self.nsteps), dtype=np.int32)
+
+    def softmax(self, x):
+        """
+        Replace x with its softmax along the first axis.
+        """
+        x[:] = self.be.exp(x - self.be.max(x, axis=0))
+        x[:] = x / self.be.sum(x, axis=0)
+
+    def fprop(self, inputs, inference=False):
+        """
+        Apply the forward pass transformation to the input data.  In training, the
+        outputs are left for SoftmaxLayerCost to compute the cost of the targets.
+
+        Arguments:
+            inputs (Tensor): input data
+            inference (bool): is inference only
+
+        Returns:
+            Tensor: output data, the probabilities of the classes in inference
+        """
+        self.inputs = inputs
+        self.inference = inference
+        self.dlogits = None
+        self.hidden[:self.nin] = inputs
+        if inference:
+            self.probabilities(self.outputs)
+        return self.outputs
+
+    def fprop_cost(self, targets, out, logscale=1., scale=1.):
+        """
+        Compute the cross entropy of every step, from the probabilities of the targets in
+        inference, or the training approximation otherwise, which also computes the
+        gradients of the logits for bprop.
+
+        Arguments:
+            targets (Tensor): (1, N) class indices or (nout, N) onehot targets
+            out (Tensor): (1, N) buffer of the cost of the steps
+            logscale (float, optional): scale of the cost
+            scale (float, optional): scale of the gradients
+
+        Returns:
+            Tensor: out
+        """
+        if targets.shape[0] == 1:
+            self.labels[:] = targets
+        else:
+            self.labels[:] = self.be.argmax(targets, axis=0)
+
+        if self.inference:
+            self.flat_index[:] = self.labels * self.ncols + self.columns
+            probs = self.outputs.reshape((1, -1)).take(self.flat_index, axis=1)
+            out[:] = -logscale * self.be.safelog(probs)
+            self.dlogits = None
+        else:
+            self.train_cost(out, logscale, scale)
+        return out
+
+    def probabilities(self, out):
+        """
+        Compute the softmax probabilities of all the classes from self.hidden.
+
+        Arguments:
+            out (Tensor): (nout, N) buffer of the probabilities
+        """
+        raise NotImplementedError()
+
+    def train_cost(self, out, logscale, scale):
+        """
+        Compute the training cost of the steps for self.labels, and the gradients of the
+        logits into self.dlogits.
+        """
+        raise NotImplementedError()
+
+
+class SampledSoftmax(SoftmaxOutput):
+
+    """
+    A softmax output layer trained with a sampled softmax: the cross entropy of each step
+    is computed over its target and num_sampled classes drawn for the minibatch from a
+    log-uniform distribution, P(c) = log((c + 2) / (c + 1)) / log(nout + 1), with the
+    logits corrected by the log of the expected count of their class in the draws.  The
+    class indices should be ordered by decreasing frequency, like in most vocabularies
+    built for large models.  Only the weights of the sampled and target classes have
+    gradients, so training costs O(num_sampled + N) rows of weights instead of O(nout).
+    In inference the layer outputs the exact softmax probabilities.
+
+    Trained with SoftmaxLayerCost.
+
+    weight shape - (nout, nin + 1), the last column holding the biases
+
+    Arguments:
+        nout (int): number of classes
+        init (Initializer): Initializer object to use for initializing layer
+            weights, the biases start at 0
+        num_sampled (int): number of distinct classes drawn per minibatch
+        remove_accidental_hits (bool, optional): exclude a sampled class from the
+            softmax of the steps it is the target of
+        name (str, optional): Layer name
+    """
+
+    def __init__(self, nout, init, num_sampled, remove_accidental_hits=True, name=None):
+        super(SampledSoftmax, self).__init__(nout, init, name)
+        assert num_sampled < nout, "num_sampled must be smaller than the number of classes"
+        self.num_sampled = num_sampled
+        self.remove_accidental_hits = remove_accidental_hits
+
+    def allocate(self, shared_outputs=None, accumulate_updates=False):
+        super(SampledSoftmax, self).allocate(shared_outputs, accumulate_updates)
+        k, ncols = self.num_sampled, self.ncols
+        self.sample_ids = self.be.zeros((1, k), dtype=np.int32)
+        self.sample_logq = self.be.zeros((k, 1))
+        self.target_logq = self.be.iobuf((1, self.nsteps))
+        self.sampled_W = self.be.zeros((k, self.nin + 1))
+        self.target_W = self.be.zeros((ncols, self.nin + 1))
+        # logits of the target, then of the sampled classes, of every step
+        self.logits = self.be.iobuf((k + 1, self.nsteps))
+        self.lut_ids = self.be.zeros((1, k + ncols), dtype=np.int32)
+        self.lut_errors = self.be.zeros((self.nin + 1, k + ncols))
+        self.lut_errors_t = self.be.zeros((k + ncols, self.nin + 1))
+
+    def sample(self):
+        """
+        Draw num_sampled distinct classes from the log-uniform distribution.
+
+        Returns:
+            tuple: int32 array of the classes and number of draws it took
+        """
+        log_range = np.log(self.nout + 1.)
+        classes, seen, tries = [], set(), 0
+        while len(classes) < self.num_sampled:
+            draws = np.exp(self.be.rng.uniform(0., log_range, self.num_sampled)) - 1.
+            for c in np.minimum(draws.astype(np.int64), self.nout - 1):
+                tries += 1
+                if c not in seen:
+                    seen.add(c)
+                    classes.append(c)
+                    if len(classes) == self.num_sampled:
+                        break
+        return np.array(classes, dtype=np.int32), tries
+
+    def log_expected_count(self, classes, tries):
+        """
+        Log of the probability of classes to be drawn at least once in tries draws.
+        """
+        p = np.log((classes + 2.) / (classes + 1.)) / np.log(self.nout + 1.)
+        return np.log(-np.expm1(tries * np.log1p(-p)))
+
+    def probabilities(self, out):
+        self.be.compound_dot(A=self.W, B=self.hidden, C=out)
+        self.softmax(out)
+
+    def train_cost(self, out, logscale, scale):
+        samples, tries = self.sample()
+        labels = self.labels.get().ravel()
+        self.sample_ids.set(samples.reshape((1, -1)))
+        self.sample_logq.set(self.log_expected_count(samples, tries).reshape((-1, 1)))
+        self.target_logq.set(self.log_expected_count(labels, tries).reshape((1, -1)))
+
+        self.sampled_W[:] = self.W.take(self.sample_ids, axis=0)
+        self.target_W[:] = self.W.take(self.labels, axis=0)
+        true_logits, sampled_logits = self.logits[:1], self.logits[1:]
+        true_logits[:] = self.be.sum(self.target_W.T * self.hidden, axis=0) - self.target_logq
+        self.be.compound_dot(A=self.sampled_W, B=self.hidden, C=sampled_logits)
+        if self.remove_accidental_hits:
+            hits = self.be.equal(self.sample_ids.reshape((-1, 1)), self.labels)
+            sampled_logits[:] = sampled_logits - self.sample_logq - 1e9 * hits
+        else:
+            sampled_logits[:] = sampled_logits - self.sample_logq
+
+        self.softmax(self.logits)
+        out[:] = -logscale * self.be.safelog(true_logits)
+        true_logits[:] = true_logits - 1.
+        self.logits[:] = self.logits * scale
+        self.dlogits = self.logits
+
+    def bprop(self, error, alpha=1.0, beta=0.0):
+        """
+        Apply the backward pass transformation to the input data.
+
+        Arguments:
+            error (Tensor): gradients of the logits computed by SoftmaxLayerCost
+            alpha (float, optional): unused
+            beta (float, optional): unused
+
+        Returns:
+            Tensor: deltas to propagate to the adjacent lower layer
+        """
+        k, nin = self.num_sampled, self.nin
+        true_errors, sampled_errors = self.logits[:1], self.logits[1:]
+        if self.deltas:
+            self.be.compound_dot(A=self.sampled_W[:, :nin].T, B=sampled_errors, C=self.deltas)
+            self.deltas[:] = self.deltas + self.target_W[:, :nin].T * true_errors
+
+        # gradients of the rows of the sampled and target classes, summed by class
+        self.be.compound_dot(A=self.hidden, B=sampled_errors.T, C=self.lut_errors[:, :k])
+        self.lut_errors[:, k:] = self.hidden * true_errors
+        self.lut_ids[:, :k] = self.sample_ids
+        self.lut_ids[:, k:] = self.labels
+        self.dW[:] = 0
+        self.be.compound_bprop_lut(self.lut_ids.shape[1], self.lut_ids, self.lut_errors,
+                                   self.lut_errors_t, self.dW, None)
+        return self.deltas
+
+
+class ClassFactoredSoftmax(SoftmaxOutput):
+
+    """
+    A class-factored (two level) softmax output layer: the classes are partitioned into
+    contiguous ranges of indices, and the probability of a class is the softmax
+    probability of its range times its softmax probability within the range.  Training
+    only computes the logits of the ranges and of the classes in the range of each
+    target, O(num_classes + nout / num_classes) rows of weights per step instead of
+    O(nout).  With ranges of equal sizes, the class indices should be ordered by
+    frequency.  In inference the layer outputs the exact probabilities of all the
+    classes.
+
+    Trained with SoftmaxLayerCost.
+
+    weight shape - (nout + num_classes, nin + 1), the rows of the classes followed by
+    the rows of the ranges, the last column holding the biases
+
+    Arguments:
+        nout (int): number of classes
+        init (Initializer): Initializer object to use for initializing layer
+            weights, the biases start at 0
+        num_classes (int, optional): number of ranges of classes of equal sizes,
+            defaults to sqrt(nout)
+        class_bounds (list, optional): increasing bounds of the ranges, from 0 to nout,
+            instead of num_classes ranges of equal sizes
+        name (str, optional): Layer name
+    """
+
+    def __init__(self, nout, init, num_classes=None, class_bounds=None, name=None):
+        super(ClassFactoredSoftmax, self).__init__(nout, init, name)
+        if class_bounds is None:
+            num_classes = num_classes or int(np.ceil(np.sqrt(nout)))
+            class_bounds = np.linspace(0, nout, min(num_classes, nout) + 1).round()
+        self.class_bounds = [int(b) for b in class_bounds]
+        bounds = np.array(self.class_bounds)
+        if bounds[0] != 0 or bounds[-1] != nout or np.any(np.diff(bounds) <= 0):
+            raise ValueError("class_bounds must increase from 0 to nout")
+        self.num_classes = len(bounds) - 1
+        self.extra_rows = self.num_classes
+        self.word_class = np.repeat(np.arange(self.num_classes), np.diff(bounds))
+        self.blocks = []
+
+    def allocate(self, shared_outputs=None, accumulate_updates=False):
+        super(ClassFactoredSoftmax, self).allocate(shared_outputs, accumulate_updates)
+        max_size = max(np.diff(self.class_bounds))
+        self.class_probs = self.be.iobuf((self.num_classes, self.nsteps))
+        self.class_labels = self.be.iobuf((1, self.nsteps), dtype=np.int32)
+        self.class_hot = self.be.iobuf((self.num_classes, self.nsteps))
+        # the steps sorted by class, the probabilities of the classes in the range of the
+        # target of each step in the first rows
+        self.order = self.be.iobuf((1, self.nsteps), dtype=np.int32)
+        self.inverse_order = self.be.iobuf((1, self.nsteps), dtype=np.int32)
+        self.sorted_hidden = self.be.iobuf((self.nin + 1, self.nsteps))
+        self.sorted_deltas = self.be.iobuf((self.nin, self.nsteps))
+        self.sorted_cost = self.be.iobuf((1, self.nsteps))
+        self.word_probs = self.be.zeros((max_size, self.ncols))
+        self.word_labels = self.be.iobuf((1, self.nsteps), dtype=np.int32)
+        self.word_hot = self.be.zeros((max_size, self.ncols))
+
+    def probabilities(self, out):
+        self.be.compound_dot(A=self.W[:self.nout], B=self.hidden, C=out)
+        self.be.compound_dot(A=self.W[self.nout:], B=self.hidden, C=self.class_probs)
+        self.softmax(self.class_probs)
+        for c in range(self.num_classes):
+            x = out[self.class_bounds[c]:self.class_bounds[c + 1]]
+            x[:] = self.be.exp(x - self.be.max(x, axis=0))
+            x[:] = x * (self.class_probs[c:c + 1] / self.be.sum(x, axis=0))
+
+    def train_cost(self, out, logscale, scale):
+        bounds = self.class_bounds
+        labels = self.labels.get().ravel()
+        classes = self.word_class[labels]
+        order = np.argsort(classes, kind='mergesort')
+        self.order.set(order.reshape((1, -1)).astype(np.int32))
+        self.inverse_order.set(np.argsort(order).reshape((1, -1)).astype(np.int32))
+        self.class_labels.set(classes.reshape((1, -1)).astype(np.int32))
+        self.word_labels.set((labels - np.take(bounds, classes))[order].reshape((1, -1))
+                             .astype(np.int32))
+        # (class, first and last rows of its range, first and last sorted steps)
+        counts = np.bincount(classes, minlength=self.num_classes)
+        ends = np.cumsum(counts)
+        self.blocks = [(c, bounds[c], bounds[c + 1], ends[c] - counts[c], ends[c])
+                       for c in np.flatnonzero(counts)]
+
+        self.be.compound_dot(A=self.W[self.nout:], B=self.hidden, C=self.class_probs)
+        self.softmax(self.class_probs)
+        self.class_hot[:] = self.be.onehot(self.class_labels, axis=0)
+        out[:] = -logscale * self.be.safelog(self.be.sum(self.class_probs * self.class_hot,
+                                                         axis=0))
+        self.class_probs[:] = (self.class_probs - self.class_hot) * scale
+
+        self.sorted_hidden[:] = self.hidden.take(self.order, axis=1)
+        for c, start, end, first, last in self.blocks:
+            probs = self.word_probs[:end - start, first:last]
+            self.be.compound_dot(A=self.W[start:end], B=self.sorted_hidden[:, first:last],
+                                 C=probs)
+            self.softmax(probs)
+        self.word_hot[:] = self.be.onehot(self.word_labels, axis=0)
+        self.sorted_cost[:] = -logscale * self.be.safelog(
+            self.be.sum(self.word_probs * self.word_hot, axis=0))
+        out[:] = out + self.sorted_cost.take(self.inverse_order, axis=1)
+        self.word_probs[:] = (self.word_probs - self.word_hot) * scale
+        self.dlogits = self.class_probs
+
+    def bprop(self, error, alpha=1.0, beta=0.0):
+        """
+        Apply the backward pass transformation to the input data.
+
+        Arguments:
+            error (Tensor): gradients of the logits of the ranges computed by
+                            SoftmaxLayerCost, the ones of the classes being kept by
+                            the layer
+            alpha (float, optional): unused
+            beta (float, optional): unused
+
+        Returns:
+            Tensor: deltas to propagate to the adjacent lower layer
+        """
+        nin = self.nin
+        self.dW[:] = 0
+        self.be.compound_dot(A=self.class_probs, B=self.hidden.T, C=self.dW[self.nout:])
+        for c, start, end, first, last in self.blocks:
+            errors = self.word_probs[:end - start, first:last]
+            self.be.compound_dot(A=errors, B=self.sorted_hidden[:, first:last].T,
+                                 C=self.dW[start:end])
+            if self.deltas:
+                self.be.compound_dot(A=self.W[start:end, :nin].T, B=errors,
+                                     C=self.sorted_deltas[:, first:last])
+        if self.deltas:
+            self.be.compound_dot(A=self.W[self.nout:, :nin].T, B=self.class_probs,
+                                 C=self.deltas)
+            self.deltas[:] = self.deltas + self.sorted_deltas.take(self.inverse_order, axis=1)
+        return self.deltas
+
+
 class GeneralizedCost(NervanaObject):
 
     """
@@ -2239,12 +2777,28 @@ class GeneralizedCost(NervanaObject):
             Tensor containing cost
 
         """
-        self.outputs[:] = self.costfunc(inputs, targets)
+        self.fprop_cost(inputs, targets)
         self.be.mean(self.outputs, axis=1, out=self.cost_buffer)
         self.cost = self.cost_buffer.get()
         self.be.clean_data(self.cost, True)
         return self.cost
 
+    def fprop_cost(self, inputs, targets):
+        """
+        Compute the cost of every record into self.outputs, without copying
+        anything to the host.
+
+        Arguments:
+            inputs (Tensor): Tensor containing input values to be compared to
+                targets
+            targets (Tensor): Tensor containing target values.
+
+        Returns:
+            Tensor containing the cost per record
+        """
+        self.outputs[:] = self.costfunc(inputs, targets)
+        return self.outputs
+
     def get_errors(self, inputs, targets):
         """
         Compute the derivative of the cost function
@@ -2322,13 +2876,29 @@ class GeneralizedCostMask(GeneralizedCost):
         Returns:
             Tensor containing cost
         """
+        self.fprop_cost(inputs, targets_mask)
+        self.cost_buffer[:] = self.be.mean(self.outputs, axis=1)
+        self.cost[:] = self.cost_buffer.get()
+        return self.cost
+
+    def fprop_cost(self, inputs, targets_mask):
+        """
+        Compute the weighted cost of every record into self.outputs, without
+        copying anything to the host.
+
+        Arguments:
+            inputs (Tensor): Tensor containing input values to be compared to
+                targets
+            targets_mask ((Tensor, Tensor)): Tuple with Tensor target values and Tensor mask
+
+        Returns:
+            Tensor containing the cost per record
+        """
         targets, mask = targets_mask
         masked_input = inputs * mask
         masked_targets = targets * mask
-        self.outputs[:] = self.costfunc(masked_input, masked_targets)
-        self.cost_buffer[:] = self.be.mean(self.outputs, axis=1) * self.weights
-        self.cost[:] = self.cost_buffer.get()
-        return self.cost
+        self.outputs[:] = self.costfunc(masked_input, masked_targets) * self.weights
+        return self.outputs
 
     def get_errors(self, inputs, targets_mask):
         """
@@ -2349,6 +2919,78 @@ class GeneralizedCostMask(GeneralizedCost):
         return self.deltas
 
 
+class SoftmaxLayerCost(GeneralizedCost):
+
+    """
+    The cross entropy cost of a SampledSoftmax or ClassFactoredSoftmax output layer,
+    which the layer computes itself: with its training approximation after a training
+    fprop, which also computes the gradients of its logits, and exactly from its output
+    probabilities after an inference fprop.  The targets are (1, N) class indices, like
+    the ones of Text with onehot_target=False, or onehot.
+
+    Arguments:
+        scale (float, optional): scale factor for the backpropagated error
+        usebits (bool, optional): compute the cost in bits
+    """
+
+    def __init__(self, scale=1., usebits=False, name=None):
+        super(SoftmaxLayerCost, self).__init__(None, name)
+        self.scale = scale
+        self.usebits = usebits
+        self.logscale = 1. / np.log(2.) if usebits else 1.
+
+    def initialize(self, in_obj):
+        """
+        Find the output layer and allocate the cost buffer.
+
+        Arguments:
+            in_obj (Layer): output layer, or container ending with it
+        """
+        layer = in_obj
+        while not isinstance(layer, SoftmaxOutput) and hasattr(layer, 'layers'):
+            layer = layer.layers[-1]
+        if not isinstance(layer, SoftmaxOutput):
+            raise ValueError("SoftmaxLayerCost requires a SampledSoftmax or "
+                             "ClassFactoredSoftmax output layer")
+        self.prev_layer = layer
+        self.parallelism = layer.parallelism
+        self.nstep = layer.nsteps
+        self.outputs = self.be.iobuf((1, self.nstep),
+                                     parallelism=self.parallelism,
+                                     persist_values=False)
+        self.cost = np.empty([1, 1], dtype=np.float32)
+
+    def fprop_cost(self, inputs, targets):
+        """
+        Compute the cost of every record into self.outputs, without copying
+        anything to the host.
+
+        Arguments:
+            inputs (Tensor): outputs of the output layer, unused
+            targets (Tensor): Tensor containing target values.
+
+        Returns:
+            Tensor containing the cost per record
+        """
+        return self.prev_layer.fprop_cost(targets, self.outputs, self.logscale, self.scale)
+
+    def get_errors(self, inputs, targets):
+        """
+        Returns the gradients of the logits of the output layer, computed with the cost
+        of the last training fprop.
+
+        Arguments:
+            inputs (Tensor): outputs of the output layer, unused
+            targets (Tensor): Tensor containing target values.
+
+        Returns:
+            Tensor: gradients of the logits, for the bprop of the output layer
+        """
+        if self.prev_layer.dlogits is None:
+            self.fprop_cost(inputs, targets)
+        return self.prev_layer.dlogits
+
+
 class BatchNorm(Layer):
 
     """
@@ -2376,6 +3018,8 @@ class BatchNorm(Layer):
         self.has_params = True
         self.owns_delta = True
         self.error_view = None
+        self.row_scale = None  # folded inference transform for partial minibatches
+        self.row_shift = None
         self.rho = rho
         self.eps = eps
         self.states = [[] for i in range(2)]
@@ -2477,6 +3121,9 @@ class BatchNorm(Layer):
         Returns:
             Tensor: output data
         """
+        if inference and self.partial_bsz is not None and inputs.shape[1] == self.be.bsz:
+            return self._fprop_partial(inputs, beta)
+
         if self.inputs is None or self.inputs.base is not inputs:
             self.inputs = inputs.reshape((self.nfm, -1))
 
@@ -2487,6 +3134,25 @@ class BatchNorm(Layer):
 
         return self.outputs
 
+    def fprop_recompute(self, inputs):
+        """
+        Recompute the batch normalized outputs without updating the running mean and
+        variance a second time.  The batch sum is taken from the inputs, since the
+        one a preceding layer computed into xsum has been scaled to the mean.
+
+        Arguments:
+            inputs (Tensor): input data
+
+        Returns:
+            Tensor: output data
+        """
+        rho, compute_batch_sum = self.rho, self.compute_batch_sum
+        self.rho, self.compute_batch_sum = 1.0, True
+        try:
+            return self.fprop(inputs)
+        finally:
+            self.rho, self.compute_batch_sum = rho, compute_batch_sum
+
     def _fprop_inference(self, inputs, beta=0.0):
         """
         Apply one linear transformation that captures normalization, gamma scaling and beta shift.
@@ -2495,6 +3161,24 @@ class BatchNorm(Layer):
         self.y[:] = self.y * beta + xhat * self.gamma + self.beta
         return self.outputs
 
+    def _fprop_partial(self, inputs, beta=0.0):
+        """
+        Inference on the actual columns of a partial minibatch.  The (nfm, -1)
+        view used otherwise mixes examples for convolutional inputs, so the
+        normalization, gamma scaling and beta shift are folded into a scale and
+        shift per input row and applied to the column slices.
+        """
+        if self.row_scale is None:
+            self.row_scale = self.be.empty((inputs.shape[0], 1))
+            self.row_shift = self.be.empty((inputs.shape[0], 1))
+        scale = self.row_scale.reshape((self.nfm, -1))
+        scale[:] = self.gamma / self.be.sqrt(self.gvar + self.eps)
+        self.row_shift.reshape((self.nfm, -1))[:] = self.beta - self.gmean * scale
+
+        y = self.batch_view(self.outputs)
+        y[:] = y * beta + self.batch_view(inputs) * self.row_scale + self.row_shift
+        return self.outputs
+
     @Layer.accumulates
     def bprop(self, error, alpha=1.0, beta=0.0):
         """
@@ -2688,8 +3372,8 @@ class RoiPooling(Layer):
 
     ROIPooling takes as input a tuple (img_fm, rois) where:
     (1) img_fm: output from the convolutional layers (e.g. for VGG-16, 62x62)
-    (2) rois: proposed ROIs, in the form (rois_per_img, 5). The first index is the
-        image_id within the minibatch. Since faster-rcnn uses batch size 1, this is always 0.
+    (2) rois: proposed ROIs, in the form (rois_per_img * batch_size, 5). The first index is
+        the image_id within the minibatch.
 
     The output shape (out_shape) is a tuple - (batch_size, rois_per_img), then
     the following layers will allocate buffers accordingly.
@@ -2794,7 +3478,7 @@ class RoiPooling(Layer):
 
         # fprop through the roipooling layer
         self.be.roipooling_fprop(self.img, self.rois, self.outputs, self.max_idx,
-                                 self.rois_per_img, self.fm_channel, self.fm_height,
+                                 self.rois.shape[0], self.fm_channel, self.fm_height,
                                  self.fm_width, self.roi_H, self.roi_W, self.spatial_scale)
 
         return self.outputs
@@ -2819,7 +3503,7 @@ class RoiPooling(Layer):
         if self.bprop_enabled:
             # # bprop through the roipooling layer
             self.be.roipooling_bprop(error, self.rois, self.error, self.max_idx,
-                                     self.rois_per_img, self.fm_channel, self.fm_height,
+                                     self.rois.shape[0], self.fm_channel, self.fm_height,
                                      self.fm_width, self.roi_H, self.roi_W, self.spatial_scale)
 
         # bprop back through the imagenet layer container
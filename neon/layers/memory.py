@@ -0,0 +1,144 @@
+# ******************************************************************************
+# Copyright 2017-2018 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ******************************************************************************
+"""
+Accounting of the device memory held by the layers of a model.
+"""
+from collections import OrderedDict
+import numpy as np
+
+from neon.backends.backend import Tensor
+from neon.layers.container import LayerContainer
+
+CATEGORIES = ('outputs', 'deltas', 'params', 'grads', 'states', 'scratch')
+
+
+def allocation(tensor):
+    """
+    Identify the memory a tensor lives in, views resolve to the tensor they were taken
+    from.
+
+    Arguments:
+        tensor (Tensor): backend tensor
+
+    Returns:
+        tuple: id of the allocation and its size in bytes
+    """
+    ary = getattr(tensor, '_tensor', None)
+    if isinstance(ary, np.ndarray):
+        while isinstance(ary.base, np.ndarray):
+            ary = ary.base
+        return id(ary), ary.nbytes
+    while getattr(tensor, 'base', None) is not None:
+        tensor = tensor.base
+    return id(tensor), tensor.nbytes
+
+
+def tensors(obj):
+    """
+    Tensors in obj, a tensor or nested lists and tuples of them.
+    """
+    if isinstance(obj, Tensor):
+        yield obj
+    elif isinstance(obj, (list, tuple)):
+        for item in obj:
+            for t in tensors(item):
+                yield t
+
+
+def arena_buffers(container):
+    """
+    Buffers shared by several layers: the delta buffers of every nesting level, the
+    checkpoint pools and the output arenas of the containers.
+
+    Returns:
+        list: (name, tensor) for each shared buffer
+    """
+    shared = []
+    for l in [container] + [l for l in container.layers_fprop()
+                            if isinstance(l, LayerContainer)]:
+        level, deltas = 0, getattr(l, 'global_deltas', None)
+        while deltas is not None:
+            shared += [('%s_deltas_%d_%d' % (l.name, level, i), buf)
+                       for i, buf in enumerate(deltas.buffers) if buf is not None]
+            level, deltas = level + 1, deltas.child
+        for attr in ('checkpoint_buffers', 'output_arenas'):
+            pool = getattr(l, attr, None)
+            if pool is not None:
+                shared += [('%s_%s_%d' % (l.name, attr, i), buf)
+                           for i, buf in enumerate(pool.buffers)]
+    return shared
+
+
+def memory_report(container, global_deltas=None):
+    """
+    Bytes of device memory held by each layer of container.  Every allocation is
+    counted once: buffers shared by several layers are reported as arenas, and any
+    other allocation is charged to the first layer in fprop order referencing it.
+
+    Arguments:
+        container (LayerContainer): initialized layers of a model
+        global_deltas (DeltasTree, optional): delta buffers allocated outside container
+
+    Returns:
+        dict: 'layers', an OrderedDict of the bytes per category (outputs, deltas, params,
+              grads, states and scratch) by layer name, 'arenas', the bytes of each
+              shared buffer by name, and the 'total_bytes' of both
+    """
+    seen = set()
+
+    def charge(tensor):
+        key, nbytes = allocation(tensor)
+        if key in seen:
+            return 0
+        seen.add(key)
+        return nbytes
+
+    arenas = OrderedDict()
+    shared = arena_buffers(container)
+    level = 0
+    while global_deltas is not None:
+        shared += [('deltas_%d_%d' % (level, i), buf)
+                   for i, buf in enumerate(global_deltas.buffers) if buf is not None]
+        level, global_deltas = level + 1, global_deltas.child
+    for name, buf in shared:
+        nbytes = charge(buf)
+        if nbytes:
+            arenas[name] = nbytes
+
+    layers = OrderedDict()
+    visited = set()
+    for l in [container] + list(container.layers_fprop()):
+        if id(l) in visited:
+            continue
+        visited.add(id(l))
+        usage = OrderedDict((cat, 0) for cat in CATEGORIES)
+        if l.has_params and not isinstance(l, LayerContainer):
+            params = l.get_params()
+            for (param, grad), states in (params if isinstance(params, list) else [params]):
+                usage['params'] += sum(charge(t) for t in tensors(param))
+                usage['grads'] += sum(charge(t) for t in tensors(grad))
+                usage['states'] += sum(charge(t) for t in tensors(states))
+        for attr, value in sorted(vars(l).items()):
+            if attr == 'inputs':
+                # the outputs of the previous layer, or the data
+                continue
+            cat = attr if attr in ('outputs', 'deltas') else 'scratch'
+            usage[cat] += sum(charge(t) for t in tensors(value))
+        usage['total'] = sum(usage.values())
+        layers[l.name] = usage
+
+    total = sum(arenas.values()) + sum(u['total'] for u in layers.values())
+    return {'layers': layers, 'arenas': arenas, 'total_bytes': total}
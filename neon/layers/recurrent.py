@@ -15,6 +15,7 @@
 # ******************************************************************************
 from __future__ import division
 from builtins import range, zip
+import functools
 import numpy as np
 from neon.layers.layer import ParameterLayer, Layer
 
@@ -66,6 +67,10 @@ class Recurrent(ParameterLayer):
         reset_cells (bool): default to be False to make the layer stateful,
                             set to True to be stateless
         name (str, optional): name to refer to this layer as.
+        checkpoint_steps (int, optional): keep the per step buffers that are only
+                                          needed within a time step for this many
+                                          steps, and compute them segment by
+                                          segment.  Defaults to the whole sequence.
 
     Attributes:
         W_input (Tensor): weights from inputs to output units
@@ -76,7 +81,7 @@ class Recurrent(ParameterLayer):
     """
 
     def __init__(self, output_size, init, init_inner=None, activation=None,
-                 reset_cells=False, name=None):
+                 reset_cells=False, name=None, checkpoint_steps=None):
         assert activation is not None, "missing activation function for Recurrent"
         super(Recurrent, self).__init__(init, name)
         self.x = None
@@ -90,6 +95,7 @@ class Recurrent(ParameterLayer):
         self.ngates = 1
         self.reset_cells = reset_cells
         self.init_inner = init_inner
+        self.checkpoint_steps = checkpoint_steps
 
     def __str__(self):
         return "Recurrent Layer '%s': %d inputs, %d outputs, %d steps" % (
@@ -127,9 +133,9 @@ class Recurrent(ParameterLayer):
                                                computed into
         """
         super(Recurrent, self).allocate(shared_outputs)
-        self.h_ff_buffer = self.be.zeros_like(self.outputs)
+        self.h_ff_buffer = self.be.iobuf(self.segment_shape(self.nout))
         self.final_state_buffer = self.be.iobuf(self.out_shape[0])
-        self.h_ff = get_steps(self.h_ff_buffer, self.out_shape)
+        self.h_ff = get_steps(self.h_ff_buffer, self.segment_shape(self.nout))
         self.h = get_steps(self.outputs, self.out_shape)
         self.h_prev = self.h[-1:] + self.h[:-1]
         # State deltas
@@ -141,6 +147,69 @@ class Recurrent(ParameterLayer):
         if self.W_input is None:
             self.init_params(self.weight_shape)
 
+    @property
+    def segment_steps(self):
+        """
+        Number of time steps the per step buffers are kept for.
+        """
+        return min(self.checkpoint_steps or self.nsteps, self.nsteps)
+
+    def segment_shape(self, nfeatures):
+        """
+        Shape of a buffer holding nfeatures for the time steps of one segment.
+        """
+        return (nfeatures, self.segment_steps)
+
+    def step_segments(self):
+        """
+        Returns:
+            list: (first step, number of steps) of each checkpoint segment
+        """
+        return [(s0, min(self.segment_steps, self.nsteps - s0))
+                for s0 in range(0, self.nsteps, self.segment_steps)]
+
+    def project_inputs(self, buf, buf_steps, s0, nsteps):
+        """
+        Compute W_input x for the time steps s0 to s0 + nsteps into the first steps
+        of a segment buffer.
+
+        Arguments:
+            buf (Tensor): segment buffer
+            buf_steps (list): per step views of buf
+            s0 (int): first time step
+            nsteps (int): number of time steps
+        """
+        if self.partial_bsz is None:
+            bsz = self.be.bsz
+            self.be.compound_dot(self.W_input, self.x[:, s0 * bsz:(s0 + nsteps) * bsz],
+                                 buf[:, :nsteps * bsz])
+        else:
+            # examples are not contiguous across steps, so work on per step views
+            n = self.partial_bsz
+            for (xs, out) in zip(self.xs[s0:s0 + nsteps], buf_steps):
+                self.be.compound_dot(self.W_input, xs[:, :n], out[:, :n])
+
+    def checkpoint_bytes(self):
+        """
+        Returns:
+            tuple: bytes of the per step buffers for the whole sequence and for one
+                   checkpoint segment
+        """
+        step_bytes = self.nout * self.be.bsz * np.dtype(self.be.default_dtype).itemsize
+        return step_bytes * self.nsteps, step_bytes * self.segment_steps
+
+    def checkpoint_report(self):
+        """
+        Returns:
+            dict: bytes of the per step buffers stored without and with checkpointing
+                  across time and the difference, None without checkpointing
+        """
+        if not self.checkpoint_steps:
+            return None
+        full, checkpointed = self.checkpoint_bytes()
+        return {'full_bytes': full, 'checkpointed_bytes': checkpointed,
+                'saved_bytes': full - checkpointed}
+
     def set_deltas(self, delta_buffers):
         """
         Use pre-allocated (by layer containers) list of buffers for backpropagated error.
@@ -260,12 +329,18 @@ class Recurrent(ParameterLayer):
             self.h_prev_bprop[0] = init_state
             self.h[-1][:] = init_state
 
-        # feedforward input
-        self.be.compound_dot(self.W_input, self.x, self.h_ff_buffer)
+        params = (self.h, self.h_prev, self.h_ff)
+        if self.partial_bsz is not None:
+            n = self.partial_bsz
+            params = [[buf[:, :n] for buf in bufs] for bufs in params]
+        (hs, h_prevs, h_ffs) = params
 
-        for (h, h_prev, h_ff) in zip(self.h, self.h_prev, self.h_ff):
-            self.be.compound_dot(self.W_recur, h_prev, h)
-            h[:] = self.activation(h + h_ff + self.b)
+        for s0, nsteps in self.step_segments():
+            # feedforward input
+            self.project_inputs(self.h_ff_buffer, self.h_ff, s0, nsteps)
+            for (h, h_prev, h_ff) in zip(hs[s0:s0 + nsteps], h_prevs[s0:s0 + nsteps], h_ffs):
+                self.be.compound_dot(self.W_recur, h_prev, h)
+                h[:] = self.activation(h + h_ff + self.b)
 
         self.final_state_buffer[:] = self.h[-1]
         return self.outputs
@@ -348,6 +423,13 @@ class LSTM(Recurrent):
         reset_cells (bool): default to be False to make the layer stateful,
                             set to True to be stateless
         name (str, optional): name to refer to this layer as.
+        checkpoint_steps (int, optional): keep the gate activations, gate deltas
+                                          and activated cell states for this many
+                                          time steps only.  Only the hidden and
+                                          cell states are stored for the whole
+                                          sequence and bprop recomputes the rest
+                                          segment by segment.  Defaults to the
+                                          whole sequence.
 
     Attributes:
         x (Tensor): input data as 2D tensor. The dimension is
@@ -359,9 +441,9 @@ class LSTM(Recurrent):
         b (Tensor): Biases (out size * 4 , 1)
     """
     def __init__(self, output_size, init, init_inner=None, activation=None,
-                 gate_activation=None, reset_cells=False, name=None):
+                 gate_activation=None, reset_cells=False, name=None, checkpoint_steps=None):
         super(LSTM, self).__init__(output_size, init, init_inner,
-                                   activation, reset_cells, name)
+                                   activation, reset_cells, name, checkpoint_steps)
         assert gate_activation is not None, ("LSTM layer requires " +
                                              "gate_activation to be specified")
         assert activation is not None, "missing activation function for LSTM"
@@ -390,12 +472,19 @@ class LSTM(Recurrent):
         self.c_prev = self.c[-1:] + self.c[:-1]
         self.c_prev_bprop = [0] + self.c[:-1]
 
-        self.c_act_buffer = self.be.iobuf(self.out_shape)
-        self.c_act = get_steps(self.c_act_buffer, self.out_shape)
+        # hidden state the first step of the sequence started from, to recompute
+        # its gates
+        self.h_init = self.be.iobuf(self.nout)
+
+        # Per step buffers only needed within a step are kept for one segment
+        seg_shape = self.segment_shape(self.nout)
+        seg_gate_shape = self.segment_shape(self.nout * self.ngates)
+        self.c_act_buffer = self.be.iobuf(seg_shape)
+        self.c_act = get_steps(self.c_act_buffer, seg_shape)
 
         # Gates: input, forget, output, input modulation
-        self.ifog_buffer = self.be.iobuf(self.gate_shape)
-        self.ifog = get_steps(self.ifog_buffer, self.gate_shape)
+        self.ifog_buffer = self.be.iobuf(seg_gate_shape)
+        self.ifog = get_steps(self.ifog_buffer, seg_gate_shape)
         self.ifo = [gate[ifo1:ifo2] for gate in self.ifog]
         self.i = [gate[i1:i2] for gate in self.ifog]
         self.f = [gate[f1:f2] for gate in self.ifog]
@@ -408,14 +497,61 @@ class LSTM(Recurrent):
         self.c_delta_prev = [None] + self.c_delta[:-1]
 
         # Pre activation gate deltas
-        self.ifog_delta_buffer = self.be.iobuf(self.gate_shape)
-        self.ifog_delta = get_steps(self.ifog_delta_buffer, self.gate_shape)
+        self.ifog_delta_buffer = self.be.iobuf(seg_gate_shape)
+        self.ifog_delta = get_steps(self.ifog_delta_buffer, seg_gate_shape)
         self.i_delta = [gate[i1:i2] for gate in self.ifog_delta]
         self.f_delta = [gate[f1:f2] for gate in self.ifog_delta]
         self.o_delta = [gate[o1:o2] for gate in self.ifog_delta]
         self.g_delta = [gate[g1:g2] for gate in self.ifog_delta]
         self.bufs_to_reset.append(self.c_buffer)
 
+    def checkpoint_bytes(self):
+        """
+        Returns:
+            tuple: bytes of the per step buffers for the whole sequence and for one
+                   checkpoint segment
+        """
+        # gates, gate deltas and activated cell state
+        full, checkpointed = super(LSTM, self).checkpoint_bytes()
+        nbufs = 2 * self.ngates + 1
+        return nbufs * full, nbufs * checkpointed
+
+    def fprop_segment(self, s0, nsteps, update_state=True):
+        """
+        Compute the gates of the time steps s0 to s0 + nsteps into the segment
+        buffers, along with the cell and hidden states if update_state is set.
+        Otherwise the stored cell states are activated again for bprop.
+
+        Arguments:
+            s0 (int): first time step
+            nsteps (int): number of time steps
+            update_state (bool, optional): compute the cell and hidden states
+        """
+        steps = slice(s0, s0 + nsteps)
+        params = (self.h[steps], self.h_prev[steps], self.c[steps], self.c_prev[steps],
+                  self.ifog, self.ifo, self.i, self.f, self.o, self.g, self.c_act)
+        if not update_state and s0 == 0:
+            # the state before the first step has been overwritten by the last step
+            params = (params[0], [self.h_init] + params[1][1:]) + params[2:]
+        if self.partial_bsz is not None:
+            n = self.partial_bsz
+            params = [[buf[:, :n] for buf in bufs] for bufs in params]
+
+        self.project_inputs(self.ifog_buffer, self.ifog, s0, nsteps)
+
+        for (h, h_prev, c, c_prev, ifog, ifo, i, f, o, g, c_act) in zip(*params):
+            self.be.compound_dot(self.W_recur, h_prev, ifog, beta=1.0)
+
+            ifog[:] = ifog + self.b
+            ifo[:] = self.gate_activation(ifo)
+            g[:] = self.activation(g)
+
+            if update_state:
+                c[:] = f * c_prev + i * g
+            c_act[:] = self.activation(c)
+            if update_state:
+                h[:] = o * c_act
+
     def fprop(self, inputs, inference=False, init_state=None):
         """
         Apply the forward pass transformation to the input data.  The input
@@ -445,21 +581,11 @@ class LSTM(Recurrent):
         if init_state is not None:
             self.h[-1][:] = init_state
 
-        params = (self.h, self.h_prev, self.ifog, self.ifo,
-                  self.i, self.f, self.o, self.g, self.c, self.c_prev, self.c_act)
-
-        self.be.compound_dot(self.W_input, self.x, self.ifog_buffer)
-
-        for (h, h_prev, ifog, ifo, i, f, o, g, c, c_prev, c_act) in zip(*params):
-            self.be.compound_dot(self.W_recur, h_prev, ifog, beta=1.0)
-
-            ifog[:] = ifog + self.b
-            ifo[:] = self.gate_activation(ifo)
-            g[:] = self.activation(g)
+        if self.segment_steps < self.nsteps and not inference:
+            self.h_init[:] = self.h[-1]
 
-            c[:] = f * c_prev + i * g
-            c_act[:] = self.activation(c)
-            h[:] = o * c_act
+        for s0, nsteps in self.step_segments():
+            self.fprop_segment(s0, nsteps)
 
         self.final_state_buffer[:] = self.h[-1]
         return self.outputs
@@ -494,45 +620,59 @@ class LSTM(Recurrent):
         if self.in_deltas is None:
             self.in_deltas = get_steps(deltas, self.out_shape)
             self.prev_in_deltas = self.in_deltas[-1:] + self.in_deltas[:-1]
-            self.ifog_delta_last_steps = self.ifog_delta_buffer[:, self.be.bsz:]
-            self.h_first_steps = self.outputs[:, :-self.be.bsz]
-
-        params = (self.h_delta, self.in_deltas, self.prev_in_deltas,
-                  self.i, self.f, self.o, self.g, self.ifog_delta,
-                  self.i_delta, self.f_delta, self.o_delta, self.g_delta,
-                  self.c_delta, self.c_delta_prev, self.c_prev_bprop, self.c_act)
 
-        for (h_delta, in_deltas, prev_in_deltas,
-             i, f, o, g, ifog_delta, i_delta, f_delta, o_delta, g_delta,
-             c_delta, c_delta_prev, c_prev, c_act) in reversed(list(zip(*params))):
-
-            # current cell delta
-            c_delta[:] = c_delta + self.activation.bprop(c_act) * (o * in_deltas)
-            i_delta[:] = self.gate_activation.bprop(i) * c_delta * g
-            f_delta[:] = self.gate_activation.bprop(f) * c_delta * c_prev
-            o_delta[:] = self.gate_activation.bprop(o) * in_deltas * c_act
-            g_delta[:] = self.activation.bprop(g) * c_delta * i
+        bsz = self.be.bsz
+        for s0, nsteps in reversed(self.step_segments()):
+            if self.segment_steps < self.nsteps:
+                self.fprop_segment(s0, nsteps, update_state=False)
+
+            steps = slice(s0, s0 + nsteps)
+            params = (self.h_delta[steps], self.in_deltas[steps], self.prev_in_deltas[steps],
+                      self.i, self.f, self.o, self.g, self.ifog_delta,
+                      self.i_delta, self.f_delta, self.o_delta, self.g_delta,
+                      self.c_delta[steps], self.c_delta_prev[steps],
+                      self.c_prev_bprop[steps], self.c_act)
+
+            for (h_delta, in_deltas, prev_in_deltas,
+                 i, f, o, g, ifog_delta, i_delta, f_delta, o_delta, g_delta,
+                 c_delta, c_delta_prev, c_prev, c_act) in reversed(list(zip(*params))):
+
+                # current cell delta
+                c_delta[:] = c_delta + self.activation.bprop(c_act) * (o * in_deltas)
+                i_delta[:] = self.gate_activation.bprop(i) * c_delta * g
+                f_delta[:] = self.gate_activation.bprop(f) * c_delta * c_prev
+                o_delta[:] = self.gate_activation.bprop(o) * in_deltas * c_act
+                g_delta[:] = self.activation.bprop(g) * c_delta * i
+
+                # out deltas
+                self.be.compound_dot(self.W_recur.T, ifog_delta, h_delta)
+
+                if c_delta_prev is not None:
+                    c_delta_prev[:] = c_delta * f
+
+                prev_in_deltas[:] = prev_in_deltas + h_delta
+
+            # Weight deltas and accumulate, the recurrent weights skip the first step
+            # of the sequence
+            ifog_delta = self.ifog_delta_buffer[:, :nsteps * bsz]
+            k0 = 1 if s0 == 0 else 0
+            if nsteps > k0:
+                self.be.compound_dot(self.ifog_delta_buffer[:, k0 * bsz:nsteps * bsz],
+                                     self.outputs[:, (s0 + k0 - 1) * bsz:
+                                                  (s0 + nsteps - 1) * bsz].T,
+                                     self.dW_recur, beta=1.0)
+            self.be.compound_dot(ifog_delta, self.x[:, s0 * bsz:(s0 + nsteps) * bsz].T,
+                                 self.dW_input, beta=1.0)
+
+            # Bias delta and accumulate
+            self.db[:] = self.db + self.be.sum(ifog_delta, axis=1)
 
             # out deltas
-            self.be.compound_dot(self.W_recur.T, ifog_delta, h_delta)
-
-            if c_delta_prev is not None:
-                c_delta_prev[:] = c_delta * f
-
-            prev_in_deltas[:] = prev_in_deltas + h_delta
-
-        # Weight deltas and accumulate
-        self.be.compound_dot(self.ifog_delta_last_steps, self.h_first_steps.T, self.dW_recur)
-        self.be.compound_dot(self.ifog_delta_buffer, self.x.T, self.dW_input)
-
-        # Bias delta and accumulate
-        self.db[:] = self.be.sum(self.ifog_delta_buffer, axis=1)
-
-        # out deltas
-        if self.out_deltas_buffer:  # save a bit of computation
-            self.be.compound_dot(self.W_input.T, self.ifog_delta_buffer,
-                                 self.out_deltas_buffer.reshape(self.nin, -1),
-                                 alpha=alpha, beta=beta)
+            if self.out_deltas_buffer:  # save a bit of computation
+                self.be.compound_dot(self.W_input.T, ifog_delta,
+                                     self.out_deltas_buffer.reshape(self.nin, -1)[
+                                         :, s0 * bsz:(s0 + nsteps) * bsz],
+                                     alpha=alpha, beta=beta)
 
         self.final_hidden_error[:] = self.h_delta[0]
         return self.out_deltas_buffer
@@ -992,6 +1132,12 @@ class BiRNN(ParameterLayer):
     """
     Basic Bi Directional Recurrent layer.
 
+    The two directions are independent until their outputs are concatenated.  When
+    they share the inputs, the input projections of both are computed as one GEMM
+    with the stacked input weights, and the unrolls over time of the two directions
+    (in fprop and bprop) run concurrently if the backend has branch workers enabled
+    (see Backend.set_branch_workers).
+
     Arguments:
         output_size (int): Number of hidden/output units
         init (Initializer): Function for initializing the model parameters
@@ -1230,6 +1376,11 @@ class BiRNN(ParameterLayer):
         self.db_f = self.dW[-2:-1].reshape(self.b_f.shape)
         self.db_b = self.dW[-1:].reshape(self.b_b.shape)
 
+        # both directions stacked, the forward rows first like in the gate buffers
+        self.W_input_all = self.W[:2 * nin].reshape((2 * self.g_nout, nin))
+        self.dW_input_all = self.dW[:2 * nin].reshape(self.W_input_all.shape)
+        self.db_all = self.dW[-2:].reshape((2 * self.g_nout, 1))
+
         if doFill:
             gatelist = [g * nout for g in range(0, self.ngates + 1)]
             for wtnm in ('W_input_f', 'W_input_b', 'W_recur_f', 'W_recur_b'):
@@ -1279,23 +1430,64 @@ class BiRNN(ParameterLayer):
             self.h_b_last[:] = self.h_b[0]
 
         # Use single multiply for W_input
-        self.be.compound_dot(self.W_input_f, self.x_f_v, self.h_buffer_f)
-        self.be.compound_dot(self.W_input_b, self.x_b_v, self.h_buffer_b)
-
-        self.be.compound_rnn_unroll_fprop(self.W_recur_f, self.h_prev,
-                                          self.h_f, self.h_f, self.b_f,
-                                          self.nout, self.nsteps,
-                                          self.nsteps,
-                                          self.activation, False)
+        self.input_dot(self.h_buffer, self.h_buffer_f, self.h_buffer_b)
 
-        self.be.compound_rnn_unroll_fprop(self.W_recur_b, self.h_next,
-                                          self.h_b, self.h_b, self.b_b,
-                                          self.nout, self.nsteps,
-                                          self.nsteps,
-                                          self.activation, True)
+        unroll = functools.partial(self.be.compound_rnn_unroll_fprop, nout=self.nout,
+                                   num_steps=self.nsteps, num_used_steps=self.nsteps,
+                                   activation=self.activation)
+        self.be.run_branches([
+            functools.partial(unroll, self.W_recur_f, self.h_prev, self.h_f, self.h_f,
+                              self.b_f, reverse=False),
+            functools.partial(unroll, self.W_recur_b, self.h_next, self.h_b, self.h_b,
+                              self.b_b, reverse=True)])
 
         return self.h_buffer
 
+    def input_dot(self, out, out_f, out_b):
+        """
+        Project the inputs of all the time steps with the input weights of both
+        directions, in a single GEMM with the stacked weights when the inputs are shared.
+
+        Arguments:
+            out (Tensor): output of both directions, the forward rows first
+            out_f (Tensor): forward direction rows of out
+            out_b (Tensor): backward direction rows of out
+        """
+        if self.split_inputs:
+            self.be.compound_dot(self.W_input_f, self.x_f_v, out_f)
+            self.be.compound_dot(self.W_input_b, self.x_b_v, out_b)
+        else:
+            self.be.compound_dot(self.W_input_all, self.x, out)
+
+    def input_bprop(self, deltas, deltas_f, deltas_b, alpha, beta):
+        """
+        Input weight and bias gradients, and output deltas, of both directions from their
+        pre-activation deltas, stacking the directions when the inputs are shared.
+
+        Arguments:
+            deltas (Tensor): deltas of both directions, the forward rows first
+            deltas_f (Tensor): forward direction rows of deltas
+            deltas_b (Tensor): backward direction rows of deltas
+            alpha (float): scale to apply to the output deltas
+            beta (float): scale to apply to the existing output deltas
+        """
+        if self.split_inputs:
+            self.be.compound_dot(deltas_f, self.x_f_v.T, self.dW_input_f)
+            self.be.compound_dot(deltas_b, self.x_b_v.T, self.dW_input_b)
+        else:
+            self.be.compound_dot(deltas, self.x.T, self.dW_input_all)
+        self.db_all[:] = self.be.sum(deltas, axis=1)
+
+        if self.out_deltas_buffer:
+            if self.split_inputs:
+                self.be.compound_dot(self.W_input_f.T, deltas_f, self.out_deltas_buffer_f_v,
+                                     alpha=alpha, beta=beta)
+                self.be.compound_dot(self.W_input_b.T, deltas_b, self.out_deltas_buffer_b_v,
+                                     alpha=alpha, beta=beta)
+            else:
+                self.be.compound_dot(self.W_input_all.T, deltas, self.out_deltas_buffer_f_v,
+                                     alpha=alpha, beta=beta)
+
     def bprop(self, error, alpha=1.0, beta=1.0):
         """
         Backward propagation of errors through bi-directional recurrent layer.
@@ -1325,44 +1517,34 @@ class BiRNN(ParameterLayer):
 
         self.out_deltas_buffer[:] = 0
 
-        self.be.compound_rnn_unroll_bprop(self.W_recur_f.T, self.prev_in_deltas,
-                                          self.in_deltas_f, self.h_f,
-                                          self.nout, self.nsteps,
-                                          self.nsteps,
-                                          self.activation, True)
-
-        self.be.compound_rnn_unroll_bprop(self.W_recur_b.T, self.next_in_deltas,
-                                          self.in_deltas_b, self.h_b,
-                                          self.nout, self.nsteps,
-                                          self.nsteps,
-                                          self.activation, False)
-
-        # Update gradients and output deltas for forward pass
+        # Update gradients for the recurrent weights of each direction after its unroll
         in_deltas_all_f = error[:self.nout]
-        in_deltas_cur_f = in_deltas_all_f[:, self.be.bsz:]
-        h_prev_all = self.h_buffer_f[:, :-self.be.bsz]
-        self.be.compound_dot(in_deltas_cur_f, h_prev_all.T,
-                             self.dW_recur_f)
-
-        # Update gradients and output deltas for backward pass
         in_deltas_all_b = error[self.nout:]
-        in_deltas_cur_b = in_deltas_all_b[:, :-self.be.bsz]
-        h_next_all = self.h_buffer_b[:, self.be.bsz:]
-        self.be.compound_dot(in_deltas_cur_b, h_next_all.T, self.dW_recur_b)
 
-        self.be.compound_dot(in_deltas_all_f, self.x_f_v.T, self.dW_input_f)
-        self.db_f[:] = self.be.sum(in_deltas_all_f, axis=1)
-        if self.out_deltas_buffer_f:
-            self.be.compound_dot(self.W_input_f.T, in_deltas_all_f,
-                                 self.out_deltas_buffer_f_v,
-                                 alpha=alpha, beta=beta)
-
-        self.be.compound_dot(in_deltas_all_b, self.x_b_v.T, self.dW_input_b)
-        self.db_b[:] = self.be.sum(in_deltas_all_b, axis=1)
-        if self.out_deltas_buffer_b:
-            self.be.compound_dot(self.W_input_b.T, in_deltas_all_b,
-                                 self.out_deltas_buffer_b_v,
-                                 alpha=alpha, beta=beta)
+        def bprop_f():
+            self.be.compound_rnn_unroll_bprop(self.W_recur_f.T, self.prev_in_deltas,
+                                              self.in_deltas_f, self.h_f,
+                                              self.nout, self.nsteps,
+                                              self.nsteps,
+                                              self.activation, True)
+            in_deltas_cur_f = in_deltas_all_f[:, self.be.bsz:]
+            h_prev_all = self.h_buffer_f[:, :-self.be.bsz]
+            self.be.compound_dot(in_deltas_cur_f, h_prev_all.T, self.dW_recur_f)
+
+        def bprop_b():
+            self.be.compound_rnn_unroll_bprop(self.W_recur_b.T, self.next_in_deltas,
+                                              self.in_deltas_b, self.h_b,
+                                              self.nout, self.nsteps,
+                                              self.nsteps,
+                                              self.activation, False)
+            in_deltas_cur_b = in_deltas_all_b[:, :-self.be.bsz]
+            h_next_all = self.h_buffer_b[:, self.be.bsz:]
+            self.be.compound_dot(in_deltas_cur_b, h_next_all.T, self.dW_recur_b)
+
+        self.be.run_branches([bprop_f, bprop_b])
+
+        # input weight gradients and output deltas of both directions
+        self.input_bprop(error, in_deltas_all_f, in_deltas_all_b, alpha, beta)
 
         return self.out_deltas_buffer
 
@@ -1570,8 +1752,7 @@ class BiBNRNN(BiRNN):
             self.h_b_last[:] = self.h_b[0]
 
         # Use single multiply for W_input
-        self.be.compound_dot(self.W_input_f, self.x_f_v, self.h_ff_buffer_f)
-        self.be.compound_dot(self.W_input_b, self.x_b_v, self.h_ff_buffer_b)
+        self.input_dot(self.h_ff_buffer, self.h_ff_buffer_f, self.h_ff_buffer_b)
 
         self._fprop_bn(self.h_ff_buffer, inference)
 
@@ -1648,19 +1829,7 @@ class BiBNRNN(BiRNN):
         self._bprop_bn(error, self.h_ff_buffer)
 
         # bprop through the ff
-        self.be.compound_dot(in_deltas_all_f, self.x_f_v.T, self.dW_input_f)
-        self.db_f[:] = self.be.sum(in_deltas_all_f, axis=1)
-        if self.out_deltas_buffer_f:
-            self.be.compound_dot(self.W_input_f.T, in_deltas_all_f,
-                                 self.out_deltas_buffer_f_v,
-                                 alpha=alpha, beta=beta)
-
-        self.be.compound_dot(in_deltas_all_b, self.x_b_v.T, self.dW_input_b)
-        self.db_b[:] = self.be.sum(in_deltas_all_b, axis=1)
-        if self.out_deltas_buffer_b:
-            self.be.compound_dot(self.W_input_b.T, in_deltas_all_b,
-                                 self.out_deltas_buffer_b_v,
-                                 alpha=alpha, beta=beta if self.split_inputs else 1.0)
+        self.input_bprop(error, in_deltas_all_f, in_deltas_all_b, alpha, beta)
 
         return self.out_deltas_buffer
 
@@ -1768,19 +1937,29 @@ class BiLSTM(BiRNN):
         self.o_b = [gate[o1:o2] for gate in self.ifog_b]
         self.g_b = [gate[g1:g2] for gate in self.ifog_b]
 
-        # State deltas
-        self.c_delta_buffer = self.be.iobuf((self.o_shape))
-        self.c_delta = get_steps(self.c_delta_buffer, self.o_shape)
-        self.c_delta_prev = [None] + self.c_delta[:-1]
-        self.c_delta_next = self.c_delta[1:] + [None]
+        # State deltas, separate for each direction so that both can be computed at once
+        self.c_delta_buffer = self.be.iobuf(self.out_shape)
+        self.c_delta_f = get_steps(self.c_delta_buffer[:nout], self.o_shape)
+        self.c_delta_b = get_steps(self.c_delta_buffer[nout:], self.o_shape)
+        self.c_delta_prev = [None] + self.c_delta_f[:-1]
+        self.c_delta_next = self.c_delta_b[1:] + [None]
 
-        # Pre activation gate deltas
-        self.ifog_delta_buffer = self.be.iobuf(self.g_shape)
-        self.ifog_delta = get_steps(self.ifog_delta_buffer, self.g_shape)
-        self.i_delta = [gate[i1:i2] for gate in self.ifog_delta]
-        self.f_delta = [gate[f1:f2] for gate in self.ifog_delta]
-        self.o_delta = [gate[o1:o2] for gate in self.ifog_delta]
-        self.g_delta = [gate[g1:g2] for gate in self.ifog_delta]
+        # Pre activation gate deltas, the forward direction rows first like the gates
+        self.ifog_delta_buffer = self.be.iobuf(self.gate_shape)
+        self.ifog_delta_buffer_f = self.ifog_delta_buffer[:self.ngates * nout]
+        self.ifog_delta_buffer_b = self.ifog_delta_buffer[self.ngates * nout:]
+
+        self.ifog_delta_f = get_steps(self.ifog_delta_buffer_f, self.g_shape)
+        self.i_delta_f = [gate[i1:i2] for gate in self.ifog_delta_f]
+        self.f_delta_f = [gate[f1:f2] for gate in self.ifog_delta_f]
+        self.o_delta_f = [gate[o1:o2] for gate in self.ifog_delta_f]
+        self.g_delta_f = [gate[g1:g2] for gate in self.ifog_delta_f]
+
+        self.ifog_delta_b = get_steps(self.ifog_delta_buffer_b, self.g_shape)
+        self.i_delta_b = [gate[i1:i2] for gate in self.ifog_delta_b]
+        self.f_delta_b = [gate[f1:f2] for gate in self.ifog_delta_b]
+        self.o_delta_b = [gate[o1:o2] for gate in self.ifog_delta_b]
+        self.g_delta_b = [gate[g1:g2] for gate in self.ifog_delta_b]
         self.bufs_to_reset.append(self.c_buffer)
 
     def fprop(self, inputs, inference=False):
@@ -1806,40 +1985,43 @@ class BiLSTM(BiRNN):
             self.h_b[0][:] = 0
             self.c_b[0][:] = 0
 
-        params_f = (self.h_f, self.h_prev, self.xs_f, self.ifog_f, self.ifo_f,
+        params_f = (self.h_f, self.h_prev, self.ifog_f, self.ifo_f,
                     self.i_f, self.f_f, self.o_f, self.g_f, self.c_f, self.c_prev, self.c_act_f)
-        params_b = (self.h_b, self.h_next, self.xs_b, self.ifog_b, self.ifo_b,
+        params_b = (self.h_b, self.h_next, self.ifog_b, self.ifo_b,
                     self.i_b, self.f_b, self.o_b, self.g_b, self.c_b, self.c_next, self.c_act_b)
 
-        self.be.compound_dot(self.W_input_f, self.x_f, self.ifog_buffer_f)
-        self.be.compound_dot(self.W_input_b, self.x_b, self.ifog_buffer_b)
+        # input projections of all the steps of both directions at once
+        self.input_dot(self.ifog_buffer, self.ifog_buffer_f, self.ifog_buffer_b)
 
-        for (h, h_prev, xs, ifog, ifo, i, f, o, g, c, c_prev, c_act) in zip(*params_f):
-            self.be.compound_dot(self.W_input_f, xs, ifog)
-            self.be.compound_dot(self.W_recur_f, h_prev, ifog, beta=1.0)
-            ifog[:] = ifog + self.b_f
+        self.be.run_branches([
+            functools.partial(self._fprop_steps, list(zip(*params_f)), self.W_recur_f, self.b_f),
+            functools.partial(self._fprop_steps, reversed(list(zip(*params_b))),
+                              self.W_recur_b, self.b_b)])
 
-            ifo[:] = self.gate_activation(ifo)
-            g[:] = self.activation(g)
+        return self.h_buffer
 
-            c[:] = f * c_prev + i * g
-            c_act[:] = self.activation(c)
-            h[:] = o * c_act
+    def _fprop_steps(self, steps, W_recur, b):
+        """
+        Unroll one direction over time, adding the recurrent projections to the input
+        projections already in the gate buffers.
 
-        for (h, h_next, xs, ifog, ifo, i, f, o, g, c, c_next, c_act) in \
-                reversed(list(zip(*params_b))):
-            self.be.compound_dot(self.W_recur_b, h_next, ifog)
-            self.be.compound_dot(self.W_input_b, xs, ifog, beta=1.0)
-            ifog[:] = ifog + self.b_b
+        Arguments:
+            steps (iterable): per step views of the buffers of the direction, in the order
+                              the direction visits the steps
+            W_recur (Tensor): recurrent weights of the direction
+            b (Tensor): bias of the direction
+        """
+        for (h, h_prev, ifog, ifo, i, f, o, g, c, c_prev, c_act) in steps:
+            self.be.compound_dot(W_recur, h_prev, ifog, beta=1.0)
+            ifog[:] = ifog + b
 
             ifo[:] = self.gate_activation(ifo)
             g[:] = self.activation(g)
-            c[:] = f * c_next + i * g
+
+            c[:] = f * c_prev + i * g
             c_act[:] = self.activation(c)
             h[:] = o * c_act
 
-        return self.h_buffer
-
     def bprop(self, error, alpha=1.0, beta=0.0):
         """
         Backpropagation of errors, output delta for previous layer, and
@@ -1861,37 +2043,65 @@ class BiLSTM(BiRNN):
         if self.in_deltas_f is None:
             self.in_deltas_f = get_steps(error[:self.o_shape[0]], self.o_shape)
             self.prev_in_deltas = self.in_deltas_f[-1:] + self.in_deltas_f[:-1]
-            self.ifog_delta_last_steps = self.ifog_delta_buffer[:, self.be.bsz:]
+            self.ifog_delta_last_steps = self.ifog_delta_buffer_f[:, self.be.bsz:]
             self.h_first_steps = self.h_buffer_f[:, :-self.be.bsz]
             # h_delta[5] * h[4] + h_delta[4] * h[3] + ... + h_delta[1] * h[0]
 
         if self.in_deltas_b is None:
             self.in_deltas_b = get_steps(error[self.o_shape[0]:], self.o_shape)
             self.next_in_deltas = self.in_deltas_b[1:] + self.in_deltas_b[:1]
-            self.ifog_delta_first_steps = self.ifog_delta_buffer[:,
-                                                                 :-self.be.bsz]
+            self.ifog_delta_first_steps = self.ifog_delta_buffer_b[:, :-self.be.bsz]
             self.h_last_steps = self.h_buffer_b[:, self.be.bsz:]
             # h_delta[0] * h[1] + h_delta[1] * h[2] + ... + h_delta[4] * h[5]
 
         params_f = (self.in_deltas_f, self.prev_in_deltas,
                     self.i_f, self.f_f, self.o_f, self.g_f,
-                    self.ifog_delta, self.i_delta, self.f_delta, self.o_delta, self.g_delta,
-                    self.c_delta, self.c_delta_prev, self.c_prev_bprop, self.c_act_f)
+                    self.ifog_delta_f, self.i_delta_f, self.f_delta_f, self.o_delta_f,
+                    self.g_delta_f, self.c_delta_f, self.c_delta_prev, self.c_prev_bprop,
+                    self.c_act_f)
 
         params_b = (self.in_deltas_b, self.next_in_deltas,
                     self.i_b, self.f_b, self.o_b, self.g_b,
-                    self.ifog_delta, self.i_delta, self.f_delta, self.o_delta, self.g_delta,
-                    self.c_delta, self.c_delta_next, self.c_next_bprop, self.c_act_b)
+                    self.ifog_delta_b, self.i_delta_b, self.f_delta_b, self.o_delta_b,
+                    self.g_delta_b, self.c_delta_b, self.c_delta_next, self.c_next_bprop,
+                    self.c_act_b)
 
-        # bprop for forward direction connections . Error flow from right to left
         self.c_delta_buffer[:] = 0
         self.ifog_delta_buffer[:] = 0
-        self.ifog_delta_f = None
-        self.ifog_delta_b = None
+
+        # error flows from right to left in the forward direction, and from left to right
+        # in the backward direction
+        self.be.run_branches([
+            functools.partial(self._bprop_steps, reversed(list(zip(*params_f))),
+                              self.W_recur_f, self.ifog_delta_last_steps, self.h_first_steps,
+                              self.dW_recur_f),
+            functools.partial(self._bprop_steps, list(zip(*params_b)),
+                              self.W_recur_b, self.ifog_delta_first_steps, self.h_last_steps,
+                              self.dW_recur_b)])
+
+        # input weight gradients, and out deltas to the input units of both directions
+        self.input_bprop(self.ifog_delta_buffer, self.ifog_delta_buffer_f,
+                         self.ifog_delta_buffer_b, alpha, beta)
+
+        return self.out_deltas_buffer
+
+    def _bprop_steps(self, steps, W_recur, ifog_delta_steps, h_steps, dW_recur):
+        """
+        Backpropagate the errors of one direction through time into its gate deltas, and
+        compute the gradient of its recurrent weights.
+
+        Arguments:
+            steps (iterable): per step views of the buffers and deltas of the direction,
+                              in the reverse of the order the direction visits the steps
+            W_recur (Tensor): recurrent weights of the direction
+            ifog_delta_steps (Tensor): gate deltas of the steps having a recurrent input
+            h_steps (Tensor): recurrent inputs of those steps
+            dW_recur (Tensor): gradient of the recurrent weights
+        """
         for (in_deltas, prev_in_deltas,
              i, f, o, g,
              ifog_delta, i_delta, f_delta, o_delta, g_delta,
-             c_delta, c_delta_prev, c_prev, c_act) in reversed(list(zip(*params_f))):
+             c_delta, c_delta_prev, c_prev, c_act) in steps:
 
             # current cell delta
             c_delta[:] = c_delta + \
@@ -1902,61 +2112,11 @@ class BiLSTM(BiRNN):
             g_delta[:] = self.activation.bprop(g) * c_delta * i
 
             # bprop the errors to prev_in_delta and c_delta_prev
-            self.be.compound_dot(
-                self.W_recur_f.T, ifog_delta, prev_in_deltas, beta=1.0)
+            self.be.compound_dot(W_recur.T, ifog_delta, prev_in_deltas, beta=1.0)
             if c_delta_prev is not None:
                 c_delta_prev[:] = c_delta * f
 
-        # Weight deltas and accumulate
-        self.be.compound_dot(
-            self.ifog_delta_last_steps, self.h_first_steps.T, self.dW_recur_f)
-        self.be.compound_dot(
-            self.ifog_delta_buffer, self.x_f.T, self.dW_input_f)
-        self.db_f[:] = self.be.sum(self.ifog_delta_buffer, axis=1)
-        # out deltas to input units
-        if self.out_deltas_buffer:
-            self.be.compound_dot(
-                self.W_input_f.T, self.ifog_delta_buffer,
-                self.out_deltas_buffer_f_v,
-                alpha=alpha, beta=beta)
-
-        # bprop for backward direction connections. Error flow from left to right
-        self.c_delta_buffer[:] = 0
-        self.ifog_delta_buffer[:] = 0
-        for (in_deltas, next_in_deltas,
-             i, f, o, g,
-             ifog_delta, i_delta, f_delta, o_delta, g_delta,
-             c_delta, c_delta_next, c_next, c_act) in zip(*params_b):
-
-            # current cell delta
-            c_delta[:] = c_delta[:] + \
-                self.activation.bprop(c_act) * (o * in_deltas)
-            i_delta[:] = self.gate_activation.bprop(i) * c_delta * g
-            f_delta[:] = self.gate_activation.bprop(f) * c_delta * c_next
-            o_delta[:] = self.gate_activation.bprop(o) * in_deltas * c_act
-            g_delta[:] = self.activation.bprop(g) * c_delta * i
-
-            # bprop the errors to next_in_delta and c_next_delta
-            self.be.compound_dot(
-                self.W_recur_b.T, ifog_delta, next_in_deltas, beta=1.0)
-            if c_delta_next is not None:
-                c_delta_next[:] = c_delta * f
-
-        # Weight deltas and accumulate
-        self.be.compound_dot(
-            self.ifog_delta_first_steps, self.h_last_steps.T, self.dW_recur_b)
-        self.be.compound_dot(
-            self.ifog_delta_buffer, self.x_b.T, self.dW_input_b)
-        self.db_b[:] = self.be.sum(self.ifog_delta_buffer, axis=1)
-        # out deltas to input units. bprop to the same inputs if
-        # split_inputs=False
-        if self.out_deltas_buffer:
-            self.be.compound_dot(self.W_input_b.T, self.ifog_delta_buffer,
-                                 self.out_deltas_buffer_b_v,
-                                 alpha=alpha,
-                                 beta=beta if self.inputs else 1.0)
-
-        return self.out_deltas_buffer
+        self.be.compound_dot(ifog_delta_steps, h_steps.T, dW_recur)
 
 
 class DeepBiRNN(list):
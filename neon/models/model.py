@@ -26,6 +26,7 @@ from neon.util.persist import load_obj, save_obj, load_class
 from neon.util.modeldesc import ModelDescription
 from neon.layers import Sequential, Activation
 from neon.layers.container import DeltasTree, SkipThought
+from neon.layers.memory import memory_report
 from neon.util.beamsearch import BeamSearch
 from neon.optimizers.optimizer import get_param_list
 import numpy as np
@@ -59,6 +60,7 @@ class Model(NervanaObject):
         self.epoch_index = 0
         self.finished = False
         self.initialized = False
+        self.inference_only = False
         self.cost = None
         self.nbatches = 0
         self.ndata = 0
@@ -106,7 +108,7 @@ class Model(NervanaObject):
             # is thrown leave transform.shortcut as is (do nothing)
             pass
 
-    def initialize(self, dataset, cost=None):
+    def initialize(self, dataset, cost=None, inference=False):
         """
         Propagate shapes through the layers to configure, then allocate space.
 
@@ -114,6 +116,10 @@ class Model(NervanaObject):
             dataset (NervanaDataIterator): Dataset iterator to perform initialization on
             cost (Cost): Defines the function which the model is minimizing based
                          on the output of the last layer and the input labels.
+            inference (bool, optional): if True, the outputs of the layers in
+                                        Sequential containers share arenas planned from
+                                        their lifetimes in inference, and the model can
+                                        not be trained.
         """
         if self.initialized:
             return
@@ -127,10 +133,29 @@ class Model(NervanaObject):
             self.cost = cost
 
         # Now allocate space
+        if inference:
+            for l in [self.layers] + list(self.layers.layers_fprop()):
+                if type(l) is Sequential:
+                    l.inference_arenas = True
+            self.inference_only = True
         self.layers.allocate()
         self.layers.allocate_deltas()
         self.initialized = True
 
+    def memory_report(self):
+        """
+        Device memory held by the layers of an initialized model.  Every allocation is
+        counted once, buffers shared between layers (delta buffers, checkpoint pools and
+        inference arenas) are reported as arenas.
+
+        Returns:
+            dict: 'layers', the bytes of outputs, deltas, params, grads, states and
+                  scratch buffers by layer name, 'arenas', the bytes of each shared
+                  buffer, and the 'total_bytes' of both
+        """
+        assert self.initialized, "Model must be initialized to report its memory"
+        return memory_report(self.layers, getattr(self, 'global_deltas', None))
+
     def allocate_deltas(self):
         if getattr(self, 'global_deltas', None) is None:
             self.global_deltas = DeltasTree()
@@ -173,6 +198,8 @@ class Model(NervanaObject):
         # self.set_shortcut()  # infer if bprop shortcut can be used
         self.total_cost = np.empty([1, 1], dtype=np.float32)
         self.optimizer = optimizer
+        if self.inference_only:
+            raise ValueError("%s was initialized for inference only" % self.name)
         self.initialize(dataset, cost)
 
         callbacks.on_train_begin(num_epochs)
@@ -264,7 +291,8 @@ class Model(NervanaObject):
             Host numpy array: the error of the final layer for the evaluation dataset
         """
         self.initialize(dataset)
-        running_error = np.zeros((len(metric.metric_names)), dtype=np.float32)
+        # the metric keeps running sums on the device, only the totals are copied back
+        metric.reset_accumulators()
         nprocessed = 0
         dataset.reset()
         if hasattr(dataset, 'seq_length'):
@@ -272,17 +300,21 @@ class Model(NervanaObject):
         else:
             ndata = dataset.ndata
         for x, t in dataset:
+            # This logic is for handling partial batch sizes at the end of the dataset
+            bsz = min(ndata - nprocessed, self.be.bsz)
+            if (bsz < self.be.bsz and self.be.partial_batch and
+                    not hasattr(dataset, 'seq_length')):
+                # let the layers skip the padding columns of the last minibatch
+                self.set_batch_size(bsz)
             x = self.fprop(x, inference=True)
 
-            # This logic is for handling partial batch sizes at the end of the dataset
             nsteps = x.shape[1] // self.be.bsz if not isinstance(x, list) else \
                 x[0].shape[1] // self.be.bsz
 
-            bsz = min(ndata - nprocessed, self.be.bsz)
-            running_error += metric(x, t, calcrange=slice(0, nsteps * bsz)) * nsteps * bsz
+            metric.accumulate(x, t, calcrange=slice(0, nsteps * bsz))
             nprocessed += bsz * nsteps
-        running_error /= nprocessed
-        return running_error
+        self.set_batch_size(None)
+        return metric.accumulated()
 
     def get_outputs(self, dataset):
         """
@@ -301,6 +333,10 @@ class Model(NervanaObject):
         assert not isinstance(x, list), "Can not get_outputs with Branch terminal"
         Ypred = None
         for idx, input_data in enumerate(dataset):
+            bsz = dataset.ndata - idx * self.be.bsz
+            if 0 < bsz < self.be.bsz and self.be.partial_batch:
+                # only the first bsz columns of the last minibatch are returned
+                self.set_batch_size(bsz)
             x = self.fprop(input_data[0], inference=True)
             if Ypred is None:
                 (dim0, dim1) = x.shape
@@ -308,6 +344,7 @@ class Model(NervanaObject):
                 nsteps = dim1 // self.be.bsz
             cur_batch = slice(idx * dim1, (idx + 1) * dim1)
             Ypred[cur_batch] = x.get().T
+        self.set_batch_size(None)
 
         # Handle the recurrent case.
         if nsteps != 1:
@@ -522,14 +559,16 @@ class Model(NervanaObject):
         """
         Set the actual minibatch size, so even though the buffers are allocated considering
         excessive padding, the processing for some layers may be shortened.
-        Currently most of the neon layers don't use that to control the processing. The
-        interface is here only for when someone wants to set that information and experiment.
+        Linear layers skip the padding columns on every backend.  On backends with
+        be.partial_batch set (the CPU backend), convolution, pooling, LRN, bias,
+        activation, batch norm inference and Recurrent/LSTM layers compute on column
+        slices of their buffers too.  Only fprop is shortened; bprop and weight
+        updates always cover the whole buffers.  Model.eval and Model.get_outputs set
+        this for the last partial minibatch of a dataset.
 
         Arguments:
-            N:
-
-        Returns:
-
+            N (int): number of examples in the minibatch, at most be.bsz.  None
+                     restores full minibatch processing.
         """
         return self.layers.set_batch_size(N)
 
@@ -0,0 +1,345 @@
+# ******************************************************************************
+# Copyright 2017-2018 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ******************************************************************************
+"""
+Micro-batching inference server built on Model.fprop.
+
+Single examples submitted from any thread are queued, coalesced into
+minibatches of up to be.bsz examples (waiting at most max_wait seconds for a
+batch to fill), copied into a preallocated input buffer and run through the
+model in inference mode.  The outputs are scattered back to the callers.
+"""
+from __future__ import division
+from builtins import object
+import logging
+import threading
+import time
+
+from future.moves.queue import Queue, Empty
+import numpy as np
+
+from neon import NervanaObject
+
+logger = logging.getLogger(__name__)
+
+
+class PendingResult(object):
+    """
+    Handle returned by InferenceServer.submit for a single example.  The
+    output becomes available once the minibatch containing the example has
+    been run.
+    """
+    def __init__(self, x):
+        self.x = x
+        self.submit_time = time.time()
+        self._done = threading.Event()
+        self._value = None
+        self._error = None
+
+    def done(self):
+        """
+        Returns:
+            bool: whether the result (or an error) is available
+        """
+        return self._done.is_set()
+
+    def result(self, timeout=None):
+        """
+        Wait for and return the model output for this example.
+
+        Arguments:
+            timeout (float, optional): seconds to wait, None waits forever
+
+        Returns:
+            np.ndarray: model output for the example
+        """
+        if not self._done.wait(timeout):
+            raise RuntimeError("Inference result not ready after %s seconds" % timeout)
+        if self._error is not None:
+            raise self._error
+        return self._value
+
+    def _set_result(self, value):
+        self._value = value
+        self._done.set()
+
+    def _set_error(self, error):
+        self._error = error
+        self._done.set()
+
+
+class ServingStats(object):
+    """
+    Request latency and batch size histograms collected by an InferenceServer.
+
+    Arguments:
+        max_batch (int): largest batch the server runs
+        latency_bins (array-like, optional): upper edges of the latency bins in
+                                             seconds.  Defaults to log spaced
+                                             bins from 100us to 10s.
+    """
+    def __init__(self, max_batch, latency_bins=None):
+        if latency_bins is None:
+            latency_bins = np.logspace(-4, 1, 26)
+        self.latency_bins = np.asarray(latency_bins, dtype=np.float64)
+        self.max_batch = max_batch
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """
+        Clear all counts.
+        """
+        with self._lock:
+            # one extra bin for latencies above the last edge
+            self.latency_counts = np.zeros(len(self.latency_bins) + 1, dtype=np.int64)
+            self.batch_counts = np.zeros(self.max_batch + 1, dtype=np.int64)
+            self.nrequests = 0
+            self.busy_time = 0.0
+            self.start_time = time.time()
+
+    def record(self, latencies, batch_time):
+        """
+        Add the request latencies of one minibatch.
+
+        Arguments:
+            latencies (np.ndarray): seconds from submit to result, per request
+            batch_time (float): seconds spent copying and running the minibatch
+        """
+        idx = np.searchsorted(self.latency_bins, latencies)
+        with self._lock:
+            np.add.at(self.latency_counts, idx, 1)
+            self.batch_counts[len(latencies)] += 1
+            self.nrequests += len(latencies)
+            self.busy_time += batch_time
+
+    def summary(self):
+        """
+        Returns:
+            dict: request count, throughput (requests per second since the
+                  last reset), mean batch size, device utilization and the
+                  latency and batch size histograms
+        """
+        with self._lock:
+            elapsed = max(time.time() - self.start_time, 1e-9)
+            nbatches = int(self.batch_counts.sum())
+            return {'requests': self.nrequests,
+                    'batches': nbatches,
+                    'throughput': self.nrequests / elapsed,
+                    'mean_batch_size': self.nrequests / max(nbatches, 1),
+                    'utilization': self.busy_time / elapsed,
+                    'latency_bins': self.latency_bins.copy(),
+                    'latency_counts': self.latency_counts.copy(),
+                    'batch_counts': self.batch_counts.copy()}
+
+    def latency_percentile(self, q):
+        """
+        Approximate latency percentile from the histogram.
+
+        Arguments:
+            q (float): percentile in [0, 100]
+
+        Returns:
+            float: upper edge of the bin holding the q-th percentile, inf if
+                   it falls above the last edge and nan if nothing was recorded
+        """
+        with self._lock:
+            total = self.latency_counts.sum()
+            if total == 0:
+                return float('nan')
+            idx = np.searchsorted(np.cumsum(self.latency_counts), q / 100. * total)
+        edges = np.append(self.latency_bins, np.inf)
+        return float(edges[min(idx, len(edges) - 1)])
+
+
+class InferenceServer(NervanaObject):
+    """
+    Runs inference for single examples by coalescing them into minibatches.
+
+    Requests are submitted with submit (asynchronous) or predict (blocking)
+    from any number of threads.  A serving loop, either in a background thread
+    (start) or in the caller's thread (serve), takes the first queued request,
+    waits up to max_wait seconds for up to max_batch - 1 more, copies them into
+    the preallocated input buffer and runs Model.fprop in inference mode.
+
+    The model has to have a single input and a single output.  An example is
+    a host array with as many elements as one column of the input buffer,
+    reshaped to (features, steps) for recurrent inputs.  The result is the
+    matching column of the output, shaped (features,) or (steps, features)
+    like Model.get_outputs.
+
+    On the GPU backend the serving loop has to run in the thread owning the
+    CUDA context, so call serve from that thread instead of start.
+
+    Arguments:
+        model (Model): model to serve
+        in_shape (int or tuple, optional): shape of one example, required if
+                                           the model is not initialized yet
+        max_wait (float, optional): seconds the oldest queued request waits for
+                                    a batch to fill.  Defaults to 5ms.
+        max_batch (int, optional): largest minibatch to run, at most be.bsz.
+                                   Defaults to be.bsz.
+        name (str, optional): name of the server
+    """
+    def __init__(self, model, in_shape=None, max_wait=0.005, max_batch=None, name=None):
+        super(InferenceServer, self).__init__(name=name)
+        self.model = model
+        if not model.initialized:
+            if in_shape is None:
+                raise ValueError("in_shape is required to serve an uninitialized model")
+            model.initialize(in_shape)
+        if isinstance(model.layers.layers[-1].outputs, list):
+            raise ValueError("Can not serve a model with a Branch terminal")
+
+        self.max_wait = max_wait
+        self.max_batch = min(max_batch or self.be.bsz, self.be.bsz)
+
+        self.inputs = self.be.iobuf(model.layers.in_shape)
+        self.nsteps = self.inputs.shape[1] // self.be.bsz
+        self.nfeatures = self.inputs.shape[0]
+        self.hbuf = np.zeros((self.nfeatures, self.nsteps, self.be.bsz),
+                             dtype=self.inputs.dtype)
+
+        self.stats = ServingStats(self.max_batch)
+        self._queue = Queue()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def submit(self, x):
+        """
+        Queue one example for inference.
+
+        Arguments:
+            x (array-like): input example
+
+        Returns:
+            PendingResult: handle to wait on for the output
+        """
+        x = np.asarray(x)
+        if x.size != self.nfeatures * self.nsteps:
+            raise ValueError("Expected an example with %d elements, got shape %s" %
+                             (self.nfeatures * self.nsteps, x.shape))
+        request = PendingResult(x.reshape(self.nfeatures, self.nsteps))
+        self._queue.put(request)
+        return request
+
+    def predict(self, x, timeout=None):
+        """
+        Run inference for one example and wait for the output.
+
+        Arguments:
+            x (array-like): input example
+            timeout (float, optional): seconds to wait for the result
+
+        Returns:
+            np.ndarray: model output for the example
+        """
+        return self.submit(x).result(timeout)
+
+    def start(self):
+        """
+        Run the serving loop in a background thread.
+        """
+        if self._thread is not None:
+            raise RuntimeError("InferenceServer is already running")
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.serve, name='neon-inference-server')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop the serving loop once the current minibatch is done.  Requests
+        still queued are left in the queue and served after a restart.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def serve(self, poll_interval=0.1):
+        """
+        Serve requests until stop is called.
+
+        Arguments:
+            poll_interval (float, optional): seconds between checks for stop
+                                             while the queue is empty
+        """
+        while not self._stop.is_set():
+            batch = self._next_batch(poll_interval)
+            if batch:
+                self.run_batch(batch)
+
+    def _next_batch(self, poll_interval):
+        """
+        Block for the first request, then collect more until the batch is full
+        or the first request has waited max_wait seconds.
+        """
+        try:
+            batch = [self._queue.get(timeout=poll_interval)]
+        except Empty:
+            return []
+
+        deadline = batch[0].submit_time + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.time()
+            try:
+                if remaining > 0:
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except Empty:
+                break
+        return batch
+
+    def run_batch(self, batch):
+        """
+        Run one minibatch of requests through the model and hand each request
+        its output.
+
+        Arguments:
+            batch (list of PendingResult): at most max_batch requests
+        """
+        start = time.time()
+        try:
+            for i, request in enumerate(batch):
+                self.hbuf[:, :, i] = request.x
+            self.inputs.set(self.hbuf.reshape(self.inputs.shape))
+
+            self.model.set_batch_size(len(batch))
+            try:
+                outputs = self.model.fprop(self.inputs, inference=True).get()
+            finally:
+                # the model is shared with its owner, leave it processing full minibatches
+                self.model.set_batch_size(None)
+            outputs = outputs.reshape(outputs.shape[0], -1, self.be.bsz)
+        except Exception as e:
+            logger.exception("Inference failed for a batch of %d requests", len(batch))
+            for request in batch:
+                request._set_error(e)
+            return
+
+        done = time.time()
+        for i, request in enumerate(batch):
+            out = outputs[:, :, i].T
+            request._set_result(out[0].copy() if out.shape[0] == 1 else out.copy())
+        self.stats.record(done - np.array([r.submit_time for r in batch]), done - start)
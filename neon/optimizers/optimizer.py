@@ -69,6 +69,48 @@ class Optimizer(NervanaObject):
         """
         raise NotImplementedError()
 
+    def master_params(self, param_list):
+        """
+        Substitute master copies in be.compute_dtype for parameters stored in a
+        narrower floating point type (float16 storage on the CPU backend), so small
+        updates are not rounded away and the optimizer states are kept in the
+        wider type as well.  Gradients are copied into a wide buffer on every call,
+        the master weights are created from the stored parameters on first use.
+        store_master_params rounds the updated masters back into the parameters.
+
+        Arguments:
+            param_list (list): list of ((param, grad), states) tuples, as returned
+                               by get_param_list
+
+        Returns:
+            list: param_list with master copies in place of narrow parameters
+        """
+        if not hasattr(self, 'masters'):
+            self.masters = dict()
+        compute_dtype = np.dtype(self.be.compute_dtype)
+        plist = []
+        for (param, grad), states in param_list:
+            dtype = np.dtype(param.dtype)
+            if dtype.kind != 'f' or dtype.itemsize >= compute_dtype.itemsize:
+                plist.append(((param, grad), states))
+                continue
+            entry = self.masters.get(id(param))
+            if entry is None or entry[0] is not param:
+                master = self.be.empty(param.shape, dtype=compute_dtype)
+                master[:] = param
+                entry = (param, master, self.be.empty(grad.shape, dtype=compute_dtype))
+                self.masters[id(param)] = entry
+            entry[2][:] = grad
+            plist.append(((entry[1], entry[2]), states))
+        return plist
+
+    def store_master_params(self):
+        """
+        Round the master copies made by master_params into the stored parameters.
+        """
+        for param, master, _ in getattr(self, 'masters', dict()).values():
+            param[:] = master
+
     def clip_gradient_norm(self, param_list, clip_norm):
         """
         Returns a scaling factor to apply to the gradients.
@@ -505,7 +547,7 @@ class GradientDescentMomentum(Optimizer):
             epoch (int): the current epoch, needed for the Schedule object.
         """
         lrate = self.schedule.get_learning_rate(self.learning_rate, epoch)
-        param_list = get_param_list(layer_list)
+        param_list = self.master_params(get_param_list(layer_list))
 
         scale_factor = self.clip_gradient_norm(param_list, self.gradient_clip_norm)
 
@@ -538,6 +580,8 @@ class GradientDescentMomentum(Optimizer):
                     param[:] = self.clip_value(
                                 param + velocity, self.param_clip_value)
 
+        self.store_master_params()
+
 
 class RMSProp(Optimizer):
 
@@ -610,7 +654,7 @@ class RMSProp(Optimizer):
         """
         lrate = self.schedule.get_learning_rate(self.learning_rate, epoch)
         epsilon, decay = (self.epsilon, self.decay_rate)
-        param_list = get_param_list(layer_list)
+        param_list = self.master_params(get_param_list(layer_list))
 
         scale_factor = self.clip_gradient_norm(param_list, self.gradient_clip_norm)
 
@@ -632,6 +676,8 @@ class RMSProp(Optimizer):
                         / (self.be.sqrt(state + epsilon) + epsilon),
                         self.param_clip_value)
 
+        self.store_master_params()
+
 
 class Adagrad(Optimizer):
 
@@ -709,7 +755,7 @@ class Adagrad(Optimizer):
             epoch (int): the current epoch, needed for the Schedule object.
         """
         lrate, epsilon = (self.learning_rate, self.epsilon)
-        param_list = get_param_list(layer_list)
+        param_list = self.master_params(get_param_list(layer_list))
 
         scale_factor = self.clip_gradient_norm(param_list, self.gradient_clip_norm)
 
@@ -729,6 +775,8 @@ class Adagrad(Optimizer):
                         param - (scale_factor * grad * lrate)
                         / (self.be.sqrt(state + epsilon)), self.param_clip_value)
 
+        self.store_master_params()
+
 
 class Adadelta(Optimizer):
 
@@ -805,7 +853,7 @@ class Adadelta(Optimizer):
         """
         epsilon, decay = (self.epsilon, self.decay)
 
-        param_list = get_param_list(layer_list)
+        param_list = self.master_params(get_param_list(layer_list))
 
         for (param, grad), states in param_list:
             param.rounding = self.stochastic_round
@@ -821,6 +869,8 @@ class Adadelta(Optimizer):
 
             param[:] = self.clip_value(param - states[2], self.param_clip_value)
 
+        self.store_master_params()
+
 
 class Adam(Optimizer):
 
@@ -908,7 +958,7 @@ class Adam(Optimizer):
         l = (self.learning_rate * self.be.sqrt(1 - self.beta_2 ** self.t) /
              (1 - self.beta_1 ** self.t))
 
-        param_list = get_param_list(layer_list)
+        param_list = self.master_params(get_param_list(layer_list))
 
         scale_factor = self.clip_gradient_norm(param_list, self.gradient_clip_norm)
 
@@ -929,6 +979,8 @@ class Adam(Optimizer):
                         param - (scale_factor * l * m)
                         / (self.be.sqrt(v) + self.epsilon), self.param_clip_value)
 
+        self.store_master_params()
+
 
 class ShiftAdaMax(Optimizer):
 
@@ -972,7 +1024,7 @@ class ShiftAdaMax(Optimizer):
         lrate = self.schedule.get_learning_rate(self.learning_rate, epoch)
         l = lrate / (1 - self.beta_1 ** t)
 
-        param_list = get_param_list(layer_list)
+        param_list = self.master_params(get_param_list(layer_list))
 
         for (param, grad), states in param_list:
             param.rounding = self.stochastic_round
@@ -989,6 +1041,8 @@ class ShiftAdaMax(Optimizer):
             param[:] = param - self.be.shift(self.be.shift(m, inv_v), l)
             self.be.clip(param, -1, 1, param)
 
+        self.store_master_params()
+
 
 class MultiOptimizer(Optimizer):
 
@@ -19,6 +19,6 @@ from neon.transforms.activation import (Identity, Explin, Rectlin, Rectlinclip,
 from neon.transforms.cost import (CrossEntropyBinary, CrossEntropyMulti,
                                   SumSquared, MeanSquared, LogLoss,
                                   Misclassification, TopKMisclassification,
-                                  Accuracy, PrecisionRecall, SmoothL1Loss,
-                                  SquareHingeLoss, ObjectDetection, BLEUScore,
+                                  Accuracy, PrecisionRecall, ConfusionMatrix,
+                                  SmoothL1Loss, SquareHingeLoss, ObjectDetection, BLEUScore,
                                   GANCost)
@@ -17,7 +17,6 @@ from __future__ import division
 from builtins import str
 from neon import NervanaObject
 import numpy as np
-from collections import Counter
 from neon import logger as neon_logger
 
 
@@ -283,6 +282,74 @@ class Metric(Cost):
         """
         raise NotImplementedError()
 
+    def per_record(self, y, t):
+        """
+        Compute each metric for every record (column) of y into backend buffers.
+        Metrics override this to have accumulate keep its running sums on the
+        device.
+
+        Args:
+            y (Tensor or OpTree): Output of previous layer or model
+            t (Tensor or OpTree): True targets corresponding to y
+
+        Returns:
+            list: one (1, N) Tensor per entry of metric_names, or None if the
+                  metric has no per record buffers
+        """
+        return None
+
+    def reset_accumulators(self):
+        """
+        Clear the running sums of accumulate.
+        """
+        self.acc_sums = None
+        self.acc_host = None
+        self.acc_count = 0
+
+    def accumulate(self, y, t, calcrange=slice(0, None)):
+        """
+        Add the metrics of the records in calcrange to running sums.  For metrics
+        with per_record buffers the sums are backend tensors, so nothing is copied
+        to the host until accumulated is called.  Other metrics add the host
+        values returned by __call__, weighted by the number of records.
+
+        Args:
+            y (Tensor or OpTree): Output of previous layer or model
+            t (Tensor or OpTree): True targets corresponding to y
+            calcrange (slice, optional): Slice of records to include (default: all)
+        """
+        if getattr(self, 'acc_count', None) is None:
+            self.reset_accumulators()
+        records = self.per_record(y, t)
+        if records is None:
+            out = y[0] if isinstance(y, (list, tuple)) else y
+            nrecords = len(range(*calcrange.indices(out.shape[1])))
+            value = np.asarray(self(y, t, calcrange=calcrange), dtype=np.float64) * nrecords
+            self.acc_host = value if self.acc_host is None else self.acc_host + value
+        else:
+            nrecords = len(range(*calcrange.indices(records[0].shape[1])))
+            if self.acc_sums is None:
+                self.acc_sums = [self.be.zeros((1, 1), dtype=np.float32) for _ in records]
+            for acc, record in zip(self.acc_sums, records):
+                acc[:] = acc + self.be.sum(record[:, calcrange], axis=1)
+        self.acc_count += nrecords
+
+    def accumulated(self):
+        """
+        Returns:
+            numpy array: mean of each metric over the records accumulated since
+                         reset_accumulators
+        """
+        if getattr(self, 'acc_count', None) is None:
+            self.reset_accumulators()
+        if self.acc_sums is not None:
+            total = np.array([acc.get()[0, 0] for acc in self.acc_sums], dtype=np.float64)
+        elif self.acc_host is not None:
+            total = np.atleast_1d(self.acc_host)
+        else:
+            total = np.zeros(len(self.metric_names))
+        return (total / max(self.acc_count, 1)).astype(np.float32)
+
 
 class MultiMetric(Metric):
     """
@@ -312,7 +379,16 @@ class MultiMetric(Metric):
             numpy array : Returns the log loss  metric in numpy array,
                          [LogLoss]
         """
-        return self.metric(y[self.index], y[self.index], *args, **kwargs)
+        return self.metric(y[self.index], t[self.index], *args, **kwargs)
+
+    def reset_accumulators(self):
+        self.metric.reset_accumulators()
+
+    def accumulate(self, y, t, *args, **kwargs):
+        self.metric.accumulate(y[self.index], t[self.index], *args, **kwargs)
+
+    def accumulated(self):
+        return self.metric.accumulated()
 
     def __getattr__(self, key):
         return getattr(self.metric, key)
@@ -340,9 +416,13 @@ class LogLoss(Metric):
             numpy array : Returns the log loss  metric in numpy array,
                          [LogLoss]
         """
+        self.per_record(y, t)
+        return np.array(self.correctProbs.get()[:, calcrange].mean())
+
+    def per_record(self, y, t):
         self.correctProbs[:] = self.be.sum(y * t, axis=0)
         self.correctProbs[:] = -self.be.safelog(self.correctProbs)
-        return np.array(self.correctProbs.get()[:, calcrange].mean())
+        return [self.correctProbs]
 
 
 class TopKMisclassification(Metric):
@@ -379,6 +459,12 @@ class TopKMisclassification(Metric):
             numpy array : Returns the metrics in a numpy array:
                           [LogLoss, Top 1 misclass, Top k misclass]
         """
+        self.per_record(y, t)
+        return np.array((self.correctProbs.get()[:, calcrange].mean(),
+                         self.top1.get()[:, calcrange].mean(),
+                         self.topk.get()[:, calcrange].mean()))
+
+    def per_record(self, y, t):
         be = self.be
         self.correctProbs[:] = be.sum(y * t, axis=0)
         nSlots = self.k - be.sum((y > self.correctProbs), axis=0)
@@ -386,9 +472,7 @@ class TopKMisclassification(Metric):
         self.topk[:] = 1. - (nSlots > 0) * ((nEq <= nSlots) * (1 - nSlots / nEq) + nSlots / nEq)
         self.top1[:] = 1. - (be.max(y, axis=0) == self.correctProbs) / nEq
         self.correctProbs[:] = -be.safelog(self.correctProbs)
-        return np.array((self.correctProbs.get()[:, calcrange].mean(),
-                         self.top1.get()[:, calcrange].mean(),
-                         self.topk.get()[:, calcrange].mean()))
+        return [self.correctProbs, self.top1, self.topk]
 
 
 class Misclassification(Metric):
@@ -417,12 +501,15 @@ class Misclassification(Metric):
         Returns:
             float: Returns the metric
         """
+        self.per_record(y, t)
+        return self.outputs.get()[:, calcrange].mean()
+
+    def per_record(self, y, t):
         # convert back from onehot and compare
         self.preds[:] = self.be.argmax(y, axis=0)
         self.hyps[:] = self.be.argmax(t, axis=0)
         self.outputs[:] = self.be.not_equal(self.preds, self.hyps)
-
-        return self.outputs.get()[:, calcrange].mean()
+        return [self.outputs]
 
 
 class Accuracy(Metric):
@@ -449,12 +536,15 @@ class Accuracy(Metric):
         Returns:
             float: Returns the metric
         """
+        self.per_record(y, t)
+        return self.outputs.get()[:, calcrange].mean()
+
+    def per_record(self, y, t):
         # convert back from onehot and compare
         self.preds[:] = self.be.argmax(y, axis=0)
         self.hyps[:] = self.be.argmax(t, axis=0)
         self.outputs[:] = self.be.equal(self.preds, self.hyps)
-
-        return self.outputs.get()[:, calcrange].mean()
+        return [self.outputs]
 
 
 class PrecisionRecall(Metric):
@@ -475,6 +565,7 @@ class PrecisionRecall(Metric):
         """
         self.outputs = self.be.empty((num_classes, 2))
         self.token_stats = self.be.empty((num_classes, 3))
+        self.acc_stats = None
         self.metric_names = ['Precision', 'Recall']
         if binarize:
             self.bin_buf = self.be.iobuf(1, dtype=np.int32)
@@ -517,6 +608,106 @@ class PrecisionRecall(Metric):
 
         return self.outputs.get().mean(axis=0)
 
+    def reset_accumulators(self):
+        super(PrecisionRecall, self).reset_accumulators()
+        if self.acc_stats is not None:
+            self.acc_stats[:] = 0
+
+    def accumulate(self, y, t, calcrange=slice(0, None)):
+        """
+        Add the true positive, prediction and target counts per class of the
+        records in calcrange to running sums kept on the device.
+
+        Args:
+            y (Tensor): Output of previous layer or model
+            t (Tensor): True targets corresponding to y
+            calcrange (slice, optional): Slice of records to include (default: all)
+        """
+        if self.acc_stats is None:
+            self.acc_stats = self.be.zeros(self.token_stats.shape, dtype=np.float32)
+        if self.bin_buf is not None:
+            self.be.argmax(y, axis=0, out=self.bin_buf)
+            y[:] = self.be.onehot(self.bin_buf, axis=0)
+        y, t = y[:, calcrange], t[:, calcrange]
+        self.acc_stats[:, 0] = self.acc_stats[:, 0] + self.be.sum(y * t, axis=1)
+        self.acc_stats[:, 1] = self.acc_stats[:, 1] + self.be.sum(y, axis=1)
+        self.acc_stats[:, 2] = self.acc_stats[:, 2] + self.be.sum(t, axis=1)
+
+    def accumulated(self):
+        """
+        Precision and recall over all records accumulated since
+        reset_accumulators.  The per class values are left in self.outputs.
+
+        Returns:
+            ndarray: The class averaged precision (item 0) and recall (item 1)
+        """
+        if self.acc_stats is None:
+            return np.zeros(2, dtype=np.float32)
+        self.outputs[:, 0] = self.acc_stats[:, 0] / (self.acc_stats[:, 1] + self.eps)
+        self.outputs[:, 1] = self.acc_stats[:, 0] / (self.acc_stats[:, 2] + self.eps)
+        return self.outputs.get().mean(axis=0)
+
+
+class ConfusionMatrix(Metric):
+    """
+    Confusion matrix of a classifier.  Called on a minibatch it returns the
+    accuracy; accumulate also counts every record into a
+    (num_classes, num_classes) matrix on the device, with true classes along
+    the rows and predicted classes along the columns.
+    """
+    def __init__(self, num_classes):
+        """
+        Arguments:
+            num_classes (int): Number of different output classes.
+        """
+        self.num_classes = num_classes
+        self.preds = self.be.iobuf(1, dtype=np.int32)
+        self.hyps = self.be.iobuf(1, dtype=np.int32)
+        self.outputs = self.be.iobuf(1)  # Contains per record metric
+        self.pred_onehot = self.be.iobuf(num_classes)
+        self.hyp_onehot = self.be.iobuf(num_classes)
+        self.matrix = self.be.zeros((num_classes, num_classes), dtype=np.float32)
+        self.metric_names = ['Accuracy']
+
+    def __call__(self, y, t, calcrange=slice(0, None)):
+        """
+        Returns the accuracy.
+
+        Args:
+            y (Tensor or OpTree): Output of previous layer or model
+            t (Tensor or OpTree): True targets corresponding to y
+
+        Returns:
+            float: Returns the metric
+        """
+        self.per_record(y, t)
+        return self.outputs.get()[:, calcrange].mean()
+
+    def per_record(self, y, t):
+        self.preds[:] = self.be.argmax(y, axis=0)
+        self.hyps[:] = self.be.argmax(t, axis=0)
+        self.outputs[:] = self.be.equal(self.preds, self.hyps)
+        return [self.outputs]
+
+    def reset_accumulators(self):
+        super(ConfusionMatrix, self).reset_accumulators()
+        self.matrix[:] = 0
+
+    def accumulate(self, y, t, calcrange=slice(0, None)):
+        super(ConfusionMatrix, self).accumulate(y, t, calcrange)
+        self.pred_onehot[:] = self.be.onehot(self.preds, axis=0)
+        self.hyp_onehot[:] = self.be.onehot(self.hyps, axis=0)
+        self.be.compound_dot(self.hyp_onehot[:, calcrange], self.pred_onehot[:, calcrange].T,
+                             self.matrix, beta=1.0)
+
+    def confusion_matrix(self):
+        """
+        Returns:
+            ndarray: counts of the records accumulated since reset_accumulators,
+                     indexed by [true class, predicted class]
+        """
+        return self.matrix.get()
+
 
 class ObjectDetection(Metric):
 
@@ -561,6 +752,11 @@ class ObjectDetection(Metric):
         Returns:
             numpy ary : Returns the metrics in numpy array [Label Accuracy, Bounding Box Smooth-L1]
         """
+        self.per_record(y, t)
+        return np.array((self.labelMetric.get()[:, calcrange].mean(),
+                         self.detectionMetric.get()[:, calcrange].mean()))
+
+    def per_record(self, y, t):
         t_bb = t[self.bbox_ind][0]
         t_bb_mask = t[self.bbox_ind][1]
         y_bb = y[self.bbox_ind]
@@ -582,14 +778,76 @@ class ObjectDetection(Metric):
         self.preds[:] = self.be.argmax(y_lbl, axis=0)
         self.hyps[:] = self.be.argmax(t_lbl, axis=0)
         self.labelMetric[:] = self.be.equal(self.preds, self.hyps)
+        return [self.labelMetric, self.detectionMetric]
 
-        return np.array((self.labelMetric.get()[:, calcrange].mean(),
-                         self.detectionMetric.get()[:, calcrange].mean()))
+
+# multiplier used to hash n-grams whose exact packing overflows 64 bits (odd, so each
+# token id still reaches every bit of the key)
+_NGRAM_HASH = np.uint64(0x9E3779B97F4A7C15)
+
+
+def _ngram_keys(ids, starts, n, base):
+    """
+    Pack every n-gram of a set of concatenated token id sequences into a uint64 key.
+
+    Arguments:
+        ids (ndarray): concatenated token ids of all the sequences
+        starts (ndarray): offset of each sequence in ids, with len(ids) appended
+        n (int): n-gram order
+        base (np.uint64): radix of the packing
+
+    Returns:
+        tuple: sequence index and key of each n-gram, and the position of its first token
+    """
+    lengths = np.diff(starts)
+    seq = np.repeat(np.arange(len(lengths)), lengths)
+    pos = np.flatnonzero(np.arange(len(ids)) + n <= starts[1:][seq])
+    padded = np.concatenate([ids, np.zeros(n, dtype=np.uint64)])
+    keys = padded[pos]
+    for k in range(1, n):
+        keys = keys * base + padded[pos + k]
+    return seq[pos], keys, pos
+
+
+def _count_ngrams(seq, keys, counts=None):
+    """
+    Reduce the (sequence, key) pairs of n-grams to the distinct pairs, sorted by sequence
+    and then key, with the number of occurrences of each pair, or the maximum of counts over
+    the occurrences when counts are given.
+    """
+    order = np.lexsort((keys, seq))
+    seq, keys = seq[order], keys[order]
+    first = np.ones(len(seq), dtype=bool)
+    first[1:] = (seq[1:] != seq[:-1]) | (keys[1:] != keys[:-1])
+    idx = np.flatnonzero(first)
+    if counts is None:
+        counts = np.diff(np.append(idx, len(seq)))
+    elif len(idx):
+        counts = np.maximum.reduceat(counts[order], idx)
+    else:
+        counts = counts[:0]
+    return seq[idx], keys[idx], counts
+
+
+def _concat(sequences):
+    """
+    Concatenate id sequences, returning the ids and the offset of each sequence.
+    """
+    starts = np.zeros(len(sequences) + 1, dtype=np.int64)
+    starts[1:] = np.cumsum([len(s) for s in sequences])
+    if starts[-1] == 0:
+        return np.zeros(0, dtype=np.uint64), starts
+    return np.concatenate(sequences).astype(np.uint64), starts
 
 
 class BLEUScore(Metric):
     """
-    Compute BLEU score metric
+    Compute BLEU score metric.
+
+    Sentences are scored as arrays of token ids: the n-grams of each order are packed into
+    integer keys, counted by sorting, and clipped against the maximum reference counts with a
+    vectorized minimum. String sentences are mapped to ids first, and the ``score_ids`` method
+    consumes the id or probability outputs of a model directly.
     """
 
     def __init__(self, unk='<unk>'):
@@ -615,59 +873,122 @@ class BLEUScore(Metric):
             for ii, sent in enumerate(y_list):
                 y_list[ii] = sent.lower()
 
-        # convert all sentences to lists of words
-        for ii, sent in enumerate(y_list):
-            y_list[ii] = sent.strip(self.end_token).split()
-
-        for ii, refs in enumerate(t_list):
-            tmp = []
-            for ref in refs:
-                tmp += [ref.split()]
-            t_list[ii] = tmp
-
-        def ngram_counts(sentence, counts, N):
-            for n in range(1, N+1):
-                num = len(sentence) - n + 1     # number of n-grams
-                for jj in range(num):
-                    ngram = ' '.join(sentence[jj:jj+n])
-                    ngram = repr(n) + ' ' + ngram
-                    counts[ngram] += 1
-
-        # compute ngram counts
+        # words containing the unknown symbol never match, they all share id 0
+        vocab = {}
+
+        def to_ids(words):
+            return np.array([0 if self.unk_symbol in w else vocab.setdefault(w, len(vocab) + 1)
+                             for w in words], dtype=np.int64)
+
+        cands = [to_ids(sent.strip(self.end_token).split()) for sent in y_list]
+        refs = [[to_ids(ref.split()) for ref in sent_refs] for sent_refs in t_list]
+
+        return self.corpus_bleu(cands, refs, N=N, brevity_penalty=brevity_penalty, unk_id=0)
+
+    def score_ids(self, y, t, N=4, brevity_penalty=False, end_id=None, pad_id=None,
+                  unk_id=None):
+        """
+        Compute the BLEU score of token id sequences without detokenizing them.
+
+        Arguments:
+            y (ndarray or list): predicted sentences, either a list of id arrays, an
+                                 (nsentences, steps) array of ids such as the output of
+                                 Model.get_outputs_beam, or an (nsentences, steps, vocab)
+                                 array of probabilities such as the output of
+                                 Model.get_outputs, which is decoded with argmax
+            t (ndarray or list): reference sentences, either a list holding a list of id
+                                 arrays per sentence, an (nsentences, steps) array with a
+                                 single reference per sentence, or an
+                                 (nsentences, nreferences, steps) array
+            N (int, optional): compute all ngram modified precisions up to this N
+            brevity_penalty (bool, optional): if True, use brevity penalty
+            end_id (int, optional): sentences are truncated at the first occurrence of this id
+            pad_id (int, optional): ids removed from the sentences
+            unk_id (int, optional): n-grams containing this id are never counted as matches
+        """
+        if isinstance(y, np.ndarray) and y.ndim == 3:
+            y = y.argmax(axis=2)
+        if isinstance(t, np.ndarray) and t.ndim == 2:
+            t = t[:, np.newaxis]
+
+        def clean(sent):
+            sent = np.asarray(sent).astype(np.int64).ravel()
+            if end_id is not None:
+                end = np.flatnonzero(sent == end_id)
+                if len(end):
+                    sent = sent[:end[0]]
+            if pad_id is not None:
+                sent = sent[sent != pad_id]
+            return sent
+
+        cands = [clean(sent) for sent in y]
+        refs = [[clean(ref) for ref in sent_refs] for sent_refs in t]
+
+        return self.corpus_bleu(cands, refs, N=N, brevity_penalty=brevity_penalty,
+                                unk_id=unk_id)
+
+    def corpus_bleu(self, cands, refs, N=4, brevity_penalty=False, unk_id=None):
+        """
+        Compute the corpus BLEU score of token id sequences.
+
+        Arguments:
+            cands (list): id array of each candidate sentence
+            refs (list): list of reference id arrays of each candidate sentence
+            N (int, optional): compute all ngram modified precisions up to this N
+            brevity_penalty (bool, optional): if True, use brevity penalty
+            unk_id (int, optional): n-grams containing this id are never counted as matches
+
+        Returns:
+            float: BLEU score of order N, the scores of all orders are kept in ``bleu_n``
+        """
+        assert len(cands) == len(refs), "Need references for every candidate sentence"
+        ref_sent = np.repeat(np.arange(len(refs)), [len(r) for r in refs])
+        refs = [ref for sent_refs in refs for ref in sent_refs]
+
+        cand_ids, cand_starts = _concat(cands)
+        ref_ids, ref_starts = _concat(refs)
+        max_id = max([int(ids.max()) for ids in (cand_ids, ref_ids) if len(ids)] + [0])
+        # pack exactly when N ids in base max_id + 1 fit in 64 bits, hash otherwise
+        base = np.uint64(max_id + 1) if (max_id + 1) ** N < 2 ** 64 else _NGRAM_HASH
+        if unk_id is not None:
+            unk_cum = np.concatenate([[0], np.cumsum(cand_ids == np.uint64(unk_id))])
+
         totals = np.zeros(N)    # ngram counts over all candidates
         correct = np.zeros(N)   # correct ngrams (compared to max over references)
-        len_translation, len_reference = (0, 0)
-        for ii, sent in enumerate(y_list):
-            counts_ref_max = Counter()    # maximum ngram count over all references for an example
-            # count ngrams in candidate sentence
-            counts_cand = Counter()
-            ngram_counts(sent, counts_cand, N)
-            # process reference sentences
-            closest_diff, closest_len = (float("inf"), float("inf"))
-            for ref in t_list[ii]:
-                counts_ref = Counter()
-                # find closest length of reference sentence for current example
-                diff = abs(len(sent) - len(ref))
-                if diff < closest_diff:
-                    closest_len = len(ref)
-                elif diff == closest_diff:
-                    closest_len = min(closest_len, len(ref))
-                # compute all ngram counts up to specified n=N for this reference
-                ngram_counts(ref, counts_ref, N)
-                for ngram, count in counts_ref.items():
-                    if counts_ref_max[ngram] < count:
-                        counts_ref_max[ngram] = count
-            len_reference += closest_len
-            len_translation += len(sent)
-            for ngram, count in counts_cand.items():
-                n = int(ngram[0])
-                ind = n - 1
-                totals[ind] += count
+        for n in range(1, N + 1):
+            seq, keys, pos = _ngram_keys(cand_ids, cand_starts, n, base)
+            totals[n - 1] = len(keys)
+            if unk_id is not None:
                 # only match if there are no UNK
-                if ngram.find(self.unk_symbol) == -1:
-                    r = counts_ref_max[ngram]
-                    c = count if r >= count else r
-                    correct[ind] += c
+                known = unk_cum[pos + n] == unk_cum[pos]
+                seq, keys = seq[known], keys[known]
+            c_seq, c_keys, c_counts = _count_ngrams(seq, keys)
+
+            # maximum count of each ngram over all references of a sentence
+            seq, keys, _ = _ngram_keys(ref_ids, ref_starts, n, base)
+            seq, keys, counts = _count_ngrams(seq, keys)
+            r_seq, r_keys, r_counts = _count_ngrams(ref_sent[seq], keys, counts)
+
+            # a candidate ngram sorts right before the same ngram of the references
+            tag = np.repeat([0, 1], [len(c_keys), len(r_keys)])
+            seq = np.concatenate([c_seq, r_seq])
+            keys = np.concatenate([c_keys, r_keys])
+            counts = np.concatenate([c_counts, r_counts])
+            order = np.lexsort((tag, keys, seq))
+            tag, seq, keys, counts = tag[order], seq[order], keys[order], counts[order]
+            match = ((tag[:-1] == 0) & (tag[1:] == 1) &
+                     (seq[:-1] == seq[1:]) & (keys[:-1] == keys[1:]))
+            correct[n - 1] = np.minimum(counts[:-1][match], counts[1:][match]).sum()
+
+        # closest reference length of each sentence, the shorter one on ties
+        len_cand = np.diff(cand_starts)
+        len_ref = np.diff(ref_starts)
+        scale = int(len_ref.max(initial=0)) + 1
+        closest = np.full(len(cands), np.iinfo(np.int64).max, dtype=np.int64)
+        np.minimum.at(closest, ref_sent,
+                      np.abs(len_ref - len_cand[ref_sent]) * scale + len_ref)
+        len_translation = len_cand.sum()
+        len_reference = (closest % scale).sum()
 
         # calculate bleu scores
         precision = correct/totals + 0.0000001
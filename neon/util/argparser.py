@@ -130,6 +130,10 @@ class NeonArgparser(configargparse.ArgumentParser):
                             const=1, metavar='N',
                             help='serialize model every N epochs')
         rt_grp.add_argument('--model_file', help='load model from pkl file')
+        rt_grp.add_argument('--graph_cache', nargs='?', const='', default=None,
+                            metavar='DIR',
+                            help='reuse the layer geometry of earlier runs of the same '
+                                 'model, cached in DIR (default: the neon cache directory)')
         rt_grp.add_argument('-l', '--log', dest='logfile', nargs='?',
                             const=os.path.join(self.work_dir, 'neon_log.txt'),
                             help='log file')
@@ -152,11 +156,13 @@ class NeonArgparser(configargparse.ArgumentParser):
                             help='Common root path for relative path items in the '
                                  'supplied manifest files')
         be_grp = self.add_argument_group('backend')
-        be_grp.add_argument('-b', '--backend', choices=Backend.backend_choices(),
-                            default='gpu' if get_compute_capability() >= 3.0
-                                    else 'mkl' if get_mkl_lib()
-                                    else 'cpu',
-                            help='backend type. Multi-GPU support is a premium '
+        # the backends are only imported and the hardware probed when the default
+        # is needed, see parse_args
+        be_grp.add_argument('-b', '--backend', choices=list(Backend.backend_modules),
+                            default=None,
+                            help='backend type, defaults to gpu if a capable device '
+                                 'is found, else mkl if installed, else cpu. '
+                                 'Multi-GPU support is a premium '
                                  'feature available exclusively through the '
                                  'Nervana cloud. Please contact '
                                  'info@nervanasys.com for details.')
@@ -164,8 +170,9 @@ class NeonArgparser(configargparse.ArgumentParser):
                             default=self.defaults.get('device_id', 0),
                             help='gpu device id (only used with GPU backend)')
         be_grp.add_argument('-m', '--max_devices', type=int,
-                            default=self.defaults.get('max_devices', get_device_count()),
-                            help='max number of GPUs (only used with mgpu backend')
+                            default=self.defaults.get('max_devices', None),
+                            help='max number of GPUs (only used with mgpu backend, '
+                                 'defaults to all GPUs found)')
 
         be_grp.add_argument('-r', '--rng_seed', type=int,
                             default=self.defaults.get('rng_seed', None),
@@ -192,6 +199,11 @@ class NeonArgparser(configargparse.ArgumentParser):
                                  'sizes and dropout implementation')
         be_grp.add_argument('--deterministic', action='store_true',
                             help='Use deterministic kernels where applicable')
+        be_grp.add_argument('--conv_autotune', nargs='?', const='', default=None,
+                            metavar='FILE',
+                            help='time the conv algorithms of the cpu backend on the first '
+                                 'use of each layer shape and keep the fastest, the choices '
+                                 'are saved in FILE (default: the neon cache directory)')
         return
 
     def add_yaml_arg(self):
@@ -251,6 +263,13 @@ class NeonArgparser(configargparse.ArgumentParser):
         args = super(NeonArgparser, self).parse_args()
         err_msg = None  # used for relaying exception to logger
 
+        if args.backend is None:
+            args.backend = ('gpu' if get_compute_capability() >= 3.0
+                            else 'mkl' if get_mkl_lib()
+                            else 'cpu')
+        if args.max_devices is None and args.backend == 'mgpu':
+            args.max_devices = get_device_count()
+
         # set up the logging
         # max thresh is 50 (critical only), min is 10 (debug or higher)
         try:
@@ -358,13 +377,15 @@ class NeonArgparser(configargparse.ArgumentParser):
         # extended parsers may need to generate backend after argparsing
         if gen_be:
             # generate the backend
-            gen_backend(backend=args.backend,
-                        rng_seed=args.rng_seed,
-                        device_id=args.device_id,
-                        batch_size=args.batch_size,
-                        datatype=args.datatype,
-                        max_devices=args.max_devices,
-                        compat_mode=args.compat_mode)
+            be = gen_backend(backend=args.backend,
+                             rng_seed=args.rng_seed,
+                             device_id=args.device_id,
+                             batch_size=args.batch_size,
+                             datatype=args.datatype,
+                             max_devices=args.max_devices,
+                             compat_mode=args.compat_mode)
+            if args.conv_autotune is not None and hasattr(be, 'autotune_conv'):
+                be.autotune_conv(cache_file=args.conv_autotune or None)
 
         # display what command line / config options were set (and from where)
         logger.info(self.format_values())
@@ -0,0 +1,123 @@
+# ******************************************************************************
+# Copyright 2017-2018 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ******************************************************************************
+"""
+On disk cache of the precomputed layer geometry of a model.
+"""
+import hashlib
+import json
+import logging
+import os
+
+import numpy as np
+
+from neon import NervanaObject
+
+logger = logging.getLogger(__name__)
+
+
+class GraphCache(NervanaObject):
+    """
+    Persists the conv, deconv and pool parameter objects (output shapes, buffer sizes and
+    slice tables) created while a model is initialized, so that later runs of the same
+    model description with the same batch size and backend reuse them instead of
+    recomputing them.
+
+    Typical use, around the first initialization of a model:
+
+        cache = GraphCache()
+        cache.load(root_yaml)
+        model.initialize(train, cost=cost)
+        cache.save(root_yaml)
+
+    Only backends keeping a ``layer_geometry`` table (the CPU backend) are cached, load and
+    save do nothing on the others.
+
+    Arguments:
+        cache_dir (str, optional): directory of the cache files, defaults to the graphs
+                                   subdirectory of the neon cache directory
+    """
+
+    def __init__(self, cache_dir=None):
+        if cache_dir is None:
+            from neon.util.persist import get_cache_dir
+            cache_dir = get_cache_dir('graphs')
+        self.cache_dir = cache_dir
+        self.loaded = 0
+
+    def key(self, description):
+        """
+        Cache key of a model description on the current backend.
+
+        Arguments:
+            description (dict): model description, such as a parsed YAML config or the
+                                output of Model.get_description
+
+        Returns:
+            str: hex digest of the description, batch size, backend and data type
+        """
+        spec = [description, self.be.bsz, type(self.be).__name__,
+                np.dtype(self.be.default_dtype).str]
+        return hashlib.sha1(json.dumps(spec, sort_keys=True, default=str).encode()).hexdigest()
+
+    def path(self, description):
+        return os.path.join(self.cache_dir, self.key(description) + '.pkl')
+
+    def load(self, description):
+        """
+        Fill the layer geometry table of the backend from the cache entry of description.
+
+        Arguments:
+            description (dict): model description
+
+        Returns:
+            bool: True if a cache entry was found
+        """
+        geometry = getattr(self.be, 'layer_geometry', None)
+        path = self.path(description)
+        if geometry is None or not os.path.exists(path):
+            return False
+
+        from neon.util.persist import load_obj
+        try:
+            cached = load_obj(path)
+        except Exception as e:
+            logger.warning("Ignoring unreadable graph cache %s: %s", path, e)
+            return False
+        geometry.update(cached)
+        self.loaded = len(cached)
+        logger.info("Loaded %d layer geometries from %s", self.loaded, path)
+        return True
+
+    def save(self, description):
+        """
+        Write the layer geometry table of the backend to the cache entry of description,
+        unless it holds nothing new since the entry was loaded.
+
+        Arguments:
+            description (dict): model description
+        """
+        geometry = getattr(self.be, 'layer_geometry', None)
+        if not geometry or len(geometry) == self.loaded:
+            return
+
+        from neon.util.persist import save_obj
+        path = self.path(description)
+        # concurrent jobs of the same model write whole files and rename them into place
+        tmp_path = '%s.%d.tmp' % (path, os.getpid())
+        save_obj(dict(geometry), tmp_path)
+        os.rename(tmp_path, path)
+        self.loaded = len(geometry)
+        logger.info("Saved %d layer geometries to %s", self.loaded, path)
@@ -165,6 +165,24 @@ def backend_cpu64(request):
     return be
 
 
+@pytest.fixture(scope='module', params=['cpu'])
+def backend_cpu16(request):
+    '''
+    Fixture that returns a cpu backend using 16 bit dtype storage.
+    '''
+    be = get_backend(request, datatype=np.float16)
+
+    # add a cleanup call - will run after all tests in module are done
+    def cleanup():
+        be = request.getfixturevalue('backend_cpu16')
+        del be
+    request.addfinalizer(cleanup)
+
+    # tests using this fixture can access the backend object from
+    # backend or use the NervanaObject.be global
+    return be
+
+
 @pytest.fixture(scope='module', params=['mkl'])
 def backend_mkl(request):
     '''
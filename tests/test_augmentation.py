@@ -0,0 +1,82 @@
+# ******************************************************************************
+# Copyright 2017-2018 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ******************************************************************************
+"""
+Tests for the minibatch image augmentation transformer.
+"""
+from builtins import range
+import numpy as np
+
+from neon import NervanaObject
+from neon.data import ArrayIterator
+from neon.data.dataloader_transformers import ImageAugmentation
+
+LSHAPE = (3, 6, 7)
+
+
+def make_data():
+    be = NervanaObject.be
+    X = np.random.uniform(0.5, 1, (2 * be.bsz, int(np.prod(LSHAPE))))
+    return X, ArrayIterator(X, np.arange(2 * be.bsz) % 10, nclass=10, lshape=LSHAPE)
+
+
+def augmented(data, **kwargs):
+    NervanaObject.be.rng_reset()
+    return [x.get().copy() for x, _ in ImageAugmentation(data, 0, LSHAPE, **kwargs)]
+
+
+def images(X, batch):
+    be = NervanaObject.be
+    return X[batch * be.bsz:(batch + 1) * be.bsz].reshape((-1,) + LSHAPE)
+
+
+def test_crop_flip(backend_default):
+    be = NervanaObject.be
+    X, data = make_data()
+    pad = 2
+    for batch, out in enumerate(augmented(data, crop_padding=pad, flip=True)):
+        out = out.reshape(LSHAPE + (be.bsz,)).transpose((3, 0, 1, 2))
+        padded = np.pad(images(X, batch), ((0, 0), (0, 0), (pad, pad), (pad, pad)), 'constant')
+        flips = 0
+        for img, src in zip(out, padded):
+            # each image is a window of its padded image, flipped or not
+            windows = [src[:, i:i + LSHAPE[1], j:j + LSHAPE[2]]
+                       for i in range(2 * pad + 1) for j in range(2 * pad + 1)]
+            if any(np.allclose(img, w) for w in windows):
+                continue
+            assert any(np.allclose(img, w[:, :, ::-1]) for w in windows)
+            flips += 1
+        assert 0 < flips < be.bsz
+
+
+def test_jitter(backend_default):
+    be = NervanaObject.be
+    X, data = make_data()
+    for batch, out in enumerate(augmented(data, brightness=0.1, contrast=0.2)):
+        src = images(X, batch).reshape(be.bsz, -1).T
+        shift = out.mean(axis=0) - src.mean(axis=0)
+        scale = out.std(axis=0) / src.std(axis=0)
+        assert np.all(np.abs(shift) <= 0.1 + 1e-5) and np.all(np.abs(scale - 1) <= 0.2 + 1e-5)
+        # an affine map of the pixel values of each image
+        assert np.allclose((out - out.mean(axis=0)) / scale,
+                           src - src.mean(axis=0), atol=1e-5)
+
+
+def test_reproducible(backend_default):
+    _, data = make_data()
+    kwargs = dict(crop_padding=1, flip=True, brightness=0.1, contrast=0.1)
+    first, second = augmented(data, **kwargs), augmented(data, **kwargs)
+    assert all(np.array_equal(a, b) for a, b in zip(first, second))
+    assert not np.array_equal(first[0], augmented(data)[0])
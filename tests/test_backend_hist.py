@@ -17,6 +17,7 @@ from builtins import str
 import numpy as np
 import itertools as itt
 import pytest
+from neon.backends.nervanacpu import exponent_hist
 from neon.backends.util import check_gpu
 from utils import tensors_allclose
 
@@ -89,6 +90,31 @@ def pytest_generate_tests(metafunc):
         metafunc.parametrize("nbin_offset_dim_dtype_inp", fargs)
 
 
+def test_exponent_hist(nbin_offset_dim_dtype_inp):
+    """
+    Compare the bit level exponent histogram to the reference implementation above.
+    """
+    (nbins, offset), dim, dtype, (name, inp_gen) = nbin_offset_dim_dtype_inp
+
+    np_inp = inp_gen(dim).astype(dtype)
+    np_hist = ref_hist(np_inp, nbins=nbins, offset=offset)
+    assert np.array_equal(exponent_hist(np_inp, nbins, offset), np_hist[0])
+
+
+def test_exponent_hist_edge_cases():
+    """
+    Zeros and underflows go to the first bin, overflows up to the last bin edge to the
+    last bin, larger values and non finite values are not counted.
+    """
+    inp = np.array([0., -0., 1e-45, 2 ** -48, 2 ** -60, 2 ** 15, -2 ** 16, 2 ** 17,
+                    np.inf, np.nan, 2 ** 5, 63.99998856, -2 ** 6, 2 ** -3, 2 ** -4,
+                    0.11262291, 92.22483826], dtype=np.float32)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        np_hist = ref_hist(inp)
+    assert np.array_equal(exponent_hist(inp, 64, -48), np_hist[0])
+    assert exponent_hist(inp, 64, -48).sum() == len(inp) - 3
+
+
 def test_edge_cases_mkl(backend_pair_mkl):
     """
     Test several edge cases related to min/max bin, and rounding.
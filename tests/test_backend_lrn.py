@@ -174,6 +174,52 @@ def lrn_helper(dtype, ones, cpu, alpha, beta, ascale, bpower,
     neon_logger.display(devB.get().reshape(C * D * H * W, N)[0:4, 0:4])
 
 
+def lrn_ref(I, E, J, ascale, bpower):
+    """
+    Per-channel reference for cross-channel LRN on (C, D, H, W, N) arrays.
+    """
+    C = I.shape[0]
+    pad = J // 2
+    denom = np.empty_like(I)
+    for c in range(C):
+        window = slice(max(c - pad, 0), min(c + pad + 1, C))
+        denom[c] = 1 + ascale / J * np.sum(np.square(I[window]), axis=0)
+    O = I * np.power(denom, -bpower)
+
+    delta = np.empty_like(I)
+    for c in range(C):
+        window = slice(max(c - pad, 0), min(c + pad + 1, C))
+        delta[c] = np.sum(O[window] * E[window] / denom[window], axis=0)
+    delta = -2 * bpower * (ascale / float(J)) * delta * I + E * np.power(denom, -bpower)
+    return denom, O, delta
+
+
+@pytest.mark.parametrize('C,J', [(16, 5), (3, 5), (7, 3), (1, 1)])
+def test_lrn_cpu_ref(C, J):
+    from neon.backends import gen_backend
+    nc = gen_backend(backend='cpu', batch_size=4, rng_seed=0)
+    layer = nc.lrn_layer(dtype=np.float32, N=4, C=C, D=1, H=3, W=5, J=J)
+    dimI = layer.dimI
+
+    I = np.random.uniform(-1.0, 1.0, dimI).astype(np.float32)
+    E = np.random.uniform(-1.0, 1.0, dimI).astype(np.float32)
+    ascale, bpower = 1.2, 0.75
+
+    devI = nc.array(I.reshape(-1, 4))
+    devE = nc.array(E.reshape(-1, 4))
+    devO = nc.empty(devI.shape)
+    devD = nc.empty(devI.shape)
+    devB = nc.empty(devI.shape)
+
+    nc.fprop_lrn(layer, devI, devO, devD, None, None, ascale, bpower)
+    nc.bprop_lrn(layer, devI, devO, devE, devB, devD, None, None, ascale, bpower)
+
+    denom, O, delta = lrn_ref(I, E, J, ascale, bpower)
+    assert np.allclose(devD.get().reshape(dimI), denom, rtol=1e-5, atol=1e-6)
+    assert np.allclose(devO.get().reshape(dimI), O, rtol=1e-5, atol=1e-6)
+    assert np.allclose(devB.get().reshape(dimI), delta, rtol=1e-5, atol=1e-6)
+
+
 if __name__ == '__main__':
     test_pooling(0)
     test_pooling_mkl(0)
@@ -17,6 +17,7 @@
 import numpy as np
 import pytest
 from neon.backends import gen_backend
+from neon.backends.counter_rng import CounterRNG
 from utils import tensors_allclose
 
 
@@ -176,3 +177,45 @@ def test_rng_funcs(backend_default):
     x2_2 = x.get().copy()
 
     assert np.max(np.abs(x2 - x2_2)) == 0.0
+
+
+@pytest.mark.skipif(not CounterRNG.available, reason="numpy has no Philox generator")
+def test_counter_rng_threads():
+    # values depend only on seed and chunk counter, not on the thread count
+    x = np.empty((40, 1000), dtype=np.float32)
+    y = np.empty((40, 1000), dtype=np.float32)
+    CounterRNG(seed=1, chunk_size=1024, num_threads=1).fill_normal(x)
+    CounterRNG(seed=1, chunk_size=1024, num_threads=4).fill_normal(y)
+    assert np.array_equal(x, y)
+
+    m = np.empty((40, 1000), dtype=np.uint8)
+    CounterRNG(seed=1, chunk_size=1024, num_threads=4).fill_mask(m, keepthresh=0.8)
+    assert set(np.unique(m)) <= set([0, 1])
+    assert abs(m.mean() - 0.8) < 0.01
+
+    # non-contiguous views are filled in place
+    z = np.zeros((8, 8), dtype=np.float32)
+    CounterRNG(seed=1).fill_uniform(z[:, ::2], -1, 1)
+    assert np.all(z[:, 1::2] == 0) and np.all(np.abs(z[:, ::2]) <= 1)
+
+
+@pytest.mark.skipif(not CounterRNG.available, reason="numpy has no Philox generator")
+def test_cpu_counter_rng_state():
+    be = gen_backend(backend='cpu', rng_seed=100)
+    x = be.empty((64, 64), dtype=be.mask_dtype)
+    w = be.empty((64, 64))
+
+    be.make_binary_mask(x)
+    state = be.rng_get_state()
+    be.make_binary_mask(x)
+    be.rng_normal(w)
+    x1, w1 = x.get(), w.get()
+
+    # resume from the saved state, as when loading a checkpoint
+    be.rng_reset()
+    be.rng_set_state(state)
+    be.make_binary_mask(x)
+    be.rng_normal(w)
+    assert np.array_equal(x.get(), x1)
+    assert np.array_equal(w.get(), w1)
+    del(be)
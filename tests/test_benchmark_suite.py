@@ -0,0 +1,52 @@
+# ******************************************************************************
+# Copyright 2017-2018 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ******************************************************************************
+"""
+Tests of the regression benchmark suite.
+"""
+import copy
+import os
+
+from neon import NervanaObject
+from neon.benchmark.suite import CASES, compare, load_results, run_suite, save_results
+
+
+def test_run_suite(backend_default, tmpdir):
+    NervanaObject.be.bsz = 8
+    # every case runs
+    results = run_suite(repeat=1, warmup=0)
+    assert list(results['results']) == list(CASES)
+    assert results['environment']['batch_size'] == 8
+    for result in results['results'].values():
+        assert len(result['times']) == 1
+        assert result['median'] > 0 and result['records_per_second'] > 0
+
+    results = run_suite(['optree/*', 'models/mlp'], repeat=3)
+    assert list(results['results']) == ['optree/elementwise', 'optree/reduction', 'models/mlp']
+    path = os.path.join(str(tmpdir), 'results.json')
+    save_results(results, path)
+    assert load_results(path) == results
+
+
+def test_compare():
+    baseline = {'environment': {'backend': 'cpu', 'batch_size': 32, 'datatype': 'float32'},
+                'results': {'a': {'median': 1.}, 'b': {'median': 1.}, 'c': {'median': 1.}}}
+    results = copy.deepcopy(baseline)
+    results['results']['a']['median'] = 1.2
+    results['results']['b']['median'] = 1.5
+    results['results']['c']['median'] = 0.5
+    results['results']['d'] = {'median': 9.}
+    assert compare(results, baseline, tolerance=0.25) == [('b', 1., 1.5, 1.5)]
+    assert [r[0] for r in compare(results, baseline, tolerance=0.1)] == ['a', 'b']
@@ -16,6 +16,7 @@
 '''
 Test BLEUScore metric against reference
 '''
+import numpy as np
 from neon.transforms.cost import BLEUScore
 
 
@@ -45,5 +46,49 @@ def test_bleuscore():
         assert round(score, 1) == reference
 
 
+def test_bleuscore_ids():
+    rng = np.random.RandomState(0)
+    vocab_size, steps = 12, 10
+    cands = [rng.randint(2, vocab_size, rng.randint(3, steps)) for _ in range(20)]
+    refs = [[np.concatenate([c[:rng.randint(len(c))], rng.randint(2, vocab_size, 3)])
+             for _ in range(2)] for c in cands]
+
+    def words(ids):
+        return " ".join("w%d" % i for i in ids)
+
+    bleu_metric = BLEUScore()
+    bleu_metric([words(c) for c in cands], [[words(r) for r in rr] for rr in refs],
+                brevity_penalty=True)
+    string_scores = bleu_metric.bleu_n
+
+    # padded id arrays, with end of sentence 1 and padding 0
+    y = np.zeros((len(cands), steps), dtype=np.int32)
+    t = np.zeros((len(cands), 2, steps + 3), dtype=np.int32)
+    for ii, c in enumerate(cands):
+        y[ii, :len(c)] = c
+        y[ii, len(c)] = 1
+        for jj, r in enumerate(refs[ii]):
+            t[ii, jj, :len(r)] = r
+    bleu_metric.score_ids(y, t, brevity_penalty=True, end_id=1, pad_id=0)
+    assert np.allclose(bleu_metric.bleu_n, string_scores)
+
+    # probabilities as returned by Model.get_outputs
+    probs = np.eye(vocab_size)[y] * 0.9 + 0.1 / vocab_size
+    bleu_metric.score_ids(probs, refs, brevity_penalty=True, end_id=1)
+    assert np.allclose(bleu_metric.bleu_n, string_scores)
+
+
+def test_bleuscore_unk_hashed():
+    # ids too large to pack 4-grams exactly into 64 bits, n-grams with unk never match
+    big = 2 ** 20
+    y = [np.array([5, big + 1, 3, big + 2, 7, 9])]
+    t = [[np.array([5, big + 1, 3, big + 2, 7, 9])]]
+    bleu_metric = BLEUScore()
+    assert round(bleu_metric.score_ids(y, t), 1) == 100.0
+    bleu_metric.score_ids(y, t, unk_id=3)
+    assert round(bleu_metric.bleu_n[0], 1) == round(100 * 5 / 6., 1)
+    assert round(bleu_metric.bleu_n[1], 1) == round(100 * np.sqrt(5 / 6. * 3 / 5.), 1)
+
+
 if __name__ == '__main__':
     test_bleuscore()
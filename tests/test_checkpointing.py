@@ -0,0 +1,150 @@
+# ******************************************************************************
+# Copyright 2017-2018 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ******************************************************************************
+"""
+Tests for activation checkpointing in Sequential containers and across time in
+recurrent layers.
+"""
+from builtins import zip
+import numpy as np
+import pytest
+
+from neon import NervanaObject
+from neon.initializers import Gaussian
+from neon.layers import (Affine, BiLSTM, Conv, Dropout, Pooling, Recurrent, RecurrentLast, LSTM,
+                         Sequential)
+from neon.layers.container import DeltasTree
+from neon.transforms import Logistic, Rectlin, Softmax, Tanh
+
+init = Gaussian(scale=0.1)
+
+
+def make_sequential(**kwargs):
+    NervanaObject.be.rng_reset()
+    layers = [Conv((3, 3, 8), init=init, padding=1, activation=Rectlin(), batch_norm=True),
+              Conv((3, 3, 8), init=init, padding=1, activation=Rectlin()),
+              Pooling(2),
+              Conv((3, 3, 8), init=init, padding=1, activation=Rectlin(), batch_norm=True),
+              Dropout(keep=0.8),
+              Conv((3, 3, 4), init=init, padding=1, activation=Rectlin()),
+              Affine(nout=20, init=init, activation=Rectlin()),
+              Affine(nout=5, init=init, activation=Softmax())]
+    seq = Sequential(layers, **kwargs)
+    seq.configure((2, 8, 8))
+    seq.allocate()
+    seq.allocate_deltas()
+    return seq
+
+
+def run_sequential(seq, x, error):
+    be = NervanaObject.be
+    be.rng_reset()
+    output = seq.fprop(be.array(x)).get().copy()
+    seq.bprop(be.array(error))
+    grads = []
+    for l in seq.layers_to_optimize:
+        params = l.get_params()
+        for (_, grad), _ in (params if isinstance(params, list) else [params]):
+            grads.append(grad.get().copy())
+    return output, grads
+
+
+@pytest.mark.parametrize("segments", [2, 3])
+def test_checkpoint_segments(backend_cpu, segments):
+    be = NervanaObject.be
+    x = np.random.uniform(-1, 1, (2 * 8 * 8, be.bsz))
+    error = np.random.uniform(-1, 1, (5, be.bsz))
+
+    ref_output, ref_grads = run_sequential(make_sequential(), x, error)
+    seq = make_sequential(checkpoint_segments=segments)
+    output, grads = run_sequential(seq, x, error)
+
+    assert len(seq.segments) >= segments
+    assert seq.recompute_at
+    report = seq.checkpoint_report()
+    assert report['saved_bytes'] > 0
+    assert report['full_bytes'] == report['checkpointed_bytes'] + report['saved_bytes']
+
+    assert np.allclose(output, ref_output, rtol=1e-5, atol=1e-6)
+    for grad, ref in zip(grads, ref_grads):
+        assert np.allclose(grad, ref, rtol=1e-4, atol=1e-5)
+
+
+def test_checkpoint_memory(backend_cpu):
+    report = make_sequential(checkpoint_segments=2).checkpoint_report()
+    budget = report['checkpointed_bytes']
+    assert budget < report['full_bytes']
+
+    report = make_sequential(checkpoint_memory=budget).checkpoint_report()
+    assert report['checkpointed_bytes'] <= budget
+    assert report['segments'] > 1
+
+
+def test_checkpoint_bidirectional(backend_cpu):
+    be = NervanaObject.be
+    nin, nsteps = 6, 5
+    x = np.random.uniform(-1, 1, (nin, nsteps * be.bsz))
+    error = np.random.uniform(-1, 1, (5, be.bsz))
+
+    def make(**kwargs):
+        be.rng_reset()
+        layers = [LSTM(8, init, activation=Tanh(), gate_activation=Logistic()),
+                  BiLSTM(8, init, activation=Tanh(), gate_activation=Logistic()),
+                  BiLSTM(8, init, activation=Tanh(), gate_activation=Logistic()),
+                  RecurrentLast(),
+                  Affine(nout=5, init=init, activation=Softmax())]
+        seq = Sequential(layers, **kwargs)
+        seq.configure((nin, nsteps))
+        seq.allocate()
+        seq.allocate_deltas()
+        return seq
+
+    # the padded outputs of the bidirectional layers are kept, not recomputed
+    ref_output, ref_grads = run_sequential(make(), x, error)
+    output, grads = run_sequential(make(checkpoint_segments=2), x, error)
+    assert np.allclose(output, ref_output, rtol=1e-5, atol=1e-6)
+    for grad, ref in zip(grads, ref_grads):
+        assert np.allclose(grad, ref, rtol=1e-4, atol=1e-5)
+
+
+@pytest.mark.parametrize("layer", [Recurrent, LSTM])
+def test_checkpoint_steps(backend_cpu, layer):
+    be = NervanaObject.be
+    nin, nout, nsteps = 6, 8, 7
+    x = np.random.uniform(-1, 1, (nin, nsteps * be.bsz))
+    error = np.random.uniform(-1, 1, (nout, nsteps * be.bsz))
+
+    results = []
+    for checkpoint_steps in (None, 3):
+        be.rng_reset()
+        if layer is LSTM:
+            rnn = LSTM(nout, init, activation=Tanh(), gate_activation=Logistic(),
+                       checkpoint_steps=checkpoint_steps)
+        else:
+            rnn = Recurrent(nout, init, activation=Tanh(), checkpoint_steps=checkpoint_steps)
+        rnn.configure((nin, nsteps))
+        rnn.prev_layer = True
+        rnn.allocate()
+        dtree = DeltasTree()
+        rnn.allocate_deltas(dtree)
+        dtree.allocate_buffers()
+        rnn.set_deltas(dtree)
+        output = rnn.fprop(be.array(x)).get().copy()
+        deltas = rnn.bprop(be.array(error)).get().copy()
+        results.append((output, deltas, rnn.dW.get().copy()))
+
+    assert rnn.checkpoint_report()['saved_bytes'] > 0
+    for out, ref in zip(results[1], results[0]):
+        assert np.allclose(out, ref, rtol=1e-4, atol=1e-5)
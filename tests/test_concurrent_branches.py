@@ -0,0 +1,159 @@
+# ******************************************************************************
+# Copyright 2017-2018 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ******************************************************************************
+"""
+Tests for running the branches of MergeBroadcast, MergeSum and Tree containers, and the
+directions of bidirectional recurrent layers, on the branch worker threads of the CPU
+backend.
+"""
+from builtins import zip
+import numpy as np
+import pytest
+
+from neon import NervanaObject
+from neon.initializers import Gaussian
+from neon.layers import (Affine, BiBNRNN, BiLSTM, BiRNN, BranchNode, Conv, MergeBroadcast,
+                         MergeSum, Pooling, SkipNode, Tree)
+from neon.layers.container import DeltasTree
+from neon.transforms import Logistic, Rectlin, Softmax, Tanh
+
+init = Gaussian(scale=0.1)
+relu = Rectlin()
+
+
+def make_tree(name):
+    be = NervanaObject.be
+    be.rng_reset()
+    bnode = BranchNode(name=name)
+    inception = MergeBroadcast([[Conv((1, 1, 4), init=init, activation=relu)],
+                                [Conv((1, 1, 4), init=init, activation=relu),
+                                 Conv((3, 3, 4), init=init, padding=1, activation=relu)],
+                                [Pooling(3, strides=1, padding=1),
+                                 Conv((1, 1, 2), init=init, activation=relu)]],
+                               merge="depth")
+    residual = MergeSum([[Conv((3, 3, 10), init=init, padding=1, activation=relu),
+                          Conv((3, 3, 10), init=init, padding=1)],
+                         [SkipNode()]])
+    trunk = [Conv((3, 3, 6), init=init, padding=1, activation=relu), bnode,
+             inception, residual, Pooling(2), Affine(nout=5, init=init, activation=Softmax())]
+    aux1 = [bnode, Pooling(2), Affine(nout=5, init=init, activation=Softmax())]
+    aux2 = [bnode, Affine(nout=3, init=init, activation=Softmax())]
+    tree = Tree([trunk, aux1, aux2], alphas=[1.0, 0.3, 0.5])
+    tree.configure((2, 8, 8))
+    tree.allocate()
+    tree.allocate_deltas()
+    return tree
+
+
+def run_tree(tree, x, errors):
+    be = NervanaObject.be
+    outputs = [o.get().copy() for o in tree.fprop(be.array(x))]
+    tree.bprop([be.array(e) for e in errors])
+    grads = [l.dW.get().copy() for l in tree.layers_to_optimize]
+    return outputs, grads
+
+
+@pytest.mark.parametrize("workers", [2, 4])
+def test_concurrent_tree(backend_cpu, workers):
+    be = NervanaObject.be
+    x = np.random.uniform(-1, 1, (2 * 8 * 8, be.bsz))
+    errors = [np.random.uniform(-1, 1, (n, be.bsz)) for n in (5, 5, 3)]
+
+    ref_outputs, ref_grads = run_tree(make_tree('serial_%d' % workers), x, errors)
+
+    be.set_branch_workers(workers)
+    try:
+        tree = make_tree('concurrent_%d' % workers)
+        outputs, grads = run_tree(tree, x, errors)
+    finally:
+        be.set_branch_workers(0)
+
+    assert tree.branch_deltas is not None
+    broadcasts = [l for l in tree.layers[0].layers if isinstance(l, (MergeBroadcast, MergeSum))]
+    assert all(l.branch_deltas is not None for l in broadcasts)
+    for out, ref in zip(outputs, ref_outputs):
+        assert np.allclose(out, ref, rtol=1e-4, atol=1e-5)
+    for grad, ref in zip(grads, ref_grads):
+        assert np.allclose(grad, ref, rtol=1e-4, atol=1e-5)
+
+
+def test_run_branches_order(backend_cpu):
+    be = NervanaObject.be
+    be.set_branch_workers(3)
+    try:
+        # branches nested in a worker thread run in order instead of waiting on the pool
+        nested = [lambda i=i: be.run_branches([lambda j=j: (i, j) for j in range(4)])
+                  for i in range(6)]
+        results = be.run_branches(nested)
+    finally:
+        be.set_branch_workers(0)
+    assert results == [[(i, j) for j in range(4)] for i in range(6)]
+
+
+def make_bidirectional(layer_cls, split_inputs, in_shape):
+    NervanaObject.be.rng_reset()
+    kwargs = dict(gate_activation=Logistic()) if layer_cls is BiLSTM else {}
+    layer = layer_cls(10, init=init, activation=Tanh(), reset_cells=True,
+                      split_inputs=split_inputs, **kwargs)
+    layer.configure(in_shape)
+    layer.prev_layer = True
+    layer.allocate()
+    deltas = DeltasTree()
+    layer.allocate_deltas(deltas)
+    deltas.allocate_buffers()
+    layer.set_deltas(deltas)
+    return layer
+
+
+def run_bidirectional(layer, x, error):
+    be = NervanaObject.be
+    output = layer.fprop(be.array(x)).get().copy()
+    deltas = layer.bprop(be.array(error)).get().copy()
+    return output, deltas, layer.dW.get().copy()
+
+
+@pytest.mark.parametrize("split_inputs", [False, True])
+@pytest.mark.parametrize("layer_cls", [BiRNN, BiLSTM, BiBNRNN])
+def test_concurrent_bidirectional(backend_cpu, layer_cls, split_inputs):
+    be = NervanaObject.be
+    in_shape, nsteps = (6, 5), 5
+    x = np.random.uniform(-1, 1, (in_shape[0], nsteps * be.bsz))
+    error = np.random.uniform(-1, 1, (20, nsteps * be.bsz))
+
+    ref = run_bidirectional(make_bidirectional(layer_cls, split_inputs, in_shape), x, error)
+
+    be.set_branch_workers(2)
+    try:
+        layer = make_bidirectional(layer_cls, split_inputs, in_shape)
+        results = run_bidirectional(layer, x, error)
+    finally:
+        be.set_branch_workers(0)
+
+    for result, ref_result in zip(results, ref):
+        assert np.allclose(result, ref_result, rtol=1e-4, atol=1e-5)
+
+
+def test_bilstm_shared_input_deltas(backend_cpu):
+    be = NervanaObject.be
+    in_shape, nsteps = (6, 5), 5
+    layer = make_bidirectional(BiLSTM, False, in_shape)
+    x = np.random.uniform(-1, 1, (in_shape[0], nsteps * be.bsz))
+    error = np.random.uniform(-1, 1, (20, nsteps * be.bsz))
+    _, deltas, _ = run_bidirectional(layer, x, error)
+
+    # the deltas of the shared inputs sum the contributions of both directions
+    expected = (np.dot(layer.W_input_f.get().T, layer.ifog_delta_buffer_f.get()) +
+                np.dot(layer.W_input_b.get().T, layer.ifog_delta_buffer_b.get()))
+    assert np.allclose(deltas, expected, rtol=1e-4, atol=1e-5)
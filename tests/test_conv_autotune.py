@@ -0,0 +1,126 @@
+# ******************************************************************************
+# Copyright 2017-2018 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ******************************************************************************
+"""
+Tests for the conv algorithms of the CPU backend and their autotuner.
+"""
+import json
+import numpy as np
+import pytest
+
+from neon import NervanaObject
+from neon.backends.autotune import ConvAutotuner
+
+GEOMETRIES = [dict(C=3, K=5, H=7, W=6, R=3, S=3, pad_h=1, pad_w=1),
+              dict(C=3, K=4, H=7, W=6, R=3, S=3, pad_w=2),
+              dict(C=2, K=4, H=11, W=9, R=5, S=5, pad_h=2, pad_w=1, str_h=2, str_w=3),
+              dict(C=2, K=3, H=9, W=8, R=5, S=5, pad_h=1, pad_w=2),
+              dict(C=2, K=3, H=10, W=10, R=3, S=3, pad_h=2, pad_w=2, dil_h=2, dil_w=2),
+              dict(C=2, K=3, D=5, H=6, W=6, T=3, R=3, S=3, pad_d=1, pad_h=1, pad_w=1,
+                   str_d=2)]
+
+
+def run_op(layer, op, I, F, E):
+    be = NervanaObject.be
+    N = be.bsz
+    if op == 'fprop':
+        out = be.empty((layer.sizeO // N, N))
+        be.fprop_conv(layer, I, F, out)
+    elif op == 'bprop':
+        out = be.empty((layer.sizeI // N, N))
+        be.bprop_conv(layer, F, E, out)
+    else:
+        out = be.empty((layer.sizeF // layer.K, layer.K))
+        be.update_conv(layer, I, E, out)
+    return out.get()
+
+
+def random_operands(layer):
+    be = NervanaObject.be
+    return (be.array(np.random.uniform(-1, 1, layer.dimI).reshape(-1, be.bsz)),
+            be.array(np.random.uniform(-1, 1, layer.dimF).reshape(-1, layer.K)),
+            be.array(np.random.uniform(-1, 1, layer.dimO).reshape(-1, be.bsz)))
+
+
+@pytest.mark.parametrize("geometry", GEOMETRIES)
+def test_conv_algorithms(backend_cpu, geometry):
+    be = NervanaObject.be
+    layer = be.conv_layer(np.float32, be.bsz, **geometry)
+    I, F, E = random_operands(layer)
+
+    for op in ('fprop', 'bprop', 'update'):
+        algos = layer.algorithms(op)
+        assert algos[0] == 'direct' and 'gemm' in algos
+        ref = run_op(layer, op, I, F, E)
+        for algo in algos[1:]:
+            layer.algos[op] = algo
+            assert np.allclose(run_op(layer, op, I, F, E), ref, rtol=1e-4, atol=1e-4), algo
+
+    winograd = geometry['R'] == 3 and 'T' not in geometry and 'dil_h' not in geometry \
+        and 'str_h' not in geometry
+    assert ('winograd' in layer.algorithms('fprop')) == winograd
+    fft = 'str_h' not in geometry and (geometry['R'] == 5 or 'dil_h' in geometry)
+    assert ('fft' in layer.algorithms('fprop')) == fft
+
+
+def test_deconv_algorithms(backend_cpu):
+    be = NervanaObject.be
+    layer = be.deconv_layer(np.float32, be.bsz, 3, 4, 1, 5, 5, R=3, S=3, pad_h=1, pad_w=1)
+    I, F, E = random_operands(layer)
+
+    # deconv fprop is the bprop of the convolution
+    ref = run_op(layer, 'bprop', I, F, E)
+    for algo in ('gemm', 'winograd'):
+        layer.algos['bprop'] = algo
+        assert np.allclose(run_op(layer, 'bprop', I, F, E), ref, rtol=1e-4, atol=1e-4)
+
+
+def test_conv_autotune(backend_cpu, tmpdir, monkeypatch):
+    be = NervanaObject.be
+    cache_file = str(tmpdir.join('conv_algos.json'))
+    geometry = GEOMETRIES[0]
+
+    be.layer_geometry.clear()
+    be.autotune_conv(cache_file=cache_file)
+    try:
+        layer = be.conv_layer(np.float32, be.bsz, **geometry)
+        I, F, E = random_operands(layer)
+        outputs = [run_op(layer, op, I, F, E) for op in ('fprop', 'bprop', 'update')]
+        timings = be.conv_tuner.timings
+
+        # a second run finds the choices in the file and does not time anything
+        be.layer_geometry.clear()
+        be.autotune_conv(cache_file=cache_file)
+        monkeypatch.setattr(ConvAutotuner, 'choose', lambda *args: pytest.fail('timed'))
+        tuned = be.conv_layer(np.float32, be.bsz, **geometry)
+        tuned_outputs = [run_op(tuned, op, I, F, E) for op in ('fprop', 'bprop', 'update')]
+    finally:
+        be.autotune_conv(False)
+        be.layer_geometry.clear()
+
+    with open(cache_file) as f:
+        choices = json.load(f)
+    assert sorted(choices) == sorted(timings)
+    for op in ('fprop', 'bprop', 'update'):
+        key = layer.tune_key(op, np.float32)
+        assert set(timings[key]) == set(layer.algorithms(op))
+        assert layer.algos[op] == tuned.algos[op] == choices[key]
+        assert choices[key] == min(timings[key], key=timings[key].get)
+
+    layer = be.conv_layer(np.float32, be.bsz, **geometry)
+    for op, out, tuned_out in zip(('fprop', 'bprop', 'update'), outputs, tuned_outputs):
+        ref = run_op(layer, op, I, F, E)
+        assert np.allclose(out, ref, rtol=1e-4, atol=1e-4)
+        assert np.allclose(tuned_out, ref, rtol=1e-4, atol=1e-4)
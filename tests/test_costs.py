@@ -22,7 +22,7 @@ from neon import NervanaObject
 from neon.backends import gen_backend
 from neon.transforms import (CrossEntropyBinary, CrossEntropyMulti, SumSquared,
                              MeanSquared, Misclassification, PrecisionRecall,
-                             SmoothL1Loss, SquareHingeLoss)
+                             ConfusionMatrix, SmoothL1Loss, SquareHingeLoss)
 
 
 def pytest_generate_tests(metafunc):
@@ -235,6 +235,59 @@ def test_precision_recall_binarize(backend_default):
                    expected_result, tol=1e-6)
 
 
+"""
+    Metric accumulators
+"""
+
+
+def test_misclassification_accumulate(backend_default):
+    be = NervanaObject.be
+    be.bsz = 4
+    outputs = [np.array([[0.9, 0.2, 0.3, 0.6], [0.1, 0.8, 0.7, 0.4]]),
+               np.array([[0.1, 0.7, 0.2, 0.9], [0.9, 0.3, 0.8, 0.1]])]
+    targets = [np.array([[1, 1, 0, 0], [0, 0, 1, 1]]),
+               np.array([[0, 0, 1, 1], [1, 1, 0, 0]])]
+    metric = Misclassification()
+    metric.reset_accumulators()
+    # the second minibatch is padded, only its first 3 records count
+    for y, t, n in zip(outputs, targets, (4, 3)):
+        metric.accumulate(be.array(y), be.array(t), calcrange=slice(0, n))
+    # 2 errors in the first minibatch, 2 in the first 3 records of the second
+    assert np.allclose(metric.accumulated(), [4. / 7])
+
+
+def test_confusion_matrix(backend_default):
+    be = NervanaObject.be
+    be.bsz = 4
+    preds = np.array([[0.7, 0.1, 0.2, 0.1], [0.2, 0.8, 0.7, 0.1], [0.1, 0.1, 0.1, 0.8]])
+    targets = np.array([[1, 0, 0, 1], [0, 1, 0, 0], [0, 0, 1, 0]])
+    metric = ConfusionMatrix(3)
+    metric.reset_accumulators()
+    metric.accumulate(be.array(preds), be.array(targets))
+    metric.accumulate(be.array(preds), be.array(targets), calcrange=slice(0, 2))
+
+    # rows are true classes, columns predicted classes
+    expected = np.array([[2, 0, 1], [0, 2, 0], [0, 1, 0]])
+    assert np.array_equal(metric.confusion_matrix(), expected)
+    assert np.allclose(metric.accumulated(), [4. / 6])
+
+
+def test_precision_recall_accumulate(backend_default):
+    be = NervanaObject.be
+    be.bsz = 4
+    preds = np.array([[0, 1, 0, 1], [1, 0, 0, 0], [0, 0, 1, 0]])
+    targets = np.array([[0, 1, 0, 1], [1, 0, 1, 0], [0, 0, 0, 0]])
+    metric = PrecisionRecall(3)
+    metric.reset_accumulators()
+    metric.accumulate(be.array(preds), be.array(targets))
+    metric.accumulate(be.array(preds), be.array(targets), calcrange=slice(0, 2))
+
+    # class 0: 3 tp of 3 predicted and 3 targets, class 1: 2 tp of 2 predicted
+    # and 3 targets, class 2: none of 1 predicted
+    expected = np.array([(1 + 1 + 0) / 3., (1 + 2. / 3 + 0) / 3.])
+    assert np.allclose(metric.accumulated(), expected, atol=1e-5)
+
+
 """
     Smooth L1 loss
 """
@@ -0,0 +1,79 @@
+# ******************************************************************************
+# Copyright 2017-2018 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ******************************************************************************
+"""
+Tests for the conversion of aeon buffers to tensors by DataLoaderAdapter.
+"""
+from builtins import range
+import numpy as np
+
+from neon import NervanaObject
+from neon.data.dataloaderadapter import DataLoaderAdapter
+
+
+class FakeAeonLoader(object):
+    """
+    Stands in for aeon's DataLoader: yields minibatches of random buffers as lists of
+    (name, array) pairs, the arrays laid out with the batch first.
+    """
+    def __init__(self, bsz, nbatches=3):
+        self.ndata = bsz * nbatches
+        self.nbatches = nbatches
+        self.config = {'etl': [{'type': 'audio', 'max_duration': '2 seconds',
+                                'sample_freq_hz': 100}]}
+        self.axes_info = [('image', (('channels', 3), ('height', 4), ('width', 5))),
+                          ('label', (('dim0', 1),)),
+                          ('audio_length', (('dim0', 1),)),
+                          ('char_map', (('max_length', 6),))]
+        self.bsz = bsz
+
+    def __iter__(self):
+        for _ in range(self.nbatches):
+            chars = np.random.randint(1, 27, (self.bsz, 6)).astype(np.uint32)
+            lengths = np.random.randint(1, 7, self.bsz)
+            chars[np.arange(6) >= lengths[:, None]] = 0
+            yield [('image', np.random.randint(0, 256, (self.bsz, 3, 4, 5)).astype(np.uint8)),
+                   ('label', np.random.randint(0, 10, (self.bsz, 1)).astype(np.int32)),
+                   ('audio_length', np.random.randint(0, 201, (self.bsz, 1)).astype(np.uint32)),
+                   ('char_map', chars)]
+
+
+def test_dataloader_adapter(backend_default):
+    be = NervanaObject.be
+    loader = FakeAeonLoader(be.bsz)
+    adapter = DataLoaderAdapter(loader)
+    assert adapter.nbatches == loader.nbatches
+    assert adapter.shapes() == ((3, 4, 5), (1,), (1,), (6,))
+
+    np.random.seed(0)
+    batches = list(loader)
+    np.random.seed(0)
+    buffers = None
+    for batch, outputs in zip(batches, adapter):
+        data = dict(batch)
+        image, label, audio_length, char_map = outputs
+
+        assert image.shape == (60, be.bsz) and image.dtype == np.uint8
+        assert np.array_equal(image.get(), data['image'].reshape(be.bsz, -1).T)
+        assert np.array_equal(label.get(), data['label'].T)
+        assert np.array_equal(audio_length.get(),
+                              (data['audio_length'].T / 200. * 100).astype(np.uint8))
+        chars = data['char_map']
+        assert np.array_equal(char_map.get(), chars[chars != 0].reshape(1, -1))
+
+        # the output buffers are allocated once
+        if buffers is None:
+            buffers = [adapter.buffers[key] for key in ('image', 'label', 'audio_length')]
+        assert all(out is buf for out, buf in zip(outputs, buffers))
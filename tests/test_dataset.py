@@ -15,11 +15,15 @@
 # ******************************************************************************
 import numpy as np
 import os
+import pytest
 
 from neon import NervanaObject
 from neon import logger as neon_logger
-from neon.data import MNIST
+from neon.data import MNIST, CIFAR10
+from neon.data.dataiterator import ArrayIterator, NormalizedArrayIterator
+from neon.data.datasets import Dataset
 from neon.data.text import Text
+from neon.util.compat import pickle
 
 
 def test_dataset(backend_default, data):
@@ -88,6 +92,123 @@ def test_text(backend_default):
             sent_ref = text_data[start:start + time_steps]
             assert sent == sent_ref
 
+    # integer targets, in the order of the columns of the onehot ones
+    int_set = Text(time_steps, train_path, vocab=train_set.vocab, onehot_target=False)
+    assert int_set.dev_y is None
+    for (_, y_batch), (_, t_batch) in zip(train_set, int_set):
+        assert t_batch.shape == (1, time_steps * bsz) and t_batch.dtype == np.int32
+        assert np.array_equal(t_batch.get()[0], np.argmax(y_batch.get(), axis=0))
+
     os.remove(data_path)
     os.remove(train_path)
     os.remove(valid_path)
+
+
+def test_load_cache(tmpdir, monkeypatch):
+    monkeypatch.delenv('NEON_DATA_CACHE_DIR', raising=False)
+    dataset = Dataset('data', 'url', 1, path=str(tmpdir))
+    arrays = {'X': np.arange(12, dtype=np.uint8).reshape(3, 4), 'y': np.arange(3)}
+    calls = []
+
+    def build():
+        calls.append(1)
+        return arrays
+
+    for _ in range(2):
+        cached = dataset.load_cache('test', ['X', 'y'], build)
+        for key in arrays:
+            assert isinstance(cached[key], np.memmap)
+            assert cached[key].dtype == arrays[key].dtype
+            assert np.array_equal(cached[key], arrays[key])
+    assert len(calls) == 1
+    assert os.path.exists(str(tmpdir.join('decoded', 'test_X.npy')))
+
+
+def test_normalized_array_iterator(backend_default):
+    be = NervanaObject.be
+    rng = np.random.RandomState(0)
+    X = rng.randint(0, 256, (be.bsz + 7, 12)).astype(np.uint8)
+    X[3] = 17  # constant example
+    y = rng.randint(0, 5, (X.shape[0], 1))
+    mean, W = rng.uniform(0, 1, 12), rng.uniform(-1, 1, (12, 12))
+
+    ref = CIFAR10.global_contrast_normalize(X, scale=55.) * 0.5 - 1
+    ref = np.dot(ref - mean, W)
+    it = NormalizedArrayIterator(X, y, nclass=5, scale=0.5, shift=-1., contrast_normalize=55.,
+                                 whiten=(mean, W))
+    assert it.Xdev[0].dtype == np.uint8
+    # the last minibatch wraps around to the first examples
+    inds = np.resize(np.arange(X.shape[0]), 2 * be.bsz).reshape(2, be.bsz)
+    for batch_inds, (x, t) in zip(inds, it):
+        assert np.allclose(x.get(), ref[batch_inds].T, rtol=1e-4, atol=1e-4)
+        assert np.array_equal(t.get().argmax(axis=0), y[batch_inds, 0])
+
+
+@pytest.mark.parametrize("make_onehot", [True, False])
+def test_array_iterator_streaming(backend_default, tmpdir, make_onehot):
+    be = NervanaObject.be
+    rng = np.random.RandomState(0)
+    X = [rng.uniform(-1, 1, (2 * be.bsz + 5, 6)), rng.uniform(-1, 1, (2 * be.bsz + 5, 3))]
+    if make_onehot:
+        y = rng.randint(0, 4, (X[0].shape[0], 1))
+    else:
+        y = rng.uniform(-1, 1, (X[0].shape[0], 2))
+    # a memory mapped data set
+    np.save(str(tmpdir.join('X.npy')), X[0])
+    X[0] = np.load(str(tmpdir.join('X.npy')), mmap_mode='r')
+
+    ref = ArrayIterator(X, y, nclass=4, make_onehot=make_onehot)
+    it = ArrayIterator(X, y, nclass=4, make_onehot=make_onehot, memory_budget=0)
+    assert it.streaming and not ref.streaming
+    assert not ArrayIterator(X, y, nclass=4, make_onehot=make_onehot,
+                             memory_budget=10**9).streaming
+
+    # the epochs start where the last minibatch wrapped around
+    for epoch in range(3):
+        assert it.nbatches == ref.nbatches
+        for (x, t), (x_ref, t_ref) in zip(it, ref):
+            for a, b in zip(x, x_ref):
+                assert np.array_equal(a.get(), b.get())
+            assert np.array_equal(t.get(), t_ref.get())
+
+    # an interrupted epoch stops the worker thread
+    for _ in it:
+        break
+    assert sum(1 for _ in it) == it.nbatches
+
+
+def test_normalized_array_iterator_streaming(backend_default):
+    be = NervanaObject.be
+    X = np.random.randint(0, 256, (be.bsz + 3, 12)).astype(np.uint8)
+    ref = NormalizedArrayIterator(X, scale=1 / 255.)
+    it = NormalizedArrayIterator(X, scale=1 / 255., memory_budget=0)
+    assert it.streaming and it.Xbuf[0].dtype == np.uint8
+    for (x, t), (x_ref, _) in zip(it, ref):
+        assert x is t
+        assert np.allclose(x.get(), x_ref.get())
+
+
+def test_cifar10_cache(backend_default, tmpdir, monkeypatch):
+    monkeypatch.delenv('NEON_DATA_CACHE_DIR', raising=False)
+    be = NervanaObject.be
+    rng = np.random.RandomState(0)
+    batchdir = tmpdir.mkdir('cifar-10-batches-py')
+    names = ['data_batch_%d' % i for i in range(1, 6)] + ['test_batch']
+    for name in names:
+        with open(str(batchdir.join(name)), 'wb') as f:
+            pickle.dump({'data': rng.randint(0, 256, (be.bsz, 3072)).astype(np.uint8),
+                         'labels': list(rng.randint(0, 10, be.bsz))}, f, 2)
+
+    dataset = CIFAR10(path=str(tmpdir), contrast_normalize=True)
+    (X_train, y_train), (X_test, y_test), nclass = dataset.load_data()
+    assert X_train.shape == (5 * be.bsz, 3072) and y_train.shape == (5 * be.bsz, 1)
+
+    # the cache is used once the batch files are gone
+    for name in names:
+        batchdir.join(name).remove()
+    for X, y, it in ((X_train, y_train, dataset.train_iter), (X_test, y_test, dataset.valid_iter)):
+        assert it.Xdev[0].dtype == np.uint8
+        for i, (x, t) in enumerate(it):
+            rows = slice(i * be.bsz, (i + 1) * be.bsz)
+            assert np.allclose(x.get(), X[rows].T, rtol=1e-4, atol=1e-5)
+            assert np.array_equal(t.get().argmax(axis=0), y[rows, 0])
@@ -0,0 +1,85 @@
+# ******************************************************************************
+# Copyright 2017-2018 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ******************************************************************************
+"""
+Tests for the persistent layer geometry cache.
+"""
+import numpy as np
+
+from neon import NervanaObject
+from neon.backends.layer_cpu import ConvLayer, PoolLayer
+from neon.data import ArrayIterator
+from neon.initializers import Gaussian
+from neon.layers import Affine, Conv, GeneralizedCost, Pooling
+from neon.models import Model
+from neon.transforms import CrossEntropyMulti, Rectlin, Softmax
+from neon.util.graph_cache import GraphCache
+
+init = Gaussian(scale=0.1)
+
+
+def make_model():
+    NervanaObject.be.rng_reset()
+    layers = [Conv((3, 3, 4), init=init, padding=1, activation=Rectlin()),
+              Conv((3, 3, 4), init=init, padding=1, activation=Rectlin()),
+              Pooling(2),
+              Affine(nout=3, init=init, activation=Softmax())]
+    return Model(layers=layers)
+
+
+def count_slices(monkeypatch):
+    calls = []
+
+    def counted(method):
+        return lambda self, *args: calls.append(1) or method(self, *args)
+
+    for cls, names in ((ConvLayer, ('fprop_slice', 'bprop_slice')), (PoolLayer, ('pool_slice',))):
+        for name in names:
+            monkeypatch.setattr(cls, name, counted(getattr(cls, name)))
+    return calls
+
+
+def test_graph_cache(backend_cpu, tmpdir, monkeypatch):
+    be = NervanaObject.be
+    x = np.random.uniform(-1, 1, (be.bsz, 4 * 8 * 8))
+    data = ArrayIterator(x, np.zeros(be.bsz, dtype=np.int32), nclass=3, lshape=(4, 8, 8))
+    cost = GeneralizedCost(costfunc=CrossEntropyMulti())
+    description = make_model().get_description()
+    be.layer_geometry.clear()
+
+    calls = count_slices(monkeypatch)
+    cache = GraphCache(str(tmpdir))
+    assert not cache.load(description)
+    model = make_model()
+    model.initialize(data, cost)
+    cache.save(description)
+    # both convolutions share one geometry
+    assert len(be.layer_geometry) == 2
+    assert len(calls) > 0
+    ref = model.fprop(be.array(x.T)).get().copy()
+
+    be.layer_geometry.clear()
+    del calls[:]
+    cache = GraphCache(str(tmpdir))
+    assert cache.load(description)
+    model = make_model()
+    model.initialize(data, cost)
+    cache.save(description)
+    assert len(calls) == 0
+    assert np.allclose(model.fprop(be.array(x.T)).get(), ref)
+
+    other = make_model()
+    other.layers.layers[0].fshape = (5, 5, 4)
+    assert cache.key(other.get_description()) != cache.key(description)
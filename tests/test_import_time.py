@@ -0,0 +1,72 @@
+# ******************************************************************************
+# Copyright 2017-2018 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ******************************************************************************
+"""
+Import time benchmark guarding the startup of short lived jobs, and tests for the
+deferred backend probing.
+"""
+import json
+import os
+import subprocess
+import sys
+
+from neon.backends.util import check_mkl
+
+# modules that neither importing neon nor creating a CPU backend should pull in
+DEFERRED = ['h5py', 'yaml', 'pycuda', 'neon.backends.nervanagpu', 'neon.backends.nervanamkl',
+            'neon.util.persist']
+
+# generous bound on the time to import the core packages, a regression that probes the
+# hardware or imports the GPU kernels at import time is well above it
+IMPORT_BUDGET = 5.0
+
+BENCHMARK = """
+import json, sys, time
+start = time.time()
+import neon.layers, neon.models, neon.optimizers, neon.transforms
+from neon.backends import gen_backend
+elapsed = time.time() - start
+gen_backend('cpu', batch_size=32)
+print(json.dumps({'elapsed': elapsed, 'loaded': [m for m in %r if m in sys.modules]}))
+"""
+
+
+def run_benchmark(deferred):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    output = subprocess.check_output([sys.executable, '-c', BENCHMARK % deferred], cwd=root)
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+
+def test_import_time():
+    result = run_benchmark(['neon.backends.nervanagpu', 'neon.backends.nervanamkl', 'pycuda',
+                            'yaml'])
+    assert result['loaded'] == []
+    assert result['elapsed'] < IMPORT_BUDGET
+
+
+def test_import_neon():
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    script = "import sys, neon; print([m for m in %r if m in sys.modules])" % DEFERRED
+    output = subprocess.check_output([sys.executable, '-c', script], cwd=root)
+    assert output.decode().strip().splitlines()[-1] == '[]'
+
+
+def test_probe_cached(monkeypatch):
+    calls = []
+    monkeypatch.setattr(check_mkl, '_mkl_lib', None)
+    monkeypatch.setattr(check_mkl, '_probe_mkl_lib', lambda: calls.append(1) or 0)
+    assert check_mkl.get_mkl_lib() == 0
+    assert check_mkl.get_mkl_lib() == 0
+    assert len(calls) == 1
@@ -0,0 +1,100 @@
+# ******************************************************************************
+# Copyright 2017-2018 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ******************************************************************************
+"""
+Tests for the micro-batching InferenceServer, using the in-process client API.
+"""
+import threading
+
+import numpy as np
+import pytest
+
+from neon import NervanaObject
+from neon.data import ArrayIterator
+from neon.initializers import Gaussian
+from neon.layers import Affine
+from neon.models import Model
+from neon.models.serving import InferenceServer
+from neon.transforms import Rectlin, Softmax
+
+
+def make_model(nin):
+    init = Gaussian(scale=0.1)
+    return Model([Affine(nout=16, init=init, activation=Rectlin()),
+                  Affine(nout=4, init=init, activation=Softmax())])
+
+
+def test_server_matches_get_outputs(backend_default):
+    be = NervanaObject.be
+    nin = 10
+    x = np.random.uniform(-1, 1, (3 * be.bsz + 5, nin)).astype(np.float32)
+    model = make_model(nin)
+    expected = model.get_outputs(ArrayIterator(x, make_onehot=False))
+
+    results = [None] * len(x)
+
+    def client(idx):
+        for i in idx:
+            results[i] = server.predict(x[i], timeout=30)
+
+    with InferenceServer(model, max_wait=0.01) as server:
+        threads = [threading.Thread(target=client, args=(range(t, len(x), 4),))
+                   for t in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+    assert np.allclose(np.array(results), expected, rtol=1e-5, atol=1e-6)
+
+    stats = server.stats.summary()
+    assert stats['requests'] == len(x)
+    assert stats['batch_counts'].sum() == stats['batches']
+    assert stats['latency_counts'].sum() == len(x)
+    assert stats['batches'] < len(x)  # requests were coalesced
+    assert server.stats.latency_percentile(50) > 0
+
+
+def test_server_partial_batch(backend_default):
+    be = NervanaObject.be
+    model = make_model(6)
+    server = InferenceServer(model, in_shape=6, max_wait=0.)
+    x = np.random.uniform(-1, 1, (3, 6))
+    pending = [server.submit(xi) for xi in x]
+
+    # drive the serving loop from this thread
+    server.run_batch(server._next_batch(poll_interval=0.1))
+    assert all(p.done() for p in pending)
+    assert server.stats.summary()['batch_counts'][3] == 1
+
+    inputs = be.zeros((6, be.bsz))
+    inputs[:, :3] = x.T
+    out = model.fprop(inputs, inference=True).get()
+    for i, p in enumerate(pending):
+        assert np.allclose(p.result(), out[:, i], rtol=1e-5, atol=1e-6)
+
+    # the model is left processing full minibatches, for its owner and the server
+    x_full = np.random.uniform(-1, 1, (be.bsz, 6))
+    out = model.fprop(be.array(x_full.T), inference=True).get()
+    model.set_batch_size(None)
+    expected = model.fprop(be.array(x_full.T), inference=True).get()
+    assert np.allclose(out, expected, rtol=1e-5, atol=1e-6)
+    pending = [server.submit(xi) for xi in x_full]
+    server.run_batch(server._next_batch(poll_interval=0.1))
+    for i, p in enumerate(pending):
+        assert np.allclose(p.result(), expected[:, i], rtol=1e-5, atol=1e-6)
+
+    with pytest.raises(ValueError):
+        server.submit(np.zeros(5))
@@ -0,0 +1,103 @@
+# ******************************************************************************
+# Copyright 2017-2018 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ******************************************************************************
+"""
+Tests for the parallel and resumable ingest of data sets.
+"""
+import os
+import numpy as np
+import pytest
+
+from neon.data.ingest import ingest_shards, write_manifest
+from neon.data.manifestloader import read_manifest
+
+
+def write_shard(args):
+    """
+    Writes two files for a shard, logging the call, and fails on the shards to fail.
+    """
+    directory, index, fail = args
+    if fail:
+        raise ValueError('shard %d failed' % index)
+    with open(os.path.join(directory, 'calls.txt'), 'a') as f:
+        f.write('%d\n' % index)
+    records = []
+    for i in range(2):
+        path = os.path.join(directory, '%d_%d.txt' % (index, i))
+        with open(path, 'w') as f:
+            f.write('%d' % (index * 2 + i))
+        records.append((path, index % 3))
+    return records
+
+
+def make_shards(directory, num_shards, fail=()):
+    return [(str(i), (directory, i, i in fail)) for i in range(num_shards)]
+
+
+def calls(directory):
+    with open(os.path.join(directory, 'calls.txt')) as f:
+        calls = [int(line) for line in f]
+    os.remove(os.path.join(directory, 'calls.txt'))
+    return sorted(calls)
+
+
+def test_ingest_resume(tmpdir):
+    directory = str(tmpdir)
+    journal = os.path.join(directory, 'journal', 'ingest.jsonl')
+    expected = [[os.path.join(directory, '%d_%d.txt' % (i, j)), i % 3]
+                for i in range(6) for j in range(2)]
+
+    # an ingest interrupted by the failure of a shard
+    with pytest.raises(ValueError):
+        ingest_shards(make_shards(directory, 6, fail=(3,)), write_shard, journal, num_workers=0)
+    assert calls(directory) == [0, 1, 2]
+
+    # the rerun only processes the remaining shards, and shards of changed outputs
+    with open(os.path.join(directory, '1_0.txt'), 'w') as f:
+        f.write('9')
+    records = ingest_shards(make_shards(directory, 6), write_shard, journal, num_workers=0)
+    assert calls(directory) == [1, 3, 4, 5]
+    assert records == expected
+
+    # all the shards are complete
+    records = ingest_shards(make_shards(directory, 6), write_shard, journal, num_workers=2)
+    assert not os.path.exists(os.path.join(directory, 'calls.txt'))
+    assert records == expected
+
+    # a journal truncated by a crash
+    with open(journal, 'a') as f:
+        f.write('{"key": "5", "reco')
+    records = ingest_shards(make_shards(directory, 7), write_shard, journal, num_workers=2)
+    assert calls(directory) == [6]
+    assert records[:-2] == expected
+
+
+def test_write_manifest(tmpdir):
+    directory = str(tmpdir)
+    records = ingest_shards(make_shards(directory, 4), write_shard,
+                            os.path.join(directory, 'journal.jsonl'), num_workers=2)
+    manifest = os.path.join(directory, 'manifest.tsv')
+    write_manifest(manifest, records, root_dir=directory)
+
+    with open(manifest) as f:
+        lines = f.read().splitlines()
+    assert lines[0] == '@FILE\tSTRING'
+    assert lines[1] == '0_0.txt\t0'
+    assert sorted(os.listdir(directory)) == sorted(['calls.txt', 'journal.jsonl', 'manifest.tsv']
+                                                   + ['%d_%d.txt' % (i, j) for i in range(4)
+                                                      for j in range(2)])
+    paths, labels = read_manifest(manifest)
+    assert paths == [record[0] for record in records]
+    assert np.array_equal(labels, [record[1] for record in records])
@@ -0,0 +1,83 @@
+# ******************************************************************************
+# Copyright 2017-2018 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ******************************************************************************
+"""
+Tests for the loss callback, on single and multiple output models.
+"""
+import numpy as np
+
+from neon import NervanaObject
+from neon.callbacks.callbacks import LossCallback
+from neon.data import ArrayIterator
+from neon.initializers import Gaussian
+from neon.layers import (Affine, BranchNode, GeneralizedCost, Multicost, SingleOutputTree,
+                         Tree)
+from neon.models import Model
+from neon.transforms import CrossEntropyBinary, CrossEntropyMulti, Logistic, Rectlin, Softmax
+
+
+def branch_model(tree_cls):
+    init = Gaussian(scale=0.1)
+    b1 = BranchNode(name="b1")
+    p1 = [Affine(nout=16, init=init, activation=Rectlin()),
+          b1,
+          Affine(nout=4, init=init, activation=Softmax())]
+    p2 = [b1,
+          Affine(nout=4, init=init, activation=Logistic(shortcut=True))]
+    cost = Multicost(costs=[GeneralizedCost(costfunc=CrossEntropyMulti()),
+                            GeneralizedCost(costfunc=CrossEntropyBinary())],
+                     weights=[1., 0.5])
+    return Model(layers=tree_cls([p1, p2], alphas=[1., 0.2])), cost
+
+
+def run_loss_callback(model, cost, data):
+    model.initialize(data, cost=cost)
+    callback = LossCallback(data)
+    callback_data = {'cost/loss': np.zeros(1), 'time/loss': np.zeros(1)}
+    callback.on_epoch_end(callback_data, model, 0)
+    return callback_data['cost/loss'][0]
+
+
+def test_loss_callback_branch_model(backend_cpu):
+    be = NervanaObject.be
+    nbatches = 3
+    x = np.random.uniform(-1, 1, (nbatches * be.bsz - 5, 20)).astype(np.float32)
+    y = np.random.randint(0, 4, nbatches * be.bsz - 5)
+    data = ArrayIterator(x, y, nclass=4)
+
+    # the weighted sum of the costs of the outputs, over the records of the set
+    model, cost = branch_model(Tree)
+    loss = run_loss_callback(model, cost, data)
+    data.reset()
+    total, nprocessed = 0., 0
+    for inputs, targets in data:
+        outputs = model.fprop(inputs, inference=True)
+        bsz = min(data.ndata - nprocessed, be.bsz)
+        for w, c, out in zip(cost.weights, cost.costs, outputs):
+            total += w * c.fprop_cost(out, targets).get()[0, :bsz].sum()
+        nprocessed += bsz
+    assert np.allclose(loss, total / data.ndata, rtol=1e-5)
+
+    # a single output in inference
+    model, cost = branch_model(SingleOutputTree)
+    loss = run_loss_callback(model, cost, data)
+    data.reset()
+    total, nprocessed = 0., 0
+    for inputs, targets in data:
+        outputs = model.fprop(inputs, inference=True)
+        bsz = min(data.ndata - nprocessed, be.bsz)
+        total += cost.costs[0].fprop_cost(outputs, targets).get()[0, :bsz].sum()
+        nprocessed += bsz
+    assert np.allclose(loss, total / data.ndata, rtol=1e-5)
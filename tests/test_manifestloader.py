@@ -0,0 +1,113 @@
+# ******************************************************************************
+# Copyright 2017-2018 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ******************************************************************************
+"""
+Tests for the python image manifest loader.
+"""
+from builtins import range
+import os
+import numpy as np
+import pytest
+
+from neon import NervanaObject
+from neon.data.dataloaderadapter import DataLoaderAdapter
+from neon.data.manifestloader import ManifestLoader, decode_image, read_manifest
+
+
+def write_images(directory, num_images, label_files=False):
+    from PIL import Image
+    rng = np.random.RandomState(0)
+    lines = [] if label_files else ['@FILE\tSTRING']
+    for i in range(num_images):
+        img = rng.randint(0, 256, (7 + i % 3, 9, 3)).astype(np.uint8)
+        Image.fromarray(img).save(os.path.join(directory, '%d.png' % i))
+        if label_files:
+            with open(os.path.join(directory, '%d.txt' % i), 'w') as f:
+                f.write('%d\n' % (i % 10))
+            lines.append('%d.png,%d.txt' % (i, i % 10))
+        else:
+            lines.append('%d.png\t%d' % (i, i % 10))
+    manifest = os.path.join(directory, 'manifest.csv')
+    with open(manifest, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+    return manifest
+
+
+def make_config(manifest, bsz, **kwargs):
+    config = {'manifest_filename': manifest, 'batch_size': bsz,
+              'etl': [{'type': 'image', 'height': 6, 'width': 8},
+                      {'type': 'label', 'binary': False}]}
+    config.update(kwargs)
+    return config
+
+
+@pytest.mark.parametrize("label_files", [False, True])
+def test_read_manifest(tmpdir, label_files):
+    manifest = write_images(str(tmpdir), 12, label_files)
+    paths, labels = read_manifest(manifest)
+    assert paths == [os.path.join(str(tmpdir), '%d.png' % i) for i in range(12)]
+    assert np.array_equal(labels, np.arange(12) % 10)
+
+
+@pytest.mark.parametrize("num_workers", [0, 2])
+def test_manifest_loader(backend_default, tmpdir, num_workers):
+    be = NervanaObject.be
+    num_images = be.bsz + 5
+    manifest = write_images(str(tmpdir), num_images)
+    images = np.array([decode_image(os.path.join(str(tmpdir), '%d.png' % i), 6, 8).ravel()
+                       for i in range(num_images)])
+
+    loader = ManifestLoader(make_config(manifest, be.bsz), num_workers=num_workers, slots=2)
+    adapter = DataLoaderAdapter(loader)
+    assert adapter.nbatches == 2
+    # the last minibatch is completed with the first images
+    order = np.resize(np.arange(num_images), 2 * be.bsz).reshape(2, be.bsz)
+    for epoch in range(2):
+        for inds, (x, t) in zip(order, adapter):
+            assert x.shape == (3 * 6 * 8, be.bsz)
+            assert np.array_equal(x.get(), images[inds].T)
+            assert np.array_equal(t.get(), (inds % 10).reshape(1, -1))
+    loader.close()
+
+
+def test_manifest_loader_shuffle(tmpdir):
+    manifest = write_images(str(tmpdir), 20)
+    loader = ManifestLoader(make_config(manifest, 4, shuffle_manifest=True, random_seed=1),
+                            num_workers=2)
+    epochs = []
+    for epoch in range(2):
+        labels = np.concatenate([t.ravel().copy() for _, (_, t) in loader])
+        epochs.append(labels)
+        assert sorted(labels) == sorted(np.arange(20) % 10)
+    assert not np.array_equal(epochs[0], epochs[1])
+
+    # an interrupted epoch leaves the loader ready for the next one
+    for _ in loader:
+        break
+    assert sum(1 for _ in loader) == loader.nbatches
+    loader.close()
+
+
+def test_manifest_loader_errors(tmpdir):
+    manifest = write_images(str(tmpdir), 8)
+    os.remove(os.path.join(str(tmpdir), '5.png'))
+    loader = ManifestLoader(make_config(manifest, 4), num_workers=1)
+    with pytest.raises(RuntimeError):
+        for _ in loader:
+            pass
+    loader.close()
+
+    with pytest.raises(NotImplementedError):
+        ManifestLoader(make_config(manifest, 4, etl=[{'type': 'audio'}]))
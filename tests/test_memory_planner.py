@@ -0,0 +1,137 @@
+# ******************************************************************************
+# Copyright 2017-2018 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ******************************************************************************
+"""
+Tests for the inference output arenas and the model memory report.
+"""
+from builtins import zip
+import numpy as np
+import pytest
+
+from neon import NervanaObject
+from neon.data import ArrayIterator
+from neon.initializers import Gaussian
+from neon.layers import (Affine, BranchNode, Conv, DeepBiLSTM, GeneralizedCost, LSTM, MergeSum,
+                         Pooling, RecurrentLast, SkipNode, Tree)
+from neon.models import Model
+from neon.optimizers import GradientDescentMomentum
+from neon.transforms import CrossEntropyMulti, Logistic, Rectlin, Softmax, Tanh
+
+init = Gaussian(scale=0.1)
+relu = Rectlin()
+
+
+def make_layers():
+    return [Conv((3, 3, 8), init=init, padding=1, activation=relu, batch_norm=True),
+            Conv((3, 3, 8), init=init, padding=1, activation=relu),
+            MergeSum([[Conv((3, 3, 8), init=init, padding=1, activation=relu),
+                       Conv((3, 3, 8), init=init, padding=1)],
+                      [SkipNode()]]),
+            Pooling(2),
+            Conv((3, 3, 8), init=init, padding=1, activation=relu),
+            Affine(nout=5, init=init, activation=Softmax())]
+
+
+def make_tree():
+    bnode = BranchNode(name='branch')
+    trunk = [Conv((3, 3, 8), init=init, padding=1, activation=relu),
+             Conv((3, 3, 8), init=init, padding=1, activation=relu), bnode,
+             Conv((3, 3, 8), init=init, padding=1, activation=relu),
+             Pooling(2), Affine(nout=5, init=init, activation=Softmax())]
+    aux = [bnode, Pooling(2), Conv((3, 3, 4), init=init, padding=1, activation=relu),
+           Affine(nout=5, init=init, activation=Softmax())]
+    return Tree([trunk, aux], alphas=[1.0, 0.5])
+
+
+def make_data():
+    be = NervanaObject.be
+    x = np.random.uniform(-1, 1, (2 * be.bsz, 3 * 16 * 16))
+    return ArrayIterator(x, np.zeros(2 * be.bsz, dtype=np.int32), nclass=5, lshape=(3, 16, 16))
+
+
+def initialized(make, data, inference):
+    NervanaObject.be.rng_reset()
+    model = Model(make())
+    model.initialize(data, inference=inference)
+    return model
+
+
+@pytest.mark.parametrize("make", [make_layers, make_tree])
+def test_inference_arenas(backend_cpu, make):
+    data = make_data()
+    ref = initialized(make, data, False)
+    model = initialized(make, data, True)
+
+    for x, _ in data:
+        outputs = model.fprop(x, inference=True)
+        ref_outputs = ref.fprop(x, inference=True)
+        if not isinstance(outputs, list):
+            outputs, ref_outputs = [outputs], [ref_outputs]
+        for out, ref_out in zip(outputs, ref_outputs):
+            assert np.allclose(out.get(), ref_out.get(), rtol=1e-5, atol=1e-6)
+
+    report, ref_report = model.memory_report(), ref.memory_report()
+    assert report['total_bytes'] < ref_report['total_bytes']
+    assert any('output_arenas' in name for name in report['arenas'])
+
+
+def test_inference_arenas_bidirectional(backend_cpu):
+    be = NervanaObject.be
+    nin, nsteps = 6, 5
+
+    def make():
+        return [LSTM(8, init, activation=Tanh(), gate_activation=Logistic()),
+                DeepBiLSTM(8, init, activation=Tanh(), gate_activation=Logistic(), depth=2),
+                RecurrentLast(),
+                Affine(nout=16, init=init, activation=relu),
+                Affine(nout=5, init=init, activation=Softmax())]
+
+    # the padded outputs of the bidirectional layers keep buffers of their own
+    x = np.random.uniform(-1, 1, (2 * be.bsz, nin * nsteps))
+    data = ArrayIterator(x, np.zeros(2 * be.bsz, dtype=np.int32), nclass=5,
+                         lshape=(nin, nsteps))
+    ref = initialized(make, data, False)
+    model = initialized(make, data, True)
+    for x, _ in data:
+        assert np.allclose(model.fprop(x, inference=True).get(),
+                           ref.fprop(x, inference=True).get(), rtol=1e-5, atol=1e-6)
+
+
+def test_arena_plan(backend_cpu):
+    model = initialized(make_layers, make_data(), True)
+    stats = model.layers.arena_stats
+    # the outputs of a chain of layers alternate between two arenas
+    assert stats['arenas'] == 2
+    assert stats['full_bytes'] == stats['planned_bytes'] + stats['saved_bytes']
+    assert stats['saved_bytes'] > 0
+
+    with pytest.raises(ValueError):
+        model.fit(make_data(), GeneralizedCost(costfunc=CrossEntropyMulti()),
+                  GradientDescentMomentum(0.1, 0.9), 1, None)
+
+
+def test_memory_report(backend_cpu):
+    model = initialized(make_layers, make_data(), False)
+    report = model.memory_report()
+    layers = report['layers']
+
+    params = sum(l.W.get().nbytes for l in model.layers_to_optimize if hasattr(l, 'W'))
+    assert params <= sum(u['params'] for u in layers.values())
+    assert sum(u['params'] for u in layers.values()) == sum(u['grads'] for u in layers.values())
+    # the deltas of all the layers live in the shared delta buffers
+    assert sum(u['deltas'] for u in layers.values()) == 0
+    assert any('deltas' in name for name in report['arenas'])
+    assert report['total_bytes'] == (sum(report['arenas'].values()) +
+                                     sum(u['total'] for u in layers.values()))
@@ -0,0 +1,101 @@
+# ******************************************************************************
+# Copyright 2017-2018 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ******************************************************************************
+"""
+Tests for float16 storage and int8 weights on the CPU backend.
+"""
+import numpy as np
+
+from neon import NervanaObject
+from neon.initializers import Constant, Gaussian
+from neon.layers import Linear, LookupTable
+from neon.optimizers import GradientDescentMomentum
+
+
+def test_compound_dot_fp16(backend_cpu16):
+    be = NervanaObject.be
+    A = np.random.uniform(-1, 1, (32, 64)).astype(np.float16)
+    B = np.random.uniform(-1, 1, (64, 16)).astype(np.float16)
+    C = np.random.uniform(-1, 1, (32, 16)).astype(np.float16)
+    ref = 0.5 * np.dot(A.astype(np.float32), B.astype(np.float32)) + 2 * C.astype(np.float32)
+
+    C_dev = be.array(C)
+    be.compound_dot(be.array(A), be.array(B), C_dev, alpha=0.5, beta=2.0)
+
+    assert C_dev.dtype == np.float16
+    assert np.allclose(C_dev.get(), ref, rtol=1e-3, atol=1e-2)
+
+
+def test_compound_dot_int8(backend_cpu):
+    be = NervanaObject.be
+    A = np.random.randint(-127, 128, (8, 20)).astype(np.int8)
+    B = np.random.uniform(-1, 1, (20, 5)).astype(np.float32)
+
+    C_dev = be.empty((8, 5))
+    be.compound_dot(be.array(A, dtype=np.int8), be.array(B), C_dev)
+
+    assert np.allclose(C_dev.get(), np.dot(A.astype(np.float32), B), rtol=1e-5, atol=1e-4)
+
+
+def test_master_weights(backend_cpu16):
+    be = NervanaObject.be
+    layer = Linear(nout=4, init=Constant(1.0))
+    layer.configure(3)
+    layer.allocate()
+    opt = GradientDescentMomentum(learning_rate=1e-4, momentum_coef=0.)
+
+    # each update of 1e-4 is below the float16 resolution at 1.0
+    for _ in range(20):
+        layer.dW[:] = be.bsz
+        opt.optimize([layer], epoch=0)
+
+    (master, _), = [v[1:] for v in opt.masters.values()]
+    assert master.dtype == np.float32
+    assert np.allclose(master.get(), 0.998, atol=1e-5)
+    assert layer.W.dtype == np.float16
+    assert np.allclose(layer.W.get(), 0.998, atol=5e-4)
+
+
+def test_quantized_linear(backend_cpu):
+    be = NervanaObject.be
+    layer = Linear(nout=10, init=Gaussian(scale=0.1))
+    layer.configure(20)
+    layer.allocate()
+    x = be.array(np.random.uniform(-1, 1, (20, be.bsz)))
+    ref = layer.fprop(x).get().copy()
+
+    layer.quantize_weights()
+    assert layer.W.dtype == np.int8
+    assert np.allclose(layer.fprop(x).get(), ref, rtol=0, atol=2e-2)
+
+    pdict = layer.get_description(get_weights=True)
+    restored = Linear(nout=10, init=Gaussian(scale=0.1))
+    restored.set_params(pdict)
+    restored.configure(20)
+    restored.allocate()
+    assert restored.W.dtype == np.int8
+    assert np.allclose(restored.fprop(x).get(), layer.fprop(x).get())
+
+
+def test_quantized_lookuptable(backend_cpu):
+    be = NervanaObject.be
+    layer = LookupTable(vocab_size=50, embedding_dim=8, init=Gaussian(scale=0.5))
+    layer.configure((6, 1))
+    layer.allocate()
+    words = be.array(np.random.randint(0, 50, (6, be.bsz)))
+    ref = layer.fprop(words).get().copy()
+
+    layer.quantize_weights()
+    assert np.allclose(layer.fprop(words).get(), ref, rtol=0, atol=1e-2)
@@ -0,0 +1,99 @@
+# ******************************************************************************
+# Copyright 2017-2018 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ******************************************************************************
+"""
+Tests for inference on partial minibatches through column sliced layer buffers.
+"""
+import numpy as np
+import pytest
+
+from neon import NervanaObject
+from neon.data import ArrayIterator
+from neon.initializers import Gaussian
+from neon.layers import Affine, BatchNorm, Conv, LRN, Pooling, Recurrent, LSTM
+from neon.models import Model
+from neon.transforms import Logistic, Rectlin, Softmax, Tanh
+
+
+def conv_model():
+    init = Gaussian(scale=0.1)
+    return Model([Conv((3, 3, 8), init=init, activation=Rectlin(), batch_norm=True),
+                  LRN(depth=3),
+                  Pooling(2),
+                  Conv((1, 1, 4), init=init, bias=init, activation=Rectlin()),
+                  Affine(nout=5, init=init, activation=Softmax())])
+
+
+def test_get_outputs_partial(backend_cpu):
+    be = NervanaObject.be
+    x = np.random.uniform(-1, 1, (2 * be.bsz + 3, 2 * 8 * 8)).astype(np.float32)
+    data = ArrayIterator(x, make_onehot=False, lshape=(2, 8, 8))
+    model = conv_model()
+    model.initialize(data)
+    for l in model.layers.layers:
+        if isinstance(l, BatchNorm):
+            l.gmean[:] = be.array(np.random.uniform(-1, 1, l.gmean.shape))
+            l.gvar[:] = be.array(np.random.uniform(0.5, 2, l.gvar.shape))
+
+    expected = []
+    for xb, _ in data:
+        expected.append(model.fprop(xb, inference=True).get().T.copy())
+    expected = np.vstack(expected)[:len(x)]
+
+    outputs = model.get_outputs(data)
+    assert outputs.shape == expected.shape
+    assert np.allclose(outputs, expected, rtol=1e-5, atol=1e-6)
+    assert all(l.actual_bsz is None for l in model.layers.layers)
+
+
+def test_padding_columns_skipped(backend_cpu):
+    be = NervanaObject.be
+    n = 3
+    x = np.random.uniform(-1, 1, (be.bsz, 2 * 8 * 8)).astype(np.float32)
+    data = ArrayIterator(x, make_onehot=False, lshape=(2, 8, 8))
+    model = conv_model()
+    model.initialize(data)
+    xb = next(iter(data))[0]
+
+    full = model.fprop(xb, inference=True).get()
+    model.layers.layers[-1].outputs.fill(-1)
+    model.set_batch_size(n)
+    partial = model.fprop(xb, inference=True).get()
+    model.set_batch_size(None)
+
+    assert np.allclose(partial[:, :n], full[:, :n], rtol=1e-5, atol=1e-6)
+    assert np.all(partial[:, n:] == -1)
+
+
+@pytest.mark.parametrize("layer", [Recurrent, LSTM])
+def test_recurrent_partial(backend_cpu, layer):
+    be = NervanaObject.be
+    nin, nsteps, n = 6, 4, 5
+    init = Gaussian(scale=0.2)
+    if layer is LSTM:
+        rnn = LSTM(8, init, activation=Tanh(), gate_activation=Logistic(),
+                   reset_cells=True)
+    else:
+        rnn = Recurrent(8, init, activation=Tanh(), reset_cells=True)
+    model = Model([rnn, Affine(nout=3, init=init, activation=Rectlin())])
+    model.initialize((nin, nsteps))
+
+    x = be.array(np.random.uniform(-1, 1, (nin, nsteps * be.bsz)))
+    full = model.fprop(x, inference=True).get().reshape(3, nsteps, be.bsz)
+    model.set_batch_size(n)
+    partial = model.fprop(x, inference=True).get().reshape(3, nsteps, be.bsz)
+    model.set_batch_size(None)
+
+    assert np.allclose(partial[:, :, :n], full[:, :, :n], rtol=1e-5, atol=1e-6)
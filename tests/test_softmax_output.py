@@ -0,0 +1,180 @@
+# ******************************************************************************
+# Copyright 2017-2018 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ******************************************************************************
+"""
+Tests of the sampled and class-factored softmax output layers over large vocabularies.
+"""
+import numpy as np
+import pytest
+
+from neon import NervanaObject
+from neon.initializers import Gaussian
+from neon.layers import SampledSoftmax, ClassFactoredSoftmax, SoftmaxLayerCost
+from utils import allclose_with_out
+
+
+def softmax(x):
+    x = np.exp(x - x.max(axis=0))
+    return x / x.sum(axis=0)
+
+
+def setup_layer(layer, cost, nin, nsteps, deltas_buffer):
+    layer.configure((nin, nsteps))
+    layer.allocate()
+    layer.prev_layer = True  # Hack to force delta buffer allocation
+    layer.allocate_deltas(deltas_buffer)
+    deltas_buffer.allocate_buffers()
+    layer.set_deltas(deltas_buffer)
+    cost.initialize(layer)
+    # random biases
+    layer.W[:, nin:] = layer.be.array(np.random.randn(layer.W.shape[0], 1))
+    return layer.W.get()
+
+
+def int_targets(be, nout, ncols):
+    labels = np.random.randint(0, nout, (1, ncols))
+    return labels, be.array(labels, dtype=np.int32)
+
+
+@pytest.mark.parametrize("layer_cls", [SampledSoftmax, ClassFactoredSoftmax])
+def test_softmax_output_inference(backend_default, deltas_buffer, layer_cls):
+    be = NervanaObject.be
+    nin, nout, nsteps = 6, 30, 2
+    args = {'num_sampled': 5} if layer_cls is SampledSoftmax else {'num_classes': 4}
+    layer = layer_cls(nout, Gaussian(scale=0.5), **args)
+    cost = SoftmaxLayerCost()
+    W = setup_layer(layer, cost, nin, nsteps, deltas_buffer)
+
+    ncols = nsteps * be.bsz
+    h = np.random.randn(nin, ncols)
+    labels, targets = int_targets(be, nout, ncols)
+    probs = layer.fprop(be.array(h), inference=True).get()
+
+    hidden = np.vstack([h, np.ones((1, ncols))])
+    if layer_cls is SampledSoftmax:
+        expected = softmax(W.dot(hidden))
+    else:
+        bounds = layer.class_bounds
+        class_probs = softmax(W[nout:].dot(hidden))
+        expected = np.vstack([softmax(W[bounds[c]:bounds[c + 1]].dot(hidden)) * class_probs[c]
+                              for c in range(len(bounds) - 1)])
+    assert allclose_with_out(probs, expected, atol=1e-5, rtol=1e-4)
+    assert allclose_with_out(probs.sum(axis=0), 1., atol=1e-5)
+
+    # the exact cross entropy, with integer or onehot targets
+    exact = -np.log(expected[labels[0], np.arange(ncols)])
+    assert allclose_with_out(cost.fprop_cost(None, targets).get(), exact[None], rtol=1e-4)
+    onehot = np.zeros((nout, ncols))
+    onehot[labels[0], np.arange(ncols)] = 1
+    assert allclose_with_out(cost.fprop_cost(None, be.array(onehot)).get(), exact[None],
+                             rtol=1e-4)
+
+
+def test_sampled_softmax_training(backend_default, deltas_buffer):
+    be = NervanaObject.be
+    nin, nout, nsteps, num_sampled = 6, 40, 2, 8
+    layer = SampledSoftmax(nout, Gaussian(scale=0.5), num_sampled=num_sampled)
+    cost = SoftmaxLayerCost(scale=2.)
+    W = setup_layer(layer, cost, nin, nsteps, deltas_buffer)
+
+    ncols = nsteps * be.bsz
+    h = np.random.randn(nin, ncols)
+    labels, targets = int_targets(be, nout, ncols)
+    layer.fprop(be.array(h))
+    loss = cost.fprop_cost(None, targets).get()
+    deltas = layer.bprop(cost.get_errors(None, targets)).get()
+    dW = layer.dW.get()
+
+    samples = layer.sample_ids.get()[0]
+    assert len(set(samples)) == num_sampled
+    sample_logq = layer.sample_logq.get()
+    target_logq = layer.target_logq.get()
+    assert np.all(sample_logq <= 0) and np.all(target_logq <= 0)
+
+    # reference: softmax over the target then the sampled classes, hits removed
+    hidden = np.vstack([h, np.ones((1, ncols))])
+    cols = np.arange(ncols)
+    logits = np.vstack([W[labels[0]].dot(hidden)[cols, cols] - target_logq,
+                        W[samples].dot(hidden) - sample_logq])
+    logits[1:][samples[:, None] == labels] -= 1e9
+    p = softmax(logits)
+    assert allclose_with_out(loss, -np.log(p[:1]), rtol=1e-4, atol=1e-5)
+
+    dz = 2. * (p - np.eye(num_sampled + 1, 1))
+    ref_deltas = W[samples, :nin].T.dot(dz[1:]) + W[labels[0], :nin].T * dz[:1]
+    ref_dW = np.zeros_like(W)
+    np.add.at(ref_dW, samples, dz[1:].dot(hidden.T))
+    np.add.at(ref_dW, labels[0], (hidden * dz[:1]).T)
+    assert allclose_with_out(deltas, ref_deltas, atol=1e-4, rtol=1e-4)
+    assert allclose_with_out(dW, ref_dW, atol=1e-4, rtol=1e-4)
+    # only the rows of the sampled and target classes have gradients
+    touched = np.union1d(samples, labels[0])
+    assert not np.any(np.delete(dW, touched, axis=0))
+
+
+def test_sampled_softmax_sampler(backend_default):
+    layer = SampledSoftmax(1000, Gaussian(), num_sampled=200)
+    counts = np.zeros(1000)
+    trials = 200
+    tries = 0
+    for _ in range(trials):
+        samples, n = layer.sample()
+        counts[samples] += 1
+        tries += n
+    # frequent classes are drawn in most minibatches, consistently with the expected counts
+    expected = np.exp(layer.log_expected_count(np.arange(1000), tries / float(trials)))
+    assert counts[0] / trials > 0.9
+    assert np.abs(counts[:50] / trials - expected[:50]).max() < 0.1
+    assert counts[:100].sum() > counts[900:].sum()
+
+
+def test_class_factored_softmax_training(backend_default, deltas_buffer):
+    be = NervanaObject.be
+    nin, nout, nsteps = 6, 23, 2
+    bounds = [0, 3, 10, 11, 23]
+    layer = ClassFactoredSoftmax(nout, Gaussian(scale=0.5), class_bounds=bounds)
+    cost = SoftmaxLayerCost()
+    W = setup_layer(layer, cost, nin, nsteps, deltas_buffer)
+
+    ncols = nsteps * be.bsz
+    h = np.random.randn(nin, ncols)
+    labels, targets = int_targets(be, nout, ncols)
+    layer.fprop(be.array(h))
+    loss = cost.fprop_cost(None, targets).get()
+    deltas = layer.bprop(cost.get_errors(None, targets)).get()
+    dW = layer.dW.get()
+
+    # the training cost is the exact cross entropy
+    hidden = np.vstack([h, np.ones((1, ncols))])
+    classes = layer.word_class[labels[0]]
+    class_probs = softmax(W[nout:].dot(hidden))
+    ref_loss = np.zeros(ncols)
+    ref_deltas = np.zeros((nin, ncols))
+    ref_dW = np.zeros_like(W)
+    dclass = class_probs.copy()
+    dclass[classes, np.arange(ncols)] -= 1
+    ref_dW[nout:] = dclass.dot(hidden.T)
+    ref_deltas += W[nout:, :nin].T.dot(dclass)
+    for n in range(ncols):
+        start, end = bounds[classes[n]], bounds[classes[n] + 1]
+        p = softmax(W[start:end].dot(hidden[:, n]))
+        ref_loss[n] = -np.log(class_probs[classes[n], n] * p[labels[0, n] - start])
+        p[labels[0, n] - start] -= 1
+        ref_dW[start:end] += np.outer(p, hidden[:, n])
+        ref_deltas[:, n] += W[start:end, :nin].T.dot(p)
+
+    assert allclose_with_out(loss, ref_loss[None], rtol=1e-4, atol=1e-5)
+    assert allclose_with_out(deltas, ref_deltas, atol=1e-4, rtol=1e-4)
+    assert allclose_with_out(dW, ref_dW, atol=1e-4, rtol=1e-4)
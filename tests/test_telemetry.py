@@ -0,0 +1,67 @@
+# ******************************************************************************
+# Copyright 2017-2018 Intel Corporation
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ******************************************************************************
+"""
+Tests for the sampled tensor telemetry callback.
+"""
+import os
+import h5py
+import numpy as np
+import pytest
+
+from neon import NervanaObject
+from neon.callbacks.callbacks import Callbacks
+from neon.data import ArrayIterator
+from neon.initializers import Gaussian
+from neon.layers import Affine, GeneralizedCost
+from neon.models import Model
+from neon.optimizers import GradientDescentMomentum
+from neon.transforms import CrossEntropyMulti, Rectlin, Softmax
+
+
+@pytest.mark.parametrize("plot_per_mini", [False, True])
+def test_telemetry_callback(backend_cpu, tmpdir, plot_per_mini):
+    be = NervanaObject.be
+    nbatches, epochs, sample_size = 3, 1, 50
+    x = np.random.uniform(-1, 1, (nbatches * be.bsz, 20)).astype(np.float32)
+    y = np.random.randint(0, 4, nbatches * be.bsz)
+    data = ArrayIterator(x, y, nclass=4)
+
+    init = Gaussian(scale=0.1)
+    model = Model([Affine(nout=16, init=init, activation=Rectlin()),
+                   Affine(nout=4, init=init, activation=Softmax())])
+    cost = GeneralizedCost(costfunc=CrossEntropyMulti())
+    opt = GradientDescentMomentum(0.1, 0.9)
+
+    output_file = os.path.join(str(tmpdir), 'telemetry.h5')
+    callbacks = Callbacks(model, output_file=output_file, progress_bar=False)
+    callbacks.add_telemetry_callback(sample_size=sample_size, plot_per_mini=plot_per_mini)
+    model.fit(data, optimizer=opt, num_epochs=epochs, cost=cost, callbacks=callbacks)
+
+    with h5py.File(output_file, 'r') as f:
+        hist = f['hist']
+        steps = nbatches * epochs if plot_per_mini else epochs
+        assert hist.attrs['time_steps'] == steps
+        names = sorted(hist.keys())
+        # the activations are named after the activation layers computing them in place
+        assert len(names) == 6
+        assert len([n for n in names if n.endswith('_Rectlin_outputs')]) == 1
+        assert len([n for n in names if n.endswith('_Softmax_outputs')]) == 1
+        assert len([n for n in names if n.endswith('_dW')]) == 2
+        for name in names:
+            counts = hist[name][:]
+            assert counts.shape == (be.hist_bins, steps)
+            per_step = sample_size * (1 if plot_per_mini else nbatches)
+            assert np.all(counts.sum(axis=0) == per_step)